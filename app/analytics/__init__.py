@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app import metrics
+from app.analytics import columnar, export
+from app.analytics.columnar import Snapshot
+from app.logs.logger import get_logger
+from app.models.models import Livro, Pagamento, Pedido, PedidoLivro
+from app.repositories import get_repositories
+
+logger = get_logger("MyBooks.analises")
+
+# Snapshots colunares (NumPy) das tabelas usadas nas análises ad hoc, reconstruídos a partir de uma
+# varredura em faixas de token quando ficam mais velhos que ANALYTICS_SNAPSHOT_TTL_S (ou sob demanda).
+# Um arquivo .arrow exportado (app/analytics/export.py) mais novo que o TTL é usado no lugar da varredura!
+ANALYTICS_SNAPSHOT_TTL_S = float(os.getenv("ANALYTICS_SNAPSHOT_TTL_S", "300"))
+
+TABELAS: Dict[str, Tuple[object, List[str]]] = {
+    "livros": (Livro, ["id", "genero", "preco", "data_publicacao", "autor_id", "editora_id"]),
+    "pedidos": (Pedido, ["id", "usuario_id", "status", "valor_total", "data_pedido"]),
+    "pagamentos": (Pagamento, ["id", "pedido_id", "valor", "data_pagamento", "forma_pagamento"]),
+    "pedido_livro": (PedidoLivro, ["pedido_id", "livro_id"]),
+}
+
+_snapshots: Dict[str, Snapshot] = {}
+_locks = {name: threading.Lock() for name in TABELAS}
+
+
+def available() -> bool:
+    return columnar.np is not None
+
+
+def _scan(name: str, names: List[str]):
+    repository = getattr(get_repositories(), name)
+    if name == "pedido_livro":
+        return repository.scan()
+    return repository.scan(columns=names)
+
+
+def _from_export(name: str, names: List[str]) -> Optional[Snapshot]:
+    arrow_table = export.open_arrow(name)
+    if arrow_table is None:
+        return None
+    built_at = export.gerado_em(arrow_table)
+    if built_at is None or time.time() - built_at >= ANALYTICS_SNAPSHOT_TTL_S:
+        return None
+    return columnar.from_arrow(name, TABELAS[name][0], arrow_table, names, built_at)
+
+
+def get_snapshot(name: str, refresh: bool = False) -> Snapshot:
+    snapshot = _snapshots.get(name)
+    if snapshot is not None and not refresh and snapshot.age_s < ANALYTICS_SNAPSHOT_TTL_S:
+        return snapshot
+    # Um build por tabela de cada vez: quem chegar durante o build espera e reaproveita o resultado!
+    with _locks[name]:
+        snapshot = _snapshots.get(name)
+        if snapshot is not None and not refresh and snapshot.age_s < ANALYTICS_SNAPSHOT_TTL_S:
+            return snapshot
+        model, names = TABELAS[name]
+        snapshot = None if refresh else _from_export(name, names)
+        origem = "arquivo" if snapshot is not None else "varredura"
+        if snapshot is None:
+            snapshot = columnar.build(name, model, _scan(name, names), names)
+        _snapshots[name] = snapshot
+    metrics.incr("analytics.snapshots", f"{name}.{origem}")
+    metrics.set_gauge("analytics.snapshot_ms", name, round(snapshot.build_ms, 1))
+    logger.info("Snapshot colunar de %s (%s)! %d linhas em %.1f ms!", name, origem, snapshot.rows, snapshot.build_ms)
+    return snapshot
+
+
+def clear(tabelas: Optional[List[str]] = None):
+    for name in list(_snapshots) if tabelas is None else tabelas:
+        _snapshots.pop(name, None)
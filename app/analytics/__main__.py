@@ -0,0 +1,32 @@
+import argparse
+from app.analytics import export
+from app.logs.setup_logger import setup_logging
+from app.repositories import create_repositories
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta snapshots das tabelas da MyBooks API para Arrow IPC/Parquet.")
+    parser.add_argument("tabelas", nargs="*", help=f"Padrão: todas ({', '.join(export.TABELAS)})")
+    parser.add_argument("--formato", default="arrow,parquet", help="arrow, parquet ou os dois separados por vírgula")
+    parser.add_argument("--dir", default=export.SNAPSHOT_DIR, help="Diretório de saída")
+    parser.add_argument("--workers", type=int, default=export.EXPORT_WORKERS, help="Processos de conversão")
+    parser.add_argument("--target", choices=["cassandra", "memory"], default="cassandra")
+    args = parser.parse_args()
+
+    desconhecidas = [tabela for tabela in args.tabelas if tabela not in export.TABELAS]
+    if desconhecidas:
+        parser.error(f"Tabelas inválidas: {', '.join(desconhecidas)}!")
+    formatos = [formato.strip() for formato in args.formato.split(",") if formato.strip()]
+    invalidos = [formato for formato in formatos if formato not in export.FORMATOS]
+    if not formatos or invalidos:
+        parser.error(f"Formatos inválidos: {', '.join(invalidos) or args.formato}!")
+
+    setup_logging()
+    repos = create_repositories(args.target)
+    repos.startup()
+    for arquivo in export.export(repos, args.tabelas or list(export.TABELAS), formatos, args.dir, args.workers):
+        print(f"{arquivo.caminho}: {arquivo.linhas:,d} linhas, {arquivo.bytes:,d} bytes em {arquivo.duracao_ms:,.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
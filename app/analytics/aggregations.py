@@ -0,0 +1,86 @@
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+# Agregações vetorizadas sobre os arrays dos snapshots: nada aqui percorre linhas em Python!
+# Chaves de grupo são os códigos inteiros das colunas de texto (dicionário do snapshot).
+
+
+def count_by(keys) -> Tuple[object, object]:
+    # Quantas linhas há de cada valor (ex.: livro_id em pedido_livro)!
+    uniques, counts = np.unique(keys, return_counts=True)
+    return uniques, counts
+
+
+def summary(values, qs: Sequence[float] = ()) -> Dict[str, object]:
+    # count/sum/mean/min/max e percentis do array inteiro (NaN = nulo, fica de fora)!
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"count": 0, "sum": 0.0, "mean": None, "min": None, "max": None, "percentiles": [None] * len(qs)}
+    return {
+        "count": int(len(values)), "sum": float(values.sum()), "mean": float(values.mean()),
+        "min": float(values.min()), "max": float(values.max()), "percentiles": percentiles(values, qs) if qs else [],
+    }
+
+
+def group_stats(codes, values, groups: int) -> Dict[str, object]:
+    # count/sum/mean/min/max por grupo em uma passada cada (bincount e ufunc.at); ignora NaN e código -1!
+    valid = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    count = np.bincount(codes, minlength=groups)
+    total = np.bincount(codes, weights=values, minlength=groups)
+    minimum = np.full(groups, np.inf)
+    maximum = np.full(groups, -np.inf)
+    np.minimum.at(minimum, codes, values)
+    np.maximum.at(maximum, codes, values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    return {"count": count, "sum": total, "mean": mean, "min": minimum, "max": maximum}
+
+
+def group_percentiles(codes, values, groups: int, qs: Sequence[float]) -> object:
+    # Percentis por grupo sem laço por linha: ordena por (grupo, valor) uma vez e indexa cada fatia
+    # (interpolação linear, como np.percentile). Retorna uma matriz grupos x percentis (NaN em grupo vazio)!
+    valid = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    order = np.lexsort((values, codes))
+    ordered = values[order]
+    count = np.bincount(codes, minlength=groups)
+    start = np.cumsum(count) - count
+    result = np.full((groups, len(qs)), np.nan)
+    present = count > 0
+    for i, q in enumerate(qs):
+        position = (count[present] - 1) * (q / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        base = start[present]
+        low_values, high_values = ordered[base + low], ordered[base + high]
+        result[present, i] = low_values + (high_values - low_values) * (position - low)
+    return result
+
+
+def percentiles(values, qs: Sequence[float]) -> List[float]:
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return [float("nan")] * len(qs)
+    return [float(v) for v in np.percentile(values, qs)]
+
+
+def histogram(values, bins: int) -> Tuple[List[float], List[int]]:
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return [], []
+    counts, edges = np.histogram(values, bins=bins)
+    return [float(edge) for edge in edges], [int(count) for count in counts]
+
+
+def top_k(weights, k: int) -> object:
+    # Índices dos k maiores pesos, em ordem decrescente: argpartition (O(n)) e ordena só os k!
+    k = min(k, len(weights))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-weights, k - 1)[:k]
+    return candidates[np.argsort(-weights[candidates], kind="stable")]
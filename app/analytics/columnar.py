@@ -0,0 +1,176 @@
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+from cassandra.cqlengine import columns as cql
+from cassandra.util import Date as CassandraDate
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+# Snapshot colunar de uma tabela: um array NumPy tipado por coluna, montado em blocos a partir da varredura.
+#   UUID  -> S16 (os 16 bytes; nulo = 16 zeros)
+#   Date  -> int32, dias desde 1970-01-01 (nulo = DATA_NULA)
+#   Float -> float64 (nulo = NaN); Integer/BigInt -> int64 (nulo = 0)
+#   Text  -> int32 com os códigos de um dicionário (nulo = -1); os valores ficam em dictionaries[coluna]
+
+EPOCH = date(1970, 1, 1)
+DATA_NULA = -2 ** 31
+CHUNK_ROWS = 65536
+
+
+@dataclass
+class Snapshot:
+    table: str
+    columns: Dict[str, Any]
+    dictionaries: Dict[str, List[str]] = field(default_factory=dict)
+    rows: int = 0
+    built_at: float = field(default_factory=time.time)
+    build_ms: float = 0.0
+
+    @property
+    def age_s(self) -> float:
+        return time.time() - self.built_at
+
+    def decode(self, name: str, code: int) -> Optional[str]:
+        return self.dictionaries[name][code] if code >= 0 else None
+
+
+def dias(value) -> int:
+    if value is None:
+        return DATA_NULA
+    if isinstance(value, CassandraDate):
+        return value.days_from_epoch
+    return (value - EPOCH).days
+
+
+def data(days: int) -> Optional[date]:
+    return date.fromordinal(EPOCH.toordinal() + int(days)) if days != DATA_NULA else None
+
+
+def uuid_at(column, index: int) -> UUID:
+    return UUID(bytes=column[index:index + 1].tobytes())
+
+
+def uuid_bytes(values: Iterable[UUID]):
+    return np.array([value.bytes for value in values], dtype="S16")
+
+
+class _Builder:
+    # Acumula um bloco em listas Python e converte para arrays a cada CHUNK_ROWS linhas!
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.buffer: List[Any] = []
+        self.chunks: List[Any] = []
+        self.dictionary: Dict[str, int] = {}
+
+    def append(self, value):
+        if self.kind == "uuid":
+            self.buffer.append(value.bytes if value is not None else bytes(16))
+        elif self.kind == "date":
+            self.buffer.append(dias(value))
+        elif self.kind == "float":
+            self.buffer.append(value if value is not None else np.nan)
+        elif self.kind == "int":
+            self.buffer.append(value or 0)
+        elif value is None:
+            self.buffer.append(-1)
+        else:
+            code = self.dictionary.get(value)
+            if code is None:
+                code = self.dictionary[value] = len(self.dictionary)
+            self.buffer.append(code)
+        if len(self.buffer) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.chunks.append(np.array(self.buffer, dtype=_DTYPES[self.kind]))
+            self.buffer = []
+
+    def array(self):
+        self.flush()
+        return np.concatenate(self.chunks) if self.chunks else np.empty(0, dtype=_DTYPES[self.kind])
+
+
+_DTYPES = {"uuid": "S16", "date": "int32", "float": "float64", "int": "int64", "text": "int32"}
+
+
+def _kind(column) -> str:
+    if isinstance(column, cql.UUID):
+        return "uuid"
+    if isinstance(column, cql.Date):
+        return "date"
+    if isinstance(column, (cql.Float, cql.Double, cql.Decimal)):
+        return "float"
+    if isinstance(column, (cql.Integer, cql.BigInt, cql.SmallInt, cql.TinyInt, cql.VarInt, cql.Counter)):
+        return "int"
+    if isinstance(column, cql.Text):
+        return "text"
+    raise ValueError(f"Coluna {column.db_field_name} sem representação colunar!")
+
+
+def _from_arrow_column(kind: str, chunked):
+    # Uma coluna Arrow (ex.: do arquivo .arrow mapeado em memória) no mesmo layout do build: com um bloco
+    # só e sem nulos, o array NumPy é uma view dos buffers do arquivo, sem cópia!
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    array = chunked.combine_chunks() if chunked.num_chunks != 1 else chunked.chunk(0)
+    if kind == "uuid":
+        if array.null_count:
+            array = pc.fill_null(array, pa.scalar(bytes(16), type=array.type))
+        return np.frombuffer(array.buffers()[1], dtype="S16", count=len(array), offset=array.offset * 16)
+    if kind == "date":
+        array = array.cast(pa.int32())
+        return (pc.fill_null(array, DATA_NULA) if array.null_count else array).to_numpy(zero_copy_only=False)
+    if kind == "float":
+        return array.cast(pa.float64()).to_numpy(zero_copy_only=False)
+    if kind == "int":
+        array = array.cast(pa.int64())
+        return (pc.fill_null(array, 0) if array.null_count else array).to_numpy(zero_copy_only=False)
+    encoded = pc.dictionary_encode(array)
+    indices = encoded.indices.cast(pa.int32())
+    return (pc.fill_null(indices, -1) if indices.null_count else indices).to_numpy(zero_copy_only=False), \
+        encoded.dictionary.to_pylist()
+
+
+def from_arrow(table: str, model, arrow_table, names: Sequence[str], built_at: float) -> Snapshot:
+    if np is None:
+        raise RuntimeError("As análises colunares requerem o pacote numpy (pip install numpy)!")
+    started = time.perf_counter()
+    columns, dictionaries = {}, {}
+    for name in names:
+        kind = _kind(model._columns[name])
+        converted = _from_arrow_column(kind, arrow_table.column(name))
+        if kind == "text":
+            columns[name], dictionaries[name] = converted
+        else:
+            columns[name] = converted
+    return Snapshot(
+        table=table, columns=columns, dictionaries=dictionaries, rows=arrow_table.num_rows,
+        built_at=built_at, build_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+def build(table: str, model, rows: Iterable[Any], names: Sequence[str]) -> Snapshot:
+    if np is None:
+        raise RuntimeError("As análises colunares requerem o pacote numpy (pip install numpy)!")
+    started = time.perf_counter()
+    builders = [_Builder(name, _kind(model._columns[name])) for name in names]
+    count = 0
+    for row in rows:
+        for builder in builders:
+            builder.append(getattr(row, builder.name))
+        count += 1
+    return Snapshot(
+        table=table,
+        columns={builder.name: builder.array() for builder in builders},
+        dictionaries={builder.name: list(builder.dictionary) for builder in builders if builder.kind == "text"},
+        rows=count,
+        build_ms=(time.perf_counter() - started) * 1000,
+    )
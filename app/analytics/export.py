@@ -0,0 +1,214 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+from cassandra.cqlengine import columns as cql
+from cassandra.util import Date as CassandraDate
+from app.logs.logger import get_logger
+from app.models.models import Autor, Editora, Livro, Pagamento, Pedido, PedidoLivro, PedidoPagamento, Usuario
+from app.repositories import Repositories
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependência opcional
+    pa = pq = None
+
+logger = get_logger("MyBooks.analises")
+
+# Exporta snapshots das tabelas para arquivos locais (Arrow IPC e/ou Parquet), para análise offline sem
+# raspar as listagens paginadas. A leitura é a varredura paralela em faixas de token; a conversão das linhas
+# para RecordBatches roda num pool de processos (spawn: nada de fork com as threads do driver).
+# O arquivo .arrow pode ser aberto com memory-map e lido sem cópia (inclusive pelas análises da própria API)!
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(min(os.cpu_count() or 1, 8))))
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "65536"))
+FORMATOS = ("arrow", "parquet")
+
+TABELAS = {
+    "autores": Autor, "editoras": Editora, "livros": Livro, "usuarios": Usuario, "pedidos": Pedido,
+    "pagamentos": Pagamento, "pedido_livro": PedidoLivro, "pedido_pagamento": PedidoPagamento,
+}
+
+
+@dataclass
+class ArquivoExportado:
+    tabela: str
+    formato: str
+    caminho: str
+    linhas: int
+    bytes: int
+    gerado_em: float
+    duracao_ms: float
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _tipo(column) -> str:
+    # Tipos Arrow por nome (o worker recebe só strings e monta o schema do lado dele)!
+    if isinstance(column, cql.UUID):
+        return "uuid"
+    if isinstance(column, cql.Date):
+        return "date32"
+    if isinstance(column, (cql.Float, cql.Double, cql.Decimal)):
+        return "float64"
+    if isinstance(column, cql.Integer):
+        return "int32"
+    if isinstance(column, (cql.BigInt, cql.Counter, cql.VarInt)):
+        return "int64"
+    if isinstance(column, cql.Boolean):
+        return "bool"
+    if isinstance(column, cql.Text):
+        return "string"
+    raise ValueError(f"Coluna {column.db_field_name} sem tipo Arrow!")
+
+
+def _arrow_type(tipo: str):
+    # UUIDs como binary(16): os mesmos 16 bytes de uuid.UUID(bytes=...)!
+    return pa.binary(16) if tipo == "uuid" else getattr(pa, tipo)()
+
+
+def _schema(colunas: Sequence[tuple]):
+    return pa.schema([pa.field(nome, _arrow_type(tipo)) for nome, tipo in colunas])
+
+
+def _valor(tipo: str, value):
+    if value is None:
+        return None
+    if tipo == "date32" and isinstance(value, CassandraDate):
+        return value.date()
+    if tipo == "float64":
+        return float(value)
+    return value
+
+
+def _encode(colunas: Sequence[tuple], rows: List[tuple]) -> bytes:
+    # Roda no processo do pool: linhas (tuplas) -> RecordBatch serializado (formato IPC)!
+    schema = _schema(colunas)
+    arrays = [
+        pa.array([_valor(tipo, row[i]) for row in rows], type=field.type)
+        for i, ((_, tipo), field) in enumerate(zip(colunas, schema))
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema).serialize().to_pybytes()
+
+
+def path_for(tabela: str, formato: str, diretorio: Optional[str] = None) -> str:
+    return os.path.join(diretorio or SNAPSHOT_DIR, f"{tabela}.{formato}")
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _batches(colunas, rows: List[tuple], workers: int, pool: Optional[ProcessPoolExecutor] = None):
+    schema = _schema(colunas)
+    chunks = [rows[i:i + EXPORT_BATCH_ROWS] for i in range(0, len(rows), EXPORT_BATCH_ROWS)]
+    if workers <= 1 or len(chunks) <= 1:
+        encoded = [_encode(colunas, chunk) for chunk in chunks]
+    elif pool is not None:
+        encoded = list(pool.map(_encode, [colunas] * len(chunks), chunks))
+    else:
+        with _pool(min(workers, len(chunks))) as pool:
+            encoded = list(pool.map(_encode, [colunas] * len(chunks), chunks))
+    return schema, [pa.ipc.read_record_batch(pa.py_buffer(data), schema) for data in encoded]
+
+
+def _publish(tmp: str, final: str) -> int:
+    # Troca atômica: quem já tem o arquivo antigo mapeado continua lendo o inode antigo!
+    os.replace(tmp, final)
+    return os.path.getsize(final)
+
+
+def export_table(
+    repos: Repositories, tabela: str, formatos: Sequence[str] = ("arrow",), diretorio: Optional[str] = None,
+    workers: Optional[int] = None, pool: Optional[ProcessPoolExecutor] = None,
+) -> List[ArquivoExportado]:
+    if pa is None:
+        raise RuntimeError("A exportação de snapshots requer o pacote pyarrow (pip install pyarrow)!")
+    started = time.perf_counter()
+    model = TABELAS[tabela]
+    colunas = [(nome, _tipo(column)) for nome, column in model._columns.items()]
+    nomes = [nome for nome, _ in colunas]
+    repository = getattr(repos, tabela)
+    scanned = repository.scan() if tabela.startswith("pedido_") else repository.scan(columns=nomes)
+    # UUIDs já viram bytes aqui: picklar uuid.UUID para o pool custa mais que a própria conversão no worker!
+    uuids = [tipo == "uuid" for _, tipo in colunas]
+    rows = [
+        tuple(value.bytes if uuid and value is not None else value
+              for uuid, value in zip(uuids, (getattr(row, nome) for nome in nomes)))
+        for row in scanned
+    ]
+
+    schema, batches = _batches(colunas, rows, EXPORT_WORKERS if workers is None else workers, pool)
+    gerado_em = time.time()
+    schema = schema.with_metadata({"mybooks.tabela": tabela, "mybooks.gerado_em": json.dumps(gerado_em)})
+    diretorio = diretorio or SNAPSHOT_DIR
+    os.makedirs(diretorio, exist_ok=True)
+
+    arquivos = []
+    for formato in formatos:
+        final = path_for(tabela, formato, diretorio)
+        tmp = f"{final}.tmp"
+        if formato == "arrow":
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+        else:
+            pq.write_table(pa.Table.from_batches(batches, schema=schema), tmp, compression="zstd")
+        tamanho = _publish(tmp, final)
+        arquivos.append(ArquivoExportado(
+            tabela=tabela, formato=formato, caminho=final, linhas=len(rows), bytes=tamanho, gerado_em=gerado_em,
+            duracao_ms=(time.perf_counter() - started) * 1000,
+        ))
+        logger.info("Snapshot exportado! %s (%d linhas, %d bytes)!", final, len(rows), tamanho)
+    return arquivos
+
+
+def export(
+    repos: Repositories, tabelas: Sequence[str], formatos: Sequence[str] = ("arrow",), diretorio: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> List[ArquivoExportado]:
+    workers = EXPORT_WORKERS if workers is None else workers
+    if workers <= 1 or pa is None:
+        return [arquivo for tabela in tabelas for arquivo in export_table(repos, tabela, formatos, diretorio, workers)]
+    # Um pool só para todas as tabelas: subir processos com spawn custa caro!
+    with _pool(workers) as pool:
+        return [
+            arquivo for tabela in tabelas for arquivo in export_table(repos, tabela, formatos, diretorio, workers, pool)
+        ]
+
+
+def open_arrow(tabela: str, diretorio: Optional[str] = None):
+    # Memory-map do arquivo IPC: os buffers da tabela apontam direto para o arquivo mapeado (sem cópia)!
+    path = path_for(tabela, "arrow", diretorio)
+    if pa is None or not os.path.exists(path):
+        return None
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def gerado_em(table) -> Optional[float]:
+    metadata = table.schema.metadata or {}
+    value = metadata.get(b"mybooks.gerado_em")
+    return json.loads(value) if value is not None else None
+
+
+def listar(diretorio: Optional[str] = None) -> List[Dict]:
+    diretorio = diretorio or SNAPSHOT_DIR
+    arquivos = []
+    for tabela in TABELAS:
+        for formato in FORMATOS:
+            path = path_for(tabela, formato, diretorio)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                arquivos.append({
+                    "tabela": tabela, "formato": formato, "caminho": path, "bytes": stat.st_size,
+                    "idade_s": round(time.time() - stat.st_mtime, 3),
+                })
+    return arquivos
+
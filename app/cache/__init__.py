@@ -0,0 +1,33 @@
+import os
+from app.cache.base import NullCache, SharedCache
+
+# "memory" (padrão, um processo só), "redis" (compartilhado entre workers) ou "none"!
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+
+_cache = None
+
+
+def create_cache(backend: str) -> SharedCache:
+    if backend == "memory":
+        from app.cache.memory import MemoryCache
+        return MemoryCache()
+    if backend == "redis":
+        from app.cache.redis import RedisCache
+        return RedisCache(CACHE_URL)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"CACHE_BACKEND inválido: {backend}!")
+
+
+def get_cache() -> SharedCache:
+    global _cache
+    if _cache is None:
+        _cache = create_cache(CACHE_BACKEND)
+    return _cache
+
+
+def set_cache(cache: SharedCache):
+    global _cache
+    _cache = cache
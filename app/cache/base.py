@@ -0,0 +1,45 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+
+class SharedCache(ABC):
+    # Cache compartilhado entre workers: valores em bytes, com TTL e tags para invalidação!
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = (), since: Optional[int] = None) -> bool:
+        """Grava o valor; com `since` (uma generation()), desiste (False) se alguma tag foi invalidada depois."""
+
+    @abstractmethod
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Remove todas as chaves marcadas com alguma das tags; retorna quantas foram removidas."""
+
+    @abstractmethod
+    def generation(self) -> int:
+        """Contador que cada invalidação incrementa: lido antes de uma leitura, vira o `since` do set."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class NullCache(SharedCache):
+    # CACHE_BACKEND=none: nada é guardado!
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = (), since: Optional[int] = None) -> bool:
+        return True
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        return 0
+
+    def generation(self) -> int:
+        return 0
+
+    def clear(self) -> None:
+        pass
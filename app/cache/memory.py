@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+from app.cache.base import SharedCache
+
+
+class MemoryCache(SharedCache):
+    # Dublê em processo do cache compartilhado (mesma semântica do Redis, mas só vale para um worker)!
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[bytes, float, Tuple[str, ...]]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        # Geração da última invalidação de cada tag (as mais antigas saem primeiro, acima de max_entries)!
+        self._generation = 0
+        self._invalidated: Dict[str, int] = {}
+        self._forgotten = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                self._drop(key)
+                return None
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = (), since: Optional[int] = None) -> bool:
+        tags = tuple(tags)
+        with self._lock:
+            if since is not None and self._stale(tags, since):
+                return False
+            self._drop(key)
+            if len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._entries[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+        return True
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._invalidated.pop(tag, None)
+                self._invalidated[tag] = self._generation
+                for key in self._tags.pop(tag, ()):
+                    removed += self._drop(key)
+            while len(self._invalidated) > self.max_entries:
+                oldest = next(iter(self._invalidated))
+                self._forgotten = self._invalidated.pop(oldest)
+        return removed
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def _stale(self, tags: Tuple[str, ...], since: int) -> bool:
+        # Leitura mais antiga que a invalidação mais antiga esquecida: não dá para saber, não grava!
+        if since < self._forgotten:
+            return True
+        return any(self._invalidated.get(tag, 0) > since for tag in tags)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _drop(self, key: str) -> int:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return 1
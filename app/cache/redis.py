@@ -0,0 +1,93 @@
+from typing import Iterable, Optional
+from app.cache.base import SharedCache
+
+try:
+    import redis
+except ImportError:  # dependência opcional
+    redis = None
+
+
+class RedisCache(SharedCache):
+    # Qualquer servidor que fale o protocolo do Redis (Redis, Valkey, KeyDB, Dragonfly)!
+    # Cada tag é um SET com as chaves marcadas; invalidar uma tag apaga as chaves e o próprio SET,
+    # e como o armazenamento é compartilhado, todos os workers enxergam a invalidação.
+    # Cada invalidação também incrementa um contador e marca as tags com o valor dele por mark_ttl segundos:
+    # um set com `since` confere as marcas sob WATCH e desiste se alguma tag foi invalidada depois da leitura!
+    def __init__(self, url: str, prefix: str = "mybooks:", mark_ttl: int = 300):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requer o pacote redis (pip install redis)!")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.mark_ttl = mark_ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}resp:{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def _mark(self, tag: str) -> str:
+        return f"{self.prefix}inv:{tag}"
+
+    def _generation(self) -> str:
+        return f"{self.prefix}generation"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self._key(key))
+
+    def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = (), since: Optional[int] = None) -> bool:
+        tags = tuple(tags)
+        if since is None or not tags:
+            self._write(self.client.pipeline(transaction=False), key, value, ttl, tags)
+            return True
+        marks = [self._mark(tag) for tag in tags]
+        with self.client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(*marks)
+                if any(int(mark or 0) > since for mark in pipe.mget(marks)):
+                    return False
+                pipe.multi()
+                self._write(pipe, key, value, ttl, tags)
+            except redis.WatchError:
+                # Uma invalidação chegou entre a conferência e o EXEC!
+                return False
+        return True
+
+    def _write(self, pipe, key: str, value: bytes, ttl: int, tags) -> None:
+        pipe.set(self._key(key), value, ex=ttl)
+        for tag in tags:
+            # O SET da tag vive pelo menos tanto quanto a chave mais nova marcada com ela!
+            pipe.sadd(self._tag(tag), self._key(key))
+            pipe.expire(self._tag(tag), ttl)
+        pipe.execute()
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        tags = tuple(tags)
+        tag_keys = [self._tag(tag) for tag in tags]
+        if not tag_keys:
+            return 0
+        # As marcas vão antes da remoção: um set concorrente ou vê a marca, ou é apagado logo abaixo!
+        generation = self.client.incr(self._generation())
+        pipe = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.set(self._mark(tag), generation, ex=self.mark_ttl)
+        pipe.execute()
+        pipe = self.client.pipeline(transaction=False)
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        keys = set()
+        for members in pipe.execute():
+            keys.update(members)
+        pipe = self.client.pipeline(transaction=True)
+        if keys:
+            pipe.delete(*keys)
+        pipe.delete(*tag_keys)
+        removed = pipe.execute()[0] if keys else 0
+        return removed
+
+    def generation(self) -> int:
+        return int(self.client.get(self._generation()) or 0)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            self.client.delete(key)
@@ -0,0 +1,59 @@
+from contextvars import ContextVar
+from typing import Iterable, Optional
+from uuid import UUID
+from fastapi import Request, Response
+from app.cache import CACHE_TTL, get_cache
+from app.logs.logger import get_logger
+from app.serialization import encoders
+
+logger = get_logger("MyBooks.cache")
+
+# Respostas compostas já serializadas, por rota + parâmetros + formato negociado. As tags dizem de quais
+# linhas a resposta depende ("livro:<id>", "editora:<id>"...); as escritas invalidam essas tags!
+
+# Geração do cache no início da leitura (no miss): uma escrita cuja invalidação chega antes do
+# store_response derruba a gravação, senão a resposta antiga sobreviveria à invalidação!
+_since: ContextVar[Optional[int]] = ContextVar("response_cache_since", default=None)
+
+
+def tag(kind: str, id: Optional[UUID] = None) -> str:
+    return kind if id is None else f"{kind}:{id}"
+
+
+def response_key(request: Request) -> str:
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{params}|{encoders.current_encoder().media_type}"
+
+
+def cached_response(key: str) -> Optional[Response]:
+    try:
+        value = get_cache().get(key)
+        if value is None:
+            _since.set(get_cache().generation())
+            return None
+    except Exception as exc:
+        logger.warning("Falha ao ler do cache! %s: %s", key, exc)
+        return None
+    media_type, _, body = value.partition(b"\n")
+    return Response(body, media_type=media_type.decode(), headers={"x-cache": "hit"})
+
+
+def store_response(key: str, response: Response, tags: Iterable[str]) -> Response:
+    try:
+        stored = get_cache().set(
+            key, response.media_type.encode() + b"\n" + response.body, CACHE_TTL, tags, since=_since.get(),
+        )
+        if not stored:
+            logger.info("Resposta não foi para o cache: invalidada durante a leitura! %s", key)
+    except Exception as exc:
+        logger.warning("Falha ao gravar no cache! %s: %s", key, exc)
+    response.headers["x-cache"] = "miss"
+    return response
+
+
+def invalidate(*tags: str):
+    try:
+        get_cache().invalidate(tags)
+    except Exception as exc:
+        # Sem a invalidação, a resposta antiga vive até o CACHE_TTL!
+        logger.error("Falha ao invalidar o cache! Tags %s: %s", ", ".join(tags), exc)
@@ -1,14 +1,16 @@
 from cassandra.cqlengine import connection
 from cassandra.cluster import Cluster
 import os
+from app.database import query_tracker
+from app.database.policies import execution_profiles
 
 def connect_to_cassandra():
     # Cassandra via Docker!
     CASSANDRA_HOSTS = os.getenv("CASSANDRA_HOSTS", "127.0.0.1").split(",")
     CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "mybooks")
 
-    # Sem autenticação!
-    cluster = Cluster(CASSANDRA_HOSTS, port=9042)
+    # Sem autenticação! Perfis com retry por idempotência e execução especulativa nas leituras por chave!
+    cluster = Cluster(CASSANDRA_HOSTS, port=9042, execution_profiles=execution_profiles())
     session = cluster.connect()
 
     # Se não existir, cria o keyspace!
@@ -22,6 +24,9 @@ def connect_to_cassandra():
 
     session.set_keyspace(CASSANDRA_KEYSPACE)
 
+    # Contabiliza as consultas de cada requisição (orçamento / N+1)!
+    query_tracker.install(session)
+
     # Conecta o ORM cqlengine!
     connection.set_session(session)
     print("Conectado ao Cassandra!")
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+from cassandra import ConsistencyLevel, WriteType
+from cassandra.cluster import EXEC_PROFILE_DEFAULT, ExecutionProfile
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, RetryPolicy
+from cassandra.query import dict_factory
+from app import metrics
+
+# Perfil das leituras por chave (idempotentes): podem ser repetidas e especuladas!
+EXEC_PROFILE_LEITURA = "leitura"
+
+CASSANDRA_REQUEST_TIMEOUT = float(os.getenv("CASSANDRA_REQUEST_TIMEOUT", "10"))
+# Execução especulativa: nova tentativa em outra réplica após o atraso, até o máximo ("0" desliga)!
+CASSANDRA_SPECULATIVE_DELAY_MS = float(os.getenv("CASSANDRA_SPECULATIVE_DELAY_MS", "50"))
+CASSANDRA_SPECULATIVE_MAX = int(os.getenv("CASSANDRA_SPECULATIVE_MAX", "2"))
+CASSANDRA_READ_RETRIES = int(os.getenv("CASSANDRA_READ_RETRIES", "1"))
+CASSANDRA_WRITE_RETRIES = int(os.getenv("CASSANDRA_WRITE_RETRIES", "1"))
+# Como UPDATE/DELETE por id conferem a existência da linha: "read" (SELECT por chave antes da escrita, que
+# também completa a resposta do PATCH), "lwt" (IF EXISTS: uma rodada de Paxos, sem medição que mostre ser mais
+# barata que a leitura) ou "blind" (sem conferir; UPDATE em id inexistente cria a linha)!
+WRITE_EXISTENCE_CHECK = os.getenv("WRITE_EXISTENCE_CHECK", "read")
+
+
+class IdempotencyAwareRetryPolicy(RetryPolicy):
+    # Leituras que expiram são repetidas; escritas só quando o statement é idempotente (reenviar um
+    # incremento de contador ou um append em lista duplicaria o efeito)!
+    def __init__(self, read_retries: int = CASSANDRA_READ_RETRIES, write_retries: int = CASSANDRA_WRITE_RETRIES):
+        self.read_retries = read_retries
+        self.write_retries = write_retries
+
+    @staticmethod
+    def _decide(event: str, decision):
+        metrics.incr("cassandra.retry", f"{event}.{_DECISOES[decision[0]]}")
+        return decision
+
+    def on_read_timeout(self, query, consistency, required_responses, received_responses, data_retrieved, retry_num):
+        if retry_num >= self.read_retries or ConsistencyLevel.is_serial(consistency):
+            return self._decide("read_timeout", (self.RETHROW, None))
+        if received_responses >= required_responses and not data_retrieved:
+            # Réplicas responderam, só faltou o dado (digest): repetir no mesmo coordenador resolve!
+            return self._decide("read_timeout", (self.RETRY, consistency))
+        return self._decide("read_timeout", (self.RETRY_NEXT_HOST, consistency))
+
+    def on_write_timeout(self, query, consistency, write_type, required_responses, received_responses, retry_num):
+        if retry_num >= self.write_retries or not getattr(query, "is_idempotent", False):
+            return self._decide("write_timeout", (self.RETHROW, None))
+        if write_type in (WriteType.SIMPLE, WriteType.BATCH_LOG, WriteType.UNLOGGED_BATCH):
+            return self._decide("write_timeout", (self.RETRY_NEXT_HOST, consistency))
+        return self._decide("write_timeout", (self.RETHROW, None))
+
+    def on_unavailable(self, query, consistency, required_replicas, alive_replicas, retry_num):
+        # O coordenador não viu réplicas suficientes; outro coordenador pode ver!
+        if retry_num == 0:
+            return self._decide("unavailable", (self.RETRY_NEXT_HOST, None))
+        return self._decide("unavailable", (self.RETHROW, None))
+
+    def on_request_error(self, query, consistency, error, retry_num):
+        # Erro de conexão/coordenador: a consulta pode ter sido aplicada, então só idempotentes vão para outro nó!
+        if retry_num == 0 and getattr(query, "is_idempotent", False):
+            return self._decide("request_error", (self.RETRY_NEXT_HOST, None))
+        return self._decide("request_error", (self.RETHROW, None))
+
+
+_DECISOES = {
+    RetryPolicy.RETRY: "retry",
+    RetryPolicy.RETHROW: "rethrow",
+    RetryPolicy.IGNORE: "ignore",
+    RetryPolicy.RETRY_NEXT_HOST: "retry_next_host",
+}
+
+
+class CountingSpeculativeExecutionPolicy(ConstantSpeculativeExecutionPolicy):
+    # Conta as execuções especulativas: a 1ª consulta ao plano agenda o timer, as seguintes vêm do timer disparado!
+    class CountingPlan:
+        def __init__(self, plan):
+            self.plan = plan
+            self.calls = 0
+
+        def next_execution(self, host):
+            if self.calls:
+                metrics.incr("cassandra.speculative", "executions")
+            self.calls += 1
+            return self.plan.next_execution(host)
+
+    def new_plan(self, keyspace, statement):
+        metrics.incr("cassandra.speculative", "eligible")
+        return self.CountingPlan(super().new_plan(keyspace, statement))
+
+
+def speculative_policy():
+    if CASSANDRA_SPECULATIVE_MAX <= 0:
+        return None
+    return CountingSpeculativeExecutionPolicy(CASSANDRA_SPECULATIVE_DELAY_MS / 1000, CASSANDRA_SPECULATIVE_MAX)
+
+
+def execution_profiles() -> dict:
+    # dict_factory é o row_factory exigido pelo cqlengine (e usado nas leituras por chave)!
+    retry_policy = IdempotencyAwareRetryPolicy()
+    return {
+        EXEC_PROFILE_DEFAULT: ExecutionProfile(
+            retry_policy=retry_policy, row_factory=dict_factory, request_timeout=CASSANDRA_REQUEST_TIMEOUT,
+        ),
+        EXEC_PROFILE_LEITURA: ExecutionProfile(
+            retry_policy=retry_policy, row_factory=dict_factory, request_timeout=CASSANDRA_REQUEST_TIMEOUT,
+            speculative_execution_policy=speculative_policy(),
+        ),
+    }
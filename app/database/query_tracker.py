@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Orçamento padrão por requisição (sobrescrito por variáveis de ambiente)!
+QUERY_BUDGET_MAX = int(os.getenv("QUERY_BUDGET_MAX", "25"))
+QUERY_BUDGET_MS = float(os.getenv("QUERY_BUDGET_MS", "250"))
+
+# Orçamentos por endpoint: (método, caminho da rota) -> (máx. consultas, máx. ms)
+ENDPOINT_BUDGETS: Dict[Tuple[str, str], Tuple[int, float]] = {}
+
+
+class QueryTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements: List[Tuple[str, float]] = []
+        self.started = time.perf_counter()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, ms in self.statements)
+
+    def record(self, statement: str, elapsed_ms: float):
+        with self._lock:
+            self.statements.append((statement, elapsed_ms))
+
+    def slowest(self, n: int = 5) -> List[Tuple[str, float]]:
+        return sorted(self.statements, key=lambda s: s[1], reverse=True)[:n]
+
+    def repeated(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for statement, _ in self.statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        return {s: c for s, c in counts.items() if c > 1}
+
+
+_current: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+_observers: List[List[QueryTracker]] = []
+
+
+def current_tracker() -> Optional[QueryTracker]:
+    return _current.get()
+
+
+def start_tracking() -> Tuple[QueryTracker, object]:
+    tracker = QueryTracker()
+    token = _current.set(tracker)
+    return tracker, token
+
+
+def stop_tracking(token):
+    _current.reset(token)
+
+
+def publish(tracker: QueryTracker):
+    for observer in list(_observers):
+        observer.append(tracker)
+
+
+def record_query(statement: str, elapsed_ms: float):
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.record(statement, elapsed_ms)
+
+
+def _statement_text(query) -> str:
+    prepared = getattr(query, "prepared_statement", None)
+    if prepared is not None:
+        return prepared.query_string
+    return getattr(query, "query_string", str(query))
+
+
+def _on_request(response_future):
+    # Chamado na thread que executa a consulta, então o contextvar da requisição é visível!
+    tracker = _current.get()
+    if tracker is None:
+        return
+
+    statement = _statement_text(response_future.query)
+    started = time.perf_counter()
+    done = []
+
+    def _finish(*_):
+        if not done:
+            done.append(True)
+            tracker.record(statement, (time.perf_counter() - started) * 1000)
+
+    response_future.add_callbacks(callback=_finish, errback=_finish)
+
+
+def install(session):
+    session.add_request_init_listener(_on_request)
+
+
+def budget_for(method: str, path: str) -> Tuple[int, float]:
+    return ENDPOINT_BUDGETS.get((method, path), (QUERY_BUDGET_MAX, QUERY_BUDGET_MS))
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, max_ms: Optional[float] = None):
+    """Falha se alguma requisição feita dentro do bloco exceder o orçamento de consultas.
+
+    Cada requisição HTTP é avaliada separadamente; chamadas diretas (sem HTTP) contam juntas:
+
+        with assert_query_budget(3):
+            client.get(f"/consulta-usuario/pedidos-detalhados/{usuario_id}")
+    """
+    requests: List[QueryTracker] = []
+    _observers.append(requests)
+    tracker, token = start_tracking()
+    try:
+        yield requests
+    finally:
+        stop_tracking(token)
+        _observers.remove(requests)
+
+    for measured in requests + ([tracker] if tracker.count else []):
+        problems = []
+        if measured.count > max_queries:
+            problems.append(f"{measured.count} consultas (orçamento {max_queries})")
+        if max_ms is not None and measured.total_ms > max_ms:
+            problems.append(f"{measured.total_ms:.1f}ms em consultas (orçamento {max_ms}ms)")
+        if problems:
+            statements = "\n".join(f"  {ms:8.2f}ms  {s}" for s, ms in measured.statements)
+            raise AssertionError(f"Orçamento de consultas excedido: {', '.join(problems)}!\n{statements}")
@@ -1,16 +1,5 @@
 import logging
 
 def get_logger(name: str) -> logging.Logger:
-    logger = logging.getLogger(name)
-    if not logger.handlers:
-        formatter = logging.Formatter(
-            "%(asctime)s [%(levelname)s] [%(name)s] %(message)s"
-        )
-
-        stream_handler = logging.StreamHandler()
-        stream_handler.setFormatter(formatter)
-
-        logger.setLevel(logging.INFO)
-        logger.addHandler(stream_handler)
-
-    return logger
\ No newline at end of file
+    # Sem handlers nem nível próprios: os registros sobem para a fila configurada em setup_logging!
+    return logging.getLogger(name)
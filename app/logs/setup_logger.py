@@ -1,17 +1,157 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import random
+import re
+import threading
+import time
+
+LOG_DIR = os.getenv("LOG_DIR", "mybook.logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" ou "json"
+LOG_BACKUP_DAYS = int(os.getenv("LOG_BACKUP_DAYS", "0"))  # 0 = mantém todos os arquivos
+# Ex.: LOG_SAMPLING="MyBooks.listagem=0.1" e LOG_RATE_LIMIT="MyBooks.listagem=50" (linhas por segundo)
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+LOG_RATE_LIMIT = os.getenv("LOG_RATE_LIMIT", "")
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] [%(name)s] %(message)s"
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    # Amostragem e limite de taxa por logger; WARNING ou acima sempre passa!
+    def __init__(self, rates: dict, limits: dict):
+        super().__init__()
+        self.rates = rates
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def _rule(self, rules: dict, name: str):
+        while name:
+            if name in rules:
+                return rules[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self._rule(self.rates, record.name)
+        if rate is not None and random.random() >= rate:
+            return False
+
+        limit = self._rule(self.limits, record.name)
+        if limit is None:
+            return True
+
+        now = int(time.monotonic())
+        with self._lock:
+            second, count = self._windows.get(record.name, (now, 0))
+            if second != now:
+                second, count = now, 0
+            self._windows[record.name] = (second, count + 1)
+        return count < limit
+
+
+class _PreparedQueueHandler(logging.handlers.QueueHandler):
+    # A mensagem só é formatada (uma vez) depois dos filtros, e não em cada handler!
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_text = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_rules(spec: str) -> dict:
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        rules[name.strip()] = float(value)
+    return rules
+
+
+def _daily_namer(default_name: str) -> str:
+    # mybooks.log.2025-07-09 -> 2025-07-09.log (mesmo padrão dos arquivos antigos)!
+    directory, filename = os.path.split(default_name)
+    return os.path.join(directory, f"{filename.rsplit('.', 1)[-1]}.log")
+
+
+class DailyFileHandler(logging.handlers.TimedRotatingFileHandler):
+    # Com o _daily_namer os arquivos rodados não começam com "mybooks.log.", que é o que o getFilesToDelete
+    # padrão procura: a retenção (LOG_BACKUP_DAYS) precisa procurar pelos YYYY-MM-DD.log!
+    DATED = re.compile(r"^\d{4}-\d{2}-\d{2}\.log$")
+
+    def getFilesToDelete(self):
+        directory = os.path.dirname(self.baseFilename)
+        # Datas ISO ordenam como texto: os primeiros são os mais antigos!
+        dated = sorted(name for name in os.listdir(directory) if self.DATED.match(name))
+        if len(dated) <= self.backupCount:
+            return []
+        return [os.path.join(directory, name) for name in dated[:len(dated) - self.backupCount]]
+
 
 def setup_logging():
-    log_dir = "mybook.logs"
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, f"{datetime.now().strftime('%Y-%m-%d')}.log")
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
\ No newline at end of file
+    global _listener
+    if _listener is not None:
+        return
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+
+    file_handler = DailyFileHandler(
+        os.path.join(LOG_DIR, "mybooks.log"),
+        when="midnight",
+        backupCount=LOG_BACKUP_DAYS,
+        encoding="utf-8",
+    )
+    file_handler.namer = _daily_namer
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _PreparedQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(_parse_rules(LOG_SAMPLING), _parse_rules(LOG_RATE_LIMIT)))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+
+    # A escrita em arquivo e console acontece numa thread de fundo!
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
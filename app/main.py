@@ -3,32 +3,51 @@ from app.logs.setup_logger import setup_logging
 
 setup_logging()
 
-from cassandra.cqlengine.management import sync_table
-from app.database.cassandra_config import connect_to_cassandra
-from app.models.models import Autor, Editora, Livro, Usuario, Pedido, Pagamento, PedidoPagamento
+from app.repositories import get_repositories
 from app.routes import autores, editoras, livros, usuarios, pedidos, pagamentos, pedido_pagamento, pedido_livro
-from app.routes import consulta_complexa  
+from app.routes import analises, consulta_complexa, editora_detalhado, metricas, relatorios
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.coalescing import SingleFlightMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.identity_map import IdentityMapMiddleware
+from app.middleware.negotiation import ContentNegotiationMiddleware
+from app.middleware.query_budget import QueryBudgetMiddleware
+from app.serialization.responses import FastJSONResponse
+from app import write_behind
 
-app = FastAPI(title="MyBooks API - Cassandra")
+app = FastAPI(title="MyBooks API - Cassandra", default_response_class=FastJSONResponse)
+app.add_middleware(SingleFlightMiddleware)
+app.add_middleware(IdentityMapMiddleware)
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
 
 @app.on_event("startup")
 def on_startup():
-    connect_to_cassandra()
-    sync_table(Autor)
-    sync_table(Editora)
-    sync_table(Livro)
-    sync_table(Usuario)
-    sync_table(Pedido)
-    sync_table(Pagamento)
-    sync_table(PedidoPagamento)  
+    # Conecta ao Cassandra e sincroniza as tabelas (nada a fazer no backend em memória)!
+    get_repositories().startup()
+
+@app.on_event("startup")
+async def iniciar_write_behind():
+    # Depois dos repositórios: refaz o que ficou no outbox e sobe o worker!
+    await write_behind.start()
+
+@app.on_event("shutdown")
+async def parar_write_behind():
+    await write_behind.stop()
 
 app.include_router(autores.router)
 app.include_router(editoras.router)
+app.include_router(editora_detalhado.router)
 app.include_router(livros.router)
 app.include_router(usuarios.router)
 app.include_router(pedidos.router)
 app.include_router(pagamentos.router)
 app.include_router(pedido_pagamento.router)
 app.include_router(pedido_livro.router)
-app.include_router(consulta_complexa.router) 
+app.include_router(consulta_complexa.router)
+app.include_router(metricas.router) 
+app.include_router(relatorios.router)
+app.include_router(analises.router)
  
@@ -0,0 +1,36 @@
+import threading
+from typing import Dict
+
+# Contadores e medidores do processo (um conjunto por worker), expostos em GET /metricas!
+_lock = threading.Lock()
+_counters: Dict[str, Dict[str, int]] = {}
+_gauges: Dict[str, Dict[str, float]] = {}
+
+
+def incr(name: str, label: str = "total", amount: int = 1):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[label] = series.get(label, 0) + amount
+
+
+def set_gauge(name: str, label: str, value: float):
+    # Valor instantâneo (ex.: limite atual de concorrência), sobrescrito a cada atualização!
+    with _lock:
+        _gauges.setdefault(name, {})[label] = value
+
+
+def value(name: str, label: str = "total") -> int:
+    with _lock:
+        return _counters.get(name, {}).get(label, 0)
+
+
+def snapshot() -> Dict[str, Dict[str, int]]:
+    with _lock:
+        series = {**_counters, **_gauges}
+        return {name: dict(values) for name, values in sorted(series.items())}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
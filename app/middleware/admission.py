@@ -0,0 +1,129 @@
+import os
+import time
+from typing import Dict, Tuple
+import orjson
+from app import metrics
+
+
+def _parse_classes(value: str) -> Dict[str, float]:
+    classes = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            classes[name.strip()] = float(number)
+    return classes
+
+
+# Concorrência máxima por classe de rota ("" desliga o controle de admissão)!
+ADMISSION_LIMITS = _parse_classes(os.getenv("ADMISSION_LIMITS", "point=64,composite=32,write=32,scan=8"))
+# Latência alvo (ms) por classe: acima dela o limite encolhe!
+ADMISSION_TARGETS_MS = _parse_classes(os.getenv("ADMISSION_TARGETS_MS", "point=250,composite=500,write=500,scan=2000"))
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "1"))
+ADMISSION_BACKOFF = float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+SCAN_SEGMENTS = ("ordenado", "filtro", "filtrar", "count")
+# Análises colunares (inclusive a exportação de snapshots) e relatórios leem tabelas inteiras ou um período
+# de partições, mesmo com id no caminho!
+SCAN_PREFIXES = ("/analises", "/relatorios")
+COMPOSITE_PREFIXES = ("/consulta-usuario/", "/editoras/com-livros-e-autores")
+# Monitoramento e documentação continuam respondendo durante a sobrecarga!
+EXEMPT_PREFIXES = ("/metricas", "/docs", "/redoc", "/openapi.json")
+
+
+def route_class(method: str, path: str) -> str:
+    # Leituras por id são baratas; listagens, ordenações, filtros e contagens varrem a tabela inteira!
+    # Antes do método: o POST /analises/snapshots exporta tabelas inteiras e não pode tomar vaga das escritas!
+    if path.startswith(SCAN_PREFIXES):
+        return "scan"
+    if method not in ("GET", "HEAD"):
+        return "write"
+    if path.startswith(COMPOSITE_PREFIXES):
+        return "composite"
+    segments = [s for s in path.split("/") if s]
+    if len(segments) <= 1 or segments[-1] in SCAN_SEGMENTS:
+        return "scan"
+    return "point"
+
+
+class AIMDLimit:
+    # Limite de concorrência adaptativo: sobe 1 quando o limite está em uso e as respostas saem dentro do
+    # alvo; cai multiplicativamente quando a latência passa do alvo ou o servidor erra (5xx)!
+    def __init__(self, max_limit: float, target_ms: float, min_limit: int = ADMISSION_MIN_LIMIT,
+                 backoff: float = ADMISSION_BACKOFF):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.target_ms = target_ms
+        self.backoff = backoff
+        self.limit = max_limit
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, elapsed_ms: float, failed: bool):
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        if failed or elapsed_ms > self.target_ms:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+
+class AdmissionControlMiddleware:
+    # Limita as requisições em andamento por classe de rota e recusa o excedente na hora (503 + Retry-After),
+    # em vez de enfileirar no threadpool: uma varredura pesada não derruba as leituras por id!
+    def __init__(self, app, limits: Dict[str, float] = None, targets_ms: Dict[str, float] = None):
+        self.app = app
+        limits = ADMISSION_LIMITS if limits is None else limits
+        targets_ms = ADMISSION_TARGETS_MS if targets_ms is None else targets_ms
+        self.limiters = {
+            name: AIMDLimit(limit, targets_ms.get(name, 1000.0)) for name, limit in limits.items()
+        }
+        for name, limiter in self.limiters.items():
+            metrics.set_gauge("admission.limit", name, limiter.limit)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope["method"], scope["path"])
+        limiter = self.limiters.get(name)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not limiter.try_acquire():
+            metrics.incr("admission.rejected", name)
+            await self._reject(send)
+            return
+
+        metrics.incr("admission.accepted", name)
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            limiter.release((time.perf_counter() - started) * 1000, status["code"] >= 500)
+            metrics.set_gauge("admission.limit", name, round(limiter.limit, 1))
+
+    @staticmethod
+    async def _reject(send):
+        body = orjson.dumps({"detail": "Servidor sobrecarregado, tente novamente em instantes!"})
+        headers: Tuple = (
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(ADMISSION_RETRY_AFTER).encode("latin-1")),
+        )
+        await send({"type": "http.response.start", "status": 503, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": body})
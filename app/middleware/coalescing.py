@@ -0,0 +1,83 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import Headers
+from app import metrics
+from app.logs.logger import get_logger
+
+logger = get_logger("MyBooks.coalescing")
+
+# Prefixos de rotas GET idempotentes e caras cujas requisições idênticas simultâneas são agrupadas ("" desliga)!
+COALESCE_ROUTES = tuple(
+    prefix.strip()
+    for prefix in os.getenv("COALESCE_ROUTES", "/consulta-usuario/,/editoras/com-livros-e-autores").split(",")
+    if prefix.strip()
+)
+
+# Cabeçalhos que mudam a resposta gerada pela aplicação (a compressão fica por fora)!
+KEY_HEADERS = ("accept",)
+
+
+class SingleFlightMiddleware:
+    # A primeira requisição calcula a resposta; as idênticas que chegam enquanto ela roda aguardam o mesmo
+    # resultado e recebem uma cópia, em vez de repetir todas as consultas (ex.: logo após o cache expirar)!
+    def __init__(self, app, routes: Tuple[str, ...] = COALESCE_ROUTES):
+        self.app = app
+        self.routes = routes
+        self.in_flight: Dict[tuple, asyncio.Future] = {}
+
+    def _route(self, scope) -> Optional[str]:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return None
+        return next((prefix for prefix in self.routes if scope["path"].startswith(prefix)), None)
+
+    async def __call__(self, scope, receive, send):
+        route = self._route(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = (
+            scope["method"], scope["path"], scope.get("query_string", b""),
+            *(headers.get(name, "") for name in KEY_HEADERS),
+        )
+        leader = self.in_flight.get(key)
+        if leader is not None:
+            metrics.incr("coalescing.merged", route)
+            try:
+                messages = await asyncio.shield(leader)
+            except Exception:
+                # A líder falhou: a primeira das que aguardavam vira a nova líder das demais!
+                metrics.incr("coalescing.fallbacks", route)
+                await self(scope, receive, send)
+                return
+            for message in messages:
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message["headers"], (b"x-coalesced", b"1")]}
+                await send(message)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        metrics.incr("coalescing.leaders", route)
+        messages: List[dict] = []
+
+        async def send_and_record(message):
+            # Guarda uma cópia: os middlewares de fora podem alterar os cabeçalhos da mensagem!
+            if message["type"] == "http.response.start":
+                messages.append({**message, "headers": list(message.get("headers", []))})
+            else:
+                messages.append(message)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        except BaseException as exc:
+            future.set_exception(exc if isinstance(exc, Exception) else RuntimeError("requisição líder cancelada"))
+            future.exception()  # evita o aviso de exceção nunca lida quando ninguém está aguardando
+            raise
+        else:
+            future.set_result(messages)
+        finally:
+            del self.in_flight[key]
@@ -0,0 +1,32 @@
+from app import metrics
+from app.repositories import identity_map
+
+
+class IdentityMapMiddleware:
+    # Abre um identity map por requisição HTTP e informa nos cabeçalhos quantas leituras ele poupou!
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not identity_map.IDENTITY_MAP:
+            await self.app(scope, receive, send)
+            return
+
+        mapa, token = identity_map.start()
+
+        async def send_with_counters(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-identity-map-hits", str(mapa.hits).encode("latin-1")))
+                headers.append((b"x-identity-map-misses", str(mapa.misses).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_counters)
+        finally:
+            identity_map.stop(token)
+            if mapa.hits:
+                metrics.incr("identity_map", "hits", mapa.hits)
+            if mapa.misses:
+                metrics.incr("identity_map", "misses", mapa.misses)
@@ -0,0 +1,25 @@
+from starlette.datastructures import Headers, MutableHeaders
+from app.serialization import encoders
+
+
+class ContentNegotiationMiddleware:
+    # Escolhe o formato da resposta (JSON, msgpack ou CBOR) pelo cabeçalho Accept da requisição!
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = encoders.use_encoder(encoders.negotiate(Headers(scope=scope).get("accept")))
+
+        async def send_with_vary(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).add_vary_header("Accept")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_vary)
+        finally:
+            encoders.reset_encoder(token)
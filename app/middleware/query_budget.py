@@ -0,0 +1,64 @@
+import time
+from app.database import query_tracker
+from app.logs.logger import get_logger
+
+logger = get_logger("MyBooks.consultas")
+
+
+class QueryBudgetMiddleware:
+    # Conta e cronometra as consultas CQL de cada requisição HTTP e avisa quando o orçamento estoura!
+    def __init__(self, app, max_statements_logged: int = 10):
+        self.app = app
+        self.max_statements_logged = max_statements_logged
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker, token = query_tracker.start_tracking()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - tracker.started) * 1000
+                server_timing = (
+                    f'cql;dur={tracker.total_ms:.1f};desc="{tracker.count} consultas", '
+                    f"app;dur={elapsed_ms:.1f}"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing.encode("latin-1")))
+                headers.append((b"x-query-count", str(tracker.count).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            query_tracker.stop_tracking(token)
+            self._check_budget(scope, tracker)
+            query_tracker.publish(tracker)
+
+    def _check_budget(self, scope, tracker):
+        route = scope.get("route")
+        path = getattr(route, "path", scope["path"])
+        max_queries, max_ms = query_tracker.budget_for(scope["method"], path)
+        elapsed_ms = (time.perf_counter() - tracker.started) * 1000
+
+        if tracker.count <= max_queries and elapsed_ms <= max_ms:
+            return
+
+        repeated = tracker.repeated()
+        logger.warning(
+            "Orçamento de consultas excedido! %s %s: %d consultas (máx. %d), %.1fms (máx. %.0fms), "
+            "%d consultas repetidas%s",
+            scope["method"],
+            path,
+            tracker.count,
+            max_queries,
+            elapsed_ms,
+            max_ms,
+            sum(repeated.values()),
+            " - possível N+1!" if repeated else "",
+        )
+        for statement, ms in tracker.slowest(self.max_statements_logged):
+            logger.warning("  %.2fms %s", ms, statement)
@@ -1,4 +1,5 @@
 from cassandra.cqlengine.models import Model
+from cassandra.cqlengine.usertype import UserType
 from cassandra.cqlengine import columns
 import uuid
 from datetime import date
@@ -12,6 +13,7 @@ class Autor(Model):
     data_nascimento = columns.Date()
     nacionalidade = columns.Text()
     biografia = columns.Text(required=False)
+    versao = columns.TimeUUID(default=uuid.uuid1)
 
 
 class Editora(Model):
@@ -21,6 +23,7 @@ class Editora(Model):
     endereco = columns.Text()
     telefone = columns.Text()
     email = columns.Text()
+    versao = columns.TimeUUID(default=uuid.uuid1)
 
 
 class Livro(Model):
@@ -33,6 +36,7 @@ class Livro(Model):
     data_publicacao = columns.Date()
     autor_id = columns.UUID(index=True)
     editora_id = columns.UUID(index=True)
+    versao = columns.TimeUUID(default=uuid.uuid1)
 
 
 class Usuario(Model):
@@ -42,6 +46,7 @@ class Usuario(Model):
     email = columns.Text(index=True)
     cpf = columns.Text(index=True)
     data_cadastro = columns.Date(default=date.today)
+    versao = columns.TimeUUID(default=uuid.uuid1)
 
 
 class Pedido(Model):
@@ -51,6 +56,7 @@ class Pedido(Model):
     status = columns.Text()
     valor_total = columns.Float()
     data_pedido = columns.Date()
+    versao = columns.TimeUUID(default=uuid.uuid1)
     
 class Pagamento(Model):
     __keyspace__ = 'mybooks'
@@ -59,13 +65,164 @@ class Pagamento(Model):
     valor = columns.Float()
     data_pagamento = columns.Date()
     forma_pagamento = columns.Text()
+    versao = columns.TimeUUID(default=uuid.uuid1)
 
 class PedidoPagamento(Model):
+    # O índice no filho acha os vínculos de um pagamento removido (só no write-behind)!
     __keyspace__ = 'mybooks'
     pedido_id = columns.UUID(primary_key=True, partition_key=True)
-    pagamento_id = columns.UUID(primary_key=True, clustering_order="ASC")
+    pagamento_id = columns.UUID(primary_key=True, clustering_order="ASC", index=True)
 
 class PedidoLivro(Model):
+    # O índice no filho acha os vínculos de um livro removido (só no write-behind)!
     __keyspace__ = 'mybooks'
     pedido_id = columns.UUID(primary_key=True, partition_key=True)
-    livro_id = columns.UUID(primary_key=True, clustering_order="ASC") 
\ No newline at end of file
+    livro_id = columns.UUID(primary_key=True, clustering_order="ASC", index=True) 
+
+
+class VersaoTabela(Model):
+    # Contador de escritas por tabela, usado nos ETags das listagens!
+    __keyspace__ = 'mybooks'
+    tabela = columns.Text(primary_key=True)
+    versao = columns.Counter()
+
+
+# ----------- PEDIDO DETALHADO (documento desnormalizado) -----------
+
+class LivroResumo(UserType):
+    __type_name__ = 'livro_resumo'
+    id = columns.UUID()
+    titulo = columns.Text()
+    autor_id = columns.UUID()
+    autor_nome = columns.Text()
+
+
+class PagamentoResumo(UserType):
+    __type_name__ = 'pagamento_resumo'
+    id = columns.UUID()
+    valor = columns.Float()
+    data_pagamento = columns.Date()
+
+
+class PedidoDetalhadoDoc(Model):
+    # Um pedido com seus livros e pagamentos, particionado por usuário: o histórico é uma partição só!
+    # Mapas por id (em vez de listas) deixam vincular/desvincular gravar só o item, sem ler o documento.
+    __keyspace__ = 'mybooks'
+    __table_name__ = 'pedido_detalhado'
+    usuario_id = columns.UUID(primary_key=True, partition_key=True)
+    pedido_id = columns.UUID(primary_key=True, clustering_order="ASC", index=True)
+    data_pedido = columns.Date()
+    livros = columns.Map(columns.UUID, columns.UserDefinedType(LivroResumo))
+    pagamentos = columns.Map(columns.UUID, columns.UserDefinedType(PagamentoResumo))
+
+
+class LivroPedido(Model):
+    # Índice reverso livro -> documentos, para propagar mudanças de título/autor!
+    __keyspace__ = 'mybooks'
+    livro_id = columns.UUID(primary_key=True, partition_key=True)
+    pedido_id = columns.UUID(primary_key=True, clustering_order="ASC")
+    usuario_id = columns.UUID()
+
+
+class PagamentoPedido(Model):
+    __keyspace__ = 'mybooks'
+    pagamento_id = columns.UUID(primary_key=True, partition_key=True)
+    pedido_id = columns.UUID(primary_key=True, clustering_order="ASC")
+    usuario_id = columns.UUID()
+
+
+# ----------- CATÁLOGO DA EDITORA (documento desnormalizado) -----------
+
+class EditoraCatalogoDoc(Model):
+    # Editora com os resumos dos seus livros (título e nome do autor), um documento por editora!
+    __keyspace__ = 'mybooks'
+    __table_name__ = 'editora_catalogo'
+    editora_id = columns.UUID(primary_key=True)
+    nome = columns.Text()
+    endereco = columns.Text()
+    telefone = columns.Text()
+    email = columns.Text()
+    livros = columns.Map(columns.UUID, columns.UserDefinedType(LivroResumo))
+
+
+# ----------- OUTBOX (tarefas do write-behind) -----------
+
+class TarefaOutbox(Model):
+    # Tarefa gravada antes de a requisição responder: sobrevive a um crash e é refeita por outro worker!
+    # dono/prazo: o worker que está com a tarefa e até quando; vencido o prazo, qualquer worker pode tomá-la!
+    __keyspace__ = 'mybooks'
+    __table_name__ = 'outbox'
+    particao = columns.Integer(primary_key=True, partition_key=True)
+    id = columns.TimeUUID(primary_key=True, clustering_order="ASC")
+    tipo = columns.Text()
+    payload = columns.Text()
+    tags = columns.List(columns.Text)
+    dono = columns.UUID()
+    prazo = columns.DateTime()
+
+
+# ----------- VENDAS (rollups em contadores) -----------
+
+class VendasDia(Model):
+    # Uma partição por dimensão e dia, uma linha por chave (livro, autor, forma de pagamento, status...):
+    # um relatório lê uma partição por dia do período, não importa quantos pedidos houve!
+    __keyspace__ = 'mybooks'
+    __table_name__ = 'vendas'
+    dimensao = columns.Text(primary_key=True, partition_key=True)
+    dia = columns.Date(primary_key=True, partition_key=True)
+    chave = columns.Text(primary_key=True, clustering_order="ASC")
+    receita_centavos = columns.Counter()
+    quantidade = columns.Counter()
+
+
+class VendaOrigem(Model):
+    # O que cada pedido, item de pedido ou pagamento já somou nos contadores: uma alteração soma só a diferença!
+    __keyspace__ = 'mybooks'
+    __table_name__ = 'vendas_origem'
+    origem = columns.UUID(primary_key=True, partition_key=True)
+    item = columns.Text(primary_key=True, clustering_order="ASC")
+    dimensao = columns.Text(primary_key=True, clustering_order="ASC")
+    chave = columns.Text()
+    dia = columns.Date()
+    receita_centavos = columns.BigInt()
+    quantidade = columns.Integer()
+    # Versão da origem inteira (coluna estática): quem troca a que leu (LWT) é o único a somar a diferença!
+    versao = columns.TimeUUID(static=True)
+
+
+# ----------- SÉRIES POR DIA (pedidos e pagamentos particionados pela data) -----------
+
+# TWCS: cada dia vira uma janela de compactação, e as janelas antigas (já estáveis) não são recompactadas!
+COMPACTACAO_POR_DIA = {
+    'compaction': {
+        'class': 'TimeWindowCompactionStrategy',
+        'compaction_window_unit': 'DAYS',
+        'compaction_window_size': '1',
+    },
+}
+
+
+class PedidoDia(Model):
+    # Cópia de Pedido com partição = data_pedido: um período lê só as partições dos seus dias!
+    # Sem índice em id: quem escreve já sabe o dia antigo da linha (lido pela rota antes da escrita)!
+    __keyspace__ = 'mybooks'
+    __table_name__ = 'pedidos_por_dia'
+    __options__ = COMPACTACAO_POR_DIA
+    data_pedido = columns.Date(primary_key=True, partition_key=True)
+    id = columns.UUID(primary_key=True, clustering_order="ASC")
+    usuario_id = columns.UUID()
+    status = columns.Text()
+    valor_total = columns.Float()
+    versao = columns.TimeUUID()
+
+
+class PagamentoDia(Model):
+    __keyspace__ = 'mybooks'
+    __table_name__ = 'pagamentos_por_dia'
+    __options__ = COMPACTACAO_POR_DIA
+    data_pagamento = columns.Date(primary_key=True, partition_key=True)
+    id = columns.UUID(primary_key=True, clustering_order="ASC")
+    pedido_id = columns.UUID()
+    valor = columns.Float()
+    forma_pagamento = columns.Text()
+    versao = columns.TimeUUID()
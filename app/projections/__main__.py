@@ -0,0 +1,33 @@
+import argparse
+from app.logs.setup_logger import setup_logging
+from app.projections import editora_catalogo, pedido_detalhado, por_dia, vendas
+from app.repositories import create_repositories
+
+PROJECOES = {
+    "pedido_detalhado": pedido_detalhado, "editora_catalogo": editora_catalogo, "vendas": vendas, "por_dia": por_dia,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói as projeções desnormalizadas (rollups de vendas e séries por dia) da MyBooks API.")
+    parser.add_argument("projecao", choices=sorted(PROJECOES))
+    parser.add_argument("--target", choices=["cassandra", "memory"], default="cassandra")
+    parser.add_argument("--concurrency", type=int, default=128, help="Inserts assíncronos em voo")
+    parser.add_argument("--backfill", action="store_true", help="Só preenche as séries vazias (por_dia)")
+    args = parser.parse_args()
+    if args.backfill and args.projecao != "por_dia":
+        parser.error("--backfill só vale para por_dia!")
+
+    setup_logging()
+    repos = create_repositories(args.target)
+    repos.startup()
+    projecao = PROJECOES[args.projecao]
+    if args.backfill:
+        written = projecao.backfill(repos, concurrency=args.concurrency)
+    else:
+        written = projecao.reconstruir(repos, concurrency=args.concurrency)
+    print(f"{args.projecao}: {written:,d} documentos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+from cassandra.cqlengine.query import DoesNotExist
+from app.logs.logger import get_logger
+from app.projections.pedido_detalhado import resumo_livro
+from app.repositories.base import Repositories
+
+logger = get_logger("MyBooks.projecoes")
+
+# Mantém o documento editora_catalogo (editora + resumos dos livros com o nome do autor) em dia com as
+# escritas em editoras, livros e autores. A listagem de editoras com catálogo lê só a página pedida!
+
+CAMPOS_EDITORA = ("id", "nome", "endereco", "telefone", "email")
+
+
+def _editora(editora) -> dict:
+    return {campo: getattr(editora, campo) for campo in CAMPOS_EDITORA}
+
+
+def _nome_do_autor(repos: Repositories, autor_id: UUID) -> Optional[str]:
+    try:
+        return repos.autores.get(autor_id, columns=["id", "nome"]).nome
+    except DoesNotExist:
+        return None
+
+
+def editora_alterada(repos: Repositories, editora):
+    # UPDATE (upsert) também na criação: refeito depois de livros entrarem no catálogo, não os apaga!
+    # A editora pode vir parcial (só as colunas do PATCH): só essas mudam no documento!
+    repos.editora_catalogo.set_editora(
+        {campo: getattr(editora, campo) for campo in CAMPOS_EDITORA if hasattr(editora, campo)}
+    )
+
+
+def editora_removida(repos: Repositories, editora_id: UUID):
+    repos.editora_catalogo.delete(editora_id)
+
+
+def livro_criado(repos: Repositories, livro, autor_nome: Optional[str] = None):
+    if autor_nome is None:
+        autor_nome = _nome_do_autor(repos, livro.autor_id)
+    repos.editora_catalogo.put_livro(livro.editora_id, resumo_livro(livro, autor_nome))
+
+
+def livro_alterado(repos: Repositories, editora_anterior: UUID, livro):
+    # Trocou de editora: sai de um catálogo e entra no outro!
+    if editora_anterior != livro.editora_id:
+        repos.editora_catalogo.remove_livro(editora_anterior, livro.id)
+    livro_criado(repos, livro)
+
+
+def livro_removido(repos: Repositories, editora_id: UUID, livro_id: UUID):
+    repos.editora_catalogo.remove_livro(editora_id, livro_id)
+
+
+def autor_alterado(repos: Repositories, autor, livros: Iterable):
+    for livro in livros:
+        repos.editora_catalogo.put_livro(livro.editora_id, resumo_livro(livro, autor.nome))
+
+
+def autor_removido(repos: Repositories, livros: Iterable):
+    # Sem o autor, o livro continua no catálogo com "autor": null (como na consulta com joins)!
+    for livro in livros:
+        repos.editora_catalogo.put_livro(livro.editora_id, resumo_livro(livro, None))
+
+
+def documentos(editoras: Iterable[dict], livros: Iterable[dict], autores: Dict[UUID, dict]) -> List[dict]:
+    # Monta os documentos a partir de linhas já em memória (carga e reconstrução)!
+    docs = {
+        editora["id"]: {
+            "editora_id": editora["id"], **{campo: editora[campo] for campo in CAMPOS_EDITORA[1:]}, "livros": [],
+        }
+        for editora in editoras
+    }
+    for livro in livros:
+        doc = docs.get(livro["editora_id"])
+        if doc is not None:
+            autor = autores.get(livro["autor_id"])
+            doc["livros"].append({
+                "id": livro["id"], "titulo": livro["titulo"], "autor_id": livro["autor_id"],
+                "autor_nome": autor["nome"] if autor else None,
+            })
+    return list(docs.values())
+
+
+def reconstruir(repos: Repositories, concurrency: int = 128) -> int:
+    # Recria os documentos a partir das tabelas normalizadas (backfill ou correção)!
+    colunas_livro = ["id", "titulo", "autor_id", "editora_id"]
+    editoras = [_editora(e) for e in repos.editoras.list_all(columns=list(CAMPOS_EDITORA))]
+    livros = [{c: getattr(l, c) for c in colunas_livro} for l in repos.livros.list_all(columns=colunas_livro)]
+    autores = {a.id: {"id": a.id, "nome": a.nome} for a in repos.autores.list_all(columns=["id", "nome"])}
+    written = repos.editora_catalogo.insert_many(documentos(editoras, livros, autores), concurrency=concurrency)
+    logger.info("Catálogo de editoras reconstruído! %d documentos!", written)
+    return written
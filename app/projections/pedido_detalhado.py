@@ -0,0 +1,188 @@
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+from cassandra.cqlengine.query import DoesNotExist
+from app.logs.logger import get_logger
+from app.repositories.base import Repositories
+
+logger = get_logger("MyBooks.projecoes")
+
+# Mantém o documento pedido_detalhado (um por pedido, particionado por usuário) em dia com as escritas
+# em pedidos, vínculos, livros, autores e pagamentos. A leitura do histórico vira uma partição só!
+
+
+def resumo_livro(livro, autor_nome: Optional[str]) -> dict:
+    return {"id": livro.id, "titulo": livro.titulo, "autor_id": livro.autor_id, "autor_nome": autor_nome}
+
+
+def resumo_pagamento(pagamento) -> dict:
+    return {"id": pagamento.id, "valor": pagamento.valor, "data_pagamento": pagamento.data_pagamento}
+
+
+def _resumo_livro(repos: Repositories, livro_id: UUID) -> dict:
+    livro = repos.livros.get(livro_id)
+    try:
+        autor_nome = repos.autores.get(livro.autor_id, columns=["id", "nome"]).nome
+    except DoesNotExist:
+        autor_nome = None
+    return resumo_livro(livro, autor_nome)
+
+
+def _usuario_do_pedido(repos: Repositories, pedido_id: UUID) -> UUID:
+    return repos.pedidos.get(pedido_id, columns=["id", "usuario_id"]).usuario_id
+
+
+def pedido_criado(repos: Repositories, pedido):
+    # UPDATE (upsert) em vez de INSERT do documento vazio: refeita depois dos vínculos, não apaga nada!
+    repos.pedido_detalhado.set_data_pedido(pedido.usuario_id, pedido.id, pedido.data_pedido)
+
+
+def pedido_alterado(repos: Repositories, usuario_anterior: UUID, pedido):
+    if usuario_anterior == pedido.usuario_id:
+        repos.pedido_detalhado.set_data_pedido(pedido.usuario_id, pedido.id, pedido.data_pedido)
+        return
+    # Mudou de usuário: o documento muda de partição!
+    try:
+        doc = repos.pedido_detalhado.get(usuario_anterior, pedido.id)
+        livros, pagamentos = list(doc.livros.values()), list(doc.pagamentos.values())
+    except DoesNotExist:
+        # Já foi movido (tarefa refeita): só confirma a data na partição nova!
+        repos.pedido_detalhado.set_data_pedido(pedido.usuario_id, pedido.id, pedido.data_pedido)
+        return
+    repos.pedido_detalhado.delete(usuario_anterior, pedido.id)
+    repos.pedido_detalhado.save(
+        pedido.usuario_id, pedido.id, pedido.data_pedido,
+        [_como_dict(l, ("id", "titulo", "autor_id", "autor_nome")) for l in livros],
+        [_como_dict(p, ("id", "valor", "data_pagamento")) for p in pagamentos],
+    )
+
+
+def pedido_removido(repos: Repositories, usuario_id: UUID, pedido_id: UUID):
+    repos.pedido_detalhado.delete(usuario_id, pedido_id)
+
+
+def livro_vinculado(repos: Repositories, pedido_id: UUID, livro_id: UUID):
+    try:
+        usuario_id = _usuario_do_pedido(repos, pedido_id)
+        resumo = _resumo_livro(repos, livro_id)
+    except DoesNotExist:
+        logger.warning("Pedido detalhado não atualizado: pedido %s ou livro %s não existe!", pedido_id, livro_id)
+        return
+    repos.pedido_detalhado.put_livro(usuario_id, pedido_id, resumo)
+
+
+def livro_desvinculado(repos: Repositories, pedido_id: UUID, livro_id: UUID):
+    for usuario_id, doc_pedido_id in repos.pedido_detalhado.pedidos_com_livro(livro_id):
+        if doc_pedido_id == pedido_id:
+            repos.pedido_detalhado.remove_livro(usuario_id, pedido_id, livro_id)
+
+
+def pagamento_vinculado(repos: Repositories, pedido_id: UUID, pagamento_id: UUID):
+    try:
+        usuario_id = _usuario_do_pedido(repos, pedido_id)
+        pagamento = repos.pagamentos.get(pagamento_id)
+    except DoesNotExist:
+        logger.warning(
+            "Pedido detalhado não atualizado: pedido %s ou pagamento %s não existe!", pedido_id, pagamento_id
+        )
+        return
+    repos.pedido_detalhado.put_pagamento(usuario_id, pedido_id, resumo_pagamento(pagamento))
+
+
+def pagamento_desvinculado(repos: Repositories, pedido_id: UUID, pagamento_id: UUID):
+    for usuario_id, doc_pedido_id in repos.pedido_detalhado.pedidos_com_pagamento(pagamento_id):
+        if doc_pedido_id == pedido_id:
+            repos.pedido_detalhado.remove_pagamento(usuario_id, pedido_id, pagamento_id)
+
+
+def livro_alterado(repos: Repositories, livro, autor_nome: Optional[str] = None):
+    # Título/autor mudou: reescreve o resumo em todos os pedidos que têm o livro!
+    pedidos = repos.pedido_detalhado.pedidos_com_livro(livro.id)
+    if not pedidos:
+        return
+    resumo = _resumo_livro(repos, livro.id) if autor_nome is None else resumo_livro(livro, autor_nome)
+    for usuario_id, pedido_id in pedidos:
+        repos.pedido_detalhado.put_livro(usuario_id, pedido_id, resumo)
+
+
+def livro_removido(repos: Repositories, livro_id: UUID):
+    for usuario_id, pedido_id in repos.pedido_detalhado.pedidos_com_livro(livro_id):
+        repos.pedido_detalhado.remove_livro(usuario_id, pedido_id, livro_id)
+
+
+def autor_alterado(repos: Repositories, autor, livros: Iterable):
+    for livro in livros:
+        livro_alterado(repos, livro, autor.nome)
+
+
+def pagamento_alterado(repos: Repositories, pagamento):
+    resumo = resumo_pagamento(pagamento)
+    for usuario_id, pedido_id in repos.pedido_detalhado.pedidos_com_pagamento(pagamento.id):
+        repos.pedido_detalhado.put_pagamento(usuario_id, pedido_id, resumo)
+
+
+def pagamento_removido(repos: Repositories, pagamento_id: UUID):
+    for usuario_id, pedido_id in repos.pedido_detalhado.pedidos_com_pagamento(pagamento_id):
+        repos.pedido_detalhado.remove_pagamento(usuario_id, pedido_id, pagamento_id)
+
+
+def _como_dict(item, names) -> dict:
+    return {name: getattr(item, name) for name in names}
+
+
+def documentos(
+    pedidos: Iterable[dict],
+    pedido_livro: Iterable[dict],
+    pedido_pagamento: Iterable[dict],
+    livros: Dict[UUID, dict],
+    autores: Dict[UUID, dict],
+    pagamentos: Dict[UUID, dict],
+) -> List[dict]:
+    # Monta os documentos a partir de linhas já em memória (carga e reconstrução)!
+    docs = {
+        pedido["id"]: {
+            "usuario_id": pedido["usuario_id"], "pedido_id": pedido["id"], "data_pedido": pedido["data_pedido"],
+            "livros": [], "pagamentos": [],
+        }
+        for pedido in pedidos
+    }
+    for rel in pedido_livro:
+        livro = livros.get(rel["livro_id"])
+        if rel["pedido_id"] in docs and livro is not None:
+            autor = autores.get(livro["autor_id"])
+            docs[rel["pedido_id"]]["livros"].append({
+                "id": livro["id"], "titulo": livro["titulo"], "autor_id": livro["autor_id"],
+                "autor_nome": autor["nome"] if autor else None,
+            })
+    for rel in pedido_pagamento:
+        pagamento = pagamentos.get(rel["pagamento_id"])
+        if rel["pedido_id"] in docs and pagamento is not None:
+            docs[rel["pedido_id"]]["pagamentos"].append({
+                "id": pagamento["id"], "valor": pagamento["valor"], "data_pagamento": pagamento["data_pagamento"],
+            })
+    return list(docs.values())
+
+
+def _linhas(rows, names) -> Dict[UUID, dict]:
+    return {row.id: _como_dict(row, names) for row in rows}
+
+
+def reconstruir(repos: Repositories, concurrency: int = 128) -> int:
+    # Recria os documentos a partir das tabelas normalizadas (backfill ou correção), lidas em faixas de token
+    # paralelas: os vínculos vêm de uma varredura de cada tabela, agrupados por pedido em memória!
+    livros = _linhas(repos.livros.scan(columns=["id", "titulo", "autor_id"]), ("id", "titulo", "autor_id"))
+    autores = _linhas(repos.autores.scan(columns=["id", "nome"]), ("id", "nome"))
+    pagamentos = _linhas(
+        repos.pagamentos.scan(columns=["id", "valor", "data_pagamento"]), ("id", "valor", "data_pagamento")
+    )
+    pedidos = [
+        _como_dict(p, ("id", "usuario_id", "data_pedido"))
+        for p in repos.pedidos.scan(columns=["id", "usuario_id", "data_pedido"])
+    ]
+    pedido_livro = [{"pedido_id": rel.pedido_id, "livro_id": rel.livro_id} for rel in repos.pedido_livro.scan()]
+    pedido_pagamento = [
+        {"pedido_id": rel.pedido_id, "pagamento_id": rel.pagamento_id} for rel in repos.pedido_pagamento.scan()
+    ]
+    docs = documentos(pedidos, pedido_livro, pedido_pagamento, livros, autores, pagamentos)
+    written = repos.pedido_detalhado.insert_many(docs, concurrency=concurrency)
+    logger.info("Pedido detalhado reconstruído! %d documentos!", written)
+    return written
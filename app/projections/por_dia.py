@@ -0,0 +1,101 @@
+import os
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
+from cassandra.util import Date as CassandraDate
+from app.logs.logger import get_logger
+from app.projections.vendas import dias
+from app.repositories.base import Repositories, SerieDiariaRepository
+
+logger = get_logger("MyBooks.projecoes")
+
+# Pedidos e pagamentos copiados para tabelas particionadas pela data (pedidos_por_dia, pagamentos_por_dia),
+# gravadas na própria requisição (criação, PATCH, DELETE e checkout): o filtro enxerga a escrita na hora.
+# A rota informa o dia da cópia atual (lido junto com a linha), então nenhuma escrita procura a cópia.
+# Um filtro por data ou período vira uma leitura por dia, todas em paralelo e juntadas em ordem (dia, id),
+# em vez de varrer a tabela inteira e comparar data por data!
+
+POR_DIA_MAX_DIAS = int(os.getenv("POR_DIA_MAX_DIAS", "366"))
+
+
+def _dia(value):
+    return value.date() if isinstance(value, CassandraDate) else value
+
+
+def _linha(repository: SerieDiariaRepository, entity) -> dict:
+    row = {nome: getattr(entity, nome) for nome in repository.model._columns}
+    row[repository.dia_key] = _dia(row[repository.dia_key])
+    return row
+
+
+def salvar(repository: SerieDiariaRepository, entity, dia_anterior=None):
+    # dia_anterior: o dia da cópia atual (None na criação, quando ainda não há cópia)!
+    dia_anterior = _dia(dia_anterior)
+    if getattr(entity, repository.dia_key) is None:
+        # Sem data não há partição: só sai a cópia antiga, se houver!
+        repository.delete(entity.id, dia_anterior)
+        return
+    repository.save(_linha(repository, entity), dia_anterior)
+
+
+def remover(repository: SerieDiariaRepository, id: UUID, dia):
+    repository.delete(id, _dia(dia))
+
+
+def periodo(
+    data_inicio: Optional[date], data_fim: Optional[date], data: Optional[date] = None,
+) -> Optional[Tuple[date, date]]:
+    # Plano da leitura: None = sem filtro de data (varredura); senão o intervalo de dias a ler.
+    # data (igualdade) e data_inicio/data_fim se combinam; um intervalo vazio devolve fim < inicio!
+    if data is None and data_inicio is None and data_fim is None:
+        return None
+    if data is None and data_inicio is None:
+        raise ValueError("Informe data_inicio junto com data_fim!")
+    if data_inicio is not None and data_fim is not None and data_inicio > data_fim:
+        raise ValueError("data_inicio deve ser anterior ou igual a data_fim!")
+    inicio = max(d for d in (data_inicio, data) if d is not None)
+    fim = min(d for d in (data_fim, data) if d is not None) if (data_fim or data) else date.today()
+    if (fim - inicio).days + 1 > POR_DIA_MAX_DIAS:
+        raise ValueError(f"Período máximo de {POR_DIA_MAX_DIAS} dias!")
+    return inicio, fim
+
+
+def ler(repository: SerieDiariaRepository, intervalo: Tuple[date, date], columns: Optional[Sequence[str]] = None) -> List:
+    inicio, fim = intervalo
+    if fim < inicio:
+        return []
+    return repository.por_dias(dias(inicio, fim), columns=columns)
+
+
+def _series(repos: Repositories):
+    return ((repos.pedidos_por_dia, repos.pedidos), (repos.pagamentos_por_dia, repos.pagamentos))
+
+
+def _copiar(serie: SerieDiariaRepository, entidades, concurrency: int) -> int:
+    # Recopia a tabela normalizada, lida em faixas de token paralelas!
+    rows = [
+        _linha(serie, entity) for entity in entidades.scan(columns=list(serie.model._columns))
+        if getattr(entity, serie.dia_key) is not None
+    ]
+    serie.truncate()
+    return serie.insert_many(rows, concurrency=concurrency)
+
+
+def reconstruir(repos: Repositories, concurrency: int = 128) -> int:
+    written = sum(_copiar(serie, entidades, concurrency) for serie, entidades in _series(repos))
+    logger.info("Séries por dia reconstruídas! %d linhas!", written)
+    return written
+
+
+def backfill(repos: Repositories, concurrency: int = 128) -> int:
+    # Só as séries vazias (bancos anteriores às séries): com dados, as escritas online já as mantêm em dia.
+    # Passo explícito da implantação (python -m app.projections por_dia --backfill), nunca no startup:
+    # workers subindo juntos truncariam as séries uns dos outros!
+    written = 0
+    for serie, entidades in _series(repos):
+        if serie.is_empty():
+            copiadas = _copiar(serie, entidades, concurrency)
+            if copiadas:
+                logger.warning("Série %s estava vazia! %d linhas copiadas!", serie.model.__table_name__, copiadas)
+            written += copiadas
+    return written
@@ -0,0 +1,228 @@
+import os
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+from uuid import UUID
+from cassandra.cqlengine.query import DoesNotExist
+from cassandra.util import Date as CassandraDate
+from app.logs.logger import get_logger
+from app.repositories.base import Repositories
+
+logger = get_logger("MyBooks.projecoes")
+
+# Rollups de vendas em contadores (tabela vendas), por dia:
+#   dia             -> receita dos pagamentos (chave "")
+#   forma_pagamento -> receita dos pagamentos por forma
+#   livro / autor   -> receita dos itens (preço do livro ao entrar no pedido), na data do pedido
+#   status          -> pedidos (e valor_total) por status, na data do pedido
+# O registro vendas_origem guarda o que cada pedido, item e pagamento já somou: sincronizar uma origem
+# compara com o estado atual e soma só a diferença, então repetir a sincronização não muda nada!
+
+# Releituras quando outra tarefa da mesma origem registra antes (a LWT não aplica)!
+VENDAS_LWT_TENTATIVAS = int(os.getenv("VENDAS_LWT_TENTATIVAS", "5"))
+
+PEDIDO = ""  # item do registro que é o próprio pedido/pagamento (os itens de pedido usam o livro_id)
+
+
+def centavos(valor: Optional[float]) -> int:
+    return int(round((valor or 0.0) * 100))
+
+
+def _dia(value):
+    return value.date() if isinstance(value, CassandraDate) else value
+
+
+def _linha(dimensao: str, chave, dia, valor: Optional[float]) -> dict:
+    return {"dimensao": dimensao, "chave": str(chave), "dia": _dia(dia), "receita_centavos": centavos(valor), "quantidade": 1}
+
+
+def linhas_pedido(status: str, valor_total: Optional[float], data_pedido) -> List[dict]:
+    return [_linha("status", status or "", data_pedido, valor_total)]
+
+
+def linhas_item(data_pedido, livro_id: UUID, preco: Optional[float], autor_id: Optional[UUID]) -> List[dict]:
+    linhas = [_linha("livro", livro_id, data_pedido, preco)]
+    if autor_id is not None:
+        linhas.append(_linha("autor", autor_id, data_pedido, preco))
+    return linhas
+
+
+def linhas_pagamento(valor: Optional[float], data_pagamento, forma_pagamento: str) -> List[dict]:
+    return [_linha("dia", "", data_pagamento, valor), _linha("forma_pagamento", forma_pagamento or "", data_pagamento, valor)]
+
+
+def _chave(linha: dict):
+    return linha["dimensao"], linha["dia"], linha["chave"]
+
+
+def somar(linhas: Iterable[dict]) -> List[dict]:
+    # Agrega por contador (dimensão, dia, chave) e descarta o que soma zero!
+    totais: Dict[tuple, List[int]] = {}
+    for linha in linhas:
+        total = totais.setdefault(_chave(linha), [0, 0])
+        total[0] += linha["receita_centavos"]
+        total[1] += linha["quantidade"]
+    return [
+        {"dimensao": dimensao, "dia": dia, "chave": chave, "receita_centavos": receita, "quantidade": quantidade}
+        for (dimensao, dia, chave), (receita, quantidade) in totais.items()
+        if receita or quantidade
+    ]
+
+
+def _registradas(rows) -> Dict[str, List[dict]]:
+    itens: Dict[str, List[dict]] = {}
+    for row in rows:
+        # Linha só com a versão estática: a origem não tem mais itens registrados!
+        if row.item is None:
+            continue
+        itens.setdefault(row.item, []).append({
+            "dimensao": row.dimensao, "chave": row.chave, "dia": _dia(row.dia),
+            "receita_centavos": row.receita_centavos, "quantidade": row.quantidade,
+        })
+    return itens
+
+
+def _sincronizar(repos: Repositories, origem: UUID, atuais: Callable[[Dict[str, List[dict]]], Dict[str, List[dict]]]):
+    # Lê o registro, calcula o estado atual e grava a diferença numa LWT sobre a versão lida: de duas tarefas
+    # concorrentes da mesma origem só uma soma nos contadores; a outra relê e recalcula (sem contar duas vezes)!
+    for _ in range(VENDAS_LWT_TENTATIVAS):
+        rows = repos.vendas.contribuicoes(origem)
+        versao = rows[0].versao if rows else None
+        registradas = _registradas(rows)
+        novas = atuais(registradas)
+        mudancas = {
+            item: novas.get(item, []) for item in {*registradas, *novas}
+            if sorted(registradas.get(item, []), key=_chave) != sorted(novas.get(item, []), key=_chave)
+        }
+        if not mudancas:
+            return
+        removidas = [
+            (item, linha["dimensao"]) for item in mudancas for linha in registradas.get(item, [])
+            if linha["dimensao"] not in {nova["dimensao"] for nova in mudancas[item]}
+        ]
+        delta = somar([
+            *({**linha, "receita_centavos": -linha["receita_centavos"], "quantidade": -linha["quantidade"]}
+              for item in mudancas for linha in registradas.get(item, [])),
+            *(linha for linhas in mudancas.values() for linha in linhas),
+        ])
+        # Registro antes dos contadores: uma falha entre os dois deixa o rollup devendo (a reconstrução acerta),
+        # nunca somando duas vezes no retry!
+        if repos.vendas.registrar(origem, versao, mudancas, removidas):
+            repos.vendas.incr(delta)
+            return
+    # A tarefa falha e o write-behind tenta de novo com backoff!
+    raise RuntimeError(f"Registro de vendas da origem {origem} disputado! {VENDAS_LWT_TENTATIVAS} tentativas!")
+
+
+def sincronizar_pedido(repos: Repositories, pedido_id: UUID):
+    # O pedido e seus itens (uma partição do registro) ficam iguais ao estado atual; pedido apagado zera tudo!
+    def atuais(registradas: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        try:
+            pedido = repos.pedidos.get(pedido_id, columns=["id", "status", "valor_total", "data_pedido"])
+        except DoesNotExist:
+            return {}
+
+        linhas = {PEDIDO: linhas_pedido(pedido.status, pedido.valor_total, pedido.data_pedido)}
+        livro_ids = [rel.livro_id for rel in repos.pedido_livro.list_by_pedido(pedido_id)]
+        # Item já registrado mantém o preço/autor da venda (só a data acompanha o pedido)!
+        novos = [livro_id for livro_id in livro_ids if str(livro_id) not in registradas]
+        livros = {
+            livro.id: livro for livro in repos.livros.get_many(novos, columns=["id", "preco", "autor_id"])
+        } if novos else {}
+        for livro_id in livro_ids:
+            anteriores = registradas.get(str(livro_id))
+            if anteriores:
+                linhas[str(livro_id)] = [{**linha, "dia": _dia(pedido.data_pedido)} for linha in anteriores]
+            elif livro_id in livros:
+                livro = livros[livro_id]
+                linhas[str(livro_id)] = linhas_item(pedido.data_pedido, livro.id, livro.preco, livro.autor_id)
+        return linhas
+
+    _sincronizar(repos, pedido_id, atuais)
+
+
+def sincronizar_pagamento(repos: Repositories, pagamento_id: UUID):
+    def atuais(registradas: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        try:
+            pagamento = repos.pagamentos.get(
+                pagamento_id, columns=["id", "valor", "data_pagamento", "forma_pagamento"]
+            )
+        except DoesNotExist:
+            return {}
+        return {PEDIDO: linhas_pagamento(pagamento.valor, pagamento.data_pagamento, pagamento.forma_pagamento)}
+
+    _sincronizar(repos, pagamento_id, atuais)
+
+
+def registro(
+    pedidos: Iterable[dict], pedido_livro: Iterable[dict], pagamentos: Iterable[dict], livros: Dict[UUID, dict],
+) -> List[dict]:
+    # Linhas do registro a partir de linhas já em memória (carga e reconstrução)!
+    pedidos = {pedido["id"]: pedido for pedido in pedidos}
+    rows = []
+    for pedido in pedidos.values():
+        rows.extend(
+            {**linha, "origem": pedido["id"], "item": PEDIDO}
+            for linha in linhas_pedido(pedido["status"], pedido["valor_total"], pedido["data_pedido"])
+        )
+    for rel in pedido_livro:
+        pedido, livro = pedidos.get(rel["pedido_id"]), livros.get(rel["livro_id"])
+        if pedido is not None and livro is not None:
+            rows.extend(
+                {**linha, "origem": pedido["id"], "item": str(livro["id"])}
+                for linha in linhas_item(pedido["data_pedido"], livro["id"], livro["preco"], livro["autor_id"])
+            )
+    for pagamento in pagamentos:
+        rows.extend(
+            {**linha, "origem": pagamento["id"], "item": PEDIDO}
+            for linha in linhas_pagamento(pagamento["valor"], pagamento["data_pagamento"], pagamento["forma_pagamento"])
+        )
+    return rows
+
+
+def _como_dict(row, names) -> dict:
+    return {name: getattr(row, name) for name in names}
+
+
+def reconstruir(repos: Repositories, concurrency: int = 128) -> int:
+    # Recalcula contadores e registro a partir das tabelas normalizadas, lidas em faixas de token paralelas!
+    # Os itens passam a usar o preço atual dos livros (o preço da venda não fica nas tabelas normalizadas).
+    colunas_pedido = ("id", "status", "valor_total", "data_pedido")
+    colunas_pagamento = ("id", "valor", "data_pagamento", "forma_pagamento")
+    colunas_livro = ("id", "preco", "autor_id")
+    pedidos = [_como_dict(p, colunas_pedido) for p in repos.pedidos.scan(columns=list(colunas_pedido))]
+    pagamentos = [_como_dict(p, colunas_pagamento) for p in repos.pagamentos.scan(columns=list(colunas_pagamento))]
+    livros = {l.id: _como_dict(l, colunas_livro) for l in repos.livros.scan(columns=list(colunas_livro))}
+    pedido_livro = [{"pedido_id": rel.pedido_id, "livro_id": rel.livro_id} for rel in repos.pedido_livro.scan()]
+
+    rows = registro(pedidos, pedido_livro, pagamentos, livros)
+    repos.vendas.truncate()
+    written = repos.vendas.insert_many(rows, concurrency=concurrency)
+    logger.info("Rollups de vendas reconstruídos! %d linhas de registro!", written)
+    return written
+
+
+def dias(inicio: date, fim: date) -> List[date]:
+    return [inicio + timedelta(days=n) for n in range((fim - inicio).days + 1)]
+
+
+def por_dia(repos: Repositories, dimensao: str, inicio: date, fim: date) -> Dict[date, List[int]]:
+    # [receita_centavos, quantidade] de cada dia do período (zerado nos dias sem venda)!
+    totais = {dia: [0, 0] for dia in dias(inicio, fim)}
+    for row in repos.vendas.por_dias(dimensao, list(totais)):
+        total = totais[_dia(row.dia)]
+        total[0] += row.receita_centavos or 0
+        total[1] += row.quantidade or 0
+    return totais
+
+
+def por_chave(
+    repos: Repositories, dimensao: str, inicio: date, fim: date, chave: Optional[str] = None,
+) -> Dict[str, List[int]]:
+    # [receita_centavos, quantidade] de cada chave no período (contadores zerados ficam de fora)!
+    totais: Dict[str, List[int]] = {}
+    for row in repos.vendas.por_dias(dimensao, dias(inicio, fim), chave):
+        if row.receita_centavos or row.quantidade:
+            total = totais.setdefault(row.chave, [0, 0])
+            total[0] += row.receita_centavos or 0
+            total[1] += row.quantidade or 0
+    return totais
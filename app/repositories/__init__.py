@@ -0,0 +1,38 @@
+import os
+from app.repositories.base import (
+    EditoraCatalogoRepository, EntityRepository, LinkRepository, OutboxRepository, PedidoDetalhadoRepository,
+    Repositories, Row, SerieDiariaRepository, VendasRepository,
+)
+
+__all__ = [
+    "EditoraCatalogoRepository", "EntityRepository", "LinkRepository", "OutboxRepository", "PedidoDetalhadoRepository",
+    "Repositories", "Row", "SerieDiariaRepository", "VendasRepository",
+    "STORAGE_BACKEND", "create_repositories", "get_repositories", "set_repositories",
+]
+
+# "cassandra" (padrão) ou "memory" (dublê em memória para benchmarks e testes)!
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cassandra")
+
+_repositories = None
+
+
+def create_repositories(backend: str) -> Repositories:
+    if backend == "cassandra":
+        from app.repositories.cassandra import create_cassandra_repositories
+        return create_cassandra_repositories()
+    if backend == "memory":
+        from app.repositories.memory import create_memory_repositories
+        return create_memory_repositories()
+    raise ValueError(f"STORAGE_BACKEND inválido: {backend}!")
+
+
+def get_repositories() -> Repositories:
+    global _repositories
+    if _repositories is None:
+        _repositories = create_repositories(STORAGE_BACKEND)
+    return _repositories
+
+
+def set_repositories(repositories: Repositories):
+    global _repositories
+    _repositories = repositories
@@ -0,0 +1,397 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+from uuid import UUID
+from cassandra.cqlengine.models import Model
+from app.repositories import identity_map, versions
+
+
+class Row(SimpleNamespace):
+    # Linha devolvida pelos repositórios que não usam o cqlengine (acesso por atributo, como nos models)!
+    pass
+
+
+class EntityRepository(ABC):
+    model: Type[Model]
+
+    # columns: lê só essas colunas do banco (None = todas)!
+
+    def get(self, id: UUID, columns: Optional[Sequence[str]] = None) -> Any:
+        """Retorna a linha com o id informado ou levanta DoesNotExist (memoizada na requisição)."""
+        mapa = identity_map.current()
+        if mapa is None:
+            return self._get(id, columns)
+        key = (self.model.__name__, id)
+        row = mapa.get(key, columns)
+        if row is identity_map.AUSENTE:
+            raise self.model.DoesNotExist(f"{self.model.__name__} {id} não encontrado!")
+        if row is not None:
+            return row
+        try:
+            row = self._get(id, columns)
+        except self.model.DoesNotExist:
+            mapa.put(key, identity_map.AUSENTE, None)
+            raise
+        mapa.put(key, row, columns)
+        return row
+
+    def get_many(self, ids: Sequence[UUID], columns: Optional[Sequence[str]] = None) -> List[Any]:
+        """Linhas com esses ids, na ordem pedida e lidas em paralelo; ids inexistentes ficam de fora.
+
+        Só os ids ainda não vistos na requisição vão ao banco (identity map)!
+        """
+        mapa = identity_map.current()
+        if mapa is None:
+            return self._get_many(ids, columns)
+        name = self.model.__name__
+        found = {id: mapa.get((name, id), columns) for id in ids}
+        missing = [id for id, row in found.items() if row is None]
+        if missing:
+            for row in self._get_many(missing, columns):
+                found[row.id] = row
+                mapa.put((name, row.id), row, columns)
+            for id in missing:
+                if found[id] is None:
+                    found[id] = identity_map.AUSENTE
+                    mapa.put((name, id), identity_map.AUSENTE, None)
+        return [found[id] for id in ids if found[id] is not identity_map.AUSENTE]
+
+    @abstractmethod
+    def _get(self, id: UUID, columns: Optional[Sequence[str]] = None) -> Any:
+        """Leitura por chave no banco (sem identity map); levanta DoesNotExist."""
+
+    @abstractmethod
+    def _get_many(self, ids: Sequence[UUID], columns: Optional[Sequence[str]] = None) -> List[Any]:
+        ...
+
+    @abstractmethod
+    def list_all(self, columns: Optional[Sequence[str]] = None) -> List[Any]:
+        ...
+
+    def scan(self, columns: Optional[Sequence[str]] = None, splits: int = 16) -> List[Any]:
+        """Varredura completa em faixas de token lidas em paralelo (reconstruções); sem ordem definida."""
+        return self.list_all(columns=columns)
+
+    @abstractmethod
+    def find_by(self, columns: Optional[Sequence[str]] = None, **filters) -> List[Any]:
+        """Linhas cujas colunas são iguais aos valores informados."""
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def create(self, **data) -> Any:
+        ...
+
+    @abstractmethod
+    def update(self, id: UUID, **data) -> Any:
+        """Grava só as colunas de data (e uma nova versao), conferindo a existência conforme WRITE_EXISTENCE_CHECK.
+
+        Levanta DoesNotExist se a linha não existir (exceto com blind). Com "read", a leitura da checagem (que o
+        identity map serve se a rota já leu a linha) completa a linha devolvida; com lwt/blind ela é parcial
+        (id, colunas gravadas e versao) e complete() busca o resto quando for preciso.
+        """
+
+    @abstractmethod
+    def delete(self, id: UUID) -> None:
+        """Remove a linha em um statement só; levanta DoesNotExist (exceto com WRITE_EXISTENCE_CHECK=blind)."""
+
+    @abstractmethod
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        """Carga em massa (sem validações); retorna quantas linhas foram gravadas."""
+
+    @abstractmethod
+    def table_version(self) -> int:
+        """Contador que muda a cada escrita na tabela (ETag das listagens)."""
+
+    def _updated_row(self, id: UUID, data: dict, stored: Any) -> Row:
+        if stored is None:
+            return Row(id=id, **data)
+        return Row(**{**{name: getattr(stored, name) for name in self.model._columns}, **data})
+
+    def complete(self, partial: Any) -> Any:
+        # Linha parcial (de update) já com todas as colunas: vira a representação sem nova leitura!
+        missing = [name for name in self.model._columns if name not in vars(partial)]
+        if not missing:
+            return partial
+        stored = self.get(partial.id, columns=["id", *missing])
+        row = Row(**{name: getattr(stored, name) for name in missing}, **vars(partial))
+        self._remember(row)
+        return row
+
+    # Versões das linhas vistas neste processo, para responder 304 antes de ler do banco!
+
+    def cached_version(self, id: UUID) -> Optional[UUID]:
+        return versions.row_versions.get((self.model.__name__, id))
+
+    def _remember(self, row: Any):
+        # Leitura parcial sem a versao não diz nada sobre a versão da linha!
+        if hasattr(row, "versao"):
+            versions.row_versions.put((self.model.__name__, row.id), row.versao)
+
+    def _forget(self, id: UUID):
+        versions.row_versions.discard((self.model.__name__, id))
+        self._evict(id)
+
+    def _evict(self, id: UUID):
+        # Escrita na linha: a cópia do identity map desta requisição deixa de valer!
+        identity_map.discard((self.model.__name__, id))
+
+
+class LinkRepository(ABC):
+    # Relações N:N particionadas por pedido (pedido_livro, pedido_pagamento)!
+    model: Type[Model]
+    child_key: str
+
+    @abstractmethod
+    def list_by_pedido(self, pedido_id: UUID) -> List[Any]:
+        ...
+
+    @abstractmethod
+    def list_by_pedidos(self, pedido_ids: Sequence[UUID]) -> List[Any]:
+        """Relações de vários pedidos, uma partição por pedido lidas em paralelo (na ordem dos pedidos)."""
+
+    @abstractmethod
+    def exists(self, pedido_id: UUID, child_id: UUID) -> bool:
+        ...
+
+    @abstractmethod
+    def link(self, pedido_id: UUID, child_id: UUID) -> Any:
+        ...
+
+    @abstractmethod
+    def unlink(self, pedido_id: UUID, child_id: UUID) -> None:
+        """Remove a relação ou levanta DoesNotExist."""
+
+    @abstractmethod
+    def delete_by_pedido(self, pedido_id: UUID) -> None:
+        """Remove todas as relações do pedido (a partição inteira) em um statement só."""
+
+    @abstractmethod
+    def pedidos_com(self, child_id: UUID) -> List[UUID]:
+        """Pedidos vinculados ao filho, pelo índice em child_key (todos os nós); só para o write-behind."""
+
+    @abstractmethod
+    def scan(self, splits: int = 16) -> List[Any]:
+        """Todas as relações, em faixas de token lidas em paralelo (reconstruções)."""
+
+    @abstractmethod
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        ...
+
+
+class PedidoDetalhadoRepository(ABC):
+    # Documento por pedido (partição = usuário) com mapas livro_id -> resumo e pagamento_id -> resumo,
+    # mais os índices reversos livro/pagamento -> (usuario_id, pedido_id)!
+    model: Type[Model]
+
+    @abstractmethod
+    def list_by_usuario(self, usuario_id: UUID) -> List[Any]:
+        """Documentos do usuário (pedido_id, data_pedido, livros, pagamentos) em uma leitura só."""
+
+    @abstractmethod
+    def get(self, usuario_id: UUID, pedido_id: UUID) -> Any:
+        """Retorna o documento ou levanta DoesNotExist."""
+
+    @abstractmethod
+    def save(self, usuario_id: UUID, pedido_id: UUID, data_pedido: Any,
+             livros: Sequence[dict] = (), pagamentos: Sequence[dict] = ()) -> None:
+        """Grava o documento inteiro (e os índices reversos dos itens)."""
+
+    @abstractmethod
+    def set_data_pedido(self, usuario_id: UUID, pedido_id: UUID, data_pedido: Any) -> None:
+        ...
+
+    @abstractmethod
+    def put_livro(self, usuario_id: UUID, pedido_id: UUID, livro: dict) -> None:
+        """Inclui/substitui só esse livro no documento, sem ler o resto."""
+
+    @abstractmethod
+    def remove_livro(self, usuario_id: UUID, pedido_id: UUID, livro_id: UUID) -> None:
+        ...
+
+    @abstractmethod
+    def put_pagamento(self, usuario_id: UUID, pedido_id: UUID, pagamento: dict) -> None:
+        ...
+
+    @abstractmethod
+    def remove_pagamento(self, usuario_id: UUID, pedido_id: UUID, pagamento_id: UUID) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, usuario_id: UUID, pedido_id: UUID) -> None:
+        """Remove o documento e as entradas dos índices reversos (não falha se não existir)."""
+
+    @abstractmethod
+    def pedidos_com_livro(self, livro_id: UUID) -> List[Tuple[UUID, UUID]]:
+        """(usuario_id, pedido_id) dos documentos que contêm o livro."""
+
+    @abstractmethod
+    def pedidos_com_pagamento(self, pagamento_id: UUID) -> List[Tuple[UUID, UUID]]:
+        ...
+
+    @abstractmethod
+    def usuario_do_pedido(self, pedido_id: UUID) -> Optional[UUID]:
+        """Dono do documento do pedido (None se não houver documento); só para o write-behind."""
+
+    @abstractmethod
+    def insert_many(self, documents: Iterable[dict], concurrency: int = 128) -> int:
+        """Carga em massa de documentos {usuario_id, pedido_id, data_pedido, livros, pagamentos}."""
+
+
+class EditoraCatalogoRepository(ABC):
+    # Catálogo desnormalizado: um documento por editora com os resumos dos livros!
+
+    @abstractmethod
+    def page(self, offset: int, limit: int) -> List[Any]:
+        """Documentos [offset, offset + limit) na ordem da tabela, lendo só até o fim da página."""
+
+    @abstractmethod
+    def page_after(self, editora_id: Optional[UUID], limit: int) -> List[Any]:
+        """Até limit documentos depois desse na ordem de token (None = do início); custa só a página."""
+
+    @abstractmethod
+    def save(self, editora: dict, livros: Sequence[dict] = ()) -> None:
+        """Grava o documento inteiro a partir da editora (id, nome, endereco, telefone, email)."""
+
+    @abstractmethod
+    def set_editora(self, editora: dict) -> None:
+        """Atualiza só os dados da editora, sem tocar nos livros."""
+
+    @abstractmethod
+    def put_livro(self, editora_id: UUID, livro: dict) -> None:
+        """Inclui/substitui só esse livro no documento, sem ler o resto."""
+
+    @abstractmethod
+    def remove_livro(self, editora_id: UUID, livro_id: UUID) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, editora_id: UUID) -> None:
+        ...
+
+    @abstractmethod
+    def editora_do_livro(self, livro_id: UUID) -> Optional[UUID]:
+        """Editora cujo documento contém o livro (None se nenhum); só para o write-behind."""
+
+    @abstractmethod
+    def insert_many(self, documents: Iterable[dict], concurrency: int = 128) -> int:
+        """Carga em massa de documentos {editora_id, nome, endereco, telefone, email, livros}."""
+
+
+class OutboxRepository(ABC):
+    # Tarefas pendentes do write-behind, espalhadas em algumas partições para não concentrar as escritas!
+
+    @abstractmethod
+    def add(self, tarefa: dict) -> None:
+        """Grava {particao, id, tipo, payload, tags, dono, prazo} antes de a tarefa entrar na fila."""
+
+    @abstractmethod
+    def pending(self, partitions: int) -> List[Any]:
+        """Tarefas ainda não concluídas de todas as partições, em ordem de criação."""
+
+    @abstractmethod
+    def claim(self, tarefas: Sequence[dict], dono: UUID, prazo: datetime) -> List[dict]:
+        """Toma as tarefas para `dono` até `prazo`, cada uma só se o prazo gravado ainda for o lido; devolve as tomadas."""
+
+    @abstractmethod
+    def remove(self, keys: Sequence[Tuple[int, UUID]]) -> None:
+        """Apaga as tarefas concluídas (particao, id) em lote."""
+
+
+class VendasRepository(ABC):
+    # Rollups de vendas em contadores (partição = dimensão + dia, linha = chave) e o registro do que cada
+    # origem (pedido, item de pedido, pagamento) já somou neles. Linhas: {dimensao, dia, chave,
+    # receita_centavos, quantidade}; no registro também {origem, item}!
+
+    @abstractmethod
+    def incr(self, linhas: Sequence[dict]) -> None:
+        """Soma as linhas aos contadores (valores negativos subtraem)."""
+
+    @abstractmethod
+    def por_dias(self, dimensao: str, dias: Sequence[date], chave: Optional[str] = None) -> List[Any]:
+        """Linhas (dia, chave, receita_centavos, quantidade) desses dias, uma partição por dia, lidas em paralelo."""
+
+    @abstractmethod
+    def contribuicoes(self, origem: UUID) -> List[Any]:
+        """Partição da origem (o pedido e os itens dele) com a versao estática; sem itens, uma linha com item None."""
+
+    @abstractmethod
+    def registrar(
+        self, origem: UUID, versao: Optional[UUID], itens: Dict[str, Sequence[dict]], removidas: Sequence[Tuple[str, str]],
+    ) -> bool:
+        """Grava as linhas dos itens e apaga as (item, dimensao) removidas numa LWT; False se a versão mudou."""
+
+    @abstractmethod
+    def truncate(self) -> None:
+        """Esvazia contadores e registro (reconstrução)."""
+
+    @abstractmethod
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        """Carga em massa do registro, somando cada linha também nos contadores."""
+
+
+class SerieDiariaRepository(ABC):
+    # Cópia de uma entidade particionada pela data (pedidos_por_dia, pagamentos_por_dia): um período lê uma
+    # partição por dia, em paralelo, em vez de varrer a tabela. Linhas: as colunas do modelo (dia_key é a data)!
+    model: Type[Model]
+    dia_key: str
+
+    @abstractmethod
+    def save(self, row: dict, dia_anterior: Optional[date]) -> None:
+        """Grava a linha no dia dela; a cópia de dia_anterior (None = não há) sai no mesmo BATCH se o dia mudou."""
+
+    @abstractmethod
+    def delete(self, id: UUID, dia: Optional[date]) -> None:
+        """Apaga a cópia do id nesse dia (None = não há cópia: não faz nada)."""
+
+    @abstractmethod
+    def por_dias(self, dias: Sequence[date], columns: Optional[Sequence[str]] = None) -> List[Any]:
+        """Linhas desses dias em ordem (dia, id): uma partição por dia, lidas em paralelo."""
+
+    @abstractmethod
+    def is_empty(self) -> bool:
+        """Se a tabela não tem nenhuma linha (uma leitura com LIMIT 1)."""
+
+    @abstractmethod
+    def truncate(self) -> None:
+        ...
+
+    @abstractmethod
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        ...
+
+
+@dataclass
+class Repositories:
+    autores: EntityRepository
+    editoras: EntityRepository
+    livros: EntityRepository
+    usuarios: EntityRepository
+    pedidos: EntityRepository
+    pagamentos: EntityRepository
+    pedido_livro: LinkRepository
+    pedido_pagamento: LinkRepository
+    pedido_detalhado: PedidoDetalhadoRepository
+    editora_catalogo: EditoraCatalogoRepository
+    outbox: OutboxRepository
+    vendas: VendasRepository
+    pedidos_por_dia: SerieDiariaRepository
+    pagamentos_por_dia: SerieDiariaRepository
+
+    def startup(self):
+        pass
+
+    def insert_batch(self, rows: Dict[str, List[dict]]) -> None:
+        """Grava linhas novas de vários repositórios juntas (batch logged no Cassandra: tudo ou nada).
+
+        As chaves são nomes de repositórios e os valores seguem o formato do insert_many de cada um.
+        """
+        for name, items in rows.items():
+            getattr(self, name).insert_many(items)
+
+    def all(self):
+        return [getattr(self, f.name) for f in fields(self)]
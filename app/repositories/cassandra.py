@@ -0,0 +1,649 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid1
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.cqlengine import connection
+from cassandra.cqlengine.functions import Token
+from cassandra.cqlengine.management import sync_table
+from cassandra.cqlengine.query import BatchQuery, BatchType as CqlBatchType, LWTException
+from cassandra.query import BatchStatement, BatchType
+from app.database.cassandra_config import connect_to_cassandra
+from app.database import policies
+from app.database.policies import EXEC_PROFILE_LEITURA
+from app.models.models import (
+    Autor, Editora, Livro, Usuario, Pedido, Pagamento, PedidoLivro, PedidoPagamento, VersaoTabela,
+    LivroResumo, PagamentoResumo, PedidoDetalhadoDoc, LivroPedido, PagamentoPedido, EditoraCatalogoDoc,
+    TarefaOutbox, VendasDia, VendaOrigem, PedidoDia, PagamentoDia,
+)
+from app.repositories.base import (
+    EditoraCatalogoRepository, EntityRepository, LinkRepository, OutboxRepository, PedidoDetalhadoRepository,
+    Repositories, Row, SerieDiariaRepository, VendasRepository,
+)
+
+
+_inserts = {}
+
+
+def prepared_insert(model):
+    # INSERT preparado por tabela (e reaproveitado), com a ordem das colunas usada nos parâmetros!
+    cached = _inserts.get(model)
+    if cached is None:
+        names = list(model._columns.keys())
+        statement = connection.get_session().prepare(
+            f"INSERT INTO {model.column_family_name()} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+        )
+        # INSERT com valores fixos pode ser repetido sem efeito colateral!
+        statement.is_idempotent = True
+        cached = _inserts[model] = (statement, names)
+    return cached
+
+
+def insert_concurrently(model, rows: Iterable[dict], concurrency: int) -> int:
+    # INSERT preparado com várias requisições assíncronas em voo (bem mais rápido que Model.create)!
+    statement, names = prepared_insert(model)
+    params = (tuple(row.get(name) for name in names) for row in rows)
+    written = 0
+    for success, result in execute_concurrent_with_args(
+        connection.get_session(), statement, params, concurrency=concurrency, results_generator=True
+    ):
+        if not success:
+            raise result
+        written += 1
+    return written
+
+
+# Faixa de tokens do Murmur3Partitioner (o mínimo nunca é atribuído a uma chave)!
+MIN_TOKEN, MAX_TOKEN = -2 ** 63, 2 ** 63 - 1
+
+
+def construct(model, row: dict, columns: Optional[Sequence[str]]):
+    # Leitura parcial vira uma Row só com as colunas lidas: o _construct_instance do cqlengine preencheria as
+    # outras com o default (versao = uuid1() novo, data_cadastro = hoje), que passariam por dados reais!
+    return Row(**row) if columns else model._construct_instance(row)
+
+
+def scan_token_ranges(model, partition_key: str, columns: Optional[Sequence[str]], splits: int) -> List:
+    # Varredura completa dividida em faixas de token, todas em voo ao mesmo tempo: cada faixa é lida
+    # (e paginada) por um coordenador diferente, em vez de um SELECT sem WHERE preso a um nó só!
+    session = connection.get_session()
+    select_list = ", ".join(columns) if columns else "*"
+    statement = session.prepare(
+        f"SELECT {select_list} FROM {model.column_family_name()} "
+        f"WHERE token({partition_key}) > ? AND token({partition_key}) <= ?"
+    )
+    statement.is_idempotent = True
+    step = (MAX_TOKEN - MIN_TOKEN) // splits
+    bounds = [MIN_TOKEN + step * n for n in range(splits)] + [MAX_TOKEN]
+    rows = []
+    for success, result in execute_concurrent_with_args(
+        session, statement, list(zip(bounds, bounds[1:])), concurrency=splits,
+        execution_profile=EXEC_PROFILE_LEITURA,
+    ):
+        if not success:
+            raise result
+        rows.extend(construct(model, row, columns) for row in result)
+    return rows
+
+
+class CassandraEntityRepository(EntityRepository):
+    def __init__(self, model):
+        self.model = model
+        self.table = model.column_family_name(include_keyspace=False)
+        self._selects = {}
+
+    def _fetch(self, query, columns: Optional[Sequence[str]]) -> List:
+        if not columns:
+            return list(query)
+        return [Row(**dict(zip(columns, values))) for values in query.values_list(*columns)]
+
+    def _select_by_id(self, columns: Optional[Sequence[str]]):
+        # SELECT por chave preparado e marcado idempotente: o driver pode repetir e especular em outra réplica!
+        key = tuple(columns) if columns else None
+        statement = self._selects.get(key)
+        if statement is None:
+            select_list = ", ".join(columns) if columns else "*"
+            statement = connection.get_session().prepare(
+                f"SELECT {select_list} FROM {self.model.column_family_name()} WHERE id = ?"
+            )
+            statement.is_idempotent = True
+            self._selects[key] = statement
+        return statement
+
+    def _get(self, id: UUID, columns: Optional[Sequence[str]] = None):
+        result = connection.get_session().execute(
+            self._select_by_id(columns), (id,), execution_profile=EXEC_PROFILE_LEITURA
+        ).one()
+        if result is None:
+            raise self.model.DoesNotExist(f"{self.model.__name__} {id} não encontrado!")
+        row = construct(self.model, result, columns)
+        self._remember(row)
+        return row
+
+    def _get_many(self, ids: Sequence[UUID], columns: Optional[Sequence[str]] = None) -> List:
+        # Uma leitura por chave para cada id, todas em voo ao mesmo tempo (melhor que IN, que sobrecarrega um coordenador)!
+        results = execute_concurrent_with_args(
+            connection.get_session(), self._select_by_id(columns), [(id,) for id in ids],
+            concurrency=max(1, min(len(ids), 64)), execution_profile=EXEC_PROFILE_LEITURA,
+        )
+        rows = []
+        for success, result in results:
+            if not success:
+                raise result
+            found = result.one()
+            if found is not None:
+                row = construct(self.model, found, columns)
+                self._remember(row)
+                rows.append(row)
+        return rows
+
+    def list_all(self, columns: Optional[Sequence[str]] = None) -> List:
+        return self._fetch(self.model.objects.all(), columns)
+
+    def scan(self, columns: Optional[Sequence[str]] = None, splits: int = 16) -> List:
+        return scan_token_ranges(self.model, "id", columns, splits)
+
+    def find_by(self, columns: Optional[Sequence[str]] = None, **filters) -> List:
+        return self._fetch(self.model.objects(**filters).allow_filtering(), columns)
+
+    def count(self) -> int:
+        return self.model.objects().count()
+
+    def create(self, **data):
+        row = self.model.create(**data)
+        self._bump()
+        self._remember(row)
+        return row
+
+    def _by_id(self, id: UUID, columns: Optional[Sequence[str]] = None):
+        # UPDATE/DELETE por id com a checagem de existência configurada (WRITE_EXISTENCE_CHECK), mais a linha
+        # lida pela checagem "read" (None nos outros modos)!
+        query = self.model.objects(id=id)
+        if policies.WRITE_EXISTENCE_CHECK == "lwt":
+            return query.if_exists(), None
+        if policies.WRITE_EXISTENCE_CHECK == "read":
+            return query, self.get(id, columns=columns)
+        return query, None
+
+    def update(self, id: UUID, **data):
+        query, lida = self._by_id(id)
+        self._evict(id)
+        data = {**data, "versao": uuid1()}
+        try:
+            # UPDATE ... SET ... WHERE id = ? (IF EXISTS com "lwt")
+            query.update(**data)
+        except LWTException:
+            raise self.model.DoesNotExist(f"{self.model.__name__} {id} não encontrado!")
+        self._bump()
+        row = self._updated_row(id, data, lida)
+        self._remember(row)
+        return row
+
+    def delete(self, id: UUID) -> None:
+        query, _ = self._by_id(id, columns=["id"])
+        try:
+            # DELETE FROM ... WHERE id = ? (IF EXISTS com "lwt")
+            query.delete()
+        except LWTException:
+            raise self.model.DoesNotExist(f"{self.model.__name__} {id} não encontrado!")
+        self._bump()
+        self._forget(id)
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        written = insert_concurrently(self.model, rows, concurrency)
+        self._bump()
+        return written
+
+    def batch_rows(self, rows: Iterable[dict]):
+        return [(self.model, row) for row in rows]
+
+    def table_version(self) -> int:
+        contador = VersaoTabela.objects(tabela=self.table).first()
+        return contador.versao if contador is not None else 0
+
+    def _bump(self):
+        # UPDATE versao_tabela SET versao = versao + 1 WHERE tabela = ?
+        VersaoTabela.objects(tabela=self.table).update(versao=1)
+
+
+class CassandraLinkRepository(LinkRepository):
+    def __init__(self, model, child_key: str):
+        self.model = model
+        self.child_key = child_key
+        self._select_by_pedido = None
+
+    def list_by_pedido(self, pedido_id: UUID) -> List:
+        return list(self.model.objects(pedido_id=pedido_id))
+
+    def list_by_pedidos(self, pedido_ids: Sequence[UUID]) -> List:
+        if self._select_by_pedido is None:
+            statement = connection.get_session().prepare(
+                f"SELECT * FROM {self.model.column_family_name()} WHERE pedido_id = ?"
+            )
+            statement.is_idempotent = True
+            self._select_by_pedido = statement
+        rows = []
+        for success, result in execute_concurrent_with_args(
+            connection.get_session(), self._select_by_pedido, [(id,) for id in pedido_ids],
+            concurrency=max(1, min(len(pedido_ids), 64)), execution_profile=EXEC_PROFILE_LEITURA,
+        ):
+            if not success:
+                raise result
+            rows.extend(self.model._construct_instance(row) for row in result)
+        return rows
+
+    def exists(self, pedido_id: UUID, child_id: UUID) -> bool:
+        return self.model.objects(pedido_id=pedido_id, **{self.child_key: child_id}).count() > 0
+
+    def link(self, pedido_id: UUID, child_id: UUID):
+        rel = self.model(pedido_id=pedido_id, **{self.child_key: child_id})
+        rel.save()
+        return rel
+
+    def unlink(self, pedido_id: UUID, child_id: UUID) -> None:
+        self.model.objects(pedido_id=pedido_id, **{self.child_key: child_id}).get().delete()
+
+    def delete_by_pedido(self, pedido_id: UUID) -> None:
+        self.model.objects(pedido_id=pedido_id).delete()
+
+    def pedidos_com(self, child_id: UUID) -> List[UUID]:
+        # Pelo índice no filho (consulta em todos os nós): só o write-behind usa, nunca uma requisição!
+        return [row.pedido_id for row in self.model.objects(**{self.child_key: child_id}).only(["pedido_id"])]
+
+    def scan(self, splits: int = 16) -> List:
+        return scan_token_ranges(self.model, "pedido_id", None, splits)
+
+    def batch_rows(self, rows: Iterable[dict]):
+        return [(self.model, row) for row in rows]
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        return insert_concurrently(self.model, rows, concurrency)
+
+
+class CassandraPedidoDetalhadoRepository(PedidoDetalhadoRepository):
+    model = PedidoDetalhadoDoc
+
+    def _doc(self, usuario_id: UUID, pedido_id: UUID):
+        return PedidoDetalhadoDoc.objects(usuario_id=usuario_id, pedido_id=pedido_id)
+
+    def list_by_usuario(self, usuario_id: UUID) -> List:
+        return list(PedidoDetalhadoDoc.objects(usuario_id=usuario_id))
+
+    def get(self, usuario_id: UUID, pedido_id: UUID):
+        return self._doc(usuario_id, pedido_id).get()
+
+    def save(self, usuario_id, pedido_id, data_pedido, livros=(), pagamentos=()) -> None:
+        PedidoDetalhadoDoc.create(
+            usuario_id=usuario_id,
+            pedido_id=pedido_id,
+            data_pedido=data_pedido,
+            livros={livro["id"]: LivroResumo(**livro) for livro in livros},
+            pagamentos={pagamento["id"]: PagamentoResumo(**pagamento) for pagamento in pagamentos},
+        )
+        for livro in livros:
+            LivroPedido.create(livro_id=livro["id"], pedido_id=pedido_id, usuario_id=usuario_id)
+        for pagamento in pagamentos:
+            PagamentoPedido.create(pagamento_id=pagamento["id"], pedido_id=pedido_id, usuario_id=usuario_id)
+
+    def set_data_pedido(self, usuario_id, pedido_id, data_pedido) -> None:
+        self._doc(usuario_id, pedido_id).update(data_pedido=data_pedido)
+
+    def put_livro(self, usuario_id, pedido_id, livro: dict) -> None:
+        # UPDATE pedido_detalhado SET livros = livros + {?: ?} WHERE usuario_id = ? AND pedido_id = ?
+        self._doc(usuario_id, pedido_id).update(livros__update={livro["id"]: LivroResumo(**livro)})
+        LivroPedido.create(livro_id=livro["id"], pedido_id=pedido_id, usuario_id=usuario_id)
+
+    def remove_livro(self, usuario_id, pedido_id, livro_id) -> None:
+        self._doc(usuario_id, pedido_id).update(livros__remove={livro_id})
+        LivroPedido.objects(livro_id=livro_id, pedido_id=pedido_id).delete()
+
+    def put_pagamento(self, usuario_id, pedido_id, pagamento: dict) -> None:
+        self._doc(usuario_id, pedido_id).update(pagamentos__update={pagamento["id"]: PagamentoResumo(**pagamento)})
+        PagamentoPedido.create(pagamento_id=pagamento["id"], pedido_id=pedido_id, usuario_id=usuario_id)
+
+    def remove_pagamento(self, usuario_id, pedido_id, pagamento_id) -> None:
+        self._doc(usuario_id, pedido_id).update(pagamentos__remove={pagamento_id})
+        PagamentoPedido.objects(pagamento_id=pagamento_id, pedido_id=pedido_id).delete()
+
+    def delete(self, usuario_id, pedido_id) -> None:
+        doc = self._doc(usuario_id, pedido_id).first()
+        if doc is None:
+            return
+        for livro_id in doc.livros or {}:
+            LivroPedido.objects(livro_id=livro_id, pedido_id=pedido_id).delete()
+        for pagamento_id in doc.pagamentos or {}:
+            PagamentoPedido.objects(pagamento_id=pagamento_id, pedido_id=pedido_id).delete()
+        doc.delete()
+
+    def pedidos_com_livro(self, livro_id: UUID) -> List[Tuple[UUID, UUID]]:
+        return [(r.usuario_id, r.pedido_id) for r in LivroPedido.objects(livro_id=livro_id)]
+
+    def pedidos_com_pagamento(self, pagamento_id: UUID) -> List[Tuple[UUID, UUID]]:
+        return [(r.usuario_id, r.pedido_id) for r in PagamentoPedido.objects(pagamento_id=pagamento_id)]
+
+    def usuario_do_pedido(self, pedido_id: UUID) -> Optional[UUID]:
+        # Pelo índice em pedido_id (consulta em todos os nós): só o write-behind usa, nunca uma requisição!
+        doc = PedidoDetalhadoDoc.objects(pedido_id=pedido_id).only(["usuario_id"]).first()
+        return doc.usuario_id if doc is not None else None
+
+    @staticmethod
+    def _doc_row(doc: dict) -> dict:
+        return {
+            **doc,
+            "livros": {livro["id"]: LivroResumo(**livro) for livro in doc["livros"]},
+            "pagamentos": {pagamento["id"]: PagamentoResumo(**pagamento) for pagamento in doc["pagamentos"]},
+        }
+
+    def batch_rows(self, documents: Iterable[dict]):
+        rows = []
+        for doc in documents:
+            rows.append((PedidoDetalhadoDoc, self._doc_row(doc)))
+            rows.extend(
+                (LivroPedido, {"livro_id": livro["id"], "pedido_id": doc["pedido_id"], "usuario_id": doc["usuario_id"]})
+                for livro in doc["livros"]
+            )
+            rows.extend(
+                (PagamentoPedido, {"pagamento_id": pagamento["id"], "pedido_id": doc["pedido_id"], "usuario_id": doc["usuario_id"]})
+                for pagamento in doc["pagamentos"]
+            )
+        return rows
+
+    def insert_many(self, documents: Iterable[dict], concurrency: int = 128) -> int:
+        documents = list(documents)
+        written = insert_concurrently(PedidoDetalhadoDoc, (self._doc_row(doc) for doc in documents), concurrency)
+        insert_concurrently(LivroPedido, (
+            {"livro_id": livro["id"], "pedido_id": doc["pedido_id"], "usuario_id": doc["usuario_id"]}
+            for doc in documents for livro in doc["livros"]
+        ), concurrency)
+        insert_concurrently(PagamentoPedido, (
+            {"pagamento_id": pagamento["id"], "pedido_id": doc["pedido_id"], "usuario_id": doc["usuario_id"]}
+            for doc in documents for pagamento in doc["pagamentos"]
+        ), concurrency)
+        return written
+
+
+class CassandraEditoraCatalogoRepository(EditoraCatalogoRepository):
+    model = EditoraCatalogoDoc
+    campos_editora = ("nome", "endereco", "telefone", "email")
+
+    def _doc(self, editora_id: UUID):
+        return EditoraCatalogoDoc.objects(editora_id=editora_id)
+
+    def page(self, offset: int, limit: int) -> List:
+        # Varredura em ordem de token que para no fim da página (sem LIMIT o cqlengine leria 10.000 linhas)!
+        return list(EditoraCatalogoDoc.objects.all().limit(offset + limit))[offset:]
+
+    def page_after(self, editora_id: Optional[UUID], limit: int) -> List:
+        # Cursor por token: WHERE token(editora_id) > token(?) LIMIT ? lê só a página, em qualquer profundidade!
+        query = EditoraCatalogoDoc.objects.all()
+        if editora_id is not None:
+            query = query.filter(pk__token__gt=Token(editora_id))
+        return list(query.limit(limit))
+
+    def save(self, editora: dict, livros=()) -> None:
+        EditoraCatalogoDoc.create(
+            editora_id=editora["id"],
+            livros={livro["id"]: LivroResumo(**livro) for livro in livros},
+            **{campo: editora.get(campo) for campo in self.campos_editora},
+        )
+
+    def set_editora(self, editora: dict) -> None:
+        self._doc(editora["id"]).update(**{campo: editora[campo] for campo in self.campos_editora if campo in editora})
+
+    def put_livro(self, editora_id, livro: dict) -> None:
+        self._doc(editora_id).update(livros__update={livro["id"]: LivroResumo(**livro)})
+
+    def remove_livro(self, editora_id, livro_id) -> None:
+        self._doc(editora_id).update(livros__remove={livro_id})
+
+    def delete(self, editora_id) -> None:
+        self._doc(editora_id).delete()
+
+    def editora_do_livro(self, livro_id: UUID) -> Optional[UUID]:
+        # Pelo índice KEYS(livros) criado no startup: só o write-behind usa, nunca uma requisição!
+        row = connection.get_session().execute(
+            f"SELECT editora_id FROM {EditoraCatalogoDoc.column_family_name()} WHERE livros CONTAINS KEY %s",
+            (livro_id,), execution_profile=EXEC_PROFILE_LEITURA,
+        ).one()
+        return row["editora_id"] if row is not None else None
+
+    def insert_many(self, documents: Iterable[dict], concurrency: int = 128) -> int:
+        return insert_concurrently(EditoraCatalogoDoc, (
+            {**doc, "livros": {livro["id"]: LivroResumo(**livro) for livro in doc["livros"]}}
+            for doc in documents
+        ), concurrency)
+
+
+class CassandraOutboxRepository(OutboxRepository):
+    def add(self, tarefa: dict) -> None:
+        TarefaOutbox.create(**tarefa)
+
+    def pending(self, partitions: int) -> List:
+        rows = [row for particao in range(partitions) for row in TarefaOutbox.objects(particao=particao)]
+        rows.sort(key=lambda row: row.id.time)
+        return rows
+
+    def claim(self, tarefas: Sequence[dict], dono: UUID, prazo) -> List[dict]:
+        tomadas = []
+        for tarefa in tarefas:
+            try:
+                # UPDATE outbox SET dono = ?, prazo = ? WHERE particao = ? AND id = ? IF prazo = ?
+                TarefaOutbox.objects(particao=tarefa["particao"], id=tarefa["id"]).iff(prazo=tarefa["prazo"]).update(
+                    dono=dono, prazo=prazo,
+                )
+            except LWTException:
+                continue  # Outro worker tomou (ou renovou) antes!
+            tomadas.append(tarefa)
+        return tomadas
+
+    def remove(self, keys: Sequence[Tuple[int, UUID]]) -> None:
+        # Um BATCH UNLOGGED por partição: cada um vai a um nó só, sem o custo do batchlog!
+        por_particao = {}
+        for particao, id in keys:
+            por_particao.setdefault(particao, []).append(id)
+        for particao, ids in por_particao.items():
+            with BatchQuery(batch_type=CqlBatchType.Unlogged) as batch:
+                for id in ids:
+                    TarefaOutbox(particao=particao, id=id).batch(batch).delete()
+
+
+class CassandraVendasRepository(VendasRepository):
+    def __init__(self):
+        self._statements = {}
+
+    def _prepare(self, key: str, cql: str, idempotent: bool):
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = self._statements[key] = connection.get_session().prepare(cql)
+            statement.is_idempotent = idempotent
+        return statement
+
+    def _execute_concurrently(self, statement, params: List[tuple], concurrency: int = 64, **kwargs) -> List:
+        results = []
+        for success, result in execute_concurrent_with_args(
+            connection.get_session(), statement, params, concurrency=max(1, min(len(params), concurrency)), **kwargs
+        ):
+            if not success:
+                raise result
+            results.append(result)
+        return results
+
+    def incr(self, linhas: Sequence[dict], concurrency: int = 64) -> None:
+        if not linhas:
+            return
+        # Incremento de contador NÃO é idempotente: sem retry nem execução especulativa (somaria duas vezes)!
+        statement = self._prepare("incr", (
+            f"UPDATE {VendasDia.column_family_name()} SET receita_centavos = receita_centavos + ?, "
+            "quantidade = quantidade + ? WHERE dimensao = ? AND dia = ? AND chave = ?"
+        ), idempotent=False)
+        self._execute_concurrently(statement, [
+            (linha["receita_centavos"], linha["quantidade"], linha["dimensao"], linha["dia"], linha["chave"])
+            for linha in linhas
+        ], concurrency)
+
+    def por_dias(self, dimensao: str, dias: Sequence, chave: Optional[str] = None) -> List:
+        filtro = " AND chave = ?" if chave is not None else ""
+        statement = self._prepare(f"dias{filtro}", (
+            f"SELECT dia, chave, receita_centavos, quantidade FROM {VendasDia.column_family_name()} "
+            f"WHERE dimensao = ? AND dia = ?{filtro}"
+        ), idempotent=True)
+        params = [(dimensao, dia, chave) if chave is not None else (dimensao, dia) for dia in dias]
+        return [
+            VendasDia._construct_instance(row)
+            for result in self._execute_concurrently(statement, params, execution_profile=EXEC_PROFILE_LEITURA)
+            for row in result
+        ]
+
+    def contribuicoes(self, origem: UUID) -> List:
+        return list(VendaOrigem.objects(origem=origem))
+
+    def registrar(
+        self, origem: UUID, versao: Optional[UUID], itens: Dict[str, Sequence[dict]], removidas: Sequence[Tuple[str, str]],
+    ) -> bool:
+        # Um BATCH condicional na partição da origem (LWT): as linhas só mudam se a versão ainda for a lida,
+        # e a versão nova marca quem vai somar a diferença nos contadores. Não é idempotente: sem retry!
+        tabela = VendaOrigem.column_family_name()
+        gate = self._prepare("versao", f"UPDATE {tabela} SET versao = ? WHERE origem = ? IF versao = ?", idempotent=False)
+        upsert = self._prepare("upsert", (
+            f"UPDATE {tabela} SET chave = ?, dia = ?, receita_centavos = ?, quantidade = ? "
+            "WHERE origem = ? AND item = ? AND dimensao = ?"
+        ), idempotent=False)
+        remove = self._prepare("remove", f"DELETE FROM {tabela} WHERE origem = ? AND item = ? AND dimensao = ?", idempotent=False)
+
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        batch.add(gate, (uuid1(), origem, versao))
+        for item, dimensao in removidas:
+            batch.add(remove, (origem, item, dimensao))
+        for item, linhas in itens.items():
+            for linha in linhas:
+                batch.add(upsert, (
+                    linha["chave"], linha["dia"], linha["receita_centavos"], linha["quantidade"], origem, item, linha["dimensao"],
+                ))
+        batch.is_idempotent = False
+        return connection.get_session().execute(batch).was_applied
+
+    def truncate(self) -> None:
+        session = connection.get_session()
+        for model in (VendasDia, VendaOrigem):
+            session.execute(f"TRUNCATE {model.column_family_name()}")
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        rows = list(rows)
+        written = insert_concurrently(VendaOrigem, rows, concurrency)
+        # Contadores não aceitam INSERT: a carga soma cada contador uma vez só, já agregado!
+        totais = {}
+        for row in rows:
+            total = totais.setdefault((row["dimensao"], row["dia"], row["chave"]), [0, 0])
+            total[0] += row["receita_centavos"]
+            total[1] += row["quantidade"]
+        self.incr([
+            {"dimensao": dimensao, "dia": dia, "chave": chave, "receita_centavos": receita, "quantidade": quantidade}
+            for (dimensao, dia, chave), (receita, quantidade) in totais.items()
+        ], concurrency)
+        return written
+
+
+class CassandraSerieDiariaRepository(SerieDiariaRepository):
+    def __init__(self, model, dia_key: str):
+        self.model = model
+        self.dia_key = dia_key
+        self._selects = {}
+
+    def save(self, row: dict, dia_anterior) -> None:
+        if dia_anterior is None or dia_anterior == row[self.dia_key]:
+            self.model.create(**row)
+            return
+        # Mudança de data: apaga do dia antigo e grava no novo num BATCH LOGGED (as duas ou nenhuma)!
+        with BatchQuery() as batch:
+            self.model.objects(**{self.dia_key: dia_anterior, "id": row["id"]}).batch(batch).delete()
+            self.model.batch(batch).create(**row)
+
+    def delete(self, id: UUID, dia) -> None:
+        if dia is not None:
+            self.model.objects(**{self.dia_key: dia, "id": id}).delete()
+
+    def _select_by_dia(self, columns: Optional[Sequence[str]]):
+        key = tuple(columns) if columns else None
+        statement = self._selects.get(key)
+        if statement is None:
+            select_list = ", ".join(columns) if columns else "*"
+            statement = connection.get_session().prepare(
+                f"SELECT {select_list} FROM {self.model.column_family_name()} WHERE {self.dia_key} = ?"
+            )
+            statement.is_idempotent = True
+            self._selects[key] = statement
+        return statement
+
+    def por_dias(self, dias: Sequence, columns: Optional[Sequence[str]] = None) -> List:
+        # Uma partição por dia, todas em voo; os resultados voltam na ordem dos dias e cada partição já vem
+        # ordenada por id, então juntar é só concatenar!
+        rows = []
+        for success, result in execute_concurrent_with_args(
+            connection.get_session(), self._select_by_dia(columns), [(dia,) for dia in dias],
+            concurrency=max(1, min(len(dias), 64)), execution_profile=EXEC_PROFILE_LEITURA,
+        ):
+            if not success:
+                raise result
+            rows.extend(construct(self.model, row, columns) for row in result)
+        return rows
+
+    def is_empty(self) -> bool:
+        return connection.get_session().execute(
+            f"SELECT id FROM {self.model.column_family_name()} LIMIT 1", execution_profile=EXEC_PROFILE_LEITURA
+        ).one() is None
+
+    def truncate(self) -> None:
+        connection.get_session().execute(f"TRUNCATE {self.model.column_family_name()}")
+
+    def batch_rows(self, rows: Iterable[dict]):
+        return [(self.model, row) for row in rows]
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        return insert_concurrently(self.model, rows, concurrency)
+
+
+class CassandraRepositories(Repositories):
+    def startup(self):
+        connect_to_cassandra()
+        for model in (
+            Autor, Editora, Livro, Usuario, Pedido, Pagamento, PedidoPagamento, PedidoLivro, VersaoTabela,
+            PedidoDetalhadoDoc, LivroPedido, PagamentoPedido, EditoraCatalogoDoc, TarefaOutbox, VendasDia,
+            VendaOrigem, PedidoDia, PagamentoDia,
+        ):
+            sync_table(model)
+        # Índice nas chaves do mapa de livros (o cqlengine só indexa valores): editora de um livro removido!
+        connection.get_session().execute(
+            f"CREATE INDEX IF NOT EXISTS ON {EditoraCatalogoDoc.column_family_name()} (KEYS(livros))"
+        )
+
+    def insert_batch(self, rows: Dict[str, List[dict]]) -> None:
+        # Um BATCH LOGGED só: ou todas as linhas (de várias partições) entram, ou nenhuma!
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        for name, items in rows.items():
+            for model, row in getattr(self, name).batch_rows(items):
+                statement, names = prepared_insert(model)
+                batch.add(statement, tuple(row.get(column) for column in names))
+        batch.is_idempotent = True
+        connection.get_session().execute(batch)
+        # Contadores não podem ir no mesmo batch: as versões das tabelas mudam em seguida!
+        for name in rows:
+            repository = getattr(self, name)
+            if isinstance(repository, CassandraEntityRepository):
+                repository._bump()
+
+
+def create_cassandra_repositories() -> Repositories:
+    return CassandraRepositories(
+        autores=CassandraEntityRepository(Autor),
+        editoras=CassandraEntityRepository(Editora),
+        livros=CassandraEntityRepository(Livro),
+        usuarios=CassandraEntityRepository(Usuario),
+        pedidos=CassandraEntityRepository(Pedido),
+        pagamentos=CassandraEntityRepository(Pagamento),
+        pedido_livro=CassandraLinkRepository(PedidoLivro, "livro_id"),
+        pedido_pagamento=CassandraLinkRepository(PedidoPagamento, "pagamento_id"),
+        pedido_detalhado=CassandraPedidoDetalhadoRepository(),
+        editora_catalogo=CassandraEditoraCatalogoRepository(),
+        outbox=CassandraOutboxRepository(),
+        vendas=CassandraVendasRepository(),
+        pedidos_por_dia=CassandraSerieDiariaRepository(PedidoDia, "data_pedido"),
+        pagamentos_por_dia=CassandraSerieDiariaRepository(PagamentoDia, "data_pagamento"),
+    )
@@ -0,0 +1,62 @@
+import os
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+# Identity map por requisição: get()/get_many() dos repositórios de entidades devolvem a linha já lida
+# na mesma requisição em vez de consultar de novo (ex.: o mesmo autor para cada livro dele). Vive numa
+# ContextVar aberta pelo IdentityMapMiddleware e some no fim da requisição; escritas descartam a linha!
+IDENTITY_MAP = os.getenv("IDENTITY_MAP", "on") != "off"
+
+# Ausência também é memoizada: um id inexistente não é procurado duas vezes!
+AUSENTE = object()
+
+
+class IdentityMap:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[Hashable, Tuple[Any, Optional[frozenset]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, columns: Optional[Sequence[str]]) -> Optional[Any]:
+        # Serve se a linha guardada tem todas as colunas pedidas (None = todas)!
+        with self._lock:
+            entry = self._rows.get(key)
+            if entry is not None:
+                row, stored = entry
+                if row is AUSENTE or stored is None or (columns is not None and stored.issuperset(columns)):
+                    self.hits += 1
+                    return row
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, row: Any, columns: Optional[Sequence[str]]):
+        with self._lock:
+            self._rows[key] = (row, frozenset(columns) if columns is not None else None)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._rows.pop(key, None)
+
+
+_current: ContextVar[Optional[IdentityMap]] = ContextVar("identity_map", default=None)
+
+
+def current() -> Optional[IdentityMap]:
+    return _current.get()
+
+
+def start() -> Tuple[IdentityMap, object]:
+    identity_map = IdentityMap()
+    return identity_map, _current.set(identity_map)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def discard(key: Hashable):
+    identity_map = _current.get()
+    if identity_map is not None:
+        identity_map.discard(key)
@@ -0,0 +1,744 @@
+import hashlib
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid1
+from app import metrics
+from app.database import policies, query_tracker
+from app.models.models import (
+    Autor, Editora, Livro, Usuario, Pedido, Pagamento, PedidoLivro, PedidoPagamento, PedidoDetalhadoDoc,
+    EditoraCatalogoDoc, PedidoDia, PagamentoDia,
+)
+from app.repositories.base import (
+    EditoraCatalogoRepository, EntityRepository, LinkRepository, OutboxRepository, PedidoDetalhadoRepository,
+    Repositories, Row, SerieDiariaRepository, VendasRepository,
+)
+
+
+class SimulatedLatency:
+    # Latência artificial por operação: base + jitter uniforme + cauda ocasional (ex.: pausa de GC)!
+    def __init__(self, base_ms=0.0, jitter_ms=0.0, tail_ms=0.0, tail_probability=0.0, seed=None):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self.tail_ms = tail_ms
+        self.tail_probability = tail_probability
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "SimulatedLatency":
+        seed = os.getenv("MEMORY_LATENCY_SEED")
+        return cls(
+            base_ms=float(os.getenv("MEMORY_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("MEMORY_LATENCY_JITTER_MS", "0")),
+            tail_ms=float(os.getenv("MEMORY_TAIL_LATENCY_MS", "0")),
+            tail_probability=float(os.getenv("MEMORY_TAIL_PROBABILITY", "0")),
+            seed=int(seed) if seed is not None else None,
+        )
+
+    def sample_ms(self) -> float:
+        delay = self.base_ms
+        if self.jitter_ms:
+            delay += self._random.uniform(0, self.jitter_ms)
+        if self.tail_probability and self._random.random() < self.tail_probability:
+            delay += self.tail_ms
+        return delay
+
+    def wait(self, statement: str):
+        started = time.perf_counter()
+        delay = self.sample_ms()
+        if delay > 0:
+            time.sleep(delay / 1000)
+        query_tracker.record_query(statement, (time.perf_counter() - started) * 1000)
+
+    def wait_speculative(self, statement: str, delay_ms: float, max_attempts: int):
+        # Simula a ConstantSpeculativeExecutionPolicy: a cada delay_ms sem resposta sai mais uma tentativa
+        # (com latência própria) e vale a primeira que responder!
+        started = time.perf_counter()
+        fastest = self.sample_ms()
+        for attempt in range(1, max_attempts + 1):
+            sent_at = attempt * delay_ms
+            if sent_at >= fastest:
+                break
+            metrics.incr("cassandra.speculative", "executions")
+            fastest = min(fastest, sent_at + self.sample_ms())
+        if fastest > 0:
+            time.sleep(fastest / 1000)
+        query_tracker.record_query(statement, (time.perf_counter() - started) * 1000)
+
+
+class MemoryTable:
+    # Linhas por chave primária + índices secundários nas colunas com index=True do model!
+    def __init__(self, model, latency: SimulatedLatency):
+        self.model = model
+        self.name = model.column_family_name(include_keyspace=False)
+        self.columns = list(model._columns.keys())
+        self.indexed = [name for name, column in model._columns.items() if column.index]
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.rows: Dict = {}
+        self.indexes: Dict[str, Dict] = {name: {} for name in self.indexed}
+        self.version = 0
+
+    def wait(self, statement: str):
+        self.latency.wait(statement.format(table=self.name))
+
+    def defaults(self, data: dict) -> dict:
+        row = {}
+        for name, column in self.model._columns.items():
+            if data.get(name) is not None:
+                row[name] = data[name]
+            elif column.has_default:
+                row[name] = column.get_default()
+            else:
+                row[name] = None
+        return row
+
+    def put(self, key, row: dict):
+        with self.lock:
+            self.remove(key)
+            self.version += 1
+            self.rows[key] = row
+            for name in self.indexed:
+                self.indexes[name].setdefault(row[name], set()).add(key)
+
+    def remove(self, key):
+        with self.lock:
+            old = self.rows.pop(key, None)
+            if old is None:
+                return None
+            self.version += 1
+            for name in self.indexed:
+                keys = self.indexes[name].get(old[name])
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.indexes[name][old[name]]
+            return old
+
+    def select(self, filters: dict) -> List[dict]:
+        with self.lock:
+            candidates = None
+            for name, value in filters.items():
+                if name in self.indexes:
+                    keys = self.indexes[name].get(value, set())
+                    candidates = keys if candidates is None else candidates & keys
+            rows = self.rows.values() if candidates is None else (self.rows[k] for k in candidates)
+            return [
+                dict(row) for row in rows
+                if all(row.get(name) == value for name, value in filters.items())
+            ]
+
+
+def _token(id: UUID) -> int:
+    # Dublê do token Murmur3 do particionador: um hash estável de 64 bits com sinal!
+    return int.from_bytes(hashlib.blake2b(id.bytes, digest_size=8).digest(), "big", signed=True)
+
+
+def _project(row: dict, columns: Optional[Sequence[str]]) -> Row:
+    if columns is None:
+        return Row(**row)
+    return Row(**{name: row[name] for name in columns})
+
+
+def _select_list(columns: Optional[Sequence[str]]) -> str:
+    return ", ".join(columns) if columns else "*"
+
+
+class MemoryEntityRepository(EntityRepository):
+    def __init__(self, model, latency: SimulatedLatency):
+        self.model = model
+        self.table = MemoryTable(model, latency)
+
+    def _get(self, id: UUID, columns: Optional[Sequence[str]] = None):
+        statement = f"SELECT {_select_list(columns)} FROM {self.table.name} WHERE id = ?"
+        if policies.CASSANDRA_SPECULATIVE_MAX > 0:
+            # Leitura por chave idempotente, como no perfil "leitura" do Cassandra!
+            metrics.incr("cassandra.speculative", "eligible")
+            self.table.latency.wait_speculative(
+                statement, policies.CASSANDRA_SPECULATIVE_DELAY_MS, policies.CASSANDRA_SPECULATIVE_MAX
+            )
+        else:
+            self.table.latency.wait(statement)
+        with self.table.lock:
+            row = self.table.rows.get(id)
+            if row is None:
+                raise self.model.DoesNotExist(f"{self.model.__name__} {id} não encontrado!")
+            projected = _project(row, columns)
+        self._remember(projected)
+        return projected
+
+    def _get_many(self, ids: Sequence[UUID], columns: Optional[Sequence[str]] = None) -> List:
+        # As leituras por chave vão em paralelo: custa uma ida e volta, não uma por id!
+        self.table.wait(f"SELECT {_select_list(columns)} FROM {{table}} WHERE id = ? (x{len(ids)})")
+        with self.table.lock:
+            rows = [_project(self.table.rows[id], columns) for id in ids if id in self.table.rows]
+        for row in rows:
+            self._remember(row)
+        return rows
+
+    def list_all(self, columns: Optional[Sequence[str]] = None) -> List:
+        self.table.wait(f"SELECT {_select_list(columns)} FROM {{table}}")
+        with self.table.lock:
+            return [_project(row, columns) for row in self.table.rows.values()]
+
+    def find_by(self, columns: Optional[Sequence[str]] = None, **filters) -> List:
+        where = " AND ".join(f"{name} = ?" for name in filters)
+        self.table.wait(f"SELECT {_select_list(columns)} FROM {{table}} WHERE {where}")
+        return [_project(row, columns) for row in self.table.select(filters)]
+
+    def count(self) -> int:
+        self.table.wait("SELECT COUNT(*) FROM {table}")
+        return len(self.table.rows)
+
+    def create(self, **data):
+        self.table.wait("INSERT INTO {table} JSON ?")
+        row = self.table.defaults(data)
+        self.table.put(row["id"], row)
+        self._bump()
+        created = Row(**row)
+        self._remember(created)
+        return created
+
+    def _write_by_id(self, statement: str, id: UUID, columns: Optional[Sequence[str]] = None) -> Tuple[bool, Any]:
+        # Mesmas checagens do Cassandra (WRITE_EXISTENCE_CHECK); retorna se a ausência da linha é erro e a
+        # linha lida pela checagem "read" (None nos outros modos)!
+        mode = policies.WRITE_EXISTENCE_CHECK
+        stored = self.get(id, columns=columns) if mode == "read" else None
+        self.table.wait(f"{statement} IF EXISTS" if mode == "lwt" else statement)
+        return mode != "blind", stored
+
+    def update(self, id: UUID, **data):
+        strict, lida = self._write_by_id("UPDATE {table} SET ... WHERE id = ?", id)
+        self._evict(id)
+        data = {**data, "versao": uuid1()}
+        with self.table.lock:
+            stored = self.table.rows.get(id)
+            if stored is None and strict:
+                raise self.model.DoesNotExist(f"{self.model.__name__} {id} não encontrado!")
+            # UPDATE no Cassandra é upsert: sem checagem, um id inexistente vira uma linha só com essas colunas!
+            stored = dict(stored) if stored is not None else self.table.defaults({"id": id})
+            stored.update(data)
+            self.table.put(id, stored)
+        self._bump()
+        row = self._updated_row(id, data, lida)
+        self._remember(row)
+        return row
+
+    def delete(self, id: UUID) -> None:
+        strict, _ = self._write_by_id("DELETE FROM {table} WHERE id = ?", id, columns=["id"])
+        if self.table.remove(id) is None and strict:
+            raise self.model.DoesNotExist(f"{self.model.__name__} {id} não encontrado!")
+        self._bump()
+        self._forget(id)
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        written = 0
+        with self.table.lock:
+            for row in rows:
+                self.table.put(row["id"], self.table.defaults(row))
+                written += 1
+        return written
+
+    def table_version(self) -> int:
+        self.table.wait("SELECT versao FROM versao_tabela WHERE tabela = ?")
+        return self.table.version
+
+    def _bump(self):
+        # A versão em memória já muda em put/remove; só simula a escrita no contador!
+        self.table.wait("UPDATE versao_tabela SET versao = versao + 1 WHERE tabela = ?")
+
+
+class MemoryLinkRepository(LinkRepository):
+    def __init__(self, model, child_key: str, latency: SimulatedLatency):
+        self.model = model
+        self.child_key = child_key
+        self.table = MemoryTable(model, latency)
+        self.partitions: Dict[UUID, Dict[UUID, dict]] = {}
+
+    def list_by_pedido(self, pedido_id: UUID) -> List:
+        self.table.wait("SELECT * FROM {table} WHERE pedido_id = ?")
+        with self.table.lock:
+            partition = self.partitions.get(pedido_id, {})
+            return [Row(**partition[child]) for child in sorted(partition)]
+
+    def list_by_pedidos(self, pedido_ids: Sequence[UUID]) -> List:
+        self.table.wait(f"SELECT * FROM {{table}} WHERE pedido_id = ? (x{len(pedido_ids)})")
+        with self.table.lock:
+            partitions = [self.partitions.get(pedido_id, {}) for pedido_id in pedido_ids]
+            return [Row(**partition[child]) for partition in partitions for child in sorted(partition)]
+
+    def exists(self, pedido_id: UUID, child_id: UUID) -> bool:
+        self.table.wait(f"SELECT * FROM {{table}} WHERE pedido_id = ? AND {self.child_key} = ?")
+        with self.table.lock:
+            return child_id in self.partitions.get(pedido_id, {})
+
+    def link(self, pedido_id: UUID, child_id: UUID):
+        self.table.wait("INSERT INTO {table} JSON ?")
+        row = {"pedido_id": pedido_id, self.child_key: child_id}
+        with self.table.lock:
+            self.partitions.setdefault(pedido_id, {})[child_id] = row
+        return Row(**row)
+
+    def unlink(self, pedido_id: UUID, child_id: UUID) -> None:
+        self.table.wait(f"DELETE FROM {{table}} WHERE pedido_id = ? AND {self.child_key} = ?")
+        with self.table.lock:
+            partition = self.partitions.get(pedido_id, {})
+            if partition.pop(child_id, None) is None:
+                raise self.model.DoesNotExist("Relação não encontrada!")
+            if not partition:
+                del self.partitions[pedido_id]
+
+    def delete_by_pedido(self, pedido_id: UUID) -> None:
+        self.table.wait("DELETE FROM {table} WHERE pedido_id = ?")
+        with self.table.lock:
+            self.partitions.pop(pedido_id, None)
+
+    def pedidos_com(self, child_id: UUID) -> List[UUID]:
+        self.table.wait(f"SELECT pedido_id FROM {{table}} WHERE {self.child_key} = ?")
+        with self.table.lock:
+            return sorted(pedido_id for pedido_id, partition in self.partitions.items() if child_id in partition)
+
+    def scan(self, splits: int = 16) -> List:
+        self.table.wait(f"SELECT * FROM {{table}} WHERE token(pedido_id) > ? AND token(pedido_id) <= ? (x{splits})")
+        with self.table.lock:
+            return [Row(**row) for partition in self.partitions.values() for row in partition.values()]
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        written = 0
+        with self.table.lock:
+            for row in rows:
+                self.partitions.setdefault(row["pedido_id"], {})[row[self.child_key]] = dict(row)
+                written += 1
+        return written
+
+
+class MemoryPedidoDetalhadoRepository(PedidoDetalhadoRepository):
+    model = PedidoDetalhadoDoc
+
+    def __init__(self, latency: SimulatedLatency):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.partitions: Dict[UUID, Dict[UUID, dict]] = {}
+        self.livro_pedido: Dict[UUID, Dict[UUID, UUID]] = {}
+        self.pagamento_pedido: Dict[UUID, Dict[UUID, UUID]] = {}
+
+    @staticmethod
+    def _row(doc: dict) -> Row:
+        return Row(**{**doc, "livros": dict(sorted(doc["livros"].items())),
+                      "pagamentos": dict(sorted(doc["pagamentos"].items()))})
+
+    def _doc(self, usuario_id: UUID, pedido_id: UUID) -> dict:
+        # UPDATE em linha inexistente cria a linha, como no Cassandra!
+        partition = self.partitions.setdefault(usuario_id, {})
+        return partition.setdefault(pedido_id, {
+            "usuario_id": usuario_id, "pedido_id": pedido_id, "data_pedido": None, "livros": {}, "pagamentos": {},
+        })
+
+    def list_by_usuario(self, usuario_id: UUID) -> List:
+        self.latency.wait("SELECT * FROM pedido_detalhado WHERE usuario_id = ?")
+        with self.lock:
+            partition = self.partitions.get(usuario_id, {})
+            return [self._row(partition[pedido_id]) for pedido_id in sorted(partition)]
+
+    def get(self, usuario_id: UUID, pedido_id: UUID):
+        self.latency.wait("SELECT * FROM pedido_detalhado WHERE usuario_id = ? AND pedido_id = ?")
+        with self.lock:
+            doc = self.partitions.get(usuario_id, {}).get(pedido_id)
+            if doc is None:
+                raise PedidoDetalhadoDoc.DoesNotExist(f"Pedido detalhado {pedido_id} não encontrado!")
+            return self._row(doc)
+
+    def save(self, usuario_id, pedido_id, data_pedido, livros=(), pagamentos=()) -> None:
+        self.latency.wait("INSERT INTO pedido_detalhado JSON ?")
+        with self.lock:
+            self.partitions.setdefault(usuario_id, {})[pedido_id] = {
+                "usuario_id": usuario_id,
+                "pedido_id": pedido_id,
+                "data_pedido": data_pedido,
+                "livros": {livro["id"]: Row(**livro) for livro in livros},
+                "pagamentos": {pagamento["id"]: Row(**pagamento) for pagamento in pagamentos},
+            }
+            for livro in livros:
+                self.livro_pedido.setdefault(livro["id"], {})[pedido_id] = usuario_id
+            for pagamento in pagamentos:
+                self.pagamento_pedido.setdefault(pagamento["id"], {})[pedido_id] = usuario_id
+
+    def set_data_pedido(self, usuario_id, pedido_id, data_pedido) -> None:
+        self.latency.wait("UPDATE pedido_detalhado SET data_pedido = ? WHERE usuario_id = ? AND pedido_id = ?")
+        with self.lock:
+            self._doc(usuario_id, pedido_id)["data_pedido"] = data_pedido
+
+    def put_livro(self, usuario_id, pedido_id, livro: dict) -> None:
+        self.latency.wait("UPDATE pedido_detalhado SET livros = livros + ? WHERE usuario_id = ? AND pedido_id = ?")
+        self.latency.wait("INSERT INTO livro_pedido JSON ?")
+        with self.lock:
+            self._doc(usuario_id, pedido_id)["livros"][livro["id"]] = Row(**livro)
+            self.livro_pedido.setdefault(livro["id"], {})[pedido_id] = usuario_id
+
+    def remove_livro(self, usuario_id, pedido_id, livro_id) -> None:
+        self.latency.wait("UPDATE pedido_detalhado SET livros = livros - ? WHERE usuario_id = ? AND pedido_id = ?")
+        self.latency.wait("DELETE FROM livro_pedido WHERE livro_id = ? AND pedido_id = ?")
+        with self.lock:
+            self._doc(usuario_id, pedido_id)["livros"].pop(livro_id, None)
+            self._unindex(self.livro_pedido, livro_id, pedido_id)
+
+    def put_pagamento(self, usuario_id, pedido_id, pagamento: dict) -> None:
+        self.latency.wait("UPDATE pedido_detalhado SET pagamentos = pagamentos + ? WHERE usuario_id = ? AND pedido_id = ?")
+        self.latency.wait("INSERT INTO pagamento_pedido JSON ?")
+        with self.lock:
+            self._doc(usuario_id, pedido_id)["pagamentos"][pagamento["id"]] = Row(**pagamento)
+            self.pagamento_pedido.setdefault(pagamento["id"], {})[pedido_id] = usuario_id
+
+    def remove_pagamento(self, usuario_id, pedido_id, pagamento_id) -> None:
+        self.latency.wait("UPDATE pedido_detalhado SET pagamentos = pagamentos - ? WHERE usuario_id = ? AND pedido_id = ?")
+        self.latency.wait("DELETE FROM pagamento_pedido WHERE pagamento_id = ? AND pedido_id = ?")
+        with self.lock:
+            self._doc(usuario_id, pedido_id)["pagamentos"].pop(pagamento_id, None)
+            self._unindex(self.pagamento_pedido, pagamento_id, pedido_id)
+
+    def delete(self, usuario_id, pedido_id) -> None:
+        self.latency.wait("DELETE FROM pedido_detalhado WHERE usuario_id = ? AND pedido_id = ?")
+        with self.lock:
+            doc = self.partitions.get(usuario_id, {}).pop(pedido_id, None)
+            if doc is None:
+                return
+            for livro_id in doc["livros"]:
+                self._unindex(self.livro_pedido, livro_id, pedido_id)
+            for pagamento_id in doc["pagamentos"]:
+                self._unindex(self.pagamento_pedido, pagamento_id, pedido_id)
+
+    @staticmethod
+    def _unindex(index: Dict[UUID, Dict[UUID, UUID]], item_id: UUID, pedido_id: UUID):
+        pedidos = index.get(item_id)
+        if pedidos is not None:
+            pedidos.pop(pedido_id, None)
+            if not pedidos:
+                del index[item_id]
+
+    def pedidos_com_livro(self, livro_id: UUID) -> List[Tuple[UUID, UUID]]:
+        self.latency.wait("SELECT * FROM livro_pedido WHERE livro_id = ?")
+        with self.lock:
+            return [(u, p) for p, u in sorted(self.livro_pedido.get(livro_id, {}).items())]
+
+    def pedidos_com_pagamento(self, pagamento_id: UUID) -> List[Tuple[UUID, UUID]]:
+        self.latency.wait("SELECT * FROM pagamento_pedido WHERE pagamento_id = ?")
+        with self.lock:
+            return [(u, p) for p, u in sorted(self.pagamento_pedido.get(pagamento_id, {}).items())]
+
+    def usuario_do_pedido(self, pedido_id: UUID) -> Optional[UUID]:
+        self.latency.wait("SELECT usuario_id FROM pedido_detalhado WHERE pedido_id = ?")
+        with self.lock:
+            return next((usuario_id for usuario_id, partition in self.partitions.items() if pedido_id in partition), None)
+
+    def insert_many(self, documents: Iterable[dict], concurrency: int = 128) -> int:
+        written = 0
+        with self.lock:
+            for doc in documents:
+                self.partitions.setdefault(doc["usuario_id"], {})[doc["pedido_id"]] = {
+                    **doc,
+                    "livros": {livro["id"]: Row(**livro) for livro in doc["livros"]},
+                    "pagamentos": {pagamento["id"]: Row(**pagamento) for pagamento in doc["pagamentos"]},
+                }
+                for livro in doc["livros"]:
+                    self.livro_pedido.setdefault(livro["id"], {})[doc["pedido_id"]] = doc["usuario_id"]
+                for pagamento in doc["pagamentos"]:
+                    self.pagamento_pedido.setdefault(pagamento["id"], {})[doc["pedido_id"]] = doc["usuario_id"]
+                written += 1
+        return written
+
+
+class MemoryEditoraCatalogoRepository(EditoraCatalogoRepository):
+    model = EditoraCatalogoDoc
+    campos_editora = ("nome", "endereco", "telefone", "email")
+
+    def __init__(self, latency: SimulatedLatency):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.docs: Dict[UUID, dict] = {}
+
+    def _doc(self, editora_id: UUID) -> dict:
+        # UPDATE em linha inexistente cria a linha, como no Cassandra!
+        return self.docs.setdefault(editora_id, {
+            "editora_id": editora_id, **{campo: None for campo in self.campos_editora}, "livros": {},
+        })
+
+    @staticmethod
+    def _row(doc: dict) -> Row:
+        return Row(**{**doc, "livros": dict(sorted(doc["livros"].items()))})
+
+    def _em_ordem(self) -> List[dict]:
+        # Ordem de token, como no Cassandra: estável e independente da ordem de inserção!
+        return [self.docs[id] for id in sorted(self.docs, key=_token)]
+
+    def page(self, offset: int, limit: int) -> List:
+        self.latency.wait("SELECT * FROM editora_catalogo LIMIT ?")
+        with self.lock:
+            return [self._row(doc) for doc in itertools.islice(self._em_ordem(), offset, offset + limit)]
+
+    def page_after(self, editora_id: Optional[UUID], limit: int) -> List:
+        self.latency.wait("SELECT * FROM editora_catalogo WHERE token(editora_id) > token(?) LIMIT ?")
+        with self.lock:
+            docs = self._em_ordem()
+            if editora_id is not None:
+                # O cursor pode ser de uma editora já removida: compara tokens, não posições!
+                docs = [doc for doc in docs if _token(doc["editora_id"]) > _token(editora_id)]
+            return [self._row(doc) for doc in docs[:limit]]
+
+    def save(self, editora: dict, livros=()) -> None:
+        self.latency.wait("INSERT INTO editora_catalogo JSON ?")
+        with self.lock:
+            self.docs[editora["id"]] = {
+                "editora_id": editora["id"],
+                **{campo: editora.get(campo) for campo in self.campos_editora},
+                "livros": {livro["id"]: Row(**livro) for livro in livros},
+            }
+
+    def set_editora(self, editora: dict) -> None:
+        self.latency.wait("UPDATE editora_catalogo SET nome = ?, endereco = ?, telefone = ?, email = ? WHERE editora_id = ?")
+        with self.lock:
+            self._doc(editora["id"]).update({campo: editora[campo] for campo in self.campos_editora if campo in editora})
+
+    def put_livro(self, editora_id, livro: dict) -> None:
+        self.latency.wait("UPDATE editora_catalogo SET livros = livros + ? WHERE editora_id = ?")
+        with self.lock:
+            self._doc(editora_id)["livros"][livro["id"]] = Row(**livro)
+
+    def remove_livro(self, editora_id, livro_id) -> None:
+        self.latency.wait("UPDATE editora_catalogo SET livros = livros - ? WHERE editora_id = ?")
+        with self.lock:
+            self._doc(editora_id)["livros"].pop(livro_id, None)
+
+    def delete(self, editora_id) -> None:
+        self.latency.wait("DELETE FROM editora_catalogo WHERE editora_id = ?")
+        with self.lock:
+            self.docs.pop(editora_id, None)
+
+    def editora_do_livro(self, livro_id: UUID) -> Optional[UUID]:
+        self.latency.wait("SELECT editora_id FROM editora_catalogo WHERE livros CONTAINS KEY ?")
+        with self.lock:
+            return next((editora_id for editora_id, doc in self.docs.items() if livro_id in doc["livros"]), None)
+
+    def insert_many(self, documents: Iterable[dict], concurrency: int = 128) -> int:
+        written = 0
+        with self.lock:
+            for doc in documents:
+                self.docs[doc["editora_id"]] = {
+                    **doc, "livros": {livro["id"]: Row(**livro) for livro in doc["livros"]},
+                }
+                written += 1
+        return written
+
+
+class MemoryOutboxRepository(OutboxRepository):
+    def __init__(self, latency: SimulatedLatency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.tarefas: Dict[Tuple[int, UUID], dict] = {}
+
+    def add(self, tarefa: dict) -> None:
+        self.latency.wait("INSERT INTO outbox JSON ?")
+        with self.lock:
+            self.tarefas[(tarefa["particao"], tarefa["id"])] = dict(tarefa)
+
+    def pending(self, partitions: int) -> List:
+        for _ in range(partitions):
+            self.latency.wait("SELECT * FROM outbox WHERE particao = ?")
+        with self.lock:
+            rows = [Row(**tarefa) for tarefa in self.tarefas.values()]
+        rows.sort(key=lambda row: row.id.time)
+        return rows
+
+    def claim(self, tarefas: Sequence[dict], dono: UUID, prazo) -> List[dict]:
+        tomadas = []
+        for tarefa in tarefas:
+            self.latency.wait("UPDATE outbox SET dono = ?, prazo = ? WHERE particao = ? AND id = ? IF prazo = ?")
+            with self.lock:
+                gravada = self.tarefas.get((tarefa["particao"], tarefa["id"]))
+                if gravada is None or gravada.get("prazo") != tarefa["prazo"]:
+                    continue
+                gravada.update(dono=dono, prazo=prazo)
+            tomadas.append(tarefa)
+        return tomadas
+
+    def remove(self, keys: Sequence[Tuple[int, UUID]]) -> None:
+        for _ in {particao for particao, _ in keys}:
+            self.latency.wait("BEGIN UNLOGGED BATCH DELETE FROM outbox ... APPLY BATCH")
+        with self.lock:
+            for key in keys:
+                self.tarefas.pop(key, None)
+
+
+class MemoryVendasRepository(VendasRepository):
+    def __init__(self, latency: SimulatedLatency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        # (dimensao, dia) -> chave -> [receita_centavos, quantidade]
+        self.contadores: Dict[Tuple[str, object], Dict[str, List[int]]] = {}
+        # origem -> (item, dimensao) -> linha
+        self.registro: Dict[UUID, Dict[Tuple[str, str], dict]] = {}
+        # origem -> versao (a coluna estática do Cassandra)
+        self.versoes: Dict[UUID, UUID] = {}
+
+    def _somar(self, linha: dict):
+        contador = self.contadores.setdefault((linha["dimensao"], linha["dia"]), {}).setdefault(linha["chave"], [0, 0])
+        contador[0] += linha["receita_centavos"]
+        contador[1] += linha["quantidade"]
+
+    def incr(self, linhas: Sequence[dict]) -> None:
+        if not linhas:
+            return
+        self.latency.wait(f"UPDATE vendas SET receita_centavos = receita_centavos + ?, quantidade = quantidade + ? WHERE ... (x{len(linhas)})")
+        with self.lock:
+            for linha in linhas:
+                self._somar(linha)
+
+    def por_dias(self, dimensao: str, dias: Sequence, chave: Optional[str] = None) -> List:
+        filtro = " AND chave = ?" if chave is not None else ""
+        self.latency.wait(f"SELECT * FROM vendas WHERE dimensao = ? AND dia = ?{filtro} (x{len(dias)})")
+        with self.lock:
+            return [
+                Row(dia=dia, chave=k, receita_centavos=contador[0], quantidade=contador[1])
+                for dia in dias
+                for k, contador in sorted(self.contadores.get((dimensao, dia), {}).items())
+                if chave is None or k == chave
+            ]
+
+    def contribuicoes(self, origem: UUID) -> List:
+        self.latency.wait("SELECT * FROM vendas_origem WHERE origem = ?")
+        with self.lock:
+            versao = self.versoes.get(origem)
+            linhas = [Row(**linha, versao=versao) for _, linha in sorted(self.registro.get(origem, {}).items())]
+            # Como no Cassandra: partição só com a coluna estática volta como uma linha sem chave de clustering!
+            if not linhas and versao is not None:
+                linhas = [Row(origem=origem, item=None, dimensao=None, versao=versao)]
+            return linhas
+
+    def registrar(
+        self, origem: UUID, versao: Optional[UUID], itens: Dict[str, Sequence[dict]], removidas: Sequence[Tuple[str, str]],
+    ) -> bool:
+        self.latency.wait("BEGIN BATCH UPDATE vendas_origem ... IF versao = ? APPLY BATCH")
+        with self.lock:
+            if self.versoes.get(origem) != versao:
+                return False
+            self.versoes[origem] = uuid1()
+            partition = self.registro.setdefault(origem, {})
+            for key in removidas:
+                partition.pop(tuple(key), None)
+            for item, linhas in itens.items():
+                for linha in linhas:
+                    partition[(item, linha["dimensao"])] = {**linha, "origem": origem, "item": item}
+            if not partition:
+                del self.registro[origem]
+            return True
+
+    def truncate(self) -> None:
+        self.latency.wait("TRUNCATE vendas")
+        self.latency.wait("TRUNCATE vendas_origem")
+        with self.lock:
+            self.contadores.clear()
+            self.registro.clear()
+            self.versoes.clear()
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        written = 0
+        with self.lock:
+            for row in rows:
+                self.registro.setdefault(row["origem"], {})[(row["item"], row["dimensao"])] = dict(row)
+                self._somar(row)
+                written += 1
+        return written
+
+
+class MemorySerieDiariaRepository(SerieDiariaRepository):
+    def __init__(self, model, dia_key: str, latency: SimulatedLatency):
+        self.model = model
+        self.dia_key = dia_key
+        self.table = MemoryTable(model, latency)
+        # dia -> id -> linha
+        self.partitions: Dict[object, Dict[UUID, dict]] = {}
+
+    def _remove(self, id: UUID, dia):
+        partition = self.partitions.get(dia, {})
+        partition.pop(id, None)
+        if not partition:
+            self.partitions.pop(dia, None)
+
+    def _put(self, row: dict):
+        self.partitions.setdefault(row[self.dia_key], {})[row["id"]] = self.table.defaults(row)
+
+    def save(self, row: dict, dia_anterior) -> None:
+        with self.table.lock:
+            if dia_anterior is not None and dia_anterior != row[self.dia_key]:
+                self.table.wait("BEGIN BATCH DELETE ... INSERT ... APPLY BATCH")
+                self._remove(row["id"], dia_anterior)
+            else:
+                self.table.wait("INSERT INTO {table} JSON ?")
+            self._put(row)
+
+    def delete(self, id: UUID, dia) -> None:
+        if dia is None:
+            return
+        self.table.wait("DELETE FROM {table} WHERE " + self.dia_key + " = ? AND id = ?")
+        with self.table.lock:
+            self._remove(id, dia)
+
+    def por_dias(self, dias: Sequence, columns: Optional[Sequence[str]] = None) -> List:
+        self.table.wait(f"SELECT {_select_list(columns)} FROM {{table}} WHERE {self.dia_key} = ? (x{len(dias)})")
+        with self.table.lock:
+            return [
+                _project(partition[id], columns)
+                for partition in (self.partitions.get(dia, {}) for dia in dias)
+                for id in sorted(partition)
+            ]
+
+    def is_empty(self) -> bool:
+        self.table.wait("SELECT id FROM {table} LIMIT 1")
+        with self.table.lock:
+            return not self.partitions
+
+    def truncate(self) -> None:
+        self.table.wait("TRUNCATE {table}")
+        with self.table.lock:
+            self.partitions.clear()
+
+    def insert_many(self, rows: Iterable[dict], concurrency: int = 128) -> int:
+        written = 0
+        with self.table.lock:
+            for row in rows:
+                self._put(row)
+                written += 1
+        return written
+
+
+class MemoryRepositories(Repositories):
+    def insert_batch(self, rows: Dict[str, List[dict]]) -> None:
+        # Simula o BATCH LOGGED do Cassandra: uma requisição só para todas as linhas!
+        self.autores.table.latency.wait("BEGIN BATCH INSERT ... APPLY BATCH")
+        super().insert_batch(rows)
+        for name in rows:
+            repository = getattr(self, name)
+            if isinstance(repository, MemoryEntityRepository):
+                repository._bump()
+
+
+def create_memory_repositories(latency: SimulatedLatency = None) -> Repositories:
+    latency = latency or SimulatedLatency.from_env()
+    return MemoryRepositories(
+        autores=MemoryEntityRepository(Autor, latency),
+        editoras=MemoryEntityRepository(Editora, latency),
+        livros=MemoryEntityRepository(Livro, latency),
+        usuarios=MemoryEntityRepository(Usuario, latency),
+        pedidos=MemoryEntityRepository(Pedido, latency),
+        pagamentos=MemoryEntityRepository(Pagamento, latency),
+        pedido_livro=MemoryLinkRepository(PedidoLivro, "livro_id", latency),
+        pedido_pagamento=MemoryLinkRepository(PedidoPagamento, "pagamento_id", latency),
+        pedido_detalhado=MemoryPedidoDetalhadoRepository(latency),
+        editora_catalogo=MemoryEditoraCatalogoRepository(latency),
+        outbox=MemoryOutboxRepository(latency),
+        vendas=MemoryVendasRepository(latency),
+        pedidos_por_dia=MemorySerieDiariaRepository(PedidoDia, "data_pedido", latency),
+        pagamentos_por_dia=MemorySerieDiariaRepository(PagamentoDia, "data_pagamento", latency),
+    )
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Por quanto tempo (s) a versão de uma linha lida/escrita neste processo é usada para responder 304
+# sem ir ao banco. Com vários workers, uma escrita feita em outro processo pode levar até esse tempo
+# para ser percebida (0 desliga o cache)!
+ETAG_VERSION_TTL = float(os.getenv("ETAG_VERSION_TTL", "5"))
+ETAG_VERSION_MAX_ENTRIES = int(os.getenv("ETAG_VERSION_MAX_ENTRIES", "100000"))
+
+
+class VersionCache:
+    def __init__(self, ttl: float = ETAG_VERSION_TTL, max_entries: int = ETAG_VERSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            version, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            return version
+
+    def put(self, key: Hashable, version: Any):
+        if self.ttl <= 0 or version is None:
+            return
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+row_versions = VersionCache()
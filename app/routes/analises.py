@@ -0,0 +1,231 @@
+import math
+import os
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+from app import analytics
+from app.analytics import aggregations, columnar, export
+from app.analytics.columnar import Snapshot
+from app.logs.logger import get_logger
+from app.repositories import get_repositories
+from app.schemas.schemas import AnaliseAgrupada, AnaliseTopK, ArquivoSnapshot
+from app.serialization.responses import render, render_list
+
+logger = get_logger("MyBooks.analises")
+router = APIRouter(prefix="/analises", tags=["Análises"])
+
+# Análises ad hoc sobre snapshots colunares em memória (ver app/analytics): agregações vetorizadas com
+# NumPy em vez de laços por linha. Os números refletem o snapshot, cuja idade vai na resposta!
+
+
+def _snapshot(tabela: str, atualizar: bool) -> Snapshot:
+    if not analytics.available():
+        raise HTTPException(status_code=503, detail="Análises indisponíveis: instale o pacote numpy!")
+    return analytics.get_snapshot(tabela, refresh=atualizar)
+
+
+def _info(snapshot: Snapshot) -> dict:
+    return {
+        "tabela": snapshot.table, "linhas": snapshot.rows,
+        "idade_s": round(snapshot.age_s, 3), "duracao_ms": round(snapshot.build_ms, 1),
+    }
+
+
+def _percentis(percentis: str) -> List[float]:
+    try:
+        qs = [float(q) for q in percentis.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentis deve ser uma lista de números separados por vírgula!")
+    if not qs or any(not 0 <= q <= 100 for q in qs):
+        raise HTTPException(status_code=400, detail="Percentis devem estar entre 0 e 100!")
+    return qs
+
+
+def _num(value) -> Optional[float]:
+    if value is None:
+        return None
+    value = float(value)
+    return round(value, 4) if math.isfinite(value) else None
+
+
+def _nomes_percentis(qs: List[float]) -> List[str]:
+    return [f"p{q:g}" for q in qs]
+
+
+def _grupos(snapshot: Snapshot, coluna: str, codes, values, qs: List[float]) -> List[dict]:
+    # Uma linha por valor do dicionário da coluna, com estatísticas e percentis calculados de uma vez!
+    groups = len(snapshot.dictionaries[coluna])
+    stats = aggregations.group_stats(codes, values, groups)
+    tabela = aggregations.group_percentiles(codes, values, groups, qs) if qs else None
+    grupos = []
+    for code in range(groups):
+        if not stats["count"][code]:
+            continue
+        grupos.append({
+            "chave": snapshot.decode(coluna, code),
+            "quantidade": int(stats["count"][code]), "soma": round(float(stats["sum"][code]), 2),
+            "media": _num(stats["mean"][code]), "minimo": _num(stats["min"][code]), "maximo": _num(stats["max"][code]),
+            "percentis": dict(zip(_nomes_percentis(qs), (_num(v) for v in tabela[code]))) if qs else {},
+        })
+    grupos.sort(key=lambda grupo: -grupo["soma"])
+    return grupos
+
+
+def _total(values, qs: List[float]) -> dict:
+    resumo = aggregations.summary(values, qs)
+    return {
+        "quantidade": resumo["count"], "soma": round(resumo["sum"], 2),
+        "media": _num(resumo["mean"]), "minimo": _num(resumo["min"]), "maximo": _num(resumo["max"]),
+        "percentis": dict(zip(_nomes_percentis(qs), (_num(v) for v in resumo["percentiles"]))),
+    }
+
+
+def _histograma(values, bins: int) -> Optional[dict]:
+    limites, contagens = aggregations.histogram(values, bins)
+    return {"limites": limites, "contagens": contagens} if contagens else None
+
+
+def _periodo(days, data_inicio: Optional[date], data_fim: Optional[date]):
+    mask = days != columnar.DATA_NULA
+    if data_inicio is not None:
+        mask &= days >= columnar.dias(data_inicio)
+    if data_fim is not None:
+        mask &= days <= columnar.dias(data_fim)
+    return mask
+
+
+@router.get("/livros/precos-por-genero", response_model=AnaliseAgrupada)
+def precos_por_genero(
+    percentis: str = Query("25,50,75", description="Percentis, separados por vírgula"),
+    bins: int = Query(20, ge=1, le=200),
+    atualizar: bool = Query(False, description="Reconstrói o snapshot antes de responder"),
+):
+    qs = _percentis(percentis)
+    snapshot = _snapshot("livros", atualizar)
+    codes, precos = snapshot.columns["genero"], snapshot.columns["preco"]
+    logger.info("Análise de preços por gênero! %d livros!", snapshot.rows)
+    return render(AnaliseAgrupada, {
+        "snapshot": _info(snapshot),
+        "total": _total(precos, qs),
+        "grupos": _grupos(snapshot, "genero", codes, precos, qs),
+        "histograma": _histograma(precos, bins),
+    })
+
+
+@router.get("/pedidos/valor-total", response_model=AnaliseAgrupada)
+def distribuicao_valor_total(
+    percentis: str = Query("50,90,95,99", description="Percentis, separados por vírgula"),
+    bins: int = Query(20, ge=1, le=200),
+    status: Optional[str] = Query(None),
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    atualizar: bool = Query(False, description="Reconstrói o snapshot antes de responder"),
+):
+    qs = _percentis(percentis)
+    snapshot = _snapshot("pedidos", atualizar)
+    codes, valores = snapshot.columns["status"], snapshot.columns["valor_total"]
+    mask = _periodo(snapshot.columns["data_pedido"], data_inicio, data_fim) if data_inicio or data_fim else None
+    if status is not None:
+        # Filtro no dicionário (um valor) e depois uma comparação de inteiros no array inteiro!
+        dicionario = snapshot.dictionaries["status"]
+        code = dicionario.index(status) if status in dicionario else -2
+        mask = (codes == code) if mask is None else mask & (codes == code)
+    if mask is not None:
+        codes, valores = codes[mask], valores[mask]
+    logger.info("Análise de valor_total dos pedidos! %d pedidos!", len(valores))
+    return render(AnaliseAgrupada, {
+        "snapshot": _info(snapshot),
+        "total": _total(valores, qs),
+        "grupos": _grupos(snapshot, "status", codes, valores, qs),
+        "histograma": _histograma(valores, bins),
+    })
+
+
+@router.get("/pagamentos/formas", response_model=AnaliseAgrupada)
+def mix_de_pagamentos(
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    atualizar: bool = Query(False, description="Reconstrói o snapshot antes de responder"),
+):
+    snapshot = _snapshot("pagamentos", atualizar)
+    codes, valores = snapshot.columns["forma_pagamento"], snapshot.columns["valor"]
+    if data_inicio or data_fim:
+        mask = _periodo(snapshot.columns["data_pagamento"], data_inicio, data_fim)
+        codes, valores = codes[mask], valores[mask]
+    total = _total(valores, [])
+    grupos = _grupos(snapshot, "forma_pagamento", codes, valores, [])
+    for grupo in grupos:
+        grupo["participacao"] = round(grupo["soma"] / total["soma"], 4) if total["soma"] else None
+    logger.info("Análise do mix de pagamentos! %d pagamentos!", len(valores))
+    return render(AnaliseAgrupada, {"snapshot": _info(snapshot), "total": total, "grupos": grupos})
+
+
+@router.get("/livros/mais-vendidos", response_model=AnaliseTopK)
+def livros_mais_vendidos(
+    k: int = Query(10, ge=1, le=100),
+    atualizar: bool = Query(False, description="Reconstrói o snapshot antes de responder"),
+):
+    snapshot = _snapshot("pedido_livro", atualizar)
+    # Contagem por livro_id (UUIDs de 16 bytes) e top-k por argpartition!
+    livros, contagens = aggregations.count_by(snapshot.columns["livro_id"])
+    indices = aggregations.top_k(contagens, k)
+    ids = [columnar.uuid_at(livros, int(i)) for i in indices]
+    titulos = {livro.id: livro.titulo for livro in get_repositories().livros.get_many(ids, columns=["id", "titulo"])}
+    logger.info("Análise dos livros mais vendidos! Top %d!", k)
+    return render(AnaliseTopK, {
+        "snapshot": _info(snapshot),
+        "total": snapshot.rows,
+        "itens": [
+            {"chave": str(id), "nome": titulos.get(id), "quantidade": int(contagens[i])}
+            for id, i in zip(ids, indices)
+        ],
+    })
+
+
+def _lista(valor: str, validos, nome: str) -> List[str]:
+    itens = [item.strip() for item in valor.split(",") if item.strip()]
+    invalidos = [item for item in itens if item not in validos]
+    if not itens or invalidos:
+        raise HTTPException(
+            status_code=400, detail=f"{nome} inválido(s): {', '.join(invalidos) or valor}! Use: {', '.join(validos)}!"
+        )
+    return itens
+
+
+@router.post("/snapshots", response_model=List[ArquivoSnapshot])
+def exportar_snapshots(
+    tabelas: str = Query(",".join(analytics.TABELAS), description="Tabelas, separadas por vírgula"),
+    formatos: str = Query("arrow", description="arrow, parquet ou os dois separados por vírgula"),
+):
+    if not export.available():
+        raise HTTPException(status_code=503, detail="Exportação indisponível: instale o pacote pyarrow!")
+    nomes = _lista(tabelas, list(export.TABELAS), "Tabela(s)")
+    arquivos = export.export(get_repositories(), nomes, _lista(formatos, list(export.FORMATOS), "Formato(s)"))
+    # Os próximos snapshots das análises saem dos arquivos recém-exportados (memory-map), sem nova varredura!
+    analytics.clear([nome for nome in nomes if nome in analytics.TABELAS])
+    logger.info("Snapshots exportados! %d arquivos!", len(arquivos))
+    return render_list(ArquivoSnapshot, [
+        {
+            "tabela": arquivo.tabela, "formato": arquivo.formato, "caminho": arquivo.caminho, "bytes": arquivo.bytes,
+            "linhas": arquivo.linhas, "idade_s": 0.0, "duracao_ms": round(arquivo.duracao_ms, 1),
+        }
+        for arquivo in arquivos
+    ])
+
+
+@router.get("/snapshots", response_model=List[ArquivoSnapshot])
+def listar_snapshots():
+    return render_list(ArquivoSnapshot, export.listar())
+
+
+@router.get("/snapshots/{tabela}.{formato}")
+def baixar_snapshot(tabela: str, formato: str):
+    # Nomes validados contra as listas fixas: nada de caminho vindo do cliente!
+    if tabela not in export.TABELAS or formato not in export.FORMATOS:
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado!")
+    path = export.path_for(tabela, formato)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado!")
+    media_type = "application/vnd.apache.arrow.file" if formato == "arrow" else "application/vnd.apache.parquet"
+    return FileResponse(path, media_type=media_type, filename=f"{tabela}.{formato}")
@@ -1,25 +1,35 @@
 from uuid import UUID
 from datetime import datetime, date
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
 from cassandra.cqlengine.query import DoesNotExist
 from cassandra.util import Date as CassandraDate
 from app.models.models import Autor
-from app.schemas.schemas import AutorCreate, AutorUpdate, AutorRead, AutorCount, PaginatedAutor
+from app.repositories import get_repositories
+from app import write_behind
+from app.schemas.schemas import AutorCreate, AutorUpdate, AutorRead, AutoresPorIds, AutorCount, PaginatedAutor
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization import etag
+from app.serialization.fields import columns_for, parse_fields, parse_ids
+from app.serialization.responses import no_content, prefers_minimal, render, render_batch, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/autores", tags=["Autores"])
 
 
-def serialize(autor: Autor) -> dict:
-    data = {field: getattr(autor, field) for field in Autor._columns.keys()}
+def serialize(autor: Autor, fields: Optional[List[str]] = None) -> dict:
+    data = {field: getattr(autor, field) for field in (fields or Autor._columns.keys())}
+    if "data_nascimento" not in data:
+        return data
+
     cass_date = data.get("data_nascimento")
 
     try:
-        if isinstance(cass_date, (date, CassandraDate)):
-            data["data_nascimento"] = date.fromisoformat(str(cass_date))
-        else:
+        if isinstance(cass_date, CassandraDate):
+            data["data_nascimento"] = cass_date.date()
+        elif not isinstance(cass_date, date):
             logger.warning(f"data_nascimento inválido: {cass_date} ({type(cass_date)})!")
             raise ValueError("data_nascimento inválido!")
     except Exception as e:
@@ -30,93 +40,129 @@ def serialize(autor: Autor) -> dict:
 
 
 @router.get("/autores/{id}", response_model=AutorRead)
-def obter_autor_por_id(id: UUID):
+def obter_autor_por_id(id: UUID, fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"), if_none_match: Optional[str] = Header(None)):
+    campos = parse_fields(fields, AutorRead)
+    autores = get_repositories().autores
+    # Com a versão em cache, o 304 sai sem consultar o banco!
+    tag = etag.cached_entity_etag(autores, id, campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     try:
-        autor = Autor.objects(id=id).get()
-        return AutorRead(**serialize(autor))
+        autor = autores.get(id, columns=columns_for(campos, "versao"))
+        tag = etag.entity_etag(id, autor.versao, campos)
+        if etag.matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        return render(AutorRead, serialize(autor, campos), fields=campos, etag=tag)
     except DoesNotExist:
         logger.warning(f"Autor não encontrado! ID {id}!")
         raise HTTPException(status_code=404, detail="Autor não encontrado!")
 
 
+@router.get("/batch", response_model=AutoresPorIds)
+def obter_autores_por_ids(
+    ids: str = Query(..., description="Ids separados por vírgula"),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+):
+    campos = parse_fields(fields, AutorRead)
+    lista_ids = parse_ids(ids)
+    # Uma leitura por chave para cada id, todas em voo: uma requisição HTTP em vez de uma por id!
+    autores = get_repositories().autores.get_many(lista_ids, columns=columns_for(campos))
+    encontrados = {autor.id: serialize(autor, campos) for autor in autores}
+    logger.info("Leitura de %d autores por id! %d encontrados!", len(lista_ids), len(encontrados))
+    return render_batch(AutoresPorIds, lista_ids, encontrados, fields=campos)
+
+
 @router.post("/", response_model=AutorRead)
 def criar_autor(autor: AutorCreate):
-    if Autor.objects(nome=autor.nome).allow_filtering().count() > 0:
+    autores = get_repositories().autores
+
+    if autores.find_by(nome=autor.nome):
         logger.warning(f"Nome já em uso! {autor.nome}!")
         raise HTTPException(status_code=400, detail="Já existe um autor com esse nome!")
 
-    if Autor.objects(email=autor.email).allow_filtering().count() > 0:
+    if autores.find_by(email=autor.email):
         logger.warning(f"E-mail já em uso! {autor.email}!")
         raise HTTPException(status_code=400, detail="Já existe um autor com esse e-mail!")
 
-    novo_autor = Autor.create(**autor.dict())
+    novo_autor = autores.create(**autor.dict())
     logger.info(f"Autor criado: {novo_autor.id} - {novo_autor.nome} ({novo_autor.email})!")
-    return AutorRead(**serialize(novo_autor))
+    return render(AutorRead, serialize(novo_autor), etag=etag.entity_etag(novo_autor.id, novo_autor.versao))
 
 
 @router.patch("/{autor_id}", response_model=AutorRead)
-def atualizar_autor(autor_id: UUID, autor_update: AutorUpdate):
-    try:
-        autor = Autor.objects(id=autor_id).get()
-    except DoesNotExist:
-        logger.warning(f"Tentativa de atualizar autor inexistente! ID {autor_id}!")
-        raise HTTPException(status_code=404, detail="Autor não encontrado!")
-
+def atualizar_autor(autor_id: UUID, autor_update: AutorUpdate, prefer: Optional[str] = Header(None)):
+    autores = get_repositories().autores
     update_data = autor_update.dict(exclude_unset=True)
 
     if "nome" in update_data:
-        nome_existente = Autor.objects(nome=update_data["nome"]).allow_filtering()
+        nome_existente = autores.find_by(nome=update_data["nome"])
         for a in nome_existente:
             if a.id != autor_id:
                 logger.warning(f"Nome já em uso por outro autor! {update_data['nome']}!")
                 raise HTTPException(status_code=400, detail="Já existe um autor com esse nome!")
 
     if "email" in update_data:
-        email_existente = Autor.objects(email=update_data["email"]).allow_filtering()
+        email_existente = autores.find_by(email=update_data["email"])
         for a in email_existente:
             if a.id != autor_id:
                 logger.warning(f"E-mail já em uso por outro autor! {update_data['email']}!")
                 raise HTTPException(status_code=400, detail="Já existe um autor com esse e-mail!")
 
-    for key, value in update_data.items():
-        setattr(autor, key, value)
-    autor.update(**update_data)
+    try:
+        # A existência é conferida pelo update (WRITE_EXISTENCE_CHECK), que já devolve a linha completa!
+        autor = autores.update(autor_id, **update_data)
+    except DoesNotExist:
+        logger.warning(f"Tentativa de atualizar autor inexistente! ID {autor_id}!")
+        raise HTTPException(status_code=404, detail="Autor não encontrado!")
+
+    tags = [response_cache.tag("autor", autor_id)]
+    response_cache.invalidate(*tags)
+    if "nome" in update_data:
+        # O nome vai para os resumos de livros e pedidos em segundo plano!
+        write_behind.enqueue("autor_alterado", tags, autor_id=autor_id)
 
     logger.info(f"Autor atualizado! {autor_id}!")
-    return AutorRead(**serialize(autor))
+    tag = etag.entity_etag(autor.id, autor.versao)
+    if prefers_minimal(prefer):
+        return no_content(tag)
+    return render(AutorRead, serialize(autores.complete(autor)), etag=tag)
 
 
 @router.get("/", response_model=PaginatedAutor)
 def listar_autores(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
+    campos = parse_fields(fields, AutorRead)
+    colunas = columns_for(campos)
+    tag = etag.page_etag(get_repositories().autores.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     offset = (page - 1) * limit
-    todos = list(Autor.objects().all())
+    todos = get_repositories().autores.list_all(columns=colunas)
     total = len(todos)
     autores_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem paginada de autores! Página {page}, limite {limit}!")
-    return PaginatedAutor(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[AutorRead(**serialize(a)) for a in autores_paginados]
-    )
+    logger_listagem.info("Listagem paginada de autores! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedAutor, page, limit, total, [serialize(a, campos) for a in autores_paginados], fields=campos, etag=tag)
 
 
 @router.get("/count", response_model=AutorCount)
 def contar_autores():
-    total = Autor.objects().count()
-    logger.info(f"Contagem de autores! {total}!")
-    return AutorCount(total_autores=total)
+    total = get_repositories().autores.count()
+    logger_listagem.info("Contagem de autores! %s!", total)
+    return render(AutorCount, {"total_autores": total})
 
 
 @router.delete("/", response_model=dict)
 def deletar_autor(autor_id: UUID):
     try:
-        autor = Autor.objects(id=autor_id).get()
-        autor.delete()
+        get_repositories().autores.delete(autor_id)
+        tags = [response_cache.tag("autor", autor_id)]
+        response_cache.invalidate(*tags)
+        write_behind.enqueue("autor_removido", tags, autor_id=autor_id)
         logger.info(f"Autor deletado! ID {autor_id}!")
         return {"message": "Autor deletado com sucesso!"}
     except DoesNotExist:
@@ -132,8 +178,15 @@ def filtrar_autores(
     nacionalidade: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todos = Autor.objects().all()
+    campos = parse_fields(fields, AutorRead)
+    colunas = columns_for(campos, *(coluna for coluna, valor in (("nome", nome), ("email", email), ("data_nascimento", data_nascimento), ("nacionalidade", nacionalidade)) if valor is not None))
+    tag = etag.page_etag(get_repositories().autores.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todos = get_repositories().autores.list_all(columns=colunas)
     if nome:
         todos = [a for a in todos if nome.lower() in a.nome.lower()]
     if email:
@@ -159,30 +212,27 @@ def filtrar_autores(
     offset = (page - 1) * limit
     autores_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Filtro aplicado! Total encontrados: {total}!")
-    return PaginatedAutor(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[AutorRead(**serialize(a)) for a in autores_paginados]
-    )
+    logger_listagem.info("Filtro aplicado! Total encontrados: %s!", total)
+    return render_page(PaginatedAutor, page, limit, total, [serialize(a, campos) for a in autores_paginados], fields=campos, etag=tag)
 
 
 @router.get("/ordenado", response_model=PaginatedAutor)
 def listar_autores_ordenados(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todos = list(Autor.objects().all())
+    campos = parse_fields(fields, AutorRead)
+    colunas = columns_for(campos, "nome")
+    tag = etag.page_etag(get_repositories().autores.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todos = get_repositories().autores.list_all(columns=colunas)
     todos.sort(key=lambda a: a.nome.lower())
     total = len(todos)
     offset = (page - 1) * limit
     autores_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem ordenada de autores! Página {page}, limite {limit}!")
-    return PaginatedAutor(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[AutorRead(**serialize(a)) for a in autores_paginados]
-    )
\ No newline at end of file
+    logger_listagem.info("Listagem ordenada de autores! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedAutor, page, limit, total, [serialize(a, campos) for a in autores_paginados], fields=campos, etag=tag)
\ No newline at end of file
@@ -1,101 +1,124 @@
-from fastapi import APIRouter, HTTPException, Path, Query
-from typing import List
+from fastapi import APIRouter, HTTPException, Path, Query, Request
 from uuid import UUID
 from cassandra.cqlengine.query import DoesNotExist
-from app.models.models import Pedido, Livro, Usuario, PedidoPagamento, Pagamento, Autor, PedidoLivro, Editora
-from app.schemas.schemas import PedidoDetalhado, LivroInfo, PagamentoInfo, EditoraComLivrosAutores
+from app.cache import responses as response_cache
+from app.repositories import get_repositories
+from app.schemas.schemas import PaginatedPedidoDetalhado, EditoraComLivrosAutores
 from app.logs.logger import get_logger
+from app.serialization.responses import render, render_page
 
 router = APIRouter(prefix="/consulta-usuario", tags=["Consultas Complexas"])
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 
 
-@router.get("/pedidos-detalhados/{usuario_id}", response_model=dict)
+@router.get("/pedidos-detalhados/{usuario_id}", response_model=PaginatedPedidoDetalhado)
 def listar_pedidos_detalhados(
+    request: Request,
     usuario_id: UUID = Path(...),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1)
 ):
-    usuario = Usuario.get(id=usuario_id)
-    if not usuario:
+    chave = response_cache.response_key(request)
+    cached = response_cache.cached_response(chave)
+    if cached is not None:
+        return cached
+
+    repos = get_repositories()
+
+    try:
+        repos.usuarios.get(usuario_id, columns=["id"])
+    except DoesNotExist:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-    pedidos = list(Pedido.objects(usuario_id=usuario_id))
-    total = len(pedidos)
+    # Uma leitura de partição: os documentos já trazem livros (com autor) e pagamentos!
+    documentos = repos.pedido_detalhado.list_by_usuario(usuario_id)
+    total = len(documentos)
+
+    # Todos os pedidos do usuário (não só os da página) entram nas tags: remover um muda a paginação!
+    tags = {response_cache.tag("usuario", usuario_id)}
+    tags.update(response_cache.tag("pedido", doc.pedido_id) for doc in documentos)
 
     # calcula offset para paginação
     offset = (page - 1) * limit
-    pedidos_paginados = pedidos[offset:offset + limit]
+    documentos_paginados = documentos[offset:offset + limit]
 
     resultado = []
 
-    for pedido in pedidos_paginados:
-        rels_pedido_livro = PedidoLivro.objects(pedido_id=pedido.id)
+    for doc in documentos_paginados:
         livros_info = []
-        for rel in rels_pedido_livro:
-            livro = Livro.get(id=rel.livro_id)
-            autor = Autor.get(id=livro.autor_id)
-            livros_info.append(LivroInfo(id=livro.id, titulo=livro.titulo, autor_nome=autor.nome))
+        for livro in (doc.livros or {}).values():
+            livros_info.append({"id": livro.id, "titulo": livro.titulo, "autor_nome": livro.autor_nome})
+            tags.update((response_cache.tag("livro", livro.id), response_cache.tag("autor", livro.autor_id)))
 
-        rels_pagamento = PedidoPagamento.objects(pedido_id=pedido.id)
         pagamentos_info = []
-        for rel in rels_pagamento:
-            pagamento = Pagamento.get(id=rel.pagamento_id)
-            pagamentos_info.append(
-                PagamentoInfo(
-                    id=pagamento.id,
-                    valor=pagamento.valor,
-                    data_pagamento=str(pagamento.data_pagamento)
-                )
-            )
-
-        resultado.append(
-            PedidoDetalhado(
-                id=pedido.id,
-                data_pedido=str(pedido.data_pedido),
-                livros=livros_info,
-                pagamentos=pagamentos_info
-            )
-        )
-
-    logger.info(f"Consultados {len(resultado)} pedidos detalhados do usuário {usuario_id} na página {page} com limite {limit}")
-
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "items": resultado
-    }
+        for pagamento in (doc.pagamentos or {}).values():
+            pagamentos_info.append({
+                "id": pagamento.id,
+                "valor": pagamento.valor,
+                "data_pagamento": str(pagamento.data_pagamento),
+            })
+            tags.add(response_cache.tag("pagamento", pagamento.id))
+
+        resultado.append({
+            "id": doc.pedido_id,
+            "data_pedido": str(doc.data_pedido),
+            "livros": livros_info,
+            "pagamentos": pagamentos_info,
+        })
+
+    logger_listagem.info("Consultados %s pedidos detalhados do usuário %s na página %s com limite %s", len(resultado), usuario_id, page, limit)
+
+    response = render_page(PaginatedPedidoDetalhado, page, limit, total, resultado)
+    return response_cache.store_response(chave, response, tags)
 
 @router.get("/editora-detalhado/{editora_id}", response_model=EditoraComLivrosAutores)
 def obter_editora_com_livros_e_autores(
+    request: Request,
     editora_id: UUID = Path(..., description="ID da editora"),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1)
 ):
+    chave = response_cache.response_key(request)
+    cached = response_cache.cached_response(chave)
+    if cached is not None:
+        return cached
+
+    repos = get_repositories()
+
     try:
-        editora = Editora.objects(id=editora_id).get()
+        editora = repos.editoras.get(editora_id)
     except DoesNotExist:
         logger.warning(f"Editora não encontrada: {editora_id}")
         raise HTTPException(status_code=404, detail="Editora não encontrada")
 
-    livros_completos = list(Livro.objects(editora_id=editora.id))
+    livros_completos = repos.livros.find_by(editora_id=editora.id)
     total_livros = len(livros_completos)
 
+    tags = {response_cache.tag("editora", editora.id)}
+    tags.update(response_cache.tag("livro", l.id) for l in livros_completos)
+
     offset = (page - 1) * limit
     livros_paginados = livros_completos[offset:offset+limit]
 
+    # Autores da página em uma leitura só (em paralelo), não uma por livro!
+    autor_ids = list(dict.fromkeys(livro.autor_id for livro in livros_paginados if livro.autor_id is not None))
+    autores = {
+        autor.id: autor for autor in repos.autores.get_many(autor_ids, columns=["id", "nome"])
+    } if autor_ids else {}
+
     livros_com_autores = []
     for livro in livros_paginados:
-        try:
-            autor = Autor.objects(id=livro.autor_id).get()
+        autor = autores.get(livro.autor_id)
+        if autor is not None:
             autor_info = {
                 "id": autor.id,
                 "nome": autor.nome,
             }
-        except DoesNotExist:
+        else:
             logger.warning(f"Autor não encontrado para livro {livro.id}")
             autor_info = None
+        tags.add(response_cache.tag("autor", livro.autor_id))
 
         livro_info = {
             "id": livro.id,
@@ -116,4 +139,5 @@ def obter_editora_com_livros_e_autores(
         "total_livros": total_livros
     }
 
-    return resultado
+    response = render(EditoraComLivrosAutores, resultado)
+    return response_cache.store_response(chave, response, tags)
@@ -1,57 +1,118 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
-from app.models.models import Editora, Livro, Autor
+import os
+import threading
+import time
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Dict, List, Optional
+from uuid import UUID
+from app import write_behind
+from app.cache import responses as response_cache
+from app.repositories import get_repositories
 from app.schemas.schemas import EditoraComLivrosAutores
 from app.logs.logger import get_logger
-from cassandra.cqlengine.query import DoesNotExist
+from app.serialization.responses import render_list
 
 logger = get_logger("MyBooks")
 router = APIRouter(prefix="/editoras", tags=["Editoras"])
 
+CAMPOS_EDITORA = ("nome", "endereco", "telefone", "email")
+
+# Um reparo por documento a cada intervalo: enquanto o write-behind não conserta, os GETs seguintes não
+# agendam de novo (e, se o reparo falhar, o próximo GET depois do intervalo agenda outro)!
+CATALOGO_REPARO_INTERVALO_S = float(os.getenv("CATALOGO_REPARO_INTERVALO_S", "60"))
+_reparos: Dict[UUID, float] = {}
+_reparos_lock = threading.Lock()
+
+
+def _reparar(editora_id: UUID, tarefa: str) -> bool:
+    agora = time.monotonic()
+    with _reparos_lock:
+        if _reparos.get(editora_id, 0) > agora:
+            return False
+        for vencido in [id for id, ate in _reparos.items() if ate <= agora]:
+            del _reparos[vencido]
+        _reparos[editora_id] = agora + CATALOGO_REPARO_INTERVALO_S
+    write_behind.enqueue(tarefa, [response_cache.tag("editora", editora_id)], editora_id=editora_id)
+    return True
+
+
+def _completar(repos, editoras) -> dict:
+    # put_livro é upsert: um livro projetado antes da editora (ou depois de ela ser removida) cria um documento
+    # sem os dados dela. Esses saem da tabela de editoras e o write-behind conserta (ou apaga) o documento!
+    incompletos = [editora.editora_id for editora in editoras if editora.nome is None]
+    if not incompletos:
+        return {}
+    encontradas = {editora.id: editora for editora in repos.editoras.get_many(incompletos)}
+    agendados = sum(
+        _reparar(editora_id, "editora_salva" if editora_id in encontradas else "editora_removida")
+        for editora_id in incompletos
+    )
+    if agendados:
+        logger.warning("Catálogo com %d documento(s) sem editora! Reparo agendado!", agendados)
+    return encontradas
+
+
+def _pagina(repos, editoras, limit: int, tags: set) -> list:
+    # Documento de editora removida sai da página: os seguintes do catálogo completam o limit, como a página
+    # fica depois do reparo (que apaga o documento)!
+    pagina, lidas, pedidas = [], editoras, limit
+    while True:
+        completas = _completar(repos, lidas)
+        for editora in lidas:
+            tags.add(response_cache.tag("editora", editora.editora_id))
+            dados = editora if editora.nome is not None else completas.get(editora.editora_id)
+            if dados is not None:
+                pagina.append((editora, dados))
+        faltam = limit - len(pagina)
+        if faltam <= 0 or len(lidas) < pedidas:
+            return pagina  # Página cheia ou fim do catálogo!
+        pedidas = faltam
+        lidas = repos.editora_catalogo.page_after(lidas[-1].editora_id, pedidas)
+
+
 @router.get("/com-livros-e-autores", response_model=List[EditoraComLivrosAutores])
 def listar_editoras_com_livros_e_autores(
+    request: Request,
     limit: int = Query(10, ge=1),
-    page: int = Query(1, ge=1)
+    page: int = Query(1, ge=1),
+    cursor: Optional[UUID] = Query(None, description="Id da última editora da página anterior (no lugar de page)"),
 ):
-    offset = (page - 1) * limit
-    editoras = list(Editora.objects().limit(limit).offset(offset))  
-    total_editoras = len(list(Editora.objects()))
+    chave = response_cache.response_key(request)
+    cached = response_cache.cached_response(chave)
+    if cached is not None:
+        return cached
+
+    repos = get_repositories()
+    if cursor is not None:
+        # Cursor por token: a página custa o mesmo em qualquer profundidade!
+        editoras = repos.editora_catalogo.page_after(cursor, limit)
+    else:
+        offset = (page - 1) * limit
+        # Catálogo desnormalizado: uma leitura que para no fim da página, em vez de livros e autores por editora!
+        editoras = repos.editora_catalogo.page(offset, limit)
 
     if not editoras:
         logger.warning("Nenhuma editora encontrada.")
         raise HTTPException(status_code=404, detail="Nenhuma editora encontrada.")
 
     resultado = []
+    # "editoras" muda com criação/remoção de editoras, que desloca as páginas!
+    tags = {response_cache.tag("editoras")}
 
-    for editora in editoras:
-        livros_obj = list(Livro.objects(editora_id=editora.id))
+    for editora, dados in _pagina(repos, editoras, limit, tags):
         livros_com_autores = []
 
-        for livro in livros_obj:
-            try:
-                autor = Autor.objects(id=livro.autor_id).get()
-                autor_info = {
-                    "id": autor.id,
-                    "nome": autor.nome,
-                }
-            except DoesNotExist:
-                logger.warning(f"Autor não encontrado para livro {livro.id}")
-                autor_info = None
-
-            livro_info = {
+        for livro in (editora.livros or {}).values():
+            tags.update((response_cache.tag("livro", livro.id), response_cache.tag("autor", livro.autor_id)))
+            livros_com_autores.append({
                 "id": livro.id,
                 "titulo": livro.titulo,
-                "autor": autor_info,
-            }
-            livros_com_autores.append(livro_info)
+                "autor": {"id": livro.autor_id, "nome": livro.autor_nome} if livro.autor_nome is not None else None,
+            })
 
         resultado.append({
-            "id": editora.id,
-            "nome": editora.nome,
-            "endereco": editora.endereco,
-            "telefone": editora.telefone,
-            "email": editora.email,
+            "id": editora.editora_id,
+            **{campo: getattr(dados, campo) for campo in CAMPOS_EDITORA},
             "livros": livros_com_autores,
         })
 
-    return resultado
+    return response_cache.store_response(chave, render_list(EditoraComLivrosAutores, resultado), tags)
@@ -1,133 +1,182 @@
 from uuid import UUID
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
 from cassandra.cqlengine.query import DoesNotExist
 from app.models.models import Editora
+from app.repositories import get_repositories
+from app import write_behind
 from app.schemas.schemas import (
     EditoraCreate,
     EditoraUpdate,
     EditoraRead,
+    EditorasPorIds,
     EditoraCount,
     PaginatedEditoras
 )
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization import etag
+from app.serialization.fields import columns_for, parse_fields, parse_ids
+from app.serialization.responses import no_content, prefers_minimal, render, render_batch, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/editoras", tags=["Editoras"])
 
 
-def serialize(editora: Editora) -> dict:
-    return {field: getattr(editora, field) for field in Editora._columns.keys()}
+def serialize(editora: Editora, fields: Optional[List[str]] = None) -> dict:
+    return {field: getattr(editora, field) for field in (fields or Editora._columns.keys())}
 
 
 @router.get("/editoras/{id}", response_model=EditoraRead)
-def obter_editora_por_id(id: UUID):
+def obter_editora_por_id(id: UUID, fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"), if_none_match: Optional[str] = Header(None)):
+    campos = parse_fields(fields, EditoraRead)
+    editoras = get_repositories().editoras
+    # Com a versão em cache, o 304 sai sem consultar o banco!
+    tag = etag.cached_entity_etag(editoras, id, campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     try:
-        editora = Editora.objects(id=id).get()
-        return EditoraRead(**serialize(editora))
+        editora = editoras.get(id, columns=columns_for(campos, "versao"))
+        tag = etag.entity_etag(id, editora.versao, campos)
+        if etag.matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        return render(EditoraRead, serialize(editora, campos), fields=campos, etag=tag)
     except DoesNotExist:
         logger.warning(f"Editora não encontrada! ID {id}!")
         raise HTTPException(status_code=404, detail="Editora não encontrada!")
 
 
+@router.get("/batch", response_model=EditorasPorIds)
+def obter_editoras_por_ids(
+    ids: str = Query(..., description="Ids separados por vírgula"),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+):
+    campos = parse_fields(fields, EditoraRead)
+    lista_ids = parse_ids(ids)
+    # Uma leitura por chave para cada id, todas em voo: uma requisição HTTP em vez de uma por id!
+    editoras = get_repositories().editoras.get_many(lista_ids, columns=columns_for(campos))
+    encontrados = {editora.id: serialize(editora, campos) for editora in editoras}
+    logger.info("Leitura de %d editoras por id! %d encontrados!", len(lista_ids), len(encontrados))
+    return render_batch(EditorasPorIds, lista_ids, encontrados, fields=campos)
+
+
 @router.post("/", response_model=EditoraRead)
 def criar_editora(editora: EditoraCreate):
-    if Editora.objects(nome=editora.nome).allow_filtering().count() > 0:
+    repos = get_repositories()
+    editoras = repos.editoras
+
+    if editoras.find_by(nome=editora.nome):
         logger.warning(f"Nome já em uso! {editora.nome}!")
         raise HTTPException(status_code=400, detail="Já existe uma editora com esse nome!")
 
-    if Editora.objects(email=editora.email).allow_filtering().count() > 0:
+    if editoras.find_by(email=editora.email):
         logger.warning(f"E-mail já em uso! {editora.email}!")
         raise HTTPException(status_code=400, detail="Já existe uma editora com esse e-mail!")
 
-    nova_editora = Editora.create(**editora.dict())
+    nova_editora = editoras.create(**editora.dict())
+    tags = [response_cache.tag("editoras")]
+    response_cache.invalidate(*tags)
+    write_behind.enqueue("editora_salva", tags, editora_id=nova_editora.id)
     logger.info(f"Editora criada: {nova_editora.id} - {nova_editora.nome}!")
-    return EditoraRead(**serialize(nova_editora))
+    return render(EditoraRead, serialize(nova_editora), etag=etag.entity_etag(nova_editora.id, nova_editora.versao))
 
 
 @router.patch("/", response_model=EditoraRead)
-def atualizar_editora(editora_id: UUID, editora_update: EditoraUpdate):
-    try:
-        editora = Editora.objects(id=editora_id).get()
-    except DoesNotExist:
-        logger.warning(f"Tentativa de atualizar editora inexistente! ID {editora_id}!")
-        raise HTTPException(status_code=404, detail="Editora não encontrada!")
-
+def atualizar_editora(editora_id: UUID, editora_update: EditoraUpdate, prefer: Optional[str] = Header(None)):
+    repos = get_repositories()
+    editoras = repos.editoras
     update_data = editora_update.dict(exclude_unset=True)
 
     if "nome" in update_data:
-        nome_existente = Editora.objects(nome=update_data["nome"]).allow_filtering()
+        nome_existente = editoras.find_by(nome=update_data["nome"])
         for e in nome_existente:
             if e.id != editora_id:
                 logger.warning(f"Nome já em uso por outra editora! {update_data['nome']}!")
                 raise HTTPException(status_code=400, detail="Já existe uma editora com esse nome!")
 
     if "email" in update_data:
-        email_existente = Editora.objects(email=update_data["email"]).allow_filtering()
+        email_existente = editoras.find_by(email=update_data["email"])
         for e in email_existente:
             if e.id != editora_id:
                 logger.warning(f"E-mail já em uso por outra editora! {update_data['email']}!")
                 raise HTTPException(status_code=400, detail="Já existe uma editora com esse e-mail!")
 
-    for key, value in update_data.items():
-        setattr(editora, key, value)
-    editora.update(**update_data)
+    try:
+        # A existência é conferida pelo update (WRITE_EXISTENCE_CHECK), que já devolve a linha completa!
+        editora = editoras.update(editora_id, **update_data)
+    except DoesNotExist:
+        logger.warning(f"Tentativa de atualizar editora inexistente! ID {editora_id}!")
+        raise HTTPException(status_code=404, detail="Editora não encontrada!")
+
+    tags = [response_cache.tag("editora", editora_id)]
+    response_cache.invalidate(*tags)
+    write_behind.enqueue("editora_salva", tags, editora_id=editora_id)
 
     logger.info(f"Editora atualizada! ID {editora_id}!")
-    return EditoraRead(**serialize(editora))
+    tag = etag.entity_etag(editora.id, editora.versao)
+    if prefers_minimal(prefer):
+        return no_content(tag)
+    return render(EditoraRead, serialize(editoras.complete(editora)), etag=tag)
 
 
 @router.get("/", response_model=PaginatedEditoras)
 def listar_editoras(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
+    campos = parse_fields(fields, EditoraRead)
+    colunas = columns_for(campos)
+    tag = etag.page_etag(get_repositories().editoras.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     offset = (page - 1) * limit
-    todas = list(Editora.objects().all())
+    todas = get_repositories().editoras.list_all(columns=colunas)
     total = len(todas)
     editoras_paginadas = todas[offset:offset + limit]
 
-    logger.info(f"Listagem paginada de editoras! Página {page}, limite {limit}!")
-    return PaginatedEditoras(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[EditoraRead(**serialize(e)) for e in editoras_paginadas]
-    )
+    logger_listagem.info("Listagem paginada de editoras! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedEditoras, page, limit, total, [serialize(e, campos) for e in editoras_paginadas], fields=campos, etag=tag)
 
 
 @router.get("/ordenado", response_model=PaginatedEditoras)
 def listar_editoras_ordenadas(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todas = list(Editora.objects().all())
+    campos = parse_fields(fields, EditoraRead)
+    colunas = columns_for(campos, "nome")
+    tag = etag.page_etag(get_repositories().editoras.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todas = get_repositories().editoras.list_all(columns=colunas)
     todas.sort(key=lambda e: e.nome.lower())
     total = len(todas)
     offset = (page - 1) * limit
     editoras_paginadas = todas[offset:offset + limit]
 
-    logger.info(f"Listagem ordenada de editoras! Página {page}, limite {limit}!")
-    return PaginatedEditoras(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[EditoraRead(**serialize(e)) for e in editoras_paginadas]
-    )
+    logger_listagem.info("Listagem ordenada de editoras! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedEditoras, page, limit, total, [serialize(e, campos) for e in editoras_paginadas], fields=campos, etag=tag)
 
 
 @router.get("/count", response_model=EditoraCount)
 def contar_editoras():
-    total = Editora.objects().count()
-    logger.info(f"Contagem de editoras! {total}!")
-    return EditoraCount(total_editoras=total)
+    total = get_repositories().editoras.count()
+    logger_listagem.info("Contagem de editoras! %s!", total)
+    return render(EditoraCount, {"total_editoras": total})
 
 
 @router.delete("/", response_model=dict)
 def deletar_editora(editora_id: UUID):
     try:
-        editora = Editora.objects(id=editora_id).get()
-        editora.delete()
+        get_repositories().editoras.delete(editora_id)
+        tags = [response_cache.tag("editora", editora_id), response_cache.tag("editoras")]
+        response_cache.invalidate(*tags)
+        write_behind.enqueue("editora_removida", tags, editora_id=editora_id)
         logger.info(f"Editora deletada! ID {editora_id}!")
         return {"message": "Editora deletada com sucesso!"}
     except DoesNotExist:
@@ -143,8 +192,15 @@ def filtrar_editoras(
     email: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todas = Editora.objects().all()
+    campos = parse_fields(fields, EditoraRead)
+    colunas = columns_for(campos, *(coluna for coluna, valor in (("nome", nome), ("endereco", endereco), ("telefone", telefone), ("email", email)) if valor is not None))
+    tag = etag.page_etag(get_repositories().editoras.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todas = get_repositories().editoras.list_all(columns=colunas)
     if nome:
         todas = [e for e in todas if nome.lower() in e.nome.lower()]
     if endereco:
@@ -161,12 +217,7 @@ def filtrar_editoras(
     offset = (page - 1) * limit
     editoras_paginadas = todas[offset:offset + limit]
 
-    logger.info(
-        f"Filtro de editoras aplicado! Página {page}, limite {limit}, total encontrados: {total}!"
+    logger_listagem.info(
+        "Filtro de editoras aplicado! Página %s, limite %s, total encontrados: %s!", page, limit, total
     )
-    return PaginatedEditoras(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[EditoraRead(**serialize(e)) for e in editoras_paginadas]
-    )
\ No newline at end of file
+    return render_page(PaginatedEditoras, page, limit, total, [serialize(e, campos) for e in editoras_paginadas], fields=campos, etag=tag)
\ No newline at end of file
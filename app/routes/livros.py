@@ -1,25 +1,38 @@
 from uuid import UUID
-from typing import Optional
+from typing import Optional, List
 from datetime import date
 from cassandra.util import Date as CassandraDate
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
 from cassandra.cqlengine.query import DoesNotExist
-from app.models.models import Livro, Autor, Editora
-from app.schemas.schemas import LivroCreate, LivroUpdate, LivroRead, LivroCount, PaginatedLivros
+from app.models.models import Livro
+from app.repositories import get_repositories
+from app import write_behind
+from app.schemas.schemas import (
+    LivroCreate, LivroUpdate, LivroRead, LivroExpandido, LivrosPorIds, LivroCount, PaginatedLivros,
+    PaginatedLivrosExpandidos,
+)
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization import etag, expand as expansao
+from app.serialization.fields import columns_for, parse_fields, parse_ids
+from app.serialization.responses import no_content, prefers_minimal, render, render_batch, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/livros", tags=["Livros"])
 
 
-def serialize(livro: Livro) -> dict:
-    data = {field: getattr(livro, field) for field in Livro._columns.keys()}
+def serialize(livro: Livro, fields: Optional[List[str]] = None) -> dict:
+    data = {field: getattr(livro, field) for field in (fields or Livro._columns.keys())}
+    if "data_publicacao" not in data:
+        return data
+
     cass_date = data.get("data_publicacao")
 
     try:
-        if isinstance(cass_date, (date, CassandraDate)):
-            data["data_publicacao"] = date.fromisoformat(str(cass_date))
-        else:
+        if isinstance(cass_date, CassandraDate):
+            data["data_publicacao"] = cass_date.date()
+        elif not isinstance(cass_date, date):
             logger.warning(f"data_publicacao inválido: {cass_date} ({type(cass_date)})!")
             raise ValueError("data_publicacao inválido!")
     except Exception as e:
@@ -29,47 +42,96 @@ def serialize(livro: Livro) -> dict:
     return data
 
 
-@router.get("/livros/{id}", response_model=LivroRead)
-def obter_livro_por_id(id: UUID):
+@router.get("/livros/{id}", response_model=LivroExpandido)
+def obter_livro_por_id(id: UUID, fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"), expand: Optional[str] = Query(None, description="Relações a incluir: autor, editora"), if_none_match: Optional[str] = Header(None)):
+    campos = parse_fields(fields, LivroRead)
+    expansoes = expansao.parse_expand(expand, expansao.LIVRO_EXPANSOES)
+    if expansoes:
+        return _obter_livro_expandido(id, campos, expansoes)
+    livros = get_repositories().livros
+    # Com a versão em cache, o 304 sai sem consultar o banco!
+    tag = etag.cached_entity_etag(livros, id, campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     try:
-        livro = Livro.objects(id=id).get()
-        return LivroRead(**serialize(livro))
+        livro = livros.get(id, columns=columns_for(campos, "versao"))
+        tag = etag.entity_etag(id, livro.versao, campos)
+        if etag.matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        return render(LivroRead, serialize(livro, campos), fields=campos, etag=tag)
     except DoesNotExist:
         logger.warning(f"Livro não encontrado! ID {id}!")
         raise HTTPException(status_code=404, detail="Livro não encontrado!")
 
 
+def _obter_livro_expandido(id: UUID, campos: Optional[List[str]], expansoes: List[str]):
+    # Sem ETag: a versão do livro não cobre autor e editora!
+    repos = get_repositories()
+    try:
+        livro = repos.livros.get(id, columns=columns_for(campos, *expansao.colunas_livro(expansoes)))
+    except DoesNotExist:
+        logger.warning(f"Livro não encontrado! ID {id}!")
+        raise HTTPException(status_code=404, detail="Livro não encontrado!")
+    item = expansao.livros(repos, [livro], [serialize(livro, campos)], expansoes)[0]
+    return render(LivroExpandido, item, fields=expansao.campos_resposta(campos, expansoes, LivroRead))
+
+
+def _pagina(page: int, limit: int, total: int, livros: List[Livro], campos: Optional[List[str]], expansoes: List[str], tag: Optional[str]):
+    itens = [serialize(l, campos) for l in livros]
+    if not expansoes:
+        return render_page(PaginatedLivros, page, limit, total, itens, fields=campos, etag=tag)
+    # Autores e editoras da página inteira em uma leitura em lote cada!
+    expansao.livros(get_repositories(), livros, itens, expansoes)
+    return render_page(
+        PaginatedLivrosExpandidos, page, limit, total, itens, fields=expansao.campos_resposta(campos, expansoes, LivroRead),
+    )
+
+
+@router.get("/batch", response_model=LivrosPorIds)
+def obter_livros_por_ids(
+    ids: str = Query(..., description="Ids separados por vírgula"),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+):
+    campos = parse_fields(fields, LivroRead)
+    lista_ids = parse_ids(ids)
+    # Uma leitura por chave para cada id, todas em voo: uma requisição HTTP em vez de uma por id!
+    livros = get_repositories().livros.get_many(lista_ids, columns=columns_for(campos))
+    encontrados = {livro.id: serialize(livro, campos) for livro in livros}
+    logger.info("Leitura de %d livros por id! %d encontrados!", len(lista_ids), len(encontrados))
+    return render_batch(LivrosPorIds, lista_ids, encontrados, fields=campos)
+
+
 @router.post("/", response_model=LivroRead)
 def criar_livro(livro: LivroCreate):
+    repos = get_repositories()
+
     try:
-        Autor.objects(id=livro.autor_id).get()
+        repos.autores.get(livro.autor_id, columns=["id"])
     except DoesNotExist:
         logger.warning(f"Autor não encontrado! ID {livro.autor_id}!")
         raise HTTPException(status_code=400, detail="Autor não encontrado!")
 
     try:
-        Editora.objects(id=livro.editora_id).get()
+        repos.editoras.get(livro.editora_id)
     except DoesNotExist:
         logger.warning(f"Editora não encontrada! ID {livro.editora_id}!")
         raise HTTPException(status_code=400, detail="Editora não encontrada!")
 
-    novo_livro = Livro.create(**livro.dict())
+    novo_livro = repos.livros.create(**livro.dict())
     logger.info(f"Livro criado: {novo_livro.id} - {novo_livro.titulo}!")
-    return LivroRead(**serialize(novo_livro))
+    tags = [response_cache.tag("editora", novo_livro.editora_id)]
+    response_cache.invalidate(*tags)
+    write_behind.enqueue("livro_criado", tags, livro_id=novo_livro.id)
+    return render(LivroRead, serialize(novo_livro), etag=etag.entity_etag(novo_livro.id, novo_livro.versao))
 
 
 @router.patch("/", response_model=LivroRead)
-def atualizar_livro(livro_id: UUID, livro_update: LivroUpdate):
-    try:
-        livro = Livro.objects(id=livro_id).get()
-    except DoesNotExist:
-        logger.warning(f"Tentativa de atualizar livro inexistente! ID {livro_id}!")
-        raise HTTPException(status_code=404, detail="Livro não encontrado!")
-
+def atualizar_livro(livro_id: UUID, livro_update: LivroUpdate, prefer: Optional[str] = Header(None)):
+    repos = get_repositories()
     update_data = livro_update.dict(exclude_unset=True)
 
     if "titulo" in update_data:
-        titulo_existente = Livro.objects(titulo=update_data["titulo"]).allow_filtering()
+        titulo_existente = repos.livros.find_by(titulo=update_data["titulo"])
         for l in titulo_existente:
             if l.id != livro_id:
                 logger.warning(f"Título já em uso por outro livro! {update_data['titulo']}!")
@@ -77,66 +139,96 @@ def atualizar_livro(livro_id: UUID, livro_update: LivroUpdate):
 
     if "autor_id" in update_data:
         try:
-            Autor.objects(id=update_data["autor_id"]).get()
+            repos.autores.get(update_data["autor_id"])
         except DoesNotExist:
             logger.warning(f"Autor não encontrado! ID {update_data['autor_id']}!")
             raise HTTPException(status_code=400, detail="Autor não encontrado!")
 
     if "editora_id" in update_data:
         try:
-            Editora.objects(id=update_data["editora_id"]).get()
+            repos.editoras.get(update_data["editora_id"])
         except DoesNotExist:
             logger.warning(f"Editora não encontrada! ID {update_data['editora_id']}!")
             raise HTTPException(status_code=400, detail="Editora não encontrada!")
 
-    for key, value in update_data.items():
-        setattr(livro, key, value)
-    livro.update(**update_data)
+    editora_anterior = None
+    try:
+        if "editora_id" in update_data:
+            # Trocar de editora tira o livro de um catálogo: só nesse caso a rota lê a linha antes. Inteira: a
+            # checagem de existência do UPDATE ("read") a reaproveita pelo identity map!
+            editora_anterior = repos.livros.get(livro_id).editora_id
+        # A existência é conferida pelo update (WRITE_EXISTENCE_CHECK)!
+        livro = repos.livros.update(livro_id, **update_data)
+    except DoesNotExist:
+        logger.warning(f"Tentativa de atualizar livro inexistente! ID {livro_id}!")
+        raise HTTPException(status_code=404, detail="Livro não encontrado!")
+
+    tags = [response_cache.tag("livro", livro_id)]
+    if "editora_id" in update_data:
+        tags.append(response_cache.tag("editora", update_data["editora_id"]))
+    response_cache.invalidate(*tags)
+    if {"titulo", "autor_id", "editora_id"} & update_data.keys():
+        write_behind.enqueue(
+            "livro_alterado", tags, livro_id=livro_id, editora_anterior=editora_anterior,
+            pedidos="titulo" in update_data or "autor_id" in update_data,
+        )
 
     logger.info(f"Livro atualizado! ID {livro_id}!")
-    return LivroRead(**serialize(livro))
+    tag = etag.entity_etag(livro.id, livro.versao)
+    if prefers_minimal(prefer):
+        return no_content(tag)
+    return render(LivroRead, serialize(repos.livros.complete(livro)), etag=tag)
 
 
-@router.get("/", response_model=PaginatedLivros)
+@router.get("/", response_model=PaginatedLivrosExpandidos)
 def listar_livros(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
     autor_id: Optional[UUID] = Query(None),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    expand: Optional[str] = Query(None, description="Relações a incluir: autor, editora"),
+    if_none_match: Optional[str] = Header(None),
 ):
+    campos = parse_fields(fields, LivroRead)
+    expansoes = expansao.parse_expand(expand, expansao.LIVRO_EXPANSOES)
+    colunas = columns_for(campos, *expansao.colunas_livro(expansoes))
+    tag = None if expansoes else etag.page_etag(get_repositories().livros.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     offset = (page - 1) * limit
 
     if autor_id:
-        todos = list(Livro.objects(autor_id=autor_id).all())
+        todos = get_repositories().livros.find_by(columns=colunas, autor_id=autor_id)
     else:
-        todos = list(Livro.objects().all())
+        todos = get_repositories().livros.list_all(columns=colunas)
 
     total = len(todos)
     livros_paginados = todos[offset:offset + limit]
 
-    logger.info(
-        f"Listagem paginada de livros! Página {page}, limite {limit}, autor_id={autor_id}"
+    logger_listagem.info(
+        "Listagem paginada de livros! Página %s, limite %s, autor_id=%s", page, limit, autor_id
     )
 
-    return PaginatedLivros(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[LivroRead(**serialize(l)) for l in livros_paginados]
-    )
+    return _pagina(page, limit, total, livros_paginados, campos, expansoes, tag)
 
 
 @router.get("/count", response_model=LivroCount)
 def contar_livros():
-    total = Livro.objects().count()
-    logger.info(f"Contagem de livros! {total}!")
-    return LivroCount(total_livros=total)
+    total = get_repositories().livros.count()
+    logger_listagem.info("Contagem de livros! %s!", total)
+    return render(LivroCount, {"total_livros": total})
 
 
 @router.delete("/", response_model=dict)
 def deletar_livro(livro_id: UUID):
     try:
-        livro = Livro.objects(id=livro_id).get()
-        livro.delete()
+        repos = get_repositories()
+        repos.livros.delete(livro_id)
+        tags = [response_cache.tag("livro", livro_id)]
+        response_cache.invalidate(*tags)
+        # Vínculos PedidoLivro, pedidos detalhados e catálogo são limpos em segundo plano (a tarefa acha a
+        # editora pelo catálogo, sem leitura antes do DELETE)!
+        write_behind.enqueue("livro_removido", tags, livro_id=livro_id)
         logger.info(f"Livro deletado! ID {livro_id}!")
         return {"message": "Livro deletado com sucesso!"}
     except DoesNotExist:
@@ -144,7 +236,7 @@ def deletar_livro(livro_id: UUID):
         raise HTTPException(status_code=404, detail="Livro não encontrado!")
 
 
-@router.get("/filtro", response_model=PaginatedLivros)
+@router.get("/filtro", response_model=PaginatedLivrosExpandidos)
 def filtrar_livros(
     titulo: Optional[str] = Query(None),
     genero: Optional[str] = Query(None),
@@ -154,8 +246,17 @@ def filtrar_livros(
     editora_id: Optional[UUID] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    expand: Optional[str] = Query(None, description="Relações a incluir: autor, editora"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    livros = Livro.objects().all()
+    campos = parse_fields(fields, LivroRead)
+    expansoes = expansao.parse_expand(expand, expansao.LIVRO_EXPANSOES)
+    colunas = columns_for(campos, *expansao.colunas_livro(expansoes), *(coluna for coluna, valor in (("titulo", titulo), ("genero", genero), ("preco", preco_min), ("preco", preco_max), ("autor_id", autor_id), ("editora_id", editora_id)) if valor is not None))
+    tag = None if expansoes else etag.page_etag(get_repositories().livros.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    livros = get_repositories().livros.list_all(columns=colunas)
 
     if titulo:
         livros = [l for l in livros if titulo.lower() in l.titulo.lower()]
@@ -177,30 +278,29 @@ def filtrar_livros(
     offset = (page - 1) * limit
     livros_paginados = livros[offset:offset + limit]
 
-    logger.info(f"Filtro de livros aplicado! Página {page}, limite {limit}, total encontrados: {total}!")
-    return PaginatedLivros(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[LivroRead(**serialize(l)) for l in livros_paginados]
-    )
+    logger_listagem.info("Filtro de livros aplicado! Página %s, limite %s, total encontrados: %s!", page, limit, total)
+    return _pagina(page, limit, total, livros_paginados, campos, expansoes, tag)
 
 
-@router.get("/ordenado", response_model=PaginatedLivros)
+@router.get("/ordenado", response_model=PaginatedLivrosExpandidos)
 def listar_livros_ordenados(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    expand: Optional[str] = Query(None, description="Relações a incluir: autor, editora"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todos = list(Livro.objects().all())
+    campos = parse_fields(fields, LivroRead)
+    expansoes = expansao.parse_expand(expand, expansao.LIVRO_EXPANSOES)
+    colunas = columns_for(campos, "titulo", *expansao.colunas_livro(expansoes))
+    tag = None if expansoes else etag.page_etag(get_repositories().livros.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todos = get_repositories().livros.list_all(columns=colunas)
     todos.sort(key=lambda l: l.titulo.lower())
     total = len(todos)
     offset = (page - 1) * limit
     livros_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem ordenada de livros! Página {page}, limite {limit}!")
-    return PaginatedLivros(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[LivroRead(**serialize(l)) for l in livros_paginados]
-    )
\ No newline at end of file
+    logger_listagem.info("Listagem ordenada de livros! Página %s, limite %s!", page, limit)
+    return _pagina(page, limit, total, livros_paginados, campos, expansoes, tag)
\ No newline at end of file
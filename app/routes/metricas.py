@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from app import metrics
+
+router = APIRouter(prefix="/metricas", tags=["Métricas"])
+
+
+@router.get("/", response_model=dict)
+def obter_metricas():
+    # Contadores deste worker (agrupamento de requisições, etc.)!
+    return metrics.snapshot()
@@ -1,31 +1,43 @@
 from uuid import UUID
-from typing import Optional
+from typing import Optional, List
 from datetime import date, datetime
 from cassandra.util import Date as CassandraDate
 from cassandra.cqlengine.query import DoesNotExist
-from fastapi import APIRouter, HTTPException, Query
-from app.models.models import Pagamento, Pedido
+from fastapi import APIRouter, Header, HTTPException, Query
+from app.models.models import Pagamento
+from app.projections import por_dia
+from app.repositories import get_repositories
+from app import write_behind
 from app.schemas.schemas import (
     PagamentoCreate,
     PagamentoUpdate,
     PagamentoRead,
+    PagamentosPorIds,
     PaginatedPagamentos,
     PagamentoCount,
 )
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization import etag
+from app.serialization.fields import columns_for, parse_fields, parse_ids
+from app.serialization.responses import no_content, prefers_minimal, render, render_batch, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/pagamentos", tags=["Pagamentos"])
 
 
-def serialize(pagamento: Pagamento) -> dict:
-    data = {field: getattr(pagamento, field) for field in Pagamento._columns.keys()}
+def serialize(pagamento: Pagamento, fields: Optional[List[str]] = None) -> dict:
+    data = {field: getattr(pagamento, field) for field in (fields or Pagamento._columns.keys())}
+    if "data_pagamento" not in data:
+        return data
+
     cass_data = data.get("data_pagamento")
 
     try:
-        if isinstance(cass_data, (date, CassandraDate)):
-            data["data_pagamento"] = date.fromisoformat(str(cass_data))
-        else:
+        if isinstance(cass_data, CassandraDate):
+            data["data_pagamento"] = cass_data.date()
+        elif not isinstance(cass_data, date):
             logger.warning(f"data_pagamento inválido: {cass_data} ({type(cass_data)})!")
             raise ValueError("data_pagamento inválido!")
     except Exception as e:
@@ -36,117 +48,180 @@ def serialize(pagamento: Pagamento) -> dict:
 
 
 @router.get("/pagamentos/{id}", response_model=PagamentoRead)
-def obter_pagamento_por_id(id: UUID):
+def obter_pagamento_por_id(id: UUID, fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"), if_none_match: Optional[str] = Header(None)):
+    campos = parse_fields(fields, PagamentoRead)
+    pagamentos = get_repositories().pagamentos
+    # Com a versão em cache, o 304 sai sem consultar o banco!
+    tag = etag.cached_entity_etag(pagamentos, id, campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     try:
-        pagamento = Pagamento.objects(id=id).get()
-        return PagamentoRead(**serialize(pagamento))
+        pagamento = pagamentos.get(id, columns=columns_for(campos, "versao"))
+        tag = etag.entity_etag(id, pagamento.versao, campos)
+        if etag.matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        return render(PagamentoRead, serialize(pagamento, campos), fields=campos, etag=tag)
     except DoesNotExist:
         logger.warning(f"Pagamento não encontrado! ID {id}!")
         raise HTTPException(status_code=404, detail="Pagamento não encontrado!")
 
 
+@router.get("/batch", response_model=PagamentosPorIds)
+def obter_pagamentos_por_ids(
+    ids: str = Query(..., description="Ids separados por vírgula"),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+):
+    campos = parse_fields(fields, PagamentoRead)
+    lista_ids = parse_ids(ids)
+    # Uma leitura por chave para cada id, todas em voo: uma requisição HTTP em vez de uma por id!
+    pagamentos = get_repositories().pagamentos.get_many(lista_ids, columns=columns_for(campos))
+    encontrados = {pagamento.id: serialize(pagamento, campos) for pagamento in pagamentos}
+    logger.info("Leitura de %d pagamentos por id! %d encontrados!", len(lista_ids), len(encontrados))
+    return render_batch(PagamentosPorIds, lista_ids, encontrados, fields=campos)
+
+
 @router.post("/", response_model=PagamentoRead)
 def criar_pagamento(pagamento: PagamentoCreate):
+    repos = get_repositories()
+
     try:
-        Pedido.objects(id=pagamento.pedido_id).get()
+        repos.pedidos.get(pagamento.pedido_id)
     except DoesNotExist:
         logger.warning(f"Pedido não encontrado! ID {pagamento.pedido_id}!")
         raise HTTPException(status_code=400, detail="Pedido não encontrado!")
 
-    pagamento_existente = Pagamento.objects(pedido_id=pagamento.pedido_id).allow_filtering().first()
+    pagamento_existente = repos.pagamentos.find_by(pedido_id=pagamento.pedido_id)
     if pagamento_existente:
         logger.warning(f"Pagamento já existente para o pedido! ID {pagamento.pedido_id}!")
         raise HTTPException(status_code=400, detail="Já existe um pagamento para este pedido!")
 
-    novo_pagamento = Pagamento.create(**pagamento.dict())
+    novo_pagamento = repos.pagamentos.create(**pagamento.dict())
+    # A série por dia é gravada aqui mesmo: o filtro por data enxerga o pagamento na hora (sem cópia antiga)!
+    por_dia.salvar(repos.pagamentos_por_dia, novo_pagamento)
+    write_behind.enqueue("pagamento_criado", pagamento_id=novo_pagamento.id)
     logger.info(f"Pagamento criado: {novo_pagamento.id} - Pedido {novo_pagamento.pedido_id}!")
-    return PagamentoRead(**serialize(novo_pagamento))
+    return render(PagamentoRead, serialize(novo_pagamento), etag=etag.entity_etag(novo_pagamento.id, novo_pagamento.versao))
 
 
 @router.patch("/", response_model=PagamentoRead)
-def atualizar_pagamento(pagamento_id: UUID, pagamento_update: PagamentoUpdate):
-    try:
-        pagamento = Pagamento.objects(id=pagamento_id).get()
-    except DoesNotExist:
-        logger.warning(f"Tentativa de atualizar pagamento inexistente! ID {pagamento_id}!")
-        raise HTTPException(status_code=404, detail="Pagamento não encontrado!")
-
+def atualizar_pagamento(pagamento_id: UUID, pagamento_update: PagamentoUpdate, prefer: Optional[str] = Header(None)):
+    repos = get_repositories()
     update_data = pagamento_update.dict(exclude_unset=True)
 
     if "pedido_id" in update_data:
         novo_pedido_id = update_data["pedido_id"]
 
         try:
-            Pedido.objects(id=novo_pedido_id).get()
+            repos.pedidos.get(novo_pedido_id)
         except DoesNotExist:
             logger.warning(f"Pedido não encontrado! ID {novo_pedido_id}!")
             raise HTTPException(status_code=400, detail="Pedido não encontrado!")
 
-        pagamentos_existentes = Pagamento.objects(pedido_id=novo_pedido_id).allow_filtering()
+        pagamentos_existentes = repos.pagamentos.find_by(pedido_id=novo_pedido_id)
         for p in pagamentos_existentes:
             if p.id != pagamento_id:
                 logger.warning(f"Já existe um pagamento para este pedido! ID {novo_pedido_id}!")
                 raise HTTPException(status_code=400, detail="Já existe um pagamento para este pedido!")
 
-    for key, value in update_data.items():
-        setattr(pagamento, key, value)
-    pagamento.update(**update_data)
+    dia_anterior = None
+    try:
+        if "data_pagamento" in update_data:
+            # A cópia por dia muda de dia: só nesse caso a rota lê a linha antes. Inteira: a checagem de
+            # existência do UPDATE ("read") a reaproveita pelo identity map!
+            dia_anterior = repos.pagamentos.get(pagamento_id).data_pagamento
+        pagamento = repos.pagamentos.update(pagamento_id, **update_data)
+    except DoesNotExist:
+        logger.warning(f"Tentativa de atualizar pagamento inexistente! ID {pagamento_id}!")
+        raise HTTPException(status_code=404, detail="Pagamento não encontrado!")
+
+    if update_data:
+        # pagamentos_por_dia copia todas as colunas: a linha completa é regravada na própria requisição (com a
+        # checagem "read", o update já a devolve completa)!
+        pagamento = repos.pagamentos.complete(pagamento)
+        if "data_pagamento" not in update_data:
+            dia_anterior = pagamento.data_pagamento
+        por_dia.salvar(repos.pagamentos_por_dia, pagamento, dia_anterior)
+
+    tags = [response_cache.tag("pagamento", pagamento_id)]
+    response_cache.invalidate(*tags)
+    if {"valor", "data_pagamento", "forma_pagamento"} & update_data.keys():
+        # Pedidos detalhados só guardam valor e data; os rollups de vendas usam também a forma!
+        write_behind.enqueue(
+            "pagamento_alterado", tags, pagamento_id=pagamento_id,
+            pedidos=bool({"valor", "data_pagamento"} & update_data.keys()),
+        )
 
     logger.info(f"Pagamento atualizado! ID {pagamento_id}!")
-    return PagamentoRead(**serialize(pagamento))
+    tag = etag.entity_etag(pagamento.id, pagamento.versao)
+    if prefers_minimal(prefer):
+        return no_content(tag)
+    if not update_data:
+        pagamento = repos.pagamentos.complete(pagamento)
+    return render(PagamentoRead, serialize(pagamento), etag=tag)
 
 
 @router.get("/", response_model=PaginatedPagamentos)
 def listar_pagamentos(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
+    campos = parse_fields(fields, PagamentoRead)
+    colunas = columns_for(campos)
+    tag = etag.page_etag(get_repositories().pagamentos.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     offset = (page - 1) * limit
-    todos = list(Pagamento.objects().all())
+    todos = get_repositories().pagamentos.list_all(columns=colunas)
     total = len(todos)
     pagamentos_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem paginada de pagamentos! Página {page}, limite {limit}!")
-    return PaginatedPagamentos(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[PagamentoRead(**serialize(p)) for p in pagamentos_paginados]
-    )
+    logger_listagem.info("Listagem paginada de pagamentos! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedPagamentos, page, limit, total, [serialize(p, campos) for p in pagamentos_paginados], fields=campos, etag=tag)
 
 
 @router.get("/ordenado", response_model=PaginatedPagamentos)
 def listar_pagamentos_ordenados(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todos = list(Pagamento.objects().all())
+    campos = parse_fields(fields, PagamentoRead)
+    colunas = columns_for(campos, "data_pagamento")
+    tag = etag.page_etag(get_repositories().pagamentos.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todos = get_repositories().pagamentos.list_all(columns=colunas)
     todos.sort(key=lambda p: str(p.data_pagamento))
     total = len(todos)
     offset = (page - 1) * limit
     pagamentos_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem ordenada de pagamentos! Página {page}, limite {limit}!")
-    return PaginatedPagamentos(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[PagamentoRead(**serialize(p)) for p in pagamentos_paginados]
-    )
+    logger_listagem.info("Listagem ordenada de pagamentos! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedPagamentos, page, limit, total, [serialize(p, campos) for p in pagamentos_paginados], fields=campos, etag=tag)
 
 
 @router.get("/count", response_model=PagamentoCount)
 def contar_pagamentos():
-    total = Pagamento.objects().count()
-    logger.info(f"Contagem de pagamentos! {total}!")
-    return PagamentoCount(total_pagamentos=total)
+    total = get_repositories().pagamentos.count()
+    logger_listagem.info("Contagem de pagamentos! %s!", total)
+    return render(PagamentoCount, {"total_pagamentos": total})
 
 
 @router.delete("/", response_model=dict)
 def deletar_pagamento(pagamento_id: UUID):
     try:
-        pagamento = Pagamento.objects(id=pagamento_id).get()
-        pagamento.delete()
+        repos = get_repositories()
+        # O dia da cópia por dia vem de uma leitura por chave (nunca de um índice consultado em todos os nós)!
+        dia = repos.pagamentos.get(pagamento_id, columns=["id", "data_pagamento"]).data_pagamento
+        repos.pagamentos.delete(pagamento_id)
+        por_dia.remover(repos.pagamentos_por_dia, pagamento_id, dia)
+        tags = [response_cache.tag("pagamento", pagamento_id)]
+        response_cache.invalidate(*tags)
+        # Vínculos PedidoPagamento e pedidos detalhados são limpos em segundo plano!
+        write_behind.enqueue("pagamento_removido", tags, pagamento_id=pagamento_id)
         logger.info(f"Pagamento deletado! ID {pagamento_id}!")
         return {"message": "Pagamento deletado com sucesso!"}
     except DoesNotExist:
@@ -159,24 +234,43 @@ def filtrar_pagamentos(
     pedido_id: Optional[UUID] = Query(None),
     forma_pagamento: Optional[str] = Query(None),
     data_pagamento: Optional[str] = Query(None),
+    data_inicio: Optional[date] = Query(None, description="Início do período (inclusive)"),
+    data_fim: Optional[date] = Query(None, description="Fim do período (inclusive; padrão: hoje)"),
     valor_min: Optional[float] = Query(None),
     valor_max: Optional[float] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    pagamentos = list(Pagamento.objects().all())
-
-    if pedido_id:
-        pagamentos = [p for p in pagamentos if p.pedido_id == pedido_id]
-    if forma_pagamento:
-        pagamentos = [p for p in pagamentos if forma_pagamento.lower() in p.forma_pagamento.lower()]
+    campos = parse_fields(fields, PagamentoRead)
+    colunas = columns_for(campos, *(coluna for coluna, valor in (("pedido_id", pedido_id), ("forma_pagamento", forma_pagamento), ("data_pagamento", data_pagamento), ("valor", valor_min), ("valor", valor_max)) if valor is not None))
+    tag = etag.page_etag(get_repositories().pagamentos.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    data_obj = None
     if data_pagamento:
         try:
             data_obj = datetime.strptime(data_pagamento, "%Y-%m-%d").date()
-            pagamentos = [p for p in pagamentos if date.fromisoformat(str(p.data_pagamento)) == data_obj]
         except ValueError:
             logger.warning(f"Formato inválido para data_pagamento! {data_pagamento}!")
             raise HTTPException(status_code=400, detail="Formato de data inválido. Use AAAA-MM-DD!")
+    try:
+        intervalo = por_dia.periodo(data_inicio, data_fim, data_obj)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    repos = get_repositories()
+    if intervalo is not None:
+        # Só as partições dos dias do período (pagamentos_por_dia), lidas em paralelo e já em ordem!
+        pagamentos = por_dia.ler(repos.pagamentos_por_dia, intervalo, columns=colunas)
+    else:
+        pagamentos = repos.pagamentos.list_all(columns=colunas)
+
+    if pedido_id:
+        pagamentos = [p for p in pagamentos if p.pedido_id == pedido_id]
+    if forma_pagamento:
+        pagamentos = [p for p in pagamentos if forma_pagamento.lower() in p.forma_pagamento.lower()]
     if valor_min is not None:
         pagamentos = [p for p in pagamentos if p.valor >= valor_min]
     if valor_max is not None:
@@ -189,10 +283,5 @@ def filtrar_pagamentos(
     offset = (page - 1) * limit
     pagamentos_paginados = pagamentos[offset:offset + limit]
 
-    logger.info(f"Filtro de pagamentos aplicado! Página {page}, limite {limit}, total encontrados: {total}!")
-    return PaginatedPagamentos(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[PagamentoRead(**serialize(p)) for p in pagamentos_paginados]
-    )
\ No newline at end of file
+    logger_listagem.info("Filtro de pagamentos aplicado! Página %s, limite %s, total encontrados: %s!", page, limit, total)
+    return render_page(PaginatedPagamentos, page, limit, total, [serialize(p, campos) for p in pagamentos_paginados], fields=campos, etag=tag)
\ No newline at end of file
@@ -2,11 +2,16 @@ from fastapi import APIRouter, HTTPException, Query, Path
 from typing import List
 from uuid import UUID
 from cassandra.cqlengine.query import DoesNotExist
-from app.models.models import PedidoLivro, Livro, Autor
-from app.schemas.schemas import PedidoLivroCreate, PedidoLivroRead, PaginatedPedidoLivro, LivroInfo
+from app.models.models import PedidoLivro
+from app.repositories import get_repositories
+from app import write_behind
+from app.schemas.schemas import PedidoLivroCreate, PedidoLivroRead, PaginatedPedidoLivro
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization.responses import render, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/pedido-livro", tags=["PedidoLivro"])
 
 
@@ -19,15 +24,18 @@ def serialize_pedido_livro(rel: PedidoLivro) -> dict:
 
 @router.post("/vincular", response_model=PedidoLivroRead, status_code=201)
 def vincular_livro_pedido(rel: PedidoLivroCreate):
-    existe = PedidoLivro.objects(pedido_id=rel.pedido_id, livro_id=rel.livro_id).count() > 0
+    pedido_livro = get_repositories().pedido_livro
+    existe = pedido_livro.exists(rel.pedido_id, rel.livro_id)
     if existe:
         logger.warning(f"Tentativa de vincular relação existente: Pedido {rel.pedido_id} - Livro {rel.livro_id}")
         raise HTTPException(status_code=400, detail="Relação já existe.")
 
-    nova_rel = PedidoLivro(pedido_id=rel.pedido_id, livro_id=rel.livro_id)
-    nova_rel.save()
+    nova_rel = pedido_livro.link(rel.pedido_id, rel.livro_id)
+    tags = [response_cache.tag("pedido", rel.pedido_id)]
+    response_cache.invalidate(*tags)
+    write_behind.enqueue("livro_vinculado", tags, pedido_id=rel.pedido_id, livro_id=rel.livro_id)
     logger.info(f"Livro vinculado ao pedido: Pedido {rel.pedido_id} - Livro {rel.livro_id}")
-    return PedidoLivroRead(**serialize_pedido_livro(nova_rel))
+    return render(PedidoLivroRead, serialize_pedido_livro(nova_rel), status_code=201)
 
 
 @router.get("/livros/{pedido_id}", response_model=PaginatedPedidoLivro)
@@ -36,7 +44,8 @@ def listar_livros_de_pedido(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
 ):
-    todos = list(PedidoLivro.objects(pedido_id=pedido_id))
+    repos = get_repositories()
+    todos = repos.pedido_livro.list_by_pedido(pedido_id)
     total = len(todos)
     if total == 0:
         logger.warning(f"Nenhum livro vinculado ao pedido {pedido_id}")
@@ -45,28 +54,31 @@ def listar_livros_de_pedido(
     offset = (page - 1) * limit
     rels_paginados = todos[offset:offset + limit]
 
+    # Livros e autores da página em duas leituras em lote (não uma por vínculo), com as colunas usadas!
+    livro_ids = [rel.livro_id for rel in rels_paginados]
+    livros = {
+        livro.id: livro for livro in repos.livros.get_many(livro_ids, columns=["id", "titulo", "autor_id"])
+    } if livro_ids else {}
+    autor_ids = list(dict.fromkeys(livro.autor_id for livro in livros.values()))
+    autores = {
+        autor.id: autor for autor in repos.autores.get_many(autor_ids, columns=["id", "nome"])
+    } if autor_ids else {}
+
     items = []
-    for rel in rels_paginados:
-        try:
-            livro = Livro.objects(id=rel.livro_id).get()
-            autor = Autor.objects(id=livro.autor_id).get()
-            livro_info = LivroInfo(
-                id=livro.id,
-                titulo=livro.titulo,
-                autor_nome=autor.nome
-            )
-           
-            items.append(livro_info.dict())
-        except DoesNotExist:
-            logger.warning(f"Livro ou Autor não encontrado para livro_id {rel.livro_id}")
+    for livro_id in livro_ids:
+        livro = livros.get(livro_id)
+        autor = autores.get(livro.autor_id) if livro is not None else None
+        if autor is None:
+            logger.warning(f"Livro ou Autor não encontrado para livro_id {livro_id}")
+            continue
+        items.append({
+            "id": livro.id,
+            "titulo": livro.titulo,
+            "autor_nome": autor.nome,
+        })
 
-    logger.info(f"Listagem paginada de livros vinculados ao pedido {pedido_id}. Página {page}, limite {limit}.")
-    return PaginatedPedidoLivro(
-        page=page,
-        limit=limit,
-        total=total,
-        items=items,
-    )
+    logger_listagem.info("Listagem paginada de livros vinculados ao pedido %s. Página %s, limite %s.", pedido_id, page, limit)
+    return render_page(PaginatedPedidoLivro, page, limit, total, items)
 
 
 @router.delete("/desvincular", status_code=204)
@@ -75,8 +87,10 @@ def desvincular_livro_pedido(
     livro_id: UUID = Query(..., description="ID do Livro"),
 ):
     try:
-        rel = PedidoLivro.objects(pedido_id=pedido_id, livro_id=livro_id).get()
-        rel.delete()
+        get_repositories().pedido_livro.unlink(pedido_id, livro_id)
+        tags = [response_cache.tag("pedido", pedido_id)]
+        response_cache.invalidate(*tags)
+        write_behind.enqueue("livro_desvinculado", tags, pedido_id=pedido_id, livro_id=livro_id)
         logger.info(f"Relação Pedido {pedido_id} - Livro {livro_id} desvinculada com sucesso")
     except DoesNotExist:
         logger.warning(f"Tentativa de desvincular relação inexistente: Pedido {pedido_id} - Livro {livro_id}")
@@ -3,10 +3,15 @@ from typing import List
 from uuid import UUID
 from cassandra.cqlengine.query import DoesNotExist
 from app.models.models import PedidoPagamento
+from app.repositories import get_repositories
+from app import write_behind
 from app.schemas.schemas import PedidoPagamentoCreate, PedidoPagamentoRead, PaginatedPedidoPagamento
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization.responses import render, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/pedido-pagamento", tags=["PedidoPagamento"])
 
 def serialize(rel: PedidoPagamento) -> dict:
@@ -17,15 +22,18 @@ def serialize(rel: PedidoPagamento) -> dict:
 
 @router.post("/vincular", response_model=PedidoPagamentoRead, status_code=201)
 def vincular_pagamento_pedido(rel: PedidoPagamentoCreate):
-    existe = PedidoPagamento.objects(pedido_id=rel.pedido_id, pagamento_id=rel.pagamento_id).count() > 0
+    pedido_pagamento = get_repositories().pedido_pagamento
+    existe = pedido_pagamento.exists(rel.pedido_id, rel.pagamento_id)
     if existe:
         logger.warning(f"Tentativa de vincular relação existente: Pedido {rel.pedido_id} - Pagamento {rel.pagamento_id}")
         raise HTTPException(status_code=400, detail="Relação já existe.")
 
-    nova_rel = PedidoPagamento(pedido_id=rel.pedido_id, pagamento_id=rel.pagamento_id)
-    nova_rel.save()
+    nova_rel = pedido_pagamento.link(rel.pedido_id, rel.pagamento_id)
+    tags = [response_cache.tag("pedido", rel.pedido_id)]
+    response_cache.invalidate(*tags)
+    write_behind.enqueue("pagamento_vinculado", tags, pedido_id=rel.pedido_id, pagamento_id=rel.pagamento_id)
     logger.info(f"Pagamento vinculado ao pedido: Pedido {rel.pedido_id} - Pagamento {rel.pagamento_id}")
-    return PedidoPagamentoRead(**serialize(nova_rel))
+    return render(PedidoPagamentoRead, serialize(nova_rel), status_code=201)
 
 @router.get("/pagamentos/{pedido_id}", response_model=PaginatedPedidoPagamento)
 def listar_pagamentos_de_pedido(
@@ -33,7 +41,7 @@ def listar_pagamentos_de_pedido(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
 ):
-    todos = list(PedidoPagamento.objects(pedido_id=pedido_id))
+    todos = get_repositories().pedido_pagamento.list_by_pedido(pedido_id)
     total = len(todos)
     if total == 0:
         logger.warning(f"Nenhum pagamento vinculado ao pedido {pedido_id}")
@@ -42,15 +50,10 @@ def listar_pagamentos_de_pedido(
     offset = (page - 1) * limit
     pagamentos_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem paginada de pagamentos vinculados ao pedido {pedido_id}. Página {page}, limite {limit}.")
-    items = [PedidoPagamentoRead(**serialize(p)) for p in pagamentos_paginados]
+    logger_listagem.info("Listagem paginada de pagamentos vinculados ao pedido %s. Página %s, limite %s.", pedido_id, page, limit)
+    items = [serialize(p) for p in pagamentos_paginados]
 
-    return PaginatedPedidoPagamento(
-        page=page,
-        limit=limit,
-        total=total,
-        items=items,
-    )
+    return render_page(PaginatedPedidoPagamento, page, limit, total, items)
 
 @router.delete("/desvincular", status_code=204)
 def desvincular_pagamento_pedido(
@@ -58,8 +61,10 @@ def desvincular_pagamento_pedido(
     pagamento_id: UUID = Query(..., description="ID do Pagamento"),
 ):
     try:
-        rel = PedidoPagamento.objects(pedido_id=pedido_id, pagamento_id=pagamento_id).get()
-        rel.delete()
+        get_repositories().pedido_pagamento.unlink(pedido_id, pagamento_id)
+        tags = [response_cache.tag("pedido", pedido_id)]
+        response_cache.invalidate(*tags)
+        write_behind.enqueue("pagamento_desvinculado", tags, pedido_id=pedido_id, pagamento_id=pagamento_id)
         logger.info(f"Relação Pedido {pedido_id} - Pagamento {pagamento_id} desvinculada com sucesso")
     except DoesNotExist:
         logger.warning(f"Tentativa de desvincular relação inexistente: Pedido {pedido_id} - Pagamento {pagamento_id}")
@@ -1,31 +1,47 @@
-from uuid import UUID
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+from uuid import UUID, uuid1, uuid4
+from typing import Optional, List
+from fastapi import APIRouter, Header, HTTPException, Query
 from cassandra.cqlengine.query import DoesNotExist
 from cassandra.util import Date as CassandraDate
 from datetime import date, datetime
-from app.models.models import Pedido, Usuario
+from app.models.models import Pedido
+from app.projections import pedido_detalhado, por_dia
+from app.repositories import get_repositories
+from app import write_behind
 from app.schemas.schemas import (
+    CheckoutCreate,
+    CheckoutRead,
     PedidoCreate,
     PedidoUpdate,
     PedidoRead,
+    PedidoExpandido,
+    PedidosPorIds,
     PaginatedPedido,
+    PaginatedPedidosExpandidos,
     ContagemPedidos,
 )
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization import etag, expand as expansao
+from app.serialization.fields import columns_for, parse_fields, parse_ids
+from app.serialization.responses import no_content, prefers_minimal, render, render_batch, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/pedidos", tags=["Pedidos"])
 
 
-def serialize(pedido: Pedido) -> dict:
-    data = {field: getattr(pedido, field) for field in Pedido._columns.keys()}
+def serialize(pedido: Pedido, fields: Optional[List[str]] = None) -> dict:
+    data = {field: getattr(pedido, field) for field in (fields or Pedido._columns.keys())}
+    if "data_pedido" not in data:
+        return data
+
     cass_data = data.get("data_pedido")
 
     try:
-        if isinstance(cass_data, (date, CassandraDate)):
-            data["data_pedido"] = date.fromisoformat(str(cass_data))
-        else:
+        if isinstance(cass_data, CassandraDate):
+            data["data_pedido"] = cass_data.date()
+        elif not isinstance(cass_data, date):
             logger.warning(f"data_pedido inválido: {cass_data} ({type(cass_data)})!")
             raise ValueError("data_pedido inválido!")
     except Exception as e:
@@ -35,105 +51,267 @@ def serialize(pedido: Pedido) -> dict:
     return data
 
 
-@router.get("/pedidos/{id}", response_model=PedidoRead)
-def obter_pedido_por_id(id: UUID):
+@router.get("/pedidos/{id}", response_model=PedidoExpandido)
+def obter_pedido_por_id(id: UUID, fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"), expand: Optional[str] = Query(None, description="Relações a incluir: livros, pagamentos"), if_none_match: Optional[str] = Header(None)):
+    campos = parse_fields(fields, PedidoRead)
+    expansoes = expansao.parse_expand(expand, expansao.PEDIDO_EXPANSOES)
+    if expansoes:
+        return _obter_pedido_expandido(id, campos, expansoes)
+    pedidos = get_repositories().pedidos
+    # Com a versão em cache, o 304 sai sem consultar o banco!
+    tag = etag.cached_entity_etag(pedidos, id, campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     try:
-        pedido = Pedido.objects(id=id).get()
-        return PedidoRead(**serialize(pedido))
+        pedido = pedidos.get(id, columns=columns_for(campos, "versao"))
+        tag = etag.entity_etag(id, pedido.versao, campos)
+        if etag.matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        return render(PedidoRead, serialize(pedido, campos), fields=campos, etag=tag)
     except DoesNotExist:
         logger.warning(f"Pedido não encontrado! ID {id}!")
         raise HTTPException(status_code=404, detail="Pedido não encontrado!")
 
 
+def _obter_pedido_expandido(id: UUID, campos: Optional[List[str]], expansoes: List[str]):
+    # Sem ETag: a versão do pedido não cobre vínculos, livros e pagamentos!
+    repos = get_repositories()
+    try:
+        pedido = repos.pedidos.get(id, columns=columns_for(campos))
+    except DoesNotExist:
+        logger.warning(f"Pedido não encontrado! ID {id}!")
+        raise HTTPException(status_code=404, detail="Pedido não encontrado!")
+    item = expansao.pedidos(repos, [pedido], [serialize(pedido, campos)], expansoes)[0]
+    return render(PedidoExpandido, item, fields=expansao.campos_resposta(campos, expansoes, PedidoRead))
+
+
+def _pagina(page: int, limit: int, total: int, pedidos: List[Pedido], campos: Optional[List[str]], expansoes: List[str], tag: Optional[str]):
+    itens = [serialize(p, campos) for p in pedidos]
+    if not expansoes:
+        return render_page(PaginatedPedido, page, limit, total, itens, fields=campos, etag=tag)
+    # Vínculos de todos os pedidos da página e depois livros/pagamentos deduplicados, em lote!
+    expansao.pedidos(get_repositories(), pedidos, itens, expansoes)
+    return render_page(
+        PaginatedPedidosExpandidos, page, limit, total, itens, fields=expansao.campos_resposta(campos, expansoes, PedidoRead),
+    )
+
+
+@router.get("/batch", response_model=PedidosPorIds)
+def obter_pedidos_por_ids(
+    ids: str = Query(..., description="Ids separados por vírgula"),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+):
+    campos = parse_fields(fields, PedidoRead)
+    lista_ids = parse_ids(ids)
+    # Uma leitura por chave para cada id, todas em voo: uma requisição HTTP em vez de uma por id!
+    pedidos = get_repositories().pedidos.get_many(lista_ids, columns=columns_for(campos))
+    encontrados = {pedido.id: serialize(pedido, campos) for pedido in pedidos}
+    logger.info("Leitura de %d pedidos por id! %d encontrados!", len(lista_ids), len(encontrados))
+    return render_batch(PedidosPorIds, lista_ids, encontrados, fields=campos)
+
+
 @router.post("/", response_model=PedidoRead)
 def criar_pedido(pedido: PedidoCreate):
+    repos = get_repositories()
+
     try:
-        Usuario.objects(id=pedido.usuario_id).get()
+        repos.usuarios.get(pedido.usuario_id)
     except DoesNotExist:
         logger.warning(f"Usuário não encontrado! ID {pedido.usuario_id}!")
         raise HTTPException(status_code=400, detail="Usuário não encontrado!")
 
-    novo_pedido = Pedido.create(**pedido.dict())
+    novo_pedido = repos.pedidos.create(**pedido.dict())
+    # A série por dia é gravada aqui mesmo: o filtro por data enxerga o pedido na hora (pedido novo, sem cópia antiga)!
+    por_dia.salvar(repos.pedidos_por_dia, novo_pedido)
+    tags = [response_cache.tag("usuario", novo_pedido.usuario_id)]
+    response_cache.invalidate(*tags)
+    write_behind.enqueue("pedido_criado", tags, pedido_id=novo_pedido.id)
     logger.info(f"Pedido criado: {novo_pedido.id} (Usuário {novo_pedido.usuario_id})!")
-    return PedidoRead(**serialize(novo_pedido))
+    return render(PedidoRead, serialize(novo_pedido), etag=etag.entity_etag(novo_pedido.id, novo_pedido.versao))
 
 
-@router.patch("/", response_model=PedidoRead)
-def atualizar_pedido(pedido_id: UUID, pedido_update: PedidoUpdate):
+@router.post("/checkout", response_model=CheckoutRead, status_code=201)
+def checkout(checkout: CheckoutCreate):
+    repos = get_repositories()
+    # Ids repetidos contam uma vez só (PedidoLivro é chaveado por pedido + livro)!
+    livro_ids = list(dict.fromkeys(checkout.livro_ids))
+    if not livro_ids:
+        raise HTTPException(status_code=400, detail="Informe ao menos um livro!")
+
     try:
-        pedido = Pedido.objects(id=pedido_id).get()
+        repos.usuarios.get(checkout.usuario_id, columns=["id"])
     except DoesNotExist:
-        logger.warning(f"Tentativa de atualizar pedido inexistente! ID {pedido_id}!")
-        raise HTTPException(status_code=404, detail="Pedido não encontrado!")
+        logger.warning(f"Usuário não encontrado! ID {checkout.usuario_id}!")
+        raise HTTPException(status_code=400, detail="Usuário não encontrado!")
 
+    # Leituras em lote: todos os livros de uma vez e depois todos os autores!
+    livros = repos.livros.get_many(livro_ids, columns=["id", "titulo", "preco", "autor_id"])
+    if len(livros) != len(livro_ids):
+        encontrados = {livro.id for livro in livros}
+        faltando = [str(id) for id in livro_ids if id not in encontrados]
+        logger.warning(f"Checkout com livros inexistentes! {', '.join(faltando)}!")
+        raise HTTPException(status_code=400, detail=f"Livros não encontrados: {', '.join(faltando)}!")
+    autor_ids = list(dict.fromkeys(livro.autor_id for livro in livros))
+    autores = {autor.id: autor.nome for autor in repos.autores.get_many(autor_ids, columns=["id", "nome"])}
+
+    data_pedido = checkout.data_pedido or date.today()
+    valor_total = round(sum(livro.preco or 0.0 for livro in livros), 2)
+    pedido = {
+        "id": uuid4(), "usuario_id": checkout.usuario_id, "status": "pago", "valor_total": valor_total,
+        "data_pedido": data_pedido, "versao": uuid1(),
+    }
+    pagamento = {
+        "id": uuid4(), "pedido_id": pedido["id"], "valor": valor_total, "data_pagamento": data_pedido,
+        "forma_pagamento": checkout.forma_pagamento, "versao": uuid1(),
+    }
+    doc = pedido_detalhado.documentos(
+        [pedido],
+        [{"pedido_id": pedido["id"], "livro_id": livro.id} for livro in livros],
+        [{"pedido_id": pedido["id"], "pagamento_id": pagamento["id"]}],
+        {livro.id: {"id": livro.id, "titulo": livro.titulo, "autor_id": livro.autor_id} for livro in livros},
+        {autor_id: {"nome": nome} for autor_id, nome in autores.items()},
+        {pagamento["id"]: pagamento},
+    )
+
+    # Pedido, itens, pagamento, vínculos, pedido_detalhado e séries por dia entram juntos (ou nada entra)!
+    repos.insert_batch({
+        "pedidos": [pedido],
+        "pagamentos": [pagamento],
+        "pedidos_por_dia": [pedido],
+        "pagamentos_por_dia": [pagamento],
+        "pedido_livro": [{"pedido_id": pedido["id"], "livro_id": livro.id} for livro in livros],
+        "pedido_pagamento": [{"pedido_id": pedido["id"], "pagamento_id": pagamento["id"]}],
+        "pedido_detalhado": doc,
+    })
+    response_cache.invalidate(response_cache.tag("usuario", checkout.usuario_id))
+    write_behind.enqueue("checkout_concluido", pedido_id=pedido["id"], pagamento_id=pagamento["id"])
+    logger.info(f"Checkout concluído: pedido {pedido['id']} com {len(livros)} livros (Usuário {checkout.usuario_id})!")
+
+    return render(CheckoutRead, {
+        "pedido": pedido,
+        "livros": [
+            {"id": livro.id, "titulo": livro.titulo, "preco": livro.preco, "autor_nome": autores.get(livro.autor_id)}
+            for livro in livros
+        ],
+        "pagamento": pagamento,
+    }, status_code=201)
+
+
+@router.patch("/", response_model=PedidoRead)
+def atualizar_pedido(pedido_id: UUID, pedido_update: PedidoUpdate, prefer: Optional[str] = Header(None)):
+    repos = get_repositories()
     update_data = pedido_update.dict(exclude_unset=True)
 
     if "usuario_id" in update_data:
         try:
-            Usuario.objects(id=update_data["usuario_id"]).get()
+            repos.usuarios.get(update_data["usuario_id"])
         except DoesNotExist:
             logger.warning(f"Usuário não encontrado! ID {update_data['usuario_id']}!")
             raise HTTPException(status_code=400, detail="Usuário não encontrado!")
 
-    for key, value in update_data.items():
-        setattr(pedido, key, value)
-    pedido.update(**update_data)
+    anterior = None
+    try:
+        if {"usuario_id", "data_pedido"} & update_data.keys():
+            # O pedido detalhado muda de partição e a cópia por dia muda de dia: só nesses casos a rota lê a linha
+            # antes. Inteira: a checagem de existência do UPDATE ("read") a reaproveita pelo identity map!
+            anterior = repos.pedidos.get(pedido_id)
+        pedido = repos.pedidos.update(pedido_id, **update_data)
+    except DoesNotExist:
+        logger.warning(f"Tentativa de atualizar pedido inexistente! ID {pedido_id}!")
+        raise HTTPException(status_code=404, detail="Pedido não encontrado!")
+    usuario_anterior = anterior.usuario_id if "usuario_id" in update_data else None
+
+    if update_data:
+        # pedidos_por_dia copia todas as colunas: a linha completa é regravada na própria requisição (com a
+        # checagem "read", o update já a devolve completa)!
+        pedido = repos.pedidos.complete(pedido)
+        dia_anterior = anterior.data_pedido if anterior is not None else pedido.data_pedido
+        por_dia.salvar(repos.pedidos_por_dia, pedido, dia_anterior)
+
+    tags = [response_cache.tag("pedido", pedido_id)]
+    if "usuario_id" in update_data:
+        tags.append(response_cache.tag("usuario", update_data["usuario_id"]))
+    response_cache.invalidate(*tags)
+    if {"usuario_id", "data_pedido", "status", "valor_total"} & update_data.keys():
+        # Pedido detalhado (usuário e data) e rollups de vendas (status, valor e data)!
+        write_behind.enqueue("pedido_alterado", tags, pedido_id=pedido_id, usuario_anterior=usuario_anterior)
 
     logger.info(f"Pedido atualizado! ID {pedido_id}!")
-    return PedidoRead(**serialize(pedido))
+    tag = etag.entity_etag(pedido.id, pedido.versao)
+    if prefers_minimal(prefer):
+        return no_content(tag)
+    if not update_data:
+        pedido = repos.pedidos.complete(pedido)
+    return render(PedidoRead, serialize(pedido), etag=tag)
 
 
-@router.get("/", response_model=PaginatedPedido)
+@router.get("/", response_model=PaginatedPedidosExpandidos)
 def listar_pedidos(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    expand: Optional[str] = Query(None, description="Relações a incluir: livros, pagamentos"),
+    if_none_match: Optional[str] = Header(None),
 ):
+    campos = parse_fields(fields, PedidoRead)
+    expansoes = expansao.parse_expand(expand, expansao.PEDIDO_EXPANSOES)
+    colunas = columns_for(campos)
+    tag = None if expansoes else etag.page_etag(get_repositories().pedidos.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     offset = (page - 1) * limit
-    todos = list(Pedido.objects().all())
+    todos = get_repositories().pedidos.list_all(columns=colunas)
     total = len(todos)
     pedidos_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem paginada de pedidos! Página {page}, limite {limit}!")
-    return PaginatedPedido(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[PedidoRead(**serialize(p)) for p in pedidos_paginados]
-    )
+    logger_listagem.info("Listagem paginada de pedidos! Página %s, limite %s!", page, limit)
+    return _pagina(page, limit, total, pedidos_paginados, campos, expansoes, tag)
 
 
-@router.get("/ordenado", response_model=PaginatedPedido)
+@router.get("/ordenado", response_model=PaginatedPedidosExpandidos)
 def listar_pedidos_ordenados(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    expand: Optional[str] = Query(None, description="Relações a incluir: livros, pagamentos"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todos = list(Pedido.objects().all())
+    campos = parse_fields(fields, PedidoRead)
+    expansoes = expansao.parse_expand(expand, expansao.PEDIDO_EXPANSOES)
+    colunas = columns_for(campos, "data_pedido")
+    tag = None if expansoes else etag.page_etag(get_repositories().pedidos.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todos = get_repositories().pedidos.list_all(columns=colunas)
     todos.sort(key=lambda p: str(p.data_pedido))
     total = len(todos)
     offset = (page - 1) * limit
     pedidos_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem ordenada de pedidos! Página {page}, limite {limit}!")
-    return PaginatedPedido(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[PedidoRead(**serialize(p)) for p in pedidos_paginados]
-    )
+    logger_listagem.info("Listagem ordenada de pedidos! Página %s, limite %s!", page, limit)
+    return _pagina(page, limit, total, pedidos_paginados, campos, expansoes, tag)
 
 
 @router.get("/count", response_model=ContagemPedidos)
 def contar_pedidos():
-    total = Pedido.objects().count()
-    logger.info(f"Contagem de pedidos! {total}!")
-    return ContagemPedidos(quantidade=total)
+    total = get_repositories().pedidos.count()
+    logger_listagem.info("Contagem de pedidos! %s!", total)
+    return render(ContagemPedidos, {"quantidade": total})
 
 
 @router.delete("/", response_model=dict)
 def deletar_pedido(pedido_id: UUID):
     try:
-        pedido = Pedido.objects(id=pedido_id).get()
-        pedido.delete()
+        repos = get_repositories()
+        # O dia da cópia por dia vem de uma leitura por chave (nunca de um índice consultado em todos os nós)!
+        dia = repos.pedidos.get(pedido_id, columns=["id", "data_pedido"]).data_pedido
+        repos.pedidos.delete(pedido_id)
+        por_dia.remover(repos.pedidos_por_dia, pedido_id, dia)
+        tags = [response_cache.tag("pedido", pedido_id)]
+        response_cache.invalidate(*tags)
+        # Vínculos PedidoLivro/PedidoPagamento e o pedido detalhado são limpos em segundo plano (a tarefa acha
+        # o usuário pelo pedido detalhado, sem leitura antes do DELETE)!
+        write_behind.enqueue("pedido_removido", tags, pedido_id=pedido_id)
         logger.info(f"Pedido deletado! ID {pedido_id}!")
         return {"message": "Pedido deletado com sucesso!"}
     except DoesNotExist:
@@ -141,29 +319,50 @@ def deletar_pedido(pedido_id: UUID):
         raise HTTPException(status_code=404, detail="Pedido não encontrado!")
 
 
-@router.get("/filtrar", response_model=PaginatedPedido)
+@router.get("/filtrar", response_model=PaginatedPedidosExpandidos)
 def filtrar_pedidos(
     usuario_id: Optional[UUID] = Query(None),
     status: Optional[str] = Query(None),
     data_pedido: Optional[str] = Query(None),
+    data_inicio: Optional[date] = Query(None, description="Início do período (inclusive)"),
+    data_fim: Optional[date] = Query(None, description="Fim do período (inclusive; padrão: hoje)"),
     valor_min: Optional[float] = Query(None),
     valor_max: Optional[float] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    expand: Optional[str] = Query(None, description="Relações a incluir: livros, pagamentos"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    pedidos = list(Pedido.objects().all())
-
-    if usuario_id:
-        pedidos = [p for p in pedidos if p.usuario_id == usuario_id]
-    if status:
-        pedidos = [p for p in pedidos if status.lower() in p.status.lower()]
+    campos = parse_fields(fields, PedidoRead)
+    expansoes = expansao.parse_expand(expand, expansao.PEDIDO_EXPANSOES)
+    colunas = columns_for(campos, *(coluna for coluna, valor in (("usuario_id", usuario_id), ("status", status), ("data_pedido", data_pedido), ("valor_total", valor_min), ("valor_total", valor_max)) if valor is not None))
+    tag = None if expansoes else etag.page_etag(get_repositories().pedidos.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    data_obj = None
     if data_pedido:
         try:
             data_obj = datetime.strptime(data_pedido, "%Y-%m-%d").date()
-            pedidos = [p for p in pedidos if date.fromisoformat(str(p.data_pedido)) == data_obj]
         except ValueError:
             logger.warning(f"Formato inválido para data_pedido! {data_pedido}!")
             raise HTTPException(status_code=400, detail="Formato de data inválido. Use AAAA-MM-DD!")
+    try:
+        intervalo = por_dia.periodo(data_inicio, data_fim, data_obj)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    repos = get_repositories()
+    if intervalo is not None:
+        # Só as partições dos dias do período (pedidos_por_dia), lidas em paralelo e já em ordem!
+        pedidos = por_dia.ler(repos.pedidos_por_dia, intervalo, columns=colunas)
+    else:
+        pedidos = repos.pedidos.list_all(columns=colunas)
+
+    if usuario_id:
+        pedidos = [p for p in pedidos if p.usuario_id == usuario_id]
+    if status:
+        pedidos = [p for p in pedidos if status.lower() in p.status.lower()]
     if valor_min is not None:
         pedidos = [p for p in pedidos if p.valor_total >= valor_min]
     if valor_max is not None:
@@ -176,10 +375,5 @@ def filtrar_pedidos(
     offset = (page - 1) * limit
     pedidos_paginados = pedidos[offset:offset + limit]
 
-    logger.info(f"Filtro de pedidos aplicado! Página {page}, limite {limit}, total encontrados: {total}!")
-    return PaginatedPedido(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[PedidoRead(**serialize(p)) for p in pedidos_paginados]
-    )
\ No newline at end of file
+    logger_listagem.info("Filtro de pedidos aplicado! Página %s, limite %s, total encontrados: %s!", page, limit, total)
+    return _pagina(page, limit, total, pedidos_paginados, campos, expansoes, tag)
\ No newline at end of file
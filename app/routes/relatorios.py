@@ -0,0 +1,111 @@
+import os
+from datetime import date, timedelta
+from typing import Optional, Tuple
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, Query
+from app.logs.logger import get_logger
+from app.projections import vendas
+from app.repositories import get_repositories
+from app.schemas.schemas import RelatorioDiario, RelatorioVendas
+from app.serialization.responses import render
+
+logger = get_logger("MyBooks.relatorios")
+router = APIRouter(prefix="/relatorios", tags=["Relatórios"])
+
+# Os relatórios leem os rollups de vendas: uma partição por dia do período, não importa o volume de pedidos!
+RELATORIO_MAX_DIAS = int(os.getenv("RELATORIO_MAX_DIAS", "366"))
+RELATORIO_DIAS_PADRAO = 30
+# Formas de pagamento e status são poucos: vão todos na lista!
+RELATORIO_MAX_CHAVES = 1000
+
+
+def _periodo(data_inicio: Optional[date], data_fim: Optional[date]) -> Tuple[date, date]:
+    fim = data_fim or date.today()
+    inicio = data_inicio or fim - timedelta(days=RELATORIO_DIAS_PADRAO - 1)
+    if inicio > fim:
+        raise HTTPException(status_code=400, detail="data_inicio deve ser anterior ou igual a data_fim!")
+    if (fim - inicio).days + 1 > RELATORIO_MAX_DIAS:
+        raise HTTPException(status_code=400, detail=f"Período máximo de {RELATORIO_MAX_DIAS} dias!")
+    return inicio, fim
+
+
+def _reais(centavos: int) -> float:
+    return round(centavos / 100, 2)
+
+
+def _por_chave(dimensao: str, inicio: date, fim: date, limit: int, chave: Optional[str] = None) -> dict:
+    # Totais de todas as chaves do período; só as limit de maior receita vão na lista!
+    totais = vendas.por_chave(get_repositories(), dimensao, inicio, fim, chave)
+    ordenados = sorted(totais.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))[:limit]
+    return {
+        "data_inicio": inicio, "data_fim": fim,
+        "receita_total": _reais(sum(receita for receita, _ in totais.values())),
+        "quantidade_total": sum(quantidade for _, quantidade in totais.values()),
+        "itens": [{"chave": k, "receita": _reais(receita), "quantidade": quantidade} for k, (receita, quantidade) in ordenados],
+    }
+
+
+def _com_nomes(relatorio: dict, repository, coluna: str) -> dict:
+    # Só as chaves da lista (top N) são resolvidas, em uma leitura em lote!
+    ids = [UUID(item["chave"]) for item in relatorio["itens"]]
+    if ids:
+        nomes = {str(row.id): getattr(row, coluna) for row in repository.get_many(ids, columns=["id", coluna])}
+        for item in relatorio["itens"]:
+            item["nome"] = nomes.get(item["chave"])
+    return relatorio
+
+
+@router.get("/receita-diaria", response_model=RelatorioDiario)
+def receita_diaria(data_inicio: Optional[date] = Query(None), data_fim: Optional[date] = Query(None)):
+    inicio, fim = _periodo(data_inicio, data_fim)
+    totais = vendas.por_dia(get_repositories(), "dia", inicio, fim)
+    dias = [{"dia": dia, "receita": _reais(receita), "quantidade": quantidade} for dia, (receita, quantidade) in totais.items()]
+    logger.info("Relatório de receita diária! %s a %s!", inicio, fim)
+    return render(RelatorioDiario, {
+        "data_inicio": inicio, "data_fim": fim,
+        "receita_total": _reais(sum(receita for receita, _ in totais.values())),
+        "quantidade_total": sum(quantidade for _, quantidade in totais.values()),
+        "dias": dias,
+    })
+
+
+@router.get("/formas-pagamento", response_model=RelatorioVendas)
+def receita_por_forma_pagamento(data_inicio: Optional[date] = Query(None), data_fim: Optional[date] = Query(None)):
+    inicio, fim = _periodo(data_inicio, data_fim)
+    relatorio = _por_chave("forma_pagamento", inicio, fim, limit=RELATORIO_MAX_CHAVES)
+    logger.info("Relatório por forma de pagamento! %s a %s!", inicio, fim)
+    return render(RelatorioVendas, relatorio)
+
+
+@router.get("/pedidos-status", response_model=RelatorioVendas)
+def pedidos_por_status(data_inicio: Optional[date] = Query(None), data_fim: Optional[date] = Query(None)):
+    inicio, fim = _periodo(data_inicio, data_fim)
+    relatorio = _por_chave("status", inicio, fim, limit=RELATORIO_MAX_CHAVES)
+    logger.info("Relatório de pedidos por status! %s a %s!", inicio, fim)
+    return render(RelatorioVendas, relatorio)
+
+
+@router.get("/livros", response_model=RelatorioVendas)
+def receita_por_livro(
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    livro_id: Optional[UUID] = Query(None),
+    limit: int = Query(10, ge=1, le=100),
+):
+    inicio, fim = _periodo(data_inicio, data_fim)
+    relatorio = _por_chave("livro", inicio, fim, limit, chave=str(livro_id) if livro_id else None)
+    logger.info("Relatório de receita por livro! %s a %s!", inicio, fim)
+    return render(RelatorioVendas, _com_nomes(relatorio, get_repositories().livros, "titulo"))
+
+
+@router.get("/autores", response_model=RelatorioVendas)
+def receita_por_autor(
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    autor_id: Optional[UUID] = Query(None),
+    limit: int = Query(10, ge=1, le=100),
+):
+    inicio, fim = _periodo(data_inicio, data_fim)
+    relatorio = _por_chave("autor", inicio, fim, limit, chave=str(autor_id) if autor_id else None)
+    logger.info("Relatório de receita por autor! %s a %s!", inicio, fim)
+    return render(RelatorioVendas, _com_nomes(relatorio, get_repositories().autores, "nome"))
@@ -1,31 +1,41 @@
 from uuid import UUID
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+from typing import Optional, List
+from fastapi import APIRouter, Header, HTTPException, Query
 from cassandra.cqlengine.query import DoesNotExist
 from cassandra.util import Date as CassandraDate
 from datetime import date
 from app.models.models import Usuario
+from app.repositories import get_repositories
 from app.schemas.schemas import (
     UsuarioCreate,
     UsuarioUpdate,
     UsuarioRead,
+    UsuariosPorIds,
     UsuarioCount,
     PaginatedUsuario,
 )
+from app.cache import responses as response_cache
 from app.logs.logger import get_logger
+from app.serialization import etag
+from app.serialization.fields import columns_for, parse_fields, parse_ids
+from app.serialization.responses import no_content, prefers_minimal, render, render_batch, render_page
 
 logger = get_logger("MyBooks")
+logger_listagem = get_logger("MyBooks.listagem")
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
 
-def serialize(usuario: Usuario) -> dict:
-    data = {field: getattr(usuario, field) for field in Usuario._columns.keys()}
+def serialize(usuario: Usuario, fields: Optional[List[str]] = None) -> dict:
+    data = {field: getattr(usuario, field) for field in (fields or Usuario._columns.keys())}
+    if "data_cadastro" not in data:
+        return data
+
     cass_data = data.get("data_cadastro")
 
     try:
-        if isinstance(cass_data, (date, CassandraDate)):
-            data["data_cadastro"] = date.fromisoformat(str(cass_data))
-        else:
+        if isinstance(cass_data, CassandraDate):
+            data["data_cadastro"] = cass_data.date()
+        elif not isinstance(cass_data, date):
             logger.warning(f"data_cadastro inválido: {cass_data} ({type(cass_data)})!")
             raise ValueError("data_cadastro inválido!")
     except Exception as e:
@@ -36,102 +46,132 @@ def serialize(usuario: Usuario) -> dict:
 
 
 @router.get("/usuarios/{id}", response_model=UsuarioRead)
-def obter_usuario_por_id(id: UUID):
+def obter_usuario_por_id(id: UUID, fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"), if_none_match: Optional[str] = Header(None)):
+    campos = parse_fields(fields, UsuarioRead)
+    usuarios = get_repositories().usuarios
+    # Com a versão em cache, o 304 sai sem consultar o banco!
+    tag = etag.cached_entity_etag(usuarios, id, campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     try:
-        usuario = Usuario.objects(id=id).get()
-        return UsuarioRead(**serialize(usuario))
+        usuario = usuarios.get(id, columns=columns_for(campos, "versao"))
+        tag = etag.entity_etag(id, usuario.versao, campos)
+        if etag.matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        return render(UsuarioRead, serialize(usuario, campos), fields=campos, etag=tag)
     except DoesNotExist:
         logger.warning(f"Usuário não encontrado! ID {id}!")
         raise HTTPException(status_code=404, detail="Usuário não encontrado!")
 
 
+@router.get("/batch", response_model=UsuariosPorIds)
+def obter_usuarios_por_ids(
+    ids: str = Query(..., description="Ids separados por vírgula"),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+):
+    campos = parse_fields(fields, UsuarioRead)
+    lista_ids = parse_ids(ids)
+    # Uma leitura por chave para cada id, todas em voo: uma requisição HTTP em vez de uma por id!
+    usuarios = get_repositories().usuarios.get_many(lista_ids, columns=columns_for(campos))
+    encontrados = {usuario.id: serialize(usuario, campos) for usuario in usuarios}
+    logger.info("Leitura de %d usuarios por id! %d encontrados!", len(lista_ids), len(encontrados))
+    return render_batch(UsuariosPorIds, lista_ids, encontrados, fields=campos)
+
+
 @router.post("/", response_model=UsuarioRead)
 def criar_usuario(usuario: UsuarioCreate):
-    if Usuario.objects(cpf=usuario.cpf).allow_filtering().count() > 0:
+    usuarios = get_repositories().usuarios
+
+    if usuarios.find_by(cpf=usuario.cpf):
         logger.warning(f"CPF já cadastrado! {usuario.cpf}!")
         raise HTTPException(status_code=400, detail="Já existe um usuário com esse CPF!")
 
-    novo_usuario = Usuario.create(**usuario.dict())
+    novo_usuario = usuarios.create(**usuario.dict())
     logger.info(f"Usuário criado: {novo_usuario.id} - {novo_usuario.nome} ({novo_usuario.email})!")
-    return UsuarioRead(**serialize(novo_usuario))
+    return render(UsuarioRead, serialize(novo_usuario), etag=etag.entity_etag(novo_usuario.id, novo_usuario.versao))
 
 
 @router.patch("/", response_model=UsuarioRead)
-def atualizar_usuario(usuario_id: UUID, usuario_update: UsuarioUpdate):
-    try:
-        usuario = Usuario.objects(id=usuario_id).get()
-    except DoesNotExist:
-        logger.warning(f"Tentativa de atualizar usuário inexistente! ID {usuario_id}!")
-        raise HTTPException(status_code=404, detail="Usuário não encontrado!")
-
+def atualizar_usuario(usuario_id: UUID, usuario_update: UsuarioUpdate, prefer: Optional[str] = Header(None)):
+    usuarios = get_repositories().usuarios
     update_data = usuario_update.dict(exclude_unset=True)
 
     if "cpf" in update_data:
-        cpf_existente = Usuario.objects(cpf=update_data["cpf"]).allow_filtering()
+        cpf_existente = usuarios.find_by(cpf=update_data["cpf"])
         for u in cpf_existente:
             if u.id != usuario_id:
                 logger.warning(f"CPF já em uso por outro usuário! {update_data['cpf']}!")
                 raise HTTPException(status_code=400, detail="Já existe um usuário com esse CPF!")
 
-    for key, value in update_data.items():
-        setattr(usuario, key, value)
-    usuario.update(**update_data)
+    try:
+        # A existência é conferida pelo update (WRITE_EXISTENCE_CHECK), que já devolve a linha completa!
+        usuario = usuarios.update(usuario_id, **update_data)
+    except DoesNotExist:
+        logger.warning(f"Tentativa de atualizar usuário inexistente! ID {usuario_id}!")
+        raise HTTPException(status_code=404, detail="Usuário não encontrado!")
 
     logger.info(f"Usuário atualizado! ID {usuario_id}!")
-    return UsuarioRead(**serialize(usuario))
+    tag = etag.entity_etag(usuario.id, usuario.versao)
+    if prefers_minimal(prefer):
+        return no_content(tag)
+    return render(UsuarioRead, serialize(usuarios.complete(usuario)), etag=tag)
 
 
 @router.get("/", response_model=PaginatedUsuario)
 def listar_usuarios(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
+    campos = parse_fields(fields, UsuarioRead)
+    colunas = columns_for(campos)
+    tag = etag.page_etag(get_repositories().usuarios.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
     offset = (page - 1) * limit
-    todos = list(Usuario.objects().all())
+    todos = get_repositories().usuarios.list_all(columns=colunas)
     total = len(todos)
     usuarios_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem paginada de usuários! Página {page}, limite {limit}!")
-    return PaginatedUsuario(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[UsuarioRead(**serialize(u)) for u in usuarios_paginados]
-    )
+    logger_listagem.info("Listagem paginada de usuários! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedUsuario, page, limit, total, [serialize(u, campos) for u in usuarios_paginados], fields=campos, etag=tag)
 
 
 @router.get("/ordenado", response_model=PaginatedUsuario)
 def listar_usuarios_ordenados(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todos = list(Usuario.objects().all())
+    campos = parse_fields(fields, UsuarioRead)
+    colunas = columns_for(campos, "nome")
+    tag = etag.page_etag(get_repositories().usuarios.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todos = get_repositories().usuarios.list_all(columns=colunas)
     todos.sort(key=lambda u: u.nome.lower())
     total = len(todos)
     offset = (page - 1) * limit
     usuarios_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Listagem ordenada de usuários! Página {page}, limite {limit}!")
-    return PaginatedUsuario(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[UsuarioRead(**serialize(u)) for u in usuarios_paginados]
-    )
+    logger_listagem.info("Listagem ordenada de usuários! Página %s, limite %s!", page, limit)
+    return render_page(PaginatedUsuario, page, limit, total, [serialize(u, campos) for u in usuarios_paginados], fields=campos, etag=tag)
 
 
 @router.get("/count", response_model=UsuarioCount)
 def contar_usuarios():
-    total = Usuario.objects().count()
-    logger.info(f"Contagem de usuários! {total}!")
-    return UsuarioCount(total_usuarios=total)
+    total = get_repositories().usuarios.count()
+    logger_listagem.info("Contagem de usuários! %s!", total)
+    return render(UsuarioCount, {"total_usuarios": total})
 
 
 @router.delete("/", response_model=dict)
 def deletar_usuario(usuario_id: UUID):
     try:
-        usuario = Usuario.objects(id=usuario_id).get()
-        usuario.delete()
+        get_repositories().usuarios.delete(usuario_id)
+        response_cache.invalidate(response_cache.tag("usuario", usuario_id))
         logger.info(f"Usuário deletado! ID {usuario_id}!")
         return {"message": "Usuário deletado com sucesso!"}
     except DoesNotExist:
@@ -146,8 +186,15 @@ def filtrar_usuarios(
     cpf: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    todos = Usuario.objects().all()
+    campos = parse_fields(fields, UsuarioRead)
+    colunas = columns_for(campos, *(coluna for coluna, valor in (("nome", nome), ("email", email), ("cpf", cpf)) if valor is not None))
+    tag = etag.page_etag(get_repositories().usuarios.table_version(), campos)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    todos = get_repositories().usuarios.list_all(columns=colunas)
     if nome:
         todos = [u for u in todos if nome.lower() in u.nome.lower()]
     if email:
@@ -162,10 +209,5 @@ def filtrar_usuarios(
     offset = (page - 1) * limit
     usuarios_paginados = todos[offset:offset + limit]
 
-    logger.info(f"Filtro de usuários aplicado! Página {page}, limite {limit}, total encontrados: {total}!")
-    return PaginatedUsuario(
-        page=page,
-        limit=limit,
-        total=total,
-        items=[UsuarioRead(**serialize(u)) for u in usuarios_paginados]
-    )
\ No newline at end of file
+    logger_listagem.info("Filtro de usuários aplicado! Página %s, limite %s, total encontrados: %s!", page, limit, total)
+    return render_page(PaginatedUsuario, page, limit, total, [serialize(u, campos) for u in usuarios_paginados], fields=campos, etag=tag)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from uuid import UUID
 from pydantic import BaseModel
 from datetime import date
@@ -26,6 +26,7 @@ class AutorRead(BaseModel):
     data_nascimento: date
     nacionalidade: str
     biografia: Optional[str] = None
+    versao: Optional[UUID] = None
 
     class Config:
         orm_mode = True
@@ -42,6 +43,10 @@ class PaginatedAutor(BaseModel):
     class Config:
         orm_mode = True
 
+class AutoresPorIds(BaseModel):
+    items: List[AutorRead]
+    nao_encontrados: List[UUID]
+
 # ----------- EDITORA -----------
 
 class EditoraCreate(BaseModel):
@@ -62,6 +67,7 @@ class EditoraRead(BaseModel):
     endereco: str
     telefone: str
     email: str
+    versao: Optional[UUID] = None
 
     class Config:
         orm_mode = True
@@ -78,6 +84,10 @@ class PaginatedEditoras(BaseModel):
     class Config:
         orm_mode = True
 
+class EditorasPorIds(BaseModel):
+    items: List[EditoraRead]
+    nao_encontrados: List[UUID]
+
 # ----------- LIVRO -----------
 
 class LivroCreate(BaseModel):
@@ -107,6 +117,7 @@ class LivroRead(BaseModel):
     data_publicacao: date
     autor_id: UUID
     editora_id: UUID
+    versao: Optional[UUID] = None
 
     class Config:
         orm_mode = True
@@ -123,6 +134,10 @@ class PaginatedLivros(BaseModel):
     class Config:
         orm_mode = True
 
+class LivrosPorIds(BaseModel):
+    items: List[LivroRead]
+    nao_encontrados: List[UUID]
+
 # ----------- USUARIO -----------
 
 class UsuarioCreate(BaseModel):
@@ -141,6 +156,7 @@ class UsuarioRead(BaseModel):
     email: str
     cpf: str
     data_cadastro: date
+    versao: Optional[UUID] = None
 
     class Config:
         orm_mode = True
@@ -157,6 +173,10 @@ class PaginatedUsuario(BaseModel):
     class Config:
         orm_mode = True
 
+class UsuariosPorIds(BaseModel):
+    items: List[UsuarioRead]
+    nao_encontrados: List[UUID]
+
 # ----------- PEDIDO -----------
 
 class PedidoCreate(BaseModel):
@@ -177,6 +197,7 @@ class PedidoRead(BaseModel):
     status: str
     valor_total: float
     data_pedido: date
+    versao: Optional[UUID] = None
 
     class Config:
         orm_mode = True
@@ -193,6 +214,10 @@ class PaginatedPedido(BaseModel):
     class Config:
         orm_mode = True
 
+class PedidosPorIds(BaseModel):
+    items: List[PedidoRead]
+    nao_encontrados: List[UUID]
+
 # ----------- LIVRO_PEDIDO -----------
 
 class PedidoLivroBase(BaseModel):
@@ -243,6 +268,7 @@ class PagamentoRead(BaseModel):
     valor: float
     data_pagamento: date
     forma_pagamento: str
+    versao: Optional[UUID] = None
 
     class Config:
         orm_mode = True
@@ -259,6 +285,10 @@ class PaginatedPagamentos(BaseModel):
     class Config:
         orm_mode = True
 
+class PagamentosPorIds(BaseModel):
+    items: List[PagamentoRead]
+    nao_encontrados: List[UUID]
+
 # ----------- PEDIDO_PAGAMENTO -----------
 
 class PedidoPagamentoBase(BaseModel):
@@ -284,6 +314,99 @@ class PaginatedPedidoPagamento(BaseModel):
     class Config:
         orm_mode = True
 
+# ----------- CHECKOUT -----------
+
+class CheckoutCreate(BaseModel):
+    usuario_id: UUID
+    livro_ids: List[UUID]
+    forma_pagamento: str
+    data_pedido: Optional[date] = None
+
+class LivroCheckout(BaseModel):
+    id: UUID
+    titulo: str
+    preco: float
+    autor_nome: Optional[str] = None
+
+class CheckoutRead(BaseModel):
+    pedido: PedidoRead
+    livros: List[LivroCheckout]
+    pagamento: PagamentoRead
+
+# ----------- RELATÓRIOS -----------
+
+class VendaDia(BaseModel):
+    dia: date
+    receita: float
+    quantidade: int
+
+class RelatorioDiario(BaseModel):
+    data_inicio: date
+    data_fim: date
+    receita_total: float
+    quantidade_total: int
+    dias: List[VendaDia]
+
+class VendaPorChave(BaseModel):
+    chave: str
+    nome: Optional[str] = None
+    receita: float
+    quantidade: int
+
+class RelatorioVendas(BaseModel):
+    data_inicio: date
+    data_fim: date
+    receita_total: float
+    quantidade_total: int
+    itens: List[VendaPorChave]
+
+# ----------- ANÁLISES (snapshots colunares) -----------
+
+class SnapshotInfo(BaseModel):
+    tabela: str
+    linhas: int
+    idade_s: float
+    duracao_ms: float
+
+class Histograma(BaseModel):
+    limites: List[float]
+    contagens: List[int]
+
+class EstatisticasGrupo(BaseModel):
+    chave: Optional[str] = None
+    quantidade: int
+    soma: float
+    media: Optional[float] = None
+    minimo: Optional[float] = None
+    maximo: Optional[float] = None
+    percentis: Dict[str, Optional[float]] = {}
+    participacao: Optional[float] = None
+
+class AnaliseAgrupada(BaseModel):
+    snapshot: SnapshotInfo
+    total: EstatisticasGrupo
+    grupos: List[EstatisticasGrupo]
+    histograma: Optional[Histograma] = None
+
+class ItemTopK(BaseModel):
+    chave: str
+    nome: Optional[str] = None
+    quantidade: int
+
+class AnaliseTopK(BaseModel):
+    snapshot: SnapshotInfo
+    total: int
+    itens: List[ItemTopK]
+
+class ArquivoSnapshot(BaseModel):
+    tabela: str
+    formato: str
+    caminho: str
+    bytes: int
+    linhas: Optional[int] = None
+    idade_s: Optional[float] = None
+    duracao_ms: Optional[float] = None
+
 # ----------- PEDIDO DETALHADO -----------
 
 class LivroInfo(BaseModel):
@@ -311,6 +434,15 @@ class PedidoDetalhado(BaseModel):
     class Config:
         orm_mode = True
 
+class PaginatedPedidoDetalhado(BaseModel):
+    page: int
+    limit: int
+    total: int
+    items: List[PedidoDetalhado]
+
+    class Config:
+        orm_mode = True
+
 # ----------- EDITORA DETALHADO -----------
 
 class AutorInfo(BaseModel):
@@ -323,7 +455,7 @@ class AutorInfo(BaseModel):
 class LivroComAutor(BaseModel):
     id: UUID
     titulo: str
-    autor: AutorInfo
+    autor: Optional[AutorInfo] = None
 
     class Config:
         orm_mode = True
@@ -335,9 +467,34 @@ class EditoraComLivrosAutores(BaseModel):
     telefone: str
     email: str
     livros: List[LivroComAutor]
+    page: Optional[int] = None
+    limit: Optional[int] = None
+    total_livros: Optional[int] = None
 
     class Config:
         orm_mode = True
 
+# ----------- EXPANSÕES (expand=) -----------
+
+class LivroExpandido(LivroRead):
+    autor: Optional[AutorRead] = None
+    editora: Optional[EditoraRead] = None
+
+class PaginatedLivrosExpandidos(BaseModel):
+    page: int
+    limit: int
+    total: int
+    items: List[LivroExpandido]
+
+class PedidoExpandido(PedidoRead):
+    livros: Optional[List[LivroRead]] = None
+    pagamentos: Optional[List[PagamentoRead]] = None
+
+class PaginatedPedidosExpandidos(BaseModel):
+    page: int
+    limit: int
+    total: int
+    items: List[PedidoExpandido]
+
 # Resolve forward references
 PaginatedPedidoLivro.update_forward_refs()
@@ -0,0 +1,33 @@
+import argparse
+from app.logs.setup_logger import setup_logging
+from app.repositories import create_repositories
+from app.seed.generator import SeedConfig, seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um dataset sintético em escala para a MyBooks API.")
+    parser.add_argument("--target", choices=["cassandra", "memory"], default="cassandra")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplicador das quantidades padrão")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=256, help="Inserts assíncronos em voo")
+    for name in ("autores", "editoras", "livros", "usuarios", "pedidos"):
+        parser.add_argument(f"--{name}", type=int, help=f"Quantidade de {name}")
+    args = parser.parse_args()
+
+    setup_logging()
+    config = SeedConfig.scaled(
+        args.scale, seed=args.seed, concurrency=args.concurrency,
+        autores=args.autores, editoras=args.editoras, livros=args.livros, usuarios=args.usuarios, pedidos=args.pedidos,
+    )
+    repos = create_repositories(args.target)
+    repos.startup()
+    summary = seed(repos, config)
+
+    for name, count in summary.rows.items():
+        print(f"{name:18} {count:>12,d}")
+    print(f"{'total':18} {summary.total_rows:>12,d} linhas em {summary.seconds:.1f}s "
+          f"({summary.total_rows / summary.seconds:,.0f} linhas/s)")
+
+
+if __name__ == "__main__":
+    main()
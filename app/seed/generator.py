@@ -0,0 +1,201 @@
+import itertools
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List
+from app.logs.logger import get_logger
+from app.projections import editora_catalogo, pedido_detalhado, vendas
+from app.repositories import Repositories
+
+logger = get_logger("MyBooks.seed")
+
+GENEROS = ["romance", "fantasia", "ficcao", "biografia", "tecnico", "poesia", "infantil", "historia"]
+NACIONALIDADES = ["BR", "PT", "AR", "US", "FR", "AO", "MZ"]
+STATUS_PEDIDO = ["novo", "pago", "enviado", "entregue", "cancelado"]
+STATUS_PESOS = [5, 30, 15, 45, 5]
+FORMAS_PAGAMENTO = ["pix", "cartao", "boleto"]
+FORMAS_PESOS = [50, 40, 10]
+INICIO_VENDAS = date(2023, 1, 1)
+
+
+@dataclass
+class SeedConfig:
+    autores: int = 2_000
+    editoras: int = 200
+    livros: int = 100_000
+    usuarios: int = 50_000
+    pedidos: int = 200_000
+    seed: int = 42
+    zipf: float = 1.1  # assimetria da popularidade de autores e livros
+    max_itens: int = 5
+    max_pagamentos: int = 3
+    dias_de_vendas: int = 730
+    chunk: int = 10_000
+    concurrency: int = 256
+    keep_ids: int = 10_000  # ids de pedidos/pagamentos guardados para quem consome o resumo (ex.: benchmarks)
+
+    @classmethod
+    def scaled(cls, scale: float, **overrides) -> "SeedConfig":
+        base = cls()
+        for name in ("autores", "editoras", "livros", "usuarios", "pedidos"):
+            setattr(base, name, max(1, int(getattr(base, name) * scale)))
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(base, name, value)
+        return base
+
+
+@dataclass
+class SeedSummary:
+    autores: List[uuid.UUID] = field(default_factory=list)
+    editoras: List[uuid.UUID] = field(default_factory=list)
+    livros: List[uuid.UUID] = field(default_factory=list)
+    usuarios: List[uuid.UUID] = field(default_factory=list)
+    pedidos: List[uuid.UUID] = field(default_factory=list)
+    pagamentos: List[uuid.UUID] = field(default_factory=list)
+    rows: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+
+def _zipf_cum_weights(n: int, s: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+class DatasetGenerator:
+    # Gera dados referencialmente válidos e determinísticos pela semente (mesma semente, mesmos ids)!
+    def __init__(self, config: SeedConfig):
+        self.config = config
+        self.rnd = random.Random(config.seed)
+
+    def _uuid(self) -> uuid.UUID:
+        return uuid.UUID(int=self.rnd.getrandbits(128), version=4)
+
+    def _data(self, inicio: date, dias: int) -> date:
+        return inicio + timedelta(days=self.rnd.randrange(dias))
+
+    def autores(self) -> List[dict]:
+        return [
+            {
+                "id": self._uuid(), "nome": f"Autor {i:07d}", "email": f"autor{i}@mybooks.dev",
+                "data_nascimento": self._data(date(1920, 1, 1), 30_000),
+                "nacionalidade": self.rnd.choice(NACIONALIDADES), "biografia": f"Biografia do autor {i}. " * 20,
+            }
+            for i in range(self.config.autores)
+        ]
+
+    def editoras(self) -> List[dict]:
+        return [
+            {
+                "id": self._uuid(), "nome": f"Editora {i:05d}", "endereco": f"Rua das Letras, {i}",
+                "telefone": f"11{i:09d}", "email": f"editora{i}@mybooks.dev",
+            }
+            for i in range(self.config.editoras)
+        ]
+
+    def livros(self, autores: List[dict], editoras: List[dict]) -> List[dict]:
+        # Poucos autores concentram boa parte do catálogo (distribuição de Zipf)!
+        pesos = _zipf_cum_weights(len(autores), self.config.zipf)
+        escolhidos = self.rnd.choices(autores, cum_weights=pesos, k=self.config.livros)
+        return [
+            {
+                "id": self._uuid(), "titulo": f"Livro {i:08d}", "sinopse": f"Sinopse do livro {i}. " * 30,
+                "genero": self.rnd.choice(GENEROS), "preco": round(self.rnd.uniform(15, 250), 2),
+                "data_publicacao": self._data(date(1950, 1, 1), 27_000),
+                "autor_id": autor["id"], "editora_id": self.rnd.choice(editoras)["id"],
+            }
+            for i, autor in enumerate(escolhidos)
+        ]
+
+    def usuarios(self) -> List[dict]:
+        return [
+            {
+                "id": self._uuid(), "nome": f"Usuario {i:08d}", "email": f"usuario{i}@mybooks.dev",
+                "cpf": f"{i:011d}", "data_cadastro": self._data(date(2020, 1, 1), 1_000),
+            }
+            for i in range(self.config.usuarios)
+        ]
+
+    def pedidos(self, usuarios: List[dict], livros: List[dict]):
+        # Lotes de pedidos com seus itens, pagamentos e vínculos; valores batem com os preços dos livros!
+        pesos = _zipf_cum_weights(len(livros), self.config.zipf)
+        restantes = self.config.pedidos
+        while restantes > 0:
+            tamanho = min(self.config.chunk, restantes)
+            restantes -= tamanho
+            lote = {"pedidos": [], "pedido_livro": [], "pagamentos": [], "pedido_pagamento": []}
+            for _ in range(tamanho):
+                pedido_id = self._uuid()
+                dia = self._data(INICIO_VENDAS, self.config.dias_de_vendas)
+                itens = {livro["id"]: livro for livro in self.rnd.choices(
+                    livros, cum_weights=pesos, k=self.rnd.randint(1, self.config.max_itens)
+                )}
+                total = round(sum(livro["preco"] for livro in itens.values()), 2)
+                lote["pedidos"].append({
+                    "id": pedido_id, "usuario_id": self.rnd.choice(usuarios)["id"],
+                    "status": self.rnd.choices(STATUS_PEDIDO, STATUS_PESOS)[0], "valor_total": total,
+                    "data_pedido": dia,
+                })
+                for livro_id in itens:
+                    lote["pedido_livro"].append({"pedido_id": pedido_id, "livro_id": livro_id})
+
+                parcelas = self.rnd.randint(1, self.config.max_pagamentos)
+                valor_parcela = round(total / parcelas, 2)
+                for n in range(parcelas):
+                    valor = valor_parcela if n < parcelas - 1 else round(total - valor_parcela * (parcelas - 1), 2)
+                    pagamento_id = self._uuid()
+                    lote["pagamentos"].append({
+                        "id": pagamento_id, "pedido_id": pedido_id, "valor": valor,
+                        "data_pagamento": dia + timedelta(days=n * 30),
+                        "forma_pagamento": self.rnd.choices(FORMAS_PAGAMENTO, FORMAS_PESOS)[0],
+                    })
+                    lote["pedido_pagamento"].append({"pedido_id": pedido_id, "pagamento_id": pagamento_id})
+            yield lote
+
+
+def seed(repos: Repositories, config: SeedConfig) -> SeedSummary:
+    generator = DatasetGenerator(config)
+    summary = SeedSummary()
+    started = time.perf_counter()
+
+    def write(name: str, rows: List[dict]):
+        summary.rows[name] = summary.rows.get(name, 0) + getattr(repos, name).insert_many(
+            rows, concurrency=config.concurrency
+        )
+
+    autores = generator.autores()
+    editoras = generator.editoras()
+    livros = generator.livros(autores, editoras)
+    usuarios = generator.usuarios()
+    for name, rows in (("autores", autores), ("editoras", editoras), ("livros", livros), ("usuarios", usuarios)):
+        write(name, rows)
+        getattr(summary, name).extend(row["id"] for row in rows)
+        logger.info("Carga: %d linhas em %s!", len(rows), name)
+
+    livros_por_id = {row["id"]: row for row in livros}
+    autores_por_id = {row["id"]: row for row in autores}
+    write("editora_catalogo", editora_catalogo.documentos(editoras, livros, autores_por_id))
+    for lote in generator.pedidos(usuarios, livros):
+        for name, rows in lote.items():
+            write(name, rows)
+        write("pedido_detalhado", pedido_detalhado.documentos(
+            lote["pedidos"], lote["pedido_livro"], lote["pedido_pagamento"],
+            livros_por_id, autores_por_id, {row["id"]: row for row in lote["pagamentos"]},
+        ))
+        # Mesmas linhas, particionadas pela data: as colunas batem com PedidoDia/PagamentoDia!
+        write("pedidos_por_dia", lote["pedidos"])
+        write("pagamentos_por_dia", lote["pagamentos"])
+        write("vendas", vendas.registro(lote["pedidos"], lote["pedido_livro"], lote["pagamentos"], livros_por_id))
+        for name in ("pedidos", "pagamentos"):
+            ids = getattr(summary, name)
+            ids.extend(row["id"] for row in lote[name][: max(0, config.keep_ids - len(ids))])
+        elapsed = time.perf_counter() - started
+        logger.info("Carga: %d linhas (%.0f linhas/s)!", summary.total_rows, summary.total_rows / elapsed)
+
+    summary.seconds = time.perf_counter() - started
+    return summary
@@ -0,0 +1,98 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import orjson
+from cassandra.util import Date as CassandraDate
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # dependência opcional
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # dependência opcional
+    cbor2 = None
+
+
+@dataclass(frozen=True)
+class Encoder:
+    media_type: str
+    encode: Callable[[Any], bytes]
+
+
+def _default(value: Any):
+    if isinstance(value, CassandraDate):
+        return value.date().isoformat()
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def encode_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode_msgpack(content: Any) -> bytes:
+    # Normalizar via orjson (UUID e datas como texto, igual ao JSON) sai ~2x mais rápido que um
+    # callback default do msgpack chamado para cada UUID/data!
+    return msgpack.packb(orjson.loads(encode_json(content)), use_bin_type=True)
+
+
+def encode_cbor(content: Any) -> bytes:
+    # UUID e datas usam as tags nativas do CBOR (37 e 1004)!
+    return cbor2.dumps(content, default=lambda encoder, value: encoder.encode(_default(value)))
+
+
+JSON = Encoder("application/json", encode_json)
+
+ENCODERS: Dict[str, Encoder] = {"application/json": JSON}
+if msgpack is not None:
+    ENCODERS["application/msgpack"] = Encoder("application/msgpack", encode_msgpack)
+    ENCODERS["application/x-msgpack"] = ENCODERS["application/msgpack"]
+if cbor2 is not None:
+    ENCODERS["application/cbor"] = Encoder("application/cbor", encode_cbor)
+
+_current: ContextVar[Encoder] = ContextVar("response_encoder", default=JSON)
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    accepted = []
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted.append((media_type.lower(), q))
+    return accepted
+
+
+def negotiate(accept: Optional[str]) -> Encoder:
+    # Escolhe o formato de maior q suportado; curingas e formatos desconhecidos caem no JSON!
+    if not accept:
+        return JSON
+    best, best_q = JSON, 0.0
+    for media_type, q in _parse_accept(accept):
+        encoder = ENCODERS.get(media_type)
+        if encoder is not None and q > best_q:
+            best, best_q = encoder, q
+    return best
+
+
+def current_encoder() -> Encoder:
+    return _current.get()
+
+
+def use_encoder(encoder: Encoder):
+    return _current.set(encoder)
+
+
+def reset_encoder(token):
+    _current.reset(token)
@@ -0,0 +1,49 @@
+import hashlib
+from typing import Any, Optional, Sequence
+from uuid import UUID
+from fastapi import Response
+from app.serialization import encoders
+
+# ETag forte por linha (id + versao) e fraco por página de listagem (contador de escritas da tabela).
+# O formato negociado e os campos pedidos entram no hash: representações diferentes, ETags diferentes!
+
+
+def _digest(*parts: Any) -> str:
+    raw = ":".join("" if part is None else str(part) for part in parts)
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+def entity_etag(id: UUID, versao: Optional[UUID], fields: Optional[Sequence[str]] = None) -> str:
+    media_type = encoders.current_encoder().media_type
+    return f'"{_digest(id, versao, media_type, ",".join(fields or ()))}"'
+
+
+def page_etag(table_version: int, fields: Optional[Sequence[str]] = None) -> str:
+    # A URL (página, filtros) já identifica o recurso; aqui só muda quando a tabela muda!
+    media_type = encoders.current_encoder().media_type
+    return f'W/"{_digest(table_version, media_type, ",".join(fields or ()))}"'
+
+
+def matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    # Comparação fraca (RFC 7232), como manda o If-None-Match!
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"etag": etag, "cache-control": "no-cache"})
+
+
+def cached_entity_etag(repository, id: UUID, fields: Optional[Sequence[str]] = None) -> Optional[str]:
+    versao = repository.cached_version(id)
+    return entity_etag(id, versao, fields) if versao is not None else None
@@ -0,0 +1,85 @@
+from typing import Dict, List, Optional, Sequence, Type
+from fastapi import HTTPException
+from pydantic import BaseModel
+from cassandra.util import Date as CassandraDate
+from app.repositories.base import Repositories
+
+# expand=autor,editora (livros) e expand=livros,pagamentos (pedidos): as relações vêm na mesma resposta.
+# Tudo em lote pela página inteira: ids deduplicados e uma leitura concorrente por tabela (get_many e
+# list_by_pedidos), nunca uma consulta por item!
+
+# Relação -> (coluna com o id no livro, tabela relacionada)
+LIVRO_EXPANSOES = {"autor": ("autor_id", "autores"), "editora": ("editora_id", "editoras")}
+# Relação -> (tabela de vínculos, chave do filho no vínculo, tabela relacionada)
+PEDIDO_EXPANSOES = {
+    "livros": ("pedido_livro", "livro_id", "livros"),
+    "pagamentos": ("pedido_pagamento", "pagamento_id", "pagamentos"),
+}
+
+
+def parse_expand(expand: Optional[str], validas: Dict[str, tuple]) -> List[str]:
+    # "autor,editora" -> ["autor", "editora"]; vazio = nada a expandir!
+    if not expand:
+        return []
+    pedidas = list(dict.fromkeys(name.strip() for name in expand.split(",") if name.strip()))
+    invalidas = [name for name in pedidas if name not in validas]
+    if invalidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Expansões inválidas: {', '.join(invalidas)}. Disponíveis: {', '.join(validas)}!",
+        )
+    return pedidas
+
+
+def colunas_livro(expansoes: Sequence[str]) -> List[str]:
+    # Colunas do livro que precisam ser lidas para resolver as relações (mesmo fora de fields)!
+    return [LIVRO_EXPANSOES[name][0] for name in expansoes]
+
+
+def campos_resposta(
+    campos: Optional[List[str]], expansoes: Sequence[str], schema: Type[BaseModel],
+) -> Optional[List[str]]:
+    # Campos validados na resposta: os pedidos (ou todos os do schema base) mais as relações expandidas!
+    if not expansoes:
+        return campos
+    return [*(campos or schema.__fields__), *expansoes]
+
+
+def _linha(row, model) -> dict:
+    data = {name: getattr(row, name) for name in model._columns}
+    for name, value in data.items():
+        if isinstance(value, CassandraDate):
+            data[name] = value.date()
+    return data
+
+
+def _buscar(repos: Repositories, tabela: str, ids) -> Dict:
+    repository = getattr(repos, tabela)
+    ids = list(dict.fromkeys(id for id in ids if id is not None))
+    if not ids:
+        return {}
+    return {row.id: _linha(row, repository.model) for row in repository.get_many(ids)}
+
+
+def livros(repos: Repositories, linhas: Sequence, itens: List[dict], expansoes: Sequence[str]) -> List[dict]:
+    # itens[i] é a representação de linhas[i]; cada relação vira uma chave (None se a linha relacionada sumiu)!
+    for name in expansoes:
+        coluna, tabela = LIVRO_EXPANSOES[name]
+        relacionados = _buscar(repos, tabela, (getattr(linha, coluna) for linha in linhas))
+        for linha, item in zip(linhas, itens):
+            item[name] = relacionados.get(getattr(linha, coluna))
+    return itens
+
+
+def pedidos(repos: Repositories, linhas: Sequence, itens: List[dict], expansoes: Sequence[str]) -> List[dict]:
+    pedido_ids = [linha.id for linha in linhas]
+    for name in expansoes:
+        vinculos, chave, tabela = PEDIDO_EXPANSOES[name]
+        por_pedido: Dict = {pedido_id: [] for pedido_id in pedido_ids}
+        for vinculo in getattr(repos, vinculos).list_by_pedidos(pedido_ids):
+            por_pedido[vinculo.pedido_id].append(getattr(vinculo, chave))
+        relacionados = _buscar(repos, tabela, (id for ids in por_pedido.values() for id in ids))
+        for pedido_id, item in zip(pedido_ids, itens):
+            # Vínculos para linhas já removidas (limpeza ainda na fila do write-behind) ficam de fora!
+            item[name] = [relacionados[id] for id in por_pedido[pedido_id] if id in relacionados]
+    return itens
@@ -0,0 +1,58 @@
+import os
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple, Type
+from uuid import UUID
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+# Máximo de ids por GET /<entidade>/batch!
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    # "titulo,preco" -> ["id", "titulo", "preco"]; o id sempre volta. None = todos os campos!
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in schema.__fields__]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos: {', '.join(unknown)}. Disponíveis: {', '.join(schema.__fields__)}!",
+        )
+    if not requested:
+        return None
+    return list(dict.fromkeys(["id", *requested] if "id" in schema.__fields__ else requested))
+
+
+def parse_ids(ids: str) -> List[UUID]:
+    # "id1,id2,id1" -> [id1, id2]: na ordem pedida, sem repetidos!
+    try:
+        parsed = list(dict.fromkeys(UUID(value.strip()) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids deve ser uma lista de UUIDs separados por vírgula!")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="Informe ao menos um id!")
+    if len(parsed) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_IDS} ids por requisição!")
+    return parsed
+
+
+def columns_for(fields: Optional[Sequence[str]], *needed: str) -> Optional[List[str]]:
+    # Colunas lidas do banco: as pedidas mais as usadas por filtros/ordenação (e o id)!
+    if fields is None:
+        return None
+    return list(dict.fromkeys(["id", *fields, *needed]))
+
+
+@lru_cache(maxsize=256)
+def partial_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    hints = {name: schema.__annotations__.get(name) for name in fields}
+    for base in schema.__mro__:
+        for name, annotation in getattr(base, "__annotations__", {}).items():
+            if name in hints and hints[name] is None:
+                hints[name] = annotation
+    return create_model(
+        f"{schema.__name__}Parcial",
+        **{name: (Optional[annotation], None) for name, annotation in hints.items()},
+    )
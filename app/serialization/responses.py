@@ -0,0 +1,99 @@
+import os
+from typing import Any, List, Mapping, Optional, Sequence, Type
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from app.serialization import encoders
+from app.serialization.fields import partial_schema
+
+# "validate" (padrão): uma única validação pelo schema antes de serializar com orjson (nunca duas)!
+# "trust" (opt-in): os dados vêm do banco já no formato do schema e vão direto para o orjson, sem checagem!
+RESPONSE_VALIDATION = os.getenv("RESPONSE_VALIDATION", "validate")
+
+
+def dumps(content: Any) -> bytes:
+    return encoders.encode_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    # JSON via orjson por padrão; msgpack/CBOR quando o ContentNegotiationMiddleware escolheu outro formato!
+    # Assinatura completa da Starlette: o gerador do OpenAPI lê o status_code padrão daqui!
+    def __init__(
+        self, content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None, background: Optional[BackgroundTask] = None,
+    ):
+        self.encoder = encoders.current_encoder()
+        self.media_type = self.encoder.media_type
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        return self.encoder.encode(content)
+
+
+def _page_item_schema(schema: Type[BaseModel]) -> Type[BaseModel]:
+    return schema.__annotations__["items"].__args__[0]
+
+
+def _with_etag(response: FastJSONResponse, etag: Optional[str]) -> FastJSONResponse:
+    if etag:
+        response.headers["etag"] = etag
+        # Guarda, mas sempre revalida com If-None-Match!
+        response.headers["cache-control"] = "no-cache"
+    return response
+
+
+def render(
+    schema: Type[BaseModel], content: dict, status_code: int = 200, fields: Optional[Sequence[str]] = None,
+    etag: Optional[str] = None,
+) -> FastJSONResponse:
+    # Devolver uma Response faz o FastAPI pular a segunda validação do response_model!
+    if RESPONSE_VALIDATION == "validate":
+        if fields:
+            schema = partial_schema(schema, tuple(fields))
+        content = schema(**content).dict()
+    return _with_etag(FastJSONResponse(content, status_code=status_code), etag)
+
+
+def render_page(
+    schema: Type[BaseModel], page: int, limit: int, total: int, items: List[dict],
+    fields: Optional[Sequence[str]] = None, etag: Optional[str] = None,
+) -> FastJSONResponse:
+    if fields and RESPONSE_VALIDATION == "validate":
+        item_schema = partial_schema(_page_item_schema(schema), tuple(fields))
+        items = [item_schema(**item).dict() for item in items]
+        return _with_etag(FastJSONResponse({"page": page, "limit": limit, "total": total, "items": items}), etag)
+    return render(schema, {"page": page, "limit": limit, "total": total, "items": items}, etag=etag)
+
+
+def render_batch(
+    schema: Type[BaseModel], ids: Sequence[Any], rows: dict, fields: Optional[Sequence[str]] = None,
+) -> FastJSONResponse:
+    # rows: id -> item serializado. Os itens saem na ordem de ids; os que faltam vão em nao_encontrados!
+    items = [rows[id] for id in ids if id in rows]
+    missing = [id for id in ids if id not in rows]
+    if fields and RESPONSE_VALIDATION == "validate":
+        item_schema = partial_schema(_page_item_schema(schema), tuple(fields))
+        items = [item_schema(**item).dict() for item in items]
+        return FastJSONResponse({"items": items, "nao_encontrados": missing})
+    return render(schema, {"items": items, "nao_encontrados": missing})
+
+
+def render_list(schema: Type[BaseModel], items: List[dict]) -> FastJSONResponse:
+    if RESPONSE_VALIDATION == "validate":
+        items = [schema(**item).dict() for item in items]
+    return FastJSONResponse(items)
+
+
+def prefers_minimal(prefer: Optional[str]) -> bool:
+    # Prefer: return=minimal (RFC 7240): o cliente dispensa a representação depois da escrita!
+    return bool(prefer) and any(
+        preference.split(";")[0].strip().lower() == "return=minimal" for preference in prefer.split(",")
+    )
+
+
+def no_content(etag: Optional[str] = None) -> Response:
+    headers = {"preference-applied": "return=minimal"}
+    if etag:
+        headers["etag"] = etag
+    return Response(status_code=204, headers=headers)
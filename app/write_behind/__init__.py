@@ -0,0 +1,231 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+from uuid import UUID, uuid1, uuid4
+from cassandra.util import unix_time_from_uuid1
+from app import metrics
+from app.cache import responses as response_cache
+from app.logs.logger import get_logger
+from app.repositories import get_repositories
+from app.write_behind.tarefas import TAREFAS
+
+logger = get_logger("MyBooks.write_behind")
+
+# Projeções e limpezas em cascata saem do caminho da requisição: a tarefa é gravada no outbox (Cassandra),
+# entra numa fila asyncio e um worker do próprio processo executa as tarefas em lotes, em ordem de chegada.
+# Cada tarefa tem dono (o worker) e prazo no outbox: o que não terminar até o prazo (crash, falhas repetidas)
+# é tomado com LWT pela varredura periódica de qualquer worker e refeito, sem esperar o próximo deploy!
+
+# "async" (fila em segundo plano) ou "inline" (executa na própria requisição, como antes)!
+WRITE_BEHIND_MODE = os.getenv("WRITE_BEHIND_MODE", "async")
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "64"))
+WRITE_BEHIND_LINGER_MS = float(os.getenv("WRITE_BEHIND_LINGER_MS", "5"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+WRITE_BEHIND_BACKOFF_MS = float(os.getenv("WRITE_BEHIND_BACKOFF_MS", "50"))
+WRITE_BEHIND_LEASE_S = float(os.getenv("WRITE_BEHIND_LEASE_S", "60"))
+WRITE_BEHIND_SWEEP_S = float(os.getenv("WRITE_BEHIND_SWEEP_S", "30"))
+OUTBOX_PARTITIONS = int(os.getenv("OUTBOX_PARTITIONS", "8"))
+
+# Identifica este processo como dono das tarefas que ele grava ou toma no outbox!
+DONO = uuid4()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+_sweeper: Optional[asyncio.Task] = None
+_partitions = itertools.count()
+_idle = threading.Condition()
+_backlog = 0
+
+
+def _agora() -> datetime:
+    # UTC sem fuso e em milissegundos, como o Cassandra devolve: o IF prazo = ? compara com o valor lido!
+    agora = datetime.now(timezone.utc).replace(tzinfo=None)
+    return agora.replace(microsecond=agora.microsecond // 1000 * 1000)
+
+
+def _payload(values: dict) -> dict:
+    return {name: str(value) if isinstance(value, UUID) else value for name, value in values.items()}
+
+
+def enqueue(tipo: str, tags: Sequence[str] = (), **payload):
+    # Chamado pelos handlers (na threadpool): grava no outbox e entrega ao worker do event loop!
+    # tags: entradas do cache de respostas que dependem do resultado, invalidadas de novo ao final!
+    payload = _payload(payload)
+    if _loop is None:
+        # Modo inline (ou worker não iniciado, como nos scripts): executa aqui mesmo!
+        TAREFAS[tipo](get_repositories(), **payload)
+        if tags:
+            response_cache.invalidate(*tags)
+        return
+
+    tarefa = {
+        "particao": next(_partitions) % OUTBOX_PARTITIONS, "id": uuid1(), "tipo": tipo,
+        "payload": json.dumps(payload), "tags": list(tags),
+        "dono": DONO, "prazo": _agora() + timedelta(seconds=WRITE_BEHIND_LEASE_S),
+    }
+    get_repositories().outbox.add(tarefa)
+    metrics.incr("write_behind.enqueued", tipo)
+    _deliver([tarefa])
+
+
+def _deliver(tarefas: List[dict]):
+    global _backlog
+    with _idle:
+        _backlog += len(tarefas)
+        metrics.set_gauge("write_behind", "backlog", _backlog)
+    for tarefa in tarefas:
+        _loop.call_soon_threadsafe(_queue.put_nowait, tarefa)
+
+
+def _run(tarefa: dict, repos) -> bool:
+    # Uma tentativa só: o backoff das novas tentativas acontece fora do lote (ver _process)!
+    payload = json.loads(tarefa["payload"])
+    try:
+        TAREFAS[tarefa["tipo"]](repos, **payload)
+        metrics.incr("write_behind.done", tarefa["tipo"])
+        return True
+    except Exception:
+        tarefa["tentativas"] = tarefa.get("tentativas", 0) + 1
+        if tarefa["tentativas"] < WRITE_BEHIND_MAX_ATTEMPTS:
+            metrics.incr("write_behind.retries", tarefa["tipo"])
+            return False
+        logger.exception(
+            "Tarefa %s %s falhou %d vezes! Fica no outbox até vencer o prazo e ser tomada de novo!",
+            tarefa["tipo"], payload, tarefa["tentativas"],
+        )
+        metrics.incr("write_behind.failed", tarefa["tipo"])
+        return False
+
+
+def _ainda_nossas(lote: List[dict], repos) -> List[dict]:
+    # Tarefa que esperou na fila além do prazo pode ter sido tomada por outro worker: renova antes de rodar!
+    agora = _agora()
+    vencidas = [tarefa for tarefa in lote if tarefa["prazo"] <= agora]
+    if not vencidas:
+        return lote
+    prazo = agora + timedelta(seconds=WRITE_BEHIND_LEASE_S)
+    for tarefa in repos.outbox.claim(vencidas, DONO, prazo):
+        tarefa["prazo"] = prazo
+    return [tarefa for tarefa in lote if tarefa["prazo"] > agora]
+
+
+def _process(lote: List[dict]):
+    # Roda numa thread (os repositórios são síncronos); o lote inteiro custa uma ida à threadpool!
+    global _backlog
+    loop, queue = _loop, _queue
+    repos = get_repositories()
+    concluidas, tags, saindo = [], set(), len(lote)
+    try:
+        for tarefa in _ainda_nossas(lote, repos):
+            if _run(tarefa, repos):
+                concluidas.append((tarefa["particao"], tarefa["id"]))
+                tags.update(tarefa["tags"] or ())
+            elif tarefa["tentativas"] < WRITE_BEHIND_MAX_ATTEMPTS and loop is not None:
+                # Backoff exponencial fora do lote: a tarefa volta à fila depois do atraso e as outras seguem!
+                atraso = WRITE_BEHIND_BACKOFF_MS * 2 ** (tarefa["tentativas"] - 1) / 1000
+                loop.call_soon_threadsafe(loop.call_later, atraso, queue.put_nowait, tarefa)
+                saindo -= 1
+        if concluidas:
+            repos.outbox.remove(concluidas)
+        if tags:
+            response_cache.invalidate(*tags)
+    finally:
+        # Atraso da tarefa mais antiga do lote, desde a gravação no outbox!
+        atraso_ms = (time.time() - unix_time_from_uuid1(lote[0]["id"])) * 1000
+        metrics.set_gauge("write_behind", "lag_ms", round(atraso_ms, 1))
+        metrics.incr("write_behind.batches")
+        with _idle:
+            # As que voltaram para a fila continuam no backlog!
+            _backlog -= saindo
+            metrics.set_gauge("write_behind", "backlog", _backlog)
+            _idle.notify_all()
+
+
+def _reclaim() -> int:
+    # Toma (LWT no prazo lido) as tarefas com prazo vencido: de um worker que caiu ou que desistiu delas.
+    # As que outro worker vivo ainda está rodando têm prazo em dia e ficam com ele!
+    outbox = get_repositories().outbox
+    agora = _agora()
+    vencidas = [
+        {"particao": t.particao, "id": t.id, "tipo": t.tipo, "payload": t.payload, "tags": t.tags, "prazo": t.prazo}
+        for t in outbox.pending(OUTBOX_PARTITIONS) if t.prazo is None or t.prazo <= agora
+    ]
+    if not vencidas:
+        return 0
+    prazo = agora + timedelta(seconds=WRITE_BEHIND_LEASE_S)
+    tomadas = outbox.claim(vencidas, DONO, prazo)
+    for tarefa in tomadas:
+        tarefa["prazo"] = prazo
+        metrics.incr("write_behind.reclaimed", tarefa["tipo"])
+    if tomadas:
+        logger.warning("Write-behind: %d tarefas vencidas no outbox serão refeitas!", len(tomadas))
+        _deliver(tomadas)
+    return len(tomadas)
+
+
+async def _consume():
+    while True:
+        lote = [await _queue.get()]
+        prazo = _loop.time() + WRITE_BEHIND_LINGER_MS / 1000
+        while len(lote) < WRITE_BEHIND_BATCH:
+            if not _queue.empty():
+                lote.append(_queue.get_nowait())
+                continue
+            restante = prazo - _loop.time()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(_queue.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await asyncio.to_thread(_process, lote)
+        except Exception:
+            logger.exception("Falha no lote do write-behind! As tarefas continuam no outbox!")
+
+
+async def _sweep():
+    # Repete as tarefas que venceram o prazo (falhas repetidas, worker que caiu) sem esperar um novo startup!
+    while True:
+        await asyncio.sleep(WRITE_BEHIND_SWEEP_S)
+        try:
+            await asyncio.to_thread(_reclaim)
+        except Exception:
+            logger.exception("Falha na varredura do outbox! Tenta de novo na próxima!")
+
+
+async def start():
+    global _loop, _queue, _worker, _sweeper
+    if WRITE_BEHIND_MODE != "async" or _worker is not None:
+        return
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue()
+    # Tarefas vencidas no outbox voltam para a fila antes das novas (são idempotentes)!
+    await asyncio.to_thread(_reclaim)
+    _worker = _loop.create_task(_consume())
+    _sweeper = _loop.create_task(_sweep())
+
+
+async def stop(timeout: float = 10.0):
+    # Drena a fila antes de desligar; o que sobrar continua no outbox e vence o prazo para outro worker!
+    global _loop, _queue, _worker, _sweeper, _backlog
+    if _worker is None:
+        return
+    await asyncio.to_thread(flush, timeout)
+    _worker.cancel()
+    _sweeper.cancel()
+    _loop, _queue, _worker, _sweeper = None, None, None, None
+    with _idle:
+        _backlog = 0
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """Espera a fila esvaziar (testes, benchmarks, shutdown); não chame de dentro do event loop."""
+    with _idle:
+        return _idle.wait_for(lambda: _backlog == 0, timeout)
@@ -0,0 +1,185 @@
+from typing import Callable, Dict, Optional
+from uuid import UUID
+from cassandra.cqlengine.query import DoesNotExist
+from app.logs.logger import get_logger
+from app.projections import editora_catalogo, pedido_detalhado, vendas
+from app.repositories.base import Repositories
+
+logger = get_logger("MyBooks.write_behind")
+
+# Tarefas do write-behind: recebem só ids (em texto, como ficam no outbox) e releem o estado atual,
+# então repetir uma tarefa (retry ou replay do outbox) leva ao mesmo resultado!
+TAREFAS: Dict[str, Callable] = {}
+
+
+def tarefa(fn: Callable) -> Callable:
+    TAREFAS[fn.__name__] = fn
+    return fn
+
+
+def _uuid(value: Optional[str]) -> Optional[UUID]:
+    return UUID(value) if value is not None else None
+
+
+def _ler(repository, id: UUID, columns=None):
+    # Linha apagada depois da escrita que gerou a tarefa: não há mais o que projetar!
+    try:
+        return repository.get(id, columns=columns)
+    except DoesNotExist:
+        return None
+
+
+# ----------- EDITORAS -----------
+
+@tarefa
+def editora_salva(repos: Repositories, editora_id: str):
+    editora = _ler(repos.editoras, _uuid(editora_id))
+    if editora is not None:
+        editora_catalogo.editora_alterada(repos, editora)
+
+
+@tarefa
+def editora_removida(repos: Repositories, editora_id: str):
+    editora_catalogo.editora_removida(repos, _uuid(editora_id))
+
+
+# ----------- AUTORES -----------
+
+@tarefa
+def autor_alterado(repos: Repositories, autor_id: str):
+    autor = _ler(repos.autores, _uuid(autor_id), columns=["id", "nome"])
+    if autor is None:
+        return
+    livros = repos.livros.find_by(autor_id=autor.id)
+    pedido_detalhado.autor_alterado(repos, autor, livros)
+    editora_catalogo.autor_alterado(repos, autor, livros)
+
+
+@tarefa
+def autor_removido(repos: Repositories, autor_id: str):
+    editora_catalogo.autor_removido(repos, repos.livros.find_by(autor_id=_uuid(autor_id)))
+
+
+# ----------- LIVROS -----------
+
+@tarefa
+def livro_criado(repos: Repositories, livro_id: str):
+    livro = _ler(repos.livros, _uuid(livro_id))
+    if livro is not None:
+        editora_catalogo.livro_criado(repos, livro)
+
+
+@tarefa
+def livro_alterado(repos: Repositories, livro_id: str, editora_anterior: Optional[str] = None, pedidos: bool = True):
+    livro = _ler(repos.livros, _uuid(livro_id))
+    if livro is None:
+        return
+    if pedidos:
+        pedido_detalhado.livro_alterado(repos, livro)
+    editora_catalogo.livro_alterado(repos, _uuid(editora_anterior) or livro.editora_id, livro)
+
+
+@tarefa
+def livro_removido(repos: Repositories, livro_id: str, editora_id: Optional[str] = None):
+    # editora_id só vem em tarefas antigas do outbox; senão sai do próprio catálogo!
+    livro_id = _uuid(livro_id)
+    editora_id = _uuid(editora_id) or repos.editora_catalogo.editora_do_livro(livro_id)
+    # Cascata: os vínculos PedidoLivro do livro saem pelo índice da própria tabela de vínculos (não dependem
+    # das projeções estarem construídas)!
+    for pedido_id in repos.pedido_livro.pedidos_com(livro_id):
+        try:
+            repos.pedido_livro.unlink(pedido_id, livro_id)
+        except DoesNotExist:
+            pass
+        vendas.sincronizar_pedido(repos, pedido_id)
+    pedido_detalhado.livro_removido(repos, livro_id)
+    if editora_id is not None:
+        editora_catalogo.livro_removido(repos, editora_id, livro_id)
+
+
+# ----------- PEDIDOS E VÍNCULOS -----------
+
+@tarefa
+def pedido_criado(repos: Repositories, pedido_id: str):
+    pedido = _ler(repos.pedidos, _uuid(pedido_id))
+    if pedido is not None:
+        pedido_detalhado.pedido_criado(repos, pedido)
+    vendas.sincronizar_pedido(repos, _uuid(pedido_id))
+
+
+@tarefa
+def pedido_alterado(repos: Repositories, pedido_id: str, usuario_anterior: Optional[str] = None):
+    pedido = _ler(repos.pedidos, _uuid(pedido_id))
+    if pedido is not None:
+        pedido_detalhado.pedido_alterado(repos, _uuid(usuario_anterior) or pedido.usuario_id, pedido)
+    vendas.sincronizar_pedido(repos, _uuid(pedido_id))
+
+
+@tarefa
+def pedido_removido(repos: Repositories, pedido_id: str, usuario_id: Optional[str] = None):
+    # usuario_id só vem em tarefas antigas do outbox; senão sai do próprio pedido detalhado!
+    pedido_id = _uuid(pedido_id)
+    usuario_id = _uuid(usuario_id) or repos.pedido_detalhado.usuario_do_pedido(pedido_id)
+    # Cascata: as partições de vínculos do pedido saem inteiras, um DELETE cada!
+    repos.pedido_livro.delete_by_pedido(pedido_id)
+    repos.pedido_pagamento.delete_by_pedido(pedido_id)
+    if usuario_id is not None:
+        pedido_detalhado.pedido_removido(repos, usuario_id, pedido_id)
+    vendas.sincronizar_pedido(repos, pedido_id)
+
+
+@tarefa
+def livro_vinculado(repos: Repositories, pedido_id: str, livro_id: str):
+    pedido_detalhado.livro_vinculado(repos, _uuid(pedido_id), _uuid(livro_id))
+    vendas.sincronizar_pedido(repos, _uuid(pedido_id))
+
+
+@tarefa
+def livro_desvinculado(repos: Repositories, pedido_id: str, livro_id: str):
+    pedido_detalhado.livro_desvinculado(repos, _uuid(pedido_id), _uuid(livro_id))
+    vendas.sincronizar_pedido(repos, _uuid(pedido_id))
+
+
+@tarefa
+def pagamento_vinculado(repos: Repositories, pedido_id: str, pagamento_id: str):
+    pedido_detalhado.pagamento_vinculado(repos, _uuid(pedido_id), _uuid(pagamento_id))
+
+
+@tarefa
+def pagamento_desvinculado(repos: Repositories, pedido_id: str, pagamento_id: str):
+    pedido_detalhado.pagamento_desvinculado(repos, _uuid(pedido_id), _uuid(pagamento_id))
+
+
+@tarefa
+def checkout_concluido(repos: Repositories, pedido_id: str, pagamento_id: str):
+    # Documento, vínculos e séries por dia já entraram no batch do checkout: sobram só os rollups de vendas!
+    vendas.sincronizar_pedido(repos, _uuid(pedido_id))
+    vendas.sincronizar_pagamento(repos, _uuid(pagamento_id))
+
+
+# ----------- PAGAMENTOS -----------
+
+@tarefa
+def pagamento_criado(repos: Repositories, pagamento_id: str):
+    vendas.sincronizar_pagamento(repos, _uuid(pagamento_id))
+
+
+@tarefa
+def pagamento_alterado(repos: Repositories, pagamento_id: str, pedidos: bool = True):
+    pagamento = _ler(repos.pagamentos, _uuid(pagamento_id))
+    if pagamento is not None and pedidos:
+        pedido_detalhado.pagamento_alterado(repos, pagamento)
+    vendas.sincronizar_pagamento(repos, _uuid(pagamento_id))
+
+
+@tarefa
+def pagamento_removido(repos: Repositories, pagamento_id: str):
+    pagamento_id = _uuid(pagamento_id)
+    # Cascata: os vínculos PedidoPagamento saem pelo índice da própria tabela de vínculos!
+    for pedido_id in repos.pedido_pagamento.pedidos_com(pagamento_id):
+        try:
+            repos.pedido_pagamento.unlink(pedido_id, pagamento_id)
+        except DoesNotExist:
+            pass
+    pedido_detalhado.pagamento_removido(repos, pagamento_id)
+    vendas.sincronizar_pagamento(repos, pagamento_id)
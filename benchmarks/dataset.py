@@ -0,0 +1,28 @@
+from dataclasses import dataclass, field
+from typing import List
+from uuid import UUID
+from app.repositories import Repositories
+from app.seed.generator import SeedConfig, seed as seed_dataset
+
+
+@dataclass
+class Dataset:
+    autores: List[UUID] = field(default_factory=list)
+    editoras: List[UUID] = field(default_factory=list)
+    livros: List[UUID] = field(default_factory=list)
+    usuarios: List[UUID] = field(default_factory=list)
+    pedidos: List[UUID] = field(default_factory=list)
+    pagamentos: List[UUID] = field(default_factory=list)
+
+
+def seed(repos: Repositories, scale: int = 1, seed_value: int = 42) -> Dataset:
+    # Escala 1 = 50 autores, 20 editoras, 1000 livros, 200 usuários e 1000 pedidos (com itens e pagamentos)!
+    config = SeedConfig(
+        autores=50 * scale, editoras=20 * scale, livros=1000 * scale, usuarios=200 * scale, pedidos=1000 * scale,
+        seed=seed_value,
+    )
+    summary = seed_dataset(repos, config)
+    return Dataset(
+        autores=summary.autores, editoras=summary.editoras, livros=summary.livros,
+        usuarios=summary.usuarios, pedidos=summary.pedidos, pagamentos=summary.pagamentos,
+    )
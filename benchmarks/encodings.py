@@ -0,0 +1,94 @@
+import argparse
+import gzip
+import json
+import timeit
+from typing import Callable, Dict, List, Tuple
+import orjson
+from app.middleware.compression import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, brotli
+from app.seed.generator import DatasetGenerator, SeedConfig
+from app.serialization import encoders
+
+# Tempo de codificação/decodificação e tamanho do payload por formato e compressão,
+# com páginas de /livros e /pedidos do tamanho que os serviços internos consomem em lote!
+
+
+def payloads(page_size: int) -> Dict[str, dict]:
+    generator = DatasetGenerator(SeedConfig(
+        autores=50, editoras=10, livros=page_size, usuarios=50, pedidos=page_size, seed=1,
+    ))
+    autores = generator.autores()
+    editoras = generator.editoras()
+    livros = generator.livros(autores, editoras)
+    usuarios = generator.usuarios()
+    pedidos = [p for lote in generator.pedidos(usuarios, livros) for p in lote["pedidos"]][:page_size]
+    return {
+        f"livros[{page_size}]": {"page": 1, "limit": page_size, "total": page_size, "items": livros},
+        f"pedidos[{page_size}]": {"page": 1, "limit": page_size, "total": len(pedidos), "items": pedidos},
+    }
+
+
+def _formats() -> List[Tuple[str, Callable, Callable]]:
+    formats = [("json", encoders.encode_json, orjson.loads)]
+    if encoders.msgpack is not None:
+        formats.append(("msgpack", encoders.encode_msgpack, encoders.msgpack.unpackb))
+    if encoders.cbor2 is not None:
+        formats.append(("cbor", encoders.encode_cbor, encoders.cbor2.loads))
+    return formats
+
+
+def _compressions() -> List[Tuple[str, Callable, Callable]]:
+    compressions = [
+        ("-", lambda b: b, lambda b: b),
+        ("gzip", lambda b: gzip.compress(b, COMPRESSION_GZIP_LEVEL), gzip.decompress),
+    ]
+    if brotli is not None:
+        compressions.append(("br", lambda b: brotli.compress(b, quality=COMPRESSION_BROTLI_QUALITY), brotli.decompress))
+    return compressions
+
+
+def _best_us(fn: Callable[[], object], number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def run(page_sizes: List[int], number: int) -> List[dict]:
+    rows = []
+    for page_size in page_sizes:
+        for name, content in payloads(page_size).items():
+            baseline = None
+            for fmt, encode, decode in _formats():
+                body = encode(content)
+                for compression, compress, decompress in _compressions():
+                    wire = compress(body)
+                    encode_us = _best_us(lambda: compress(encode(content)), number)
+                    decode_us = _best_us(lambda: decode(decompress(wire)), number)
+                    baseline = baseline or len(wire)
+                    rows.append({
+                        "payload": name, "format": fmt, "compression": compression,
+                        "bytes": len(wire), "ratio": len(wire) / baseline,
+                        "encode_us": encode_us, "decode_us": decode_us,
+                    })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formatos e compressão das respostas.")
+    parser.add_argument("--page-size", type=int, action="append", help="Tamanhos de página (padrão: 100 e 1000)")
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    rows = run(args.page_size or [100, 1000], args.number)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'payload':14} {'formato':8} {'compr.':6} {'bytes':>9} {'tamanho':>8} {'codif. µs':>10} {'decodif. µs':>12}")
+    for row in rows:
+        print(
+            f"{row['payload']:14} {row['format']:8} {row['compression']:6} {row['bytes']:9d} "
+            f"{row['ratio']:7.0%} {row['encode_us']:10.1f} {row['decode_us']:12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+import httpx
+from benchmarks.dataset import Dataset
+from benchmarks.scenarios import Scenario
+
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int
+    errors: int
+    seconds: float
+    rps: float
+    p50: float
+    p95: float
+    p99: float
+    mean: float
+    # p95 e vazão de cada rodada: a comparação usa a dispersão entre rodadas, não só a rodada mediana!
+    p95_runs: List[float] = field(default_factory=list)
+    rps_runs: List[float] = field(default_factory=list)
+
+# Valores críticos bicaudais de 95% da t de Student por graus de liberdade (acima de 30, a normal)!
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145,
+        2.131, 2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048,
+        2.045, 2.042]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, data: Dataset, seed: int = 7) -> Result:
+    rnd = random.Random(seed)
+    requests = [scenario.build(data, rnd) for _ in range(scenario.requests)]
+    latencies: List[float] = []
+    errors = 0
+    position = 0
+
+    async def worker():
+        nonlocal errors, position
+        while position < len(requests):
+            method, url, params, body = requests[position]
+            position += 1
+            started = time.perf_counter()
+            response = await client.request(method, url, params=params, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(scenario.concurrency)))
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return Result(
+        scenario=scenario.name,
+        requests=len(latencies),
+        errors=errors,
+        seconds=round(seconds, 4),
+        rps=round(len(latencies) / seconds, 1) if seconds else 0.0,
+        p50=round(percentile(latencies, 50), 3),
+        p95=round(percentile(latencies, 95), 3),
+        p99=round(percentile(latencies, 99), 3),
+        mean=round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+    )
+
+
+async def _rounds(client: httpx.AsyncClient, scenario: Scenario, data: Dataset, repeat: int) -> Result:
+    runs = [await run_scenario(client, scenario, data, seed=7 + n) for n in range(repeat)]
+    median = sorted(runs, key=lambda r: r.p95)[len(runs) // 2]
+    median.p95_runs = [r.p95 for r in runs]
+    median.rps_runs = [r.rps for r in runs]
+    return median
+
+
+async def run_all(
+    client: httpx.AsyncClient, scenarios: List[Scenario], data: Dataset, warmup: int = 20, repeat: int = 5,
+    regressed: Optional[Callable[[Result], bool]] = None, confirm: int = 1,
+) -> List[Result]:
+    # Cada cenário roda `repeat` vezes: o relatório mostra a rodada de p95 mediano e guarda todas para a comparação!
+    results = []
+    for scenario in scenarios:
+        rnd = random.Random(0)
+        for _ in range(min(warmup, scenario.requests)):
+            method, url, params, body = scenario.build(data, rnd)
+            await client.request(method, url, params=params, json=body)
+        result = await _rounds(client, scenario, data, repeat)
+        # Um surto de ruído da máquina derruba rodadas seguidas: o cenário suspeito repete na hora (com os mesmos
+        # dados, antes dos cenários de escrita seguintes) e só conta se regredir de novo!
+        for _ in range(confirm if regressed is not None else 0):
+            if not regressed(result):
+                break
+            result = await _rounds(client, scenario, data, repeat)
+        results.append(result)
+    return results
+
+
+def environment() -> dict:
+    # O que faz um baseline valer só para a máquina em que foi gravado!
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def calibrate(rounds: int = 7) -> float:
+    # Velocidade da máquina agora (ms de uma carga fixa de CPU, mediana): numa VM compartilhada ela varia entre
+    # execuções, e a comparação escala o baseline por essa razão em vez de acusar a máquina de regressão!
+    def carga():
+        started = time.perf_counter()
+        json.loads(json.dumps([{"id": n, "nome": str(n) * 4, "itens": list(range(20))} for n in range(2000)]))
+        sorted(random.Random(n).random() for n in range(20000))
+        return (time.perf_counter() - started) * 1000
+
+    return round(statistics.median(carga() for _ in range(rounds)), 3)
+
+
+def difference_interval(base: Sequence[float], current: Sequence[float]) -> Optional[tuple]:
+    # Intervalo de 95% (Welch) para média(current) - média(base); None com menos de 2 rodadas de cada lado!
+    if len(base) < 2 or len(current) < 2:
+        return None
+    vb, vc = statistics.variance(base) / len(base), statistics.variance(current) / len(current)
+    delta = statistics.mean(current) - statistics.mean(base)
+    if vb + vc == 0:
+        return delta, delta
+    df = (vb + vc) ** 2 / (vb ** 2 / (len(base) - 1) + vc ** 2 / (len(current) - 1))
+    t = T_95[max(1, math.floor(df)) - 1] if df < len(T_95) + 1 else 1.96
+    margin = t * math.sqrt(vb + vc)
+    return delta - margin, delta + margin
+
+
+def format_report(results: List[Result], regressions: Optional[Dict[str, str]] = None) -> str:
+    regressions = regressions or {}
+    header = (
+        f"{'cenário':32} {'req':>6} {'erros':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'± p95':>7} {'p99 ms':>9}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in results:
+        flag = f"  <-- {regressions[r.scenario]}" if r.scenario in regressions else ""
+        spread = statistics.stdev(r.p95_runs) if len(r.p95_runs) > 1 else 0.0
+        lines.append(
+            f"{r.scenario:32} {r.requests:6d} {r.errors:6d} {r.rps:9.1f} {r.p50:9.2f} {r.p95:9.2f} {spread:7.2f}"
+            f" {r.p99:9.2f}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def save_baseline(path: str, results: List[Result], meta: dict, calibration_ms: float):
+    payload = {
+        "meta": meta,
+        "environment": environment(),
+        "calibration_ms": calibration_ms,
+        "results": {r.scenario: asdict(r) for r in results},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def environment_mismatch(baseline: dict, meta: dict) -> Dict[str, tuple]:
+    # Campos do ambiente (e da configuração do benchmark) que diferem do baseline: {campo: (baseline, atual)}!
+    stored = {**baseline.get("meta", {}), **baseline.get("environment", {})}
+    current = {**meta, **environment()}
+    return {key: (stored.get(key), value) for key, value in current.items() if stored.get(key) != value}
+
+
+def compare(
+    results: List[Result], baseline: Optional[dict], min_change: float = 0.10, min_delta_ms: float = 5.0,
+    calibration_ms: Optional[float] = None,
+) -> Dict[str, str]:
+    # Regressão = o intervalo de 95% da diferença entre as rodadas exclui zero (p95 acima ou vazão abaixo) E a
+    # diferença é relevante: mais que min_change do baseline (e mais que min_delta_ms no p95). Sem rodadas
+    # suficientes dos dois lados não há como separar ruído de regressão, e o cenário não é julgado!
+    if baseline is None:
+        return {}
+    # Máquina 20% mais lenta agora que na gravação: o baseline esperado é 20% mais lento também!
+    scale = calibration_ms / baseline["calibration_ms"] if calibration_ms and baseline.get("calibration_ms") else 1.0
+
+    regressions = {}
+    for r in results:
+        base = baseline["results"].get(r.scenario)
+        if base is None:
+            continue
+        if r.errors > base.get("errors", 0):
+            regressions[r.scenario] = f"erros {base.get('errors', 0)} -> {r.errors}"
+            continue
+        base_p95_runs = [p95 * scale for p95 in base.get("p95_runs", [])]
+        base_rps_runs = [rps / scale for rps in base.get("rps_runs", [])]
+        p95 = difference_interval(base_p95_runs, r.p95_runs)
+        rps = difference_interval(base_rps_runs, r.rps_runs)
+        base_p95 = statistics.mean(base_p95_runs) if base_p95_runs else 0.0
+        base_rps = statistics.mean(base_rps_runs) if base_rps_runs else 0.0
+        if p95 is not None and p95[0] > max(base_p95 * min_change, min_delta_ms):
+            regressions[r.scenario] = f"p95 {base_p95:.2f} -> {statistics.mean(r.p95_runs):.2f} ms"
+        elif rps is not None and -rps[1] > base_rps * min_change:
+            regressions[r.scenario] = f"req/s {base_rps:.1f} -> {statistics.mean(r.rps_runs):.1f}"
+    return regressions
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# O benchmark roda contra o dublê em memória, sem Cassandra nem outros serviços de rede!
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_DIR", os.path.join(tempfile.gettempdir(), "mybooks-bench-logs"))
+
+import httpx
+from app import write_behind
+from app.repositories import set_repositories
+from app.repositories.memory import SimulatedLatency, create_memory_repositories
+from benchmarks import dataset, harness
+from benchmarks.scenarios import SCENARIOS, SCENARIOS_BY_NAME
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def _start_uvicorn(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def _main(args) -> int:
+    latency = SimulatedLatency(
+        base_ms=args.latency_ms, jitter_ms=args.jitter_ms, tail_ms=args.tail_ms,
+        tail_probability=args.tail_probability, seed=1,
+    )
+    repos = create_memory_repositories(latency)
+    set_repositories(repos)
+
+    # A carga inicial não deve pagar a latência simulada!
+    latency.base_ms = 0
+    data = dataset.seed(repos, scale=args.scale)
+    latency.base_ms = args.latency_ms
+
+    from app.main import app
+
+    scenarios = [SCENARIOS_BY_NAME[name] for name in args.scenarios] if args.scenarios else SCENARIOS
+    if args.requests:
+        for scenario in scenarios:
+            scenario.requests = args.requests
+
+    if args.uvicorn:
+        server = _start_uvicorn(app, args.port)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60)
+    else:
+        server = None
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        # O ASGITransport não dispara o lifespan: o worker do write-behind sobe aqui!
+        await write_behind.start()
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.baseline}.json")
+    baseline = None if args.update_baseline else harness.load_baseline(baseline_path)
+    calibration_ms = harness.calibrate()
+
+    def regressions_of(results):
+        return harness.compare(results, baseline, args.min_change, args.min_delta_ms, calibration_ms)
+
+    try:
+        results = await harness.run_all(
+            client, scenarios, data, repeat=args.repeat,
+            confirm=args.confirm, regressed=lambda result: bool(regressions_of([result])),
+        )
+    finally:
+        await client.aclose()
+        if server is not None:
+            server.should_exit = True
+        else:
+            await write_behind.stop()
+
+    meta = {"scale": args.scale, "latency_ms": args.latency_ms, "transport": "uvicorn" if args.uvicorn else "asgi"}
+    if args.update_baseline:
+        harness.save_baseline(baseline_path, results, meta, calibration_ms)
+        print(harness.format_report(results))
+        print(f"\nBaseline salvo em {baseline_path}")
+        return 0
+
+    regressions = regressions_of(results)
+    print(harness.format_report(results, regressions))
+    mismatch = harness.environment_mismatch(baseline, meta) if baseline is not None else {}
+    if mismatch:
+        # Números de outra máquina (ou outra configuração) não servem de referência: o relatório é só informativo!
+        diferencas = ", ".join(f"{key}: {old!r} -> {new!r}" for key, (old, new) in sorted(mismatch.items()))
+        print(f"\nO baseline {baseline_path} foi gravado em outro ambiente ({diferencas}).")
+        print("Regenere-o com --update-baseline nesta máquina; regressões não falham a execução.")
+        return 0
+    if regressions:
+        print(f"\n{len(regressions)} cenário(s) regrediram em relação a {baseline_path}!")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks HTTP da MyBooks API contra o backend em memória.")
+    parser.add_argument("scenarios", nargs="*", help="Cenários a executar (padrão: todos)")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplicador do tamanho do dataset")
+    parser.add_argument("--requests", type=int, help="Requisições por cenário (sobrescreve o padrão)")
+    parser.add_argument("--repeat", type=int, default=5, help="Rodadas por cenário (intervalo de confiança entre elas)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência simulada por operação de banco")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Jitter uniforme somado à latência simulada")
+    parser.add_argument("--tail-ms", type=float, default=0.0, help="Latência extra dos picos de cauda (ex.: pausa de GC)")
+    parser.add_argument("--tail-probability", type=float, default=0.0, help="Probabilidade de um pico de cauda")
+    parser.add_argument("--uvicorn", action="store_true", help="Dirige um uvicorn local em vez do app ASGI em processo")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--baseline", default="asgi", help="Nome do arquivo de baseline em benchmarks/baselines")
+    parser.add_argument("--min-change", type=float, default=0.10, help="Menor mudança relevante (fração do baseline)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Aumento mínimo de p95 para contar regressão")
+    parser.add_argument("--confirm", type=int, default=1, help="Repetições dos cenários que regrediram antes de falhar")
+    parser.add_argument("--update-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from app.seed.generator import FORMAS_PAGAMENTO, GENEROS
+from benchmarks.dataset import Dataset
+
+# Cada cenário devolve (método, url, parâmetros, corpo) para uma requisição!
+Request = Tuple[str, str, Optional[dict], Optional[dict]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[Dataset, random.Random], Request]
+    requests: int = 300
+    concurrency: int = 8
+
+
+def _get(url: str, params: dict = None) -> Request:
+    return "GET", url, params, None
+
+
+def _novo_livro(data: Dataset, rnd: random.Random) -> Request:
+    corpo = {
+        "titulo": f"Bench {rnd.getrandbits(64):x}", "genero": rnd.choice(GENEROS), "preco": 42.0,
+        "data_publicacao": "2020-01-01", "autor_id": str(rnd.choice(data.autores)),
+        "editora_id": str(rnd.choice(data.editoras)),
+    }
+    return "POST", "/livros/", None, corpo
+
+
+def _novo_pedido(data: Dataset, rnd: random.Random) -> Request:
+    corpo = {
+        "usuario_id": str(rnd.choice(data.usuarios)), "status": "novo", "valor_total": 99.9,
+        "data_pedido": "2024-06-01",
+    }
+    return "POST", "/pedidos/", None, corpo
+
+
+def _checkout(data: Dataset, rnd: random.Random) -> Request:
+    corpo = {
+        "usuario_id": str(rnd.choice(data.usuarios)), "livro_ids": [str(l) for l in rnd.sample(data.livros, 3)],
+        "forma_pagamento": rnd.choice(FORMAS_PAGAMENTO), "data_pedido": "2024-06-01",
+    }
+    return "POST", "/pedidos/checkout", None, corpo
+
+
+SCENARIOS: List[Scenario] = [
+    # Leituras pontuais
+    Scenario("livros.obter", lambda d, r: _get(f"/livros/livros/{r.choice(d.livros)}")),
+    Scenario("autores.obter", lambda d, r: _get(f"/autores/autores/{r.choice(d.autores)}")),
+    Scenario("editoras.obter", lambda d, r: _get(f"/editoras/editoras/{r.choice(d.editoras)}")),
+    Scenario("usuarios.obter", lambda d, r: _get(f"/usuarios/usuarios/{r.choice(d.usuarios)}")),
+    Scenario("pedidos.obter", lambda d, r: _get(f"/pedidos/pedidos/{r.choice(d.pedidos)}")),
+    Scenario("pagamentos.obter", lambda d, r: _get(f"/pagamentos/pagamentos/{r.choice(d.pagamentos)}")),
+    Scenario("livros.batch", lambda d, r: _get("/livros/batch", {"ids": ",".join(str(i) for i in r.sample(d.livros, 20))})),
+    # Listagens paginadas (inclusive páginas profundas)
+    Scenario("livros.listar", lambda d, r: _get("/livros/", {"page": 1, "limit": 100}), requests=100),
+    Scenario("livros.listar.profunda", lambda d, r: _get("/livros/", {"page": len(d.livros) // 100, "limit": 100}), requests=100),
+    Scenario("pedidos.listar.profunda", lambda d, r: _get("/pedidos/", {"page": len(d.pedidos) // 100, "limit": 100}), requests=100),
+    Scenario("pagamentos.listar", lambda d, r: _get("/pagamentos/", {"page": 1, "limit": 100}), requests=100),
+    Scenario("usuarios.listar", lambda d, r: _get("/usuarios/", {"page": 2, "limit": 100}), requests=100),
+    Scenario("autores.listar", lambda d, r: _get("/autores/", {"page": 1, "limit": 50}), requests=100),
+    Scenario("editoras.listar", lambda d, r: _get("/editoras/", {"page": 1, "limit": 20}), requests=100),
+    Scenario("livros.ordenado", lambda d, r: _get("/livros/ordenado", {"page": 5, "limit": 50}), requests=100),
+    # Filtros
+    Scenario("livros.filtro", lambda d, r: _get("/livros/filtro", {"genero": r.choice(GENEROS), "preco_max": 80}), requests=100),
+    Scenario("pedidos.filtrar", lambda d, r: _get("/pedidos/filtrar", {"status": "pago", "valor_min": 100}), requests=100),
+    Scenario("pagamentos.filtrar", lambda d, r: _get("/pagamentos/filtrar", {"forma_pagamento": r.choice(FORMAS_PAGAMENTO)}), requests=100),
+    # Filtros por data (séries por dia: uma partição por dia do período)
+    Scenario("pedidos.filtrar.periodo", lambda d, r: _get("/pedidos/filtrar", {"data_inicio": "2023-03-01", "data_fim": "2023-03-07", "limit": 50}), requests=100),
+    Scenario("pagamentos.filtrar.periodo", lambda d, r: _get("/pagamentos/filtrar", {"forma_pagamento": "pix", "data_inicio": "2023-04-01", "data_fim": "2023-04-30"}), requests=100),
+    # Relações expandidas na mesma resposta (expand=), em lote pela página
+    Scenario("livros.listar.expand", lambda d, r: _get("/livros/", {"page": 1, "limit": 100, "expand": "autor,editora"}), requests=100),
+    Scenario("pedidos.listar.expand", lambda d, r: _get("/pedidos/", {"page": r.randint(1, 20), "limit": 50, "expand": "livros,pagamentos"}), requests=100),
+    # Consultas compostas
+    Scenario("consulta.pedidos_detalhados", lambda d, r: _get(f"/consulta-usuario/pedidos-detalhados/{r.choice(d.usuarios)}")),
+    Scenario("consulta.editora_detalhado", lambda d, r: _get(f"/consulta-usuario/editora-detalhado/{r.choice(d.editoras)}")),
+    Scenario("editoras.com_livros", lambda d, r: _get("/editoras/com-livros-e-autores", {"page": r.randint(1, 2), "limit": 10})),
+    Scenario("pedido_livro.listar", lambda d, r: _get(f"/pedido-livro/livros/{r.choice(d.pedidos)}")),
+    # Relatórios (rollups de vendas: uma partição por dia do período)
+    Scenario("relatorios.receita_diaria", lambda d, r: _get("/relatorios/receita-diaria", {"data_inicio": "2023-01-01", "data_fim": "2023-12-31"}), requests=100),
+    Scenario("analises.valor_total", lambda d, r: _get("/analises/pedidos/valor-total", {"percentis": "50,90,99"}), requests=100),
+    Scenario("analises.precos_genero", lambda d, r: _get("/analises/livros/precos-por-genero"), requests=100),
+    Scenario("relatorios.livros", lambda d, r: _get("/relatorios/livros", {"data_inicio": "2023-01-01", "data_fim": "2023-03-31", "limit": 20}), requests=100),
+    # Escritas em massa
+    Scenario("livros.criar", _novo_livro, requests=500, concurrency=16),
+    Scenario("pedidos.criar", _novo_pedido, requests=500, concurrency=16),
+    Scenario("pedidos.checkout", _checkout, requests=500, concurrency=16),
+]
+
+SCENARIOS_BY_NAME: Dict[str, Scenario] = {s.name: s for s in SCENARIOS}
@@ -0,0 +1,109 @@
+import argparse
+import inspect
+import json
+import timeit
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from app.schemas import schemas
+from app.serialization.responses import FastJSONResponse
+from app.seed.generator import DatasetGenerator, SeedConfig
+
+# Microbenchmark por schema de leitura: caminho antigo (schema + revalidação do response_model + json)
+# contra validar uma vez (o padrão) e contra confiar nos dados do banco (opt-in), ambos com orjson!
+
+
+def _samples() -> Dict[str, dict]:
+    generator = DatasetGenerator(SeedConfig(autores=5, editoras=3, livros=10, usuarios=5, pedidos=5, seed=1))
+    autores = generator.autores()
+    editoras = generator.editoras()
+    livros = generator.livros(autores, editoras)
+    usuarios = generator.usuarios()
+    lote = next(generator.pedidos(usuarios, livros))
+    livro_info = {"id": livros[0]["id"], "titulo": livros[0]["titulo"], "autor_nome": autores[0]["nome"]}
+    pagamento_info = {"id": uuid.uuid4(), "valor": 10.5, "data_pagamento": "2024-01-01"}
+    detalhado = {"id": uuid.uuid4(), "data_pedido": "2024-01-01", "livros": [livro_info] * 3, "pagamentos": [pagamento_info]}
+    return {
+        "AutorRead": autores[0],
+        "EditoraRead": editoras[0],
+        "LivroRead": livros[0],
+        "UsuarioRead": usuarios[0],
+        "PedidoRead": lote["pedidos"][0],
+        "PagamentoRead": lote["pagamentos"][0],
+        "PedidoLivroRead": lote["pedido_livro"][0],
+        "PedidoPagamentoRead": lote["pedido_pagamento"][0],
+        "LivroInfoPedido": livro_info,
+        "LivroInfo": livro_info,
+        "PagamentoInfo": pagamento_info,
+        "PedidoDetalhado": detalhado,
+        "AutorInfo": {"id": autores[0]["id"], "nome": autores[0]["nome"]},
+        "LivroComAutor": {"id": livros[0]["id"], "titulo": livros[0]["titulo"],
+                          "autor": {"id": autores[0]["id"], "nome": autores[0]["nome"]}},
+        "EditoraComLivrosAutores": {**editoras[0], "livros": [
+            {"id": l["id"], "titulo": l["titulo"], "autor": {"id": l["autor_id"], "nome": "Autor"}} for l in livros
+        ]},
+    }
+
+
+def _page_item_schema(schema) -> Optional[type]:
+    annotation = schema.__annotations__.get("items")
+    args = getattr(annotation, "__args__", None)
+    return args[0] if args else None
+
+
+def cases(page_size: int) -> List[Tuple[str, type, Callable[[], dict], Optional[type]]]:
+    samples = _samples()
+    result = []
+    for name, schema in inspect.getmembers(schemas, inspect.isclass):
+        if not issubclass(schema, BaseModel) or schema is BaseModel:
+            continue
+        if name in samples:
+            result.append((name, schema, samples[name], None))
+            continue
+        item = _page_item_schema(schema)
+        if name.startswith("Paginated") and item is not None and item.__name__ in samples:
+            page = {"page": 1, "limit": page_size, "total": 10_000, "items": [samples[item.__name__]] * page_size}
+            result.append((f"{name}[{page_size}]", schema, page, item))
+    return result
+
+
+def legacy(schema, data, item):
+    # Handler constrói o schema (itens incluídos) e o FastAPI valida de novo pelo response_model!
+    if item is not None:
+        built = schema(**{**data, "items": [item(**i) for i in data["items"]]})
+    else:
+        built = schema(**data)
+    validated = schema(**built.dict())
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def validate_once(schema, data, item):
+    return FastJSONResponse(schema(**data).dict()).body
+
+
+def trust(schema, data, item):
+    return FastJSONResponse(data).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de serialização por schema.")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'schema':36} {'antigo µs':>10} {'validar µs':>11} {'confiar µs':>11} {'validar':>8} {'confiar':>8}")
+    for name, schema, data, item in cases(args.page_size):
+        timings = []
+        for fn in (legacy, validate_once, trust):
+            seconds = min(timeit.repeat(lambda: fn(schema, data, item), number=args.number, repeat=3))
+            timings.append(seconds / args.number * 1e6)
+        # Ganho de cada modo sobre o caminho antigo!
+        print(
+            f"{name:36} {timings[0]:10.1f} {timings[1]:11.1f} {timings[2]:11.1f} "
+            f"{timings[0] / timings[1]:7.1f}x {timings[0] / timings[2]:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+
+# Os testes rodam no backend em memória, sem latência simulada e com o write-behind inline (determinístico)!
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("WRITE_BEHIND_MODE", "inline")
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="mybooks-logs-"))
+
+import pytest
+from fastapi.testclient import TestClient
+from app import analytics
+from app.cache import create_cache, set_cache
+from app.repositories import create_repositories, set_repositories, versions
+
+
+def ok(response, status_code: int = 200):
+    assert response.status_code == status_code, (response.request.url, response.status_code, response.text)
+    return response.json() if response.content else None
+
+
+@pytest.fixture
+def repos():
+    # Repositórios, cache de respostas e versões novos a cada teste: nada vaza de um teste para outro!
+    repositories = create_repositories("memory")
+    set_repositories(repositories)
+    set_cache(create_cache("memory"))
+    versions.row_versions.clear()
+    analytics.clear()
+    yield repositories
+
+
+@pytest.fixture
+def client(repos):
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def dados(client):
+    # Um pequeno catálogo: 2 autores, 1 editora, 4 livros, 1 usuário e 1 pedido com 2 livros e 1 pagamento!
+    autores = [
+        ok(client.post("/autores/", json={
+            "nome": nome, "email": f"{nome.lower()}@x.com", "data_nascimento": "1900-01-01", "nacionalidade": "BR",
+        }))
+        for nome in ("Machado", "Clarice")
+    ]
+    editora = ok(client.post("/editoras/", json={"nome": "Ed", "endereco": "Rua", "telefone": "1", "email": "e@x.com"}))
+    livros = [
+        ok(client.post("/livros/", json={
+            "titulo": f"Livro {i}", "genero": "romance" if i % 2 else "conto", "preco": 10.0 + i,
+            "data_publicacao": "1900-01-01", "autor_id": autores[i % 2]["id"], "editora_id": editora["id"],
+        }))
+        for i in range(4)
+    ]
+    usuario = ok(client.post("/usuarios/", json={"nome": "U", "email": "u@x.com", "cpf": "1"}))
+    pedido = ok(client.post("/pedidos/", json={
+        "usuario_id": usuario["id"], "status": "novo", "valor_total": 21.0, "data_pedido": "2025-07-01",
+    }))
+    pagamento = ok(client.post("/pagamentos/", json={
+        "pedido_id": pedido["id"], "valor": 21.0, "data_pagamento": "2025-07-02", "forma_pagamento": "pix",
+    }))
+    for livro in livros[:2]:
+        ok(client.post("/pedido-livro/vincular", json={"pedido_id": pedido["id"], "livro_id": livro["id"]}), 201)
+    ok(client.post("/pedido-pagamento/vincular", json={"pedido_id": pedido["id"], "pagamento_id": pagamento["id"]}), 201)
+    return {
+        "autores": autores, "editora": editora, "livros": livros, "usuario": usuario, "pedido": pedido,
+        "pagamento": pagamento,
+    }
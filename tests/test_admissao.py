@@ -0,0 +1,18 @@
+import pytest
+from app.middleware.admission import route_class
+
+
+@pytest.mark.parametrize("method, path, classe", [
+    ("GET", "/livros/livros/1", "point"),
+    ("GET", "/livros/", "scan"),
+    ("GET", "/livros/filtro", "scan"),
+    ("GET", "/consulta-usuario/pedidos-detalhados/1", "composite"),
+    ("GET", "/analises/pedidos/valor-total", "scan"),
+    ("GET", "/analises/snapshots/pedidos.arrow", "scan"),
+    ("GET", "/relatorios/receita-diaria", "scan"),
+    ("GET", "/relatorios/livros", "scan"),
+    ("POST", "/livros/", "write"),
+    ("POST", "/analises/snapshots", "scan"),
+])
+def test_classes_de_rota(method, path, classe):
+    assert route_class(method, path) == classe
@@ -0,0 +1,33 @@
+from benchmarks import harness
+
+
+def _result(p95_runs, rps_runs, errors=0):
+    return harness.Result(
+        scenario="livros.listar", requests=100, errors=errors, seconds=1.0, rps=rps_runs[0], p50=1.0,
+        p95=p95_runs[0], p99=1.0, mean=1.0, p95_runs=p95_runs, rps_runs=rps_runs,
+    )
+
+
+def _baseline(p95_runs, rps_runs):
+    return {"results": {"livros.listar": {"errors": 0, "p95_runs": p95_runs, "rps_runs": rps_runs}}}
+
+
+def test_ruido_entre_rodadas_nao_e_regressao():
+    # Média 30% pior, mas as rodadas se sobrepõem: o intervalo de confiança inclui zero!
+    baseline = _baseline([20.0, 40.0, 25.0, 60.0, 30.0], [500.0, 300.0, 450.0, 250.0, 400.0])
+    atual = _result([30.0, 70.0, 35.0, 45.0, 50.0], [400.0, 220.0, 380.0, 300.0, 310.0])
+    assert harness.compare([atual], baseline) == {}
+
+
+def test_regressao_consistente_e_detectada():
+    baseline = _baseline([20.0, 21.0, 20.5, 19.5, 20.2], [500.0, 505.0, 498.0, 502.0, 500.0])
+    assert "p95" in harness.compare([_result([40.0, 41.0, 39.5, 40.5, 40.2], [500.0] * 5)], baseline)["livros.listar"]
+    assert "req/s" in harness.compare([_result([20.0] * 5, [400.0, 402.0, 398.0, 401.0, 399.0])], baseline)["livros.listar"]
+    # Sem rodadas suficientes não há como separar ruído de regressão!
+    assert harness.compare([_result([40.0], [400.0])], baseline) == {}
+
+
+def test_ambiente_diferente_e_apontado():
+    baseline = {"meta": {"scale": 1}, "environment": {**harness.environment(), "cpu_count": -1}}
+    assert set(harness.environment_mismatch(baseline, {"scale": 1})) == {"cpu_count"}
+    assert harness.environment_mismatch({**baseline, "environment": harness.environment()}, {"scale": 1}) == {}
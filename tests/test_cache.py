@@ -0,0 +1,32 @@
+from app.cache import responses as response_cache
+from app.cache.memory import MemoryCache
+
+
+def test_set_desiste_se_a_tag_foi_invalidada_depois_da_leitura():
+    cache = MemoryCache(max_entries=2)
+    since = cache.generation()
+    cache.invalidate(["livro:1"])
+    assert not cache.set("a", b"velho", 60, ["livro:1"], since=since)
+    assert cache.get("a") is None
+    # Outras tags e leituras que começaram depois da invalidação gravam normalmente!
+    assert cache.set("b", b"ok", 60, ["livro:2"], since=since)
+    assert cache.set("a", b"novo", 60, ["livro:1"], since=cache.generation())
+    # Invalidações esquecidas (acima de max_entries): uma leitura mais antiga que elas não grava!
+    cache.invalidate(["livro:3", "livro:4", "livro:5"])
+    assert not cache.set("c", b"?", 60, ["livro:9"], since=since)
+
+
+def test_escrita_durante_a_leitura_nao_deixa_resposta_antiga(client, dados, repos, monkeypatch):
+    page = repos.editora_catalogo.page
+
+    def page_com_escrita_concorrente(offset, limit):
+        editoras = page(offset, limit)
+        # Uma escrita de outra requisição termina entre a leitura e o store_response!
+        response_cache.invalidate(response_cache.tag("editora", editoras[0].editora_id))
+        return editoras
+
+    monkeypatch.setattr(repos.editora_catalogo, "page", page_com_escrita_concorrente)
+    assert client.get("/editoras/com-livros-e-autores").headers["x-cache"] == "miss"
+    monkeypatch.setattr(repos.editora_catalogo, "page", page)
+    assert client.get("/editoras/com-livros-e-autores").headers["x-cache"] == "miss"
+    assert client.get("/editoras/com-livros-e-autores").headers["x-cache"] == "hit"
@@ -0,0 +1,70 @@
+from uuid import UUID, uuid4
+from tests.conftest import ok
+
+
+def _editora(client, i):
+    return ok(client.post("/editoras/", json={"nome": f"Ed {i}", "endereco": "R", "telefone": "1", "email": f"e{i}@x.com"}))
+
+
+def test_cursor_percorre_o_catalogo_inteiro(client, dados):
+    for i in range(24):
+        _editora(client, i)
+    por_pagina = [e["id"] for page in (1, 2, 3) for e in ok(client.get("/editoras/com-livros-e-autores", params={"page": page}))]
+
+    por_cursor, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/editoras/com-livros-e-autores", params=params)
+        if response.status_code == 404:
+            break
+        ids = [e["id"] for e in ok(response)]
+        por_cursor.extend(ids)
+        cursor = ids[-1]
+    assert len(por_cursor) == 25 and len(set(por_cursor)) == 25
+    assert por_cursor == por_pagina
+
+
+def test_cursor_de_editora_removida(client, dados, repos):
+    for i in range(5):
+        _editora(client, i)
+    primeira = [e["id"] for e in ok(client.get("/editoras/com-livros-e-autores", params={"limit": 3}))]
+    ok(client.delete("/editoras/", params={"editora_id": primeira[-1]}))
+    seguinte = [e["id"] for e in ok(client.get("/editoras/com-livros-e-autores", params={"cursor": primeira[-1]}))]
+    assert len(primeira) + len(seguinte) == 6 and not set(primeira) & set(seguinte)
+
+
+def test_documento_sem_editora_e_completado_ou_ignorado(client, dados, repos):
+    livro = {"id": uuid4(), "titulo": "Solto", "autor_id": None, "autor_nome": None}
+    editora_id = UUID(dados["editora"]["id"])
+    # Livro projetado antes da editora: o upsert deixa o documento só com os livros!
+    repos.editora_catalogo.docs[editora_id].update(nome=None, endereco=None, telefone=None, email=None)
+    orfa = uuid4()
+    repos.editora_catalogo.put_livro(orfa, livro)
+
+    editoras = ok(client.get("/editoras/com-livros-e-autores"))
+    assert [e["id"] for e in editoras] == [dados["editora"]["id"]]
+    assert editoras[0]["nome"] == "Ed" and len(editoras[0]["livros"]) == 4
+
+    # O write-behind (inline) consertou um documento e apagou o órfão!
+    assert repos.editora_catalogo.docs[editora_id]["nome"] == "Ed"
+    assert orfa not in repos.editora_catalogo.docs
+
+
+def test_orfao_nao_encurta_a_pagina_e_o_reparo_sai_uma_vez(client, dados, repos, monkeypatch):
+    from app.cache import responses as response_cache
+    from app.routes import editora_detalhado
+    for i in range(5):
+        _editora(client, i)
+    reparos = []
+    monkeypatch.setattr(editora_detalhado, "_reparos", {})
+    monkeypatch.setattr(editora_detalhado.write_behind, "enqueue", lambda tipo, tags, **payload: reparos.append(tipo))
+    # Editora removida da tabela sem o write-behind apagar o documento: vira um órfão no meio do catálogo!
+    todas = [e["id"] for e in ok(client.get("/editoras/com-livros-e-autores", params={"limit": 6}))]
+    repos.editoras.table.rows.pop(UUID(todas[1]))
+    repos.editora_catalogo.docs[UUID(todas[1])].update(nome=None, endereco=None, telefone=None, email=None)
+
+    for _ in range(2):
+        response_cache.invalidate(response_cache.tag("editoras"))
+        pagina = [e["id"] for e in ok(client.get("/editoras/com-livros-e-autores", params={"limit": 3}))]
+        assert pagina == [todas[0], todas[2], todas[3]]
+    assert reparos == ["editora_removida"]
@@ -0,0 +1,31 @@
+from uuid import uuid4
+from tests.conftest import ok
+
+
+def test_checkout_grava_pedido_pagamento_e_projecoes(client, dados):
+    livros = dados["livros"]
+    usuario = dados["usuario"]
+    corpo = {
+        "usuario_id": usuario["id"], "livro_ids": [livros[0]["id"], livros[3]["id"], livros[0]["id"]],
+        "forma_pagamento": "pix", "data_pedido": "2025-08-01",
+    }
+    resposta = ok(client.post("/pedidos/checkout", json=corpo), 201)
+    pedido = resposta["pedido"]
+    assert pedido["valor_total"] == 23.0 and len(resposta["livros"]) == 2
+    assert resposta["pagamento"]["valor"] == 23.0
+
+    assert ok(client.get(f"/pedido-livro/livros/{pedido['id']}"))["total"] == 2
+    assert ok(client.get(f"/pedido-pagamento/pagamentos/{pedido['id']}"))["total"] == 1
+    detalhados = ok(client.get(f"/consulta-usuario/pedidos-detalhados/{usuario['id']}"))
+    assert pedido["id"] in {item["id"] for item in detalhados["items"]}
+    por_dia = ok(client.get("/pedidos/filtrar", params={"data_inicio": "2025-08-01", "data_fim": "2025-08-01"}))
+    assert [item["id"] for item in por_dia["items"]] == [pedido["id"]]
+
+
+def test_checkout_com_livro_inexistente_nao_grava_nada(client, dados):
+    corpo = {
+        "usuario_id": dados["usuario"]["id"], "livro_ids": [dados["livros"][0]["id"], str(uuid4())],
+        "forma_pagamento": "pix",
+    }
+    ok(client.post("/pedidos/checkout", json=corpo), 400)
+    assert ok(client.get("/pedidos/count"))["quantidade"] == 1
@@ -0,0 +1,31 @@
+from starlette.responses import JSONResponse
+from starlette.testclient import TestClient
+from app.middleware.compression import CompressionMiddleware
+
+
+def test_corpo_comprimido_leva_etag_fraca_e_vary():
+    async def app(scope, receive, send):
+        await JSONResponse({"a": "x" * 100}, headers={"etag": '"forte"'})(scope, receive, send)
+
+    response = TestClient(CompressionMiddleware(app, minimum_size=0)).get("/", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"forte"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == {"a": "x" * 100}
+
+
+def test_etag_forte_so_sem_content_coding(client, dados):
+    url = f"/livros/livros/{dados['livros'][0]['id']}"
+    identidade = client.get(url, headers={"accept-encoding": "identity"})
+    assert not identidade.headers["etag"].startswith("W/")
+    negociada = client.get(url, headers={"accept-encoding": "gzip"})
+    assert negociada.headers["etag"] == f"W/{identidade.headers['etag']}"
+
+
+def test_304_tem_vary_accept_encoding(client, dados):
+    url = f"/livros/livros/{dados['livros'][0]['id']}"
+    tag = client.get(url, headers={"accept-encoding": "gzip"}).headers["etag"]
+    response = client.get(url, headers={"accept-encoding": "gzip", "if-none-match": tag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == tag
+    assert {v.strip() for v in response.headers["vary"].split(",")} >= {"Accept", "Accept-Encoding"}
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+from app.models.models import Livro, Usuario
+from app.repositories import cassandra
+from tests.conftest import ok
+
+
+def test_crud_de_livro(client, dados):
+    livro = dados["livros"][0]
+    assert ok(client.get(f"/livros/livros/{livro['id']}"))["titulo"] == "Livro 0"
+
+    atualizado = ok(client.patch("/livros/", params={"livro_id": livro["id"]}, json={"preco": 99.5}))
+    assert atualizado["preco"] == 99.5 and atualizado["titulo"] == "Livro 0"
+    assert atualizado["versao"] != livro["versao"]
+
+    ok(client.delete("/livros/", params={"livro_id": livro["id"]}))
+    ok(client.get(f"/livros/livros/{livro['id']}"), 404)
+    ok(client.delete("/livros/", params={"livro_id": livro["id"]}), 404)
+
+
+def test_criacao_valida_relacoes(client, dados):
+    corpo = {
+        "titulo": "Órfão", "genero": "conto", "preco": 1.0, "data_publicacao": "2000-01-01",
+        "autor_id": str(uuid4()), "editora_id": dados["editora"]["id"],
+    }
+    ok(client.post("/livros/", json=corpo), 400)
+
+
+def test_listagem_paginada_e_filtros(client, dados):
+    pagina = ok(client.get("/livros/", params={"page": 2, "limit": 3}))
+    assert pagina["total"] == 4 and len(pagina["items"]) == 1
+
+    filtrados = ok(client.get("/livros/filtro", params={"genero": "romance"}))
+    assert {item["titulo"] for item in filtrados["items"]} == {"Livro 1", "Livro 3"}
+    ok(client.get("/livros/filtro", params={"genero": "poesia"}), 404)
+
+    ordenados = ok(client.get("/livros/ordenado", params={"limit": 10}))
+    assert [item["titulo"] for item in ordenados["items"]] == ["Livro 0", "Livro 1", "Livro 2", "Livro 3"]
+
+
+def test_patch_return_minimal(client, dados):
+    autor = dados["autores"][0]
+    response = client.patch(
+        f"/autores/{autor['id']}", json={"nacionalidade": "PT"},
+        headers={"Prefer": "return=minimal"},
+    )
+    assert response.status_code == 204 and response.headers["etag"]
+    assert ok(client.get(f"/autores/autores/{autor['id']}"))["nacionalidade"] == "PT"
+
+
+def test_etag_e_304(client, dados):
+    url = f"/livros/livros/{dados['livros'][0]['id']}"
+    primeira = client.get(url)
+    tag = primeira.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": tag}).status_code == 304
+
+    ok(client.patch("/livros/", params={"livro_id": dados["livros"][0]["id"]}, json={"preco": 1.5}))
+    depois = client.get(url, headers={"If-None-Match": tag})
+    assert depois.status_code == 200 and depois.headers["etag"] != tag
+
+
+def test_etag_da_listagem_muda_com_escritas(client, dados):
+    tag = client.get("/livros/").headers["etag"]
+    assert client.get("/livros/", headers={"If-None-Match": tag}).status_code == 304
+    ok(client.patch("/livros/", params={"livro_id": dados["livros"][1]["id"]}, json={"preco": 2.5}))
+    assert client.get("/livros/", headers={"If-None-Match": tag}).status_code == 200
+
+
+def test_campos_parciais(client, dados):
+    livro = ok(client.get(f"/livros/livros/{dados['livros'][0]['id']}", params={"fields": "titulo,preco"}))
+    assert set(livro) == {"id", "titulo", "preco"}
+
+    pagina = ok(client.get("/livros/filtro", params={"genero": "romance", "fields": "titulo"}))
+    assert all(set(item) == {"id", "titulo"} for item in pagina["items"])
+
+    ok(client.get("/livros/", params={"fields": "titulo,nao_existe"}), 400)
+
+
+class _Sessao:
+    # Sessão do driver falsa: responde ao SELECT por id preparado pelo repositório do Cassandra!
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.execucoes = 0
+
+    def prepare(self, query):
+        return SimpleNamespace(query_string=query)
+
+    def execute(self, statement, params, execution_profile=None):
+        self.execucoes += 1
+        colunas = statement.query_string.split("SELECT ")[1].split(" FROM")[0]
+        linha = self.linhas.get(params[0])
+        if linha is not None and colunas != "*":
+            linha = {nome: linha[nome] for nome in colunas.split(", ")}
+        return SimpleNamespace(one=lambda: linha)
+
+
+def test_leitura_parcial_no_cassandra_nao_inventa_colunas(client, dados, repos, monkeypatch):
+    id = UUID(dados["livros"][0]["id"])
+    sessao = _Sessao({id: {nome: getattr(repos.livros.get(id), nome) for nome in Livro._columns}})
+    monkeypatch.setattr(cassandra.connection, "get_session", lambda: sessao)
+    repos.livros = cassandra.CassandraEntityRepository(Livro)
+
+    url = f"/livros/livros/{id}"
+    tag = client.get(url).headers["etag"]
+    # O _construct_instance do cqlengine daria versao = uuid1() novo às colunas não lidas!
+    parcial = repos.livros.get(id, columns=["id", "editora_id"])
+    assert set(vars(parcial)) == {"id", "editora_id"}
+
+    # A versão real continua em cache: o 304 sai sem ir ao banco!
+    antes = sessao.execucoes
+    assert client.get(url, headers={"If-None-Match": tag}).status_code == 304
+    assert sessao.execucoes == antes
+
+
+def test_complete_busca_as_colunas_que_faltam(dados, repos, monkeypatch):
+    id = UUID(dados["usuario"]["id"])
+    completo = {nome: getattr(repos.usuarios.get(id), nome) for nome in Usuario._columns}
+    sessao = _Sessao({id: completo})
+    monkeypatch.setattr(cassandra.connection, "get_session", lambda: sessao)
+    usuarios = cassandra.CassandraEntityRepository(Usuario)
+
+    # Sem as colunas inventadas (data_cadastro = hoje), complete() sabe o que falta e vai buscar!
+    parcial = usuarios.get(id, columns=["id", "nome"])
+    assert not hasattr(parcial, "data_cadastro")
+    assert vars(usuarios.complete(parcial)) == completo
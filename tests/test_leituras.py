@@ -0,0 +1,48 @@
+from uuid import uuid4
+from tests.conftest import ok
+
+
+def test_batch_por_ids(client, dados):
+    livros = dados["livros"]
+    inexistente = str(uuid4())
+    ids = [livros[2]["id"], inexistente, livros[0]["id"], livros[2]["id"]]
+    resposta = ok(client.get("/livros/batch", params={"ids": ",".join(ids)}))
+    assert [item["id"] for item in resposta["items"]] == [livros[2]["id"], livros[0]["id"]]
+    assert resposta["nao_encontrados"] == [inexistente]
+
+    parcial = ok(client.get("/livros/batch", params={"ids": livros[1]["id"], "fields": "titulo"}))
+    assert parcial["items"] == [{"id": livros[1]["id"], "titulo": "Livro 1"}]
+
+
+def test_batch_valida_ids(client, dados):
+    ok(client.get("/livros/batch", params={"ids": "abc"}), 400)
+    ok(client.get("/livros/batch", params={"ids": " , "}), 400)
+
+
+def test_expand_de_livros(client, dados):
+    livro = dados["livros"][1]
+    expandido = ok(client.get(f"/livros/livros/{livro['id']}", params={"expand": "autor,editora"}))
+    assert expandido["autor"]["id"] == livro["autor_id"]
+    assert expandido["editora"]["nome"] == "Ed"
+
+    pagina = ok(client.get("/livros/", params={"expand": "autor", "fields": "titulo"}))
+    assert all(set(item) == {"id", "titulo", "autor"} for item in pagina["items"])
+    assert {item["autor"]["nome"] for item in pagina["items"]} == {"Machado", "Clarice"}
+
+    ok(client.get("/livros/", params={"expand": "usuario"}), 400)
+
+
+def test_expand_sem_etag(client, dados):
+    url = f"/livros/livros/{dados['livros'][0]['id']}"
+    assert "etag" in client.get(url).headers
+    assert "etag" not in client.get(url, params={"expand": "autor"}).headers
+
+
+def test_expand_de_pedidos(client, dados):
+    pedido = dados["pedido"]
+    expandido = ok(client.get(f"/pedidos/pedidos/{pedido['id']}", params={"expand": "livros,pagamentos"}))
+    assert {livro["id"] for livro in expandido["livros"]} == {livro["id"] for livro in dados["livros"][:2]}
+    assert [pagamento["id"] for pagamento in expandido["pagamentos"]] == [dados["pagamento"]["id"]]
+
+    pagina = ok(client.get("/pedidos/", params={"expand": "pagamentos", "fields": "status"}))
+    assert pagina["items"][0]["pagamentos"][0]["valor"] == 21.0
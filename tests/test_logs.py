@@ -0,0 +1,38 @@
+import logging
+import os
+from app.logs.setup_logger import DailyFileHandler, _daily_namer
+
+
+def _handler(directory, backup_days):
+    handler = DailyFileHandler(os.path.join(directory, "mybooks.log"), when="midnight", backupCount=backup_days)
+    handler.namer = _daily_namer
+    return handler
+
+
+def test_retencao_apaga_os_dias_mais_antigos(tmp_path):
+    for dia in ("2025-07-01", "2025-07-02", "2025-07-03", "2025-07-04"):
+        (tmp_path / f"{dia}.log").write_text(dia)
+    (tmp_path / "outro.log").write_text("fica")
+    handler = _handler(tmp_path, 2)
+    try:
+        handler.emit(logging.makeLogRecord({"msg": "hoje"}))
+        handler.doRollover()
+    finally:
+        handler.close()
+
+    restantes = sorted(os.listdir(tmp_path))
+    datados = [name for name in restantes if DailyFileHandler.DATED.match(name)]
+    # O arquivo do dia rodado entra na conta: sobram os 2 dias mais novos!
+    assert len(datados) == 2 and "2025-07-01.log" not in datados and "2025-07-02.log" not in datados
+    assert "outro.log" in restantes and "mybooks.log" in restantes
+
+
+def test_sem_retencao_mantem_todos(tmp_path):
+    for dia in ("2025-07-01", "2025-07-02"):
+        (tmp_path / f"{dia}.log").write_text(dia)
+    handler = _handler(tmp_path, 0)
+    try:
+        handler.doRollover()
+    finally:
+        handler.close()
+    assert {"2025-07-01.log", "2025-07-02.log"} <= set(os.listdir(tmp_path))
@@ -0,0 +1,15 @@
+from tests.conftest import ok
+
+
+def test_openapi_e_docs(client):
+    esquema = ok(client.get("/openapi.json"))
+    assert "/livros/livros/{id}" in esquema["paths"]
+    assert "/pedidos/checkout" in esquema["paths"]
+    assert client.get("/docs").status_code == 200
+    assert client.get("/redoc").status_code == 200
+
+
+def test_resposta_msgpack_mantem_media_type(client, dados):
+    response = client.get("/livros/", headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/msgpack")
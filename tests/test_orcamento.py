@@ -0,0 +1,72 @@
+import copy
+from app.database.query_tracker import assert_query_budget
+from tests.conftest import ok
+
+# Orçamentos de consultas das leituras compostas: o número de consultas não cresce com o tamanho da página!
+
+
+def _mais_livros_no_pedido(client, dados, n=6):
+    for i in range(n):
+        livro = ok(client.post("/livros/", json={
+            "titulo": f"Extra {i}", "genero": "conto", "preco": 1.0, "data_publicacao": "1900-01-01",
+            "autor_id": dados["autores"][i % 2]["id"], "editora_id": dados["editora"]["id"],
+        }))
+        ok(client.post("/pedido-livro/vincular", json={"pedido_id": dados["pedido"]["id"], "livro_id": livro["id"]}), 201)
+
+
+def test_orcamento_pedidos_detalhados(client, dados):
+    _mais_livros_no_pedido(client, dados)
+    # Usuário (existência) + a partição do pedido_detalhado!
+    with assert_query_budget(2):
+        pagina = ok(client.get(f"/consulta-usuario/pedidos-detalhados/{dados['usuario']['id']}"))
+    assert len(pagina["items"][0]["livros"]) == 8
+
+
+def test_orcamento_editoras_com_livros_e_autores(client, dados):
+    _mais_livros_no_pedido(client, dados)
+    # Uma leitura do catálogo desnormalizado, qualquer que seja o número de livros!
+    with assert_query_budget(1):
+        editoras = ok(client.get("/editoras/com-livros-e-autores"))
+    assert len(editoras[0]["livros"]) == 10
+
+
+def test_orcamento_editora_detalhado(client, dados):
+    _mais_livros_no_pedido(client, dados)
+    # Editora + livros da editora + autores da página em lote, não um autor por livro!
+    with assert_query_budget(3):
+        editora = ok(client.get(f"/consulta-usuario/editora-detalhado/{dados['editora']['id']}"))
+    assert len(editora["livros"]) == 10
+    assert {livro["autor"]["nome"] for livro in editora["livros"]} == {autor["nome"] for autor in dados["autores"]}
+
+def test_orcamento_livros_do_pedido(client, dados):
+    _mais_livros_no_pedido(client, dados)
+    # Vínculos + livros da página em lote + autores em lote!
+    with assert_query_budget(3):
+        pagina = ok(client.get(f"/pedido-livro/livros/{dados['pedido']['id']}", params={"limit": 10}))
+    assert len(pagina["items"]) == 8
+    assert {item["autor_nome"] for item in pagina["items"]} == {autor["nome"] for autor in dados["autores"]}
+
+
+def test_orcamento_patch_de_pedido(client, dados, monkeypatch):
+    from app import write_behind
+    monkeypatch.setattr(write_behind, "enqueue", lambda *args, **kwargs: None)
+    # Uma leitura só (existência, dia anterior e as colunas da resposta) + UPDATE + versão da tabela + cópia por dia!
+    for corpo in ({"data_pedido": "2025-07-05"}, {"status": "pago"}):
+        with assert_query_budget(4) as requisicoes:
+            pedido = ok(client.patch("/pedidos/", params={"pedido_id": dados["pedido"]["id"]}, json=corpo))
+        assert [s for s, _ in requisicoes[0].statements].count("SELECT * FROM pedido WHERE id = ?") == 1
+    assert pedido["data_pedido"] == "2025-07-05" and pedido["status"] == "pago"
+
+
+def test_orcamento_reconstrucao_do_pedido_detalhado(client, dados, repos):
+    from app.projections import pedido_detalhado
+    for _ in range(4):
+        ok(client.post("/pedidos/checkout", json={
+            "usuario_id": dados["usuario"]["id"], "livro_ids": [dados["livros"][0]["id"]], "forma_pagamento": "pix",
+        }), 201)
+    antes = copy.deepcopy(repos.pedido_detalhado.partitions)
+    repos.pedido_detalhado.partitions.clear()
+    # Uma varredura por tabela (livros, autores, pagamentos, pedidos e os dois vínculos), não duas por pedido!
+    with assert_query_budget(6):
+        pedido_detalhado.reconstruir(repos)
+    assert repos.pedido_detalhado.partitions == antes
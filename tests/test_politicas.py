@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+from uuid import uuid4
+import pytest
+from cassandra import ConsistencyLevel, WriteType
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.query import dict_factory
+from app import metrics
+from app.database import policies
+from app.database.policies import EXEC_PROFILE_LEITURA, CountingSpeculativeExecutionPolicy, IdempotencyAwareRetryPolicy
+from app.models.models import Livro
+from app.repositories import cassandra
+
+IDEMPOTENTE = SimpleNamespace(is_idempotent=True)
+NAO_IDEMPOTENTE = SimpleNamespace(is_idempotent=False)
+QUORUM = ConsistencyLevel.LOCAL_QUORUM
+
+
+# ----------- RETRY -----------
+
+@pytest.mark.parametrize("write_type", [WriteType.SIMPLE, WriteType.BATCH_LOG, WriteType.UNLOGGED_BATCH, WriteType.COUNTER])
+def test_escrita_nao_idempotente_nunca_e_repetida(write_type):
+    policy = IdempotencyAwareRetryPolicy(write_retries=3)
+    decisao, _ = policy.on_write_timeout(NAO_IDEMPOTENTE, QUORUM, write_type, 2, 1, retry_num=0)
+    assert decisao == policy.RETHROW
+    decisao, _ = policy.on_request_error(NAO_IDEMPOTENTE, QUORUM, Exception(), retry_num=0)
+    assert decisao == policy.RETHROW
+
+
+def test_escrita_idempotente_vai_para_outro_no_uma_vez():
+    policy = IdempotencyAwareRetryPolicy(write_retries=1)
+    assert policy.on_write_timeout(IDEMPOTENTE, QUORUM, WriteType.SIMPLE, 2, 1, retry_num=0)[0] == policy.RETRY_NEXT_HOST
+    assert policy.on_write_timeout(IDEMPOTENTE, QUORUM, WriteType.SIMPLE, 2, 1, retry_num=1)[0] == policy.RETHROW
+    # Contador e LWT não são reenviados nem quando o statement diz ser idempotente!
+    assert policy.on_write_timeout(IDEMPOTENTE, QUORUM, WriteType.COUNTER, 2, 1, retry_num=0)[0] == policy.RETHROW
+    assert policy.on_write_timeout(IDEMPOTENTE, QUORUM, WriteType.CAS, 2, 1, retry_num=0)[0] == policy.RETHROW
+    assert policy.on_request_error(IDEMPOTENTE, QUORUM, Exception(), retry_num=0)[0] == policy.RETRY_NEXT_HOST
+
+
+def test_leitura_repete_e_serial_nao():
+    policy = IdempotencyAwareRetryPolicy(read_retries=1)
+    assert policy.on_read_timeout(IDEMPOTENTE, QUORUM, 2, 2, False, retry_num=0)[0] == policy.RETRY
+    assert policy.on_read_timeout(IDEMPOTENTE, QUORUM, 2, 1, False, retry_num=0)[0] == policy.RETRY_NEXT_HOST
+    assert policy.on_read_timeout(IDEMPOTENTE, QUORUM, 2, 1, False, retry_num=1)[0] == policy.RETHROW
+    assert policy.on_read_timeout(IDEMPOTENTE, ConsistencyLevel.SERIAL, 2, 1, False, retry_num=0)[0] == policy.RETHROW
+
+
+# ----------- PERFIS DO DRIVER -----------
+
+def test_especulacao_so_no_perfil_de_leitura(monkeypatch):
+    monkeypatch.setattr(policies, "CASSANDRA_SPECULATIVE_DELAY_MS", 10.0)
+    monkeypatch.setattr(policies, "CASSANDRA_SPECULATIVE_MAX", 2)
+    perfis = policies.execution_profiles()
+    padrao, leitura = perfis[EXEC_PROFILE_DEFAULT], perfis[EXEC_PROFILE_LEITURA]
+
+    especulacao = leitura.speculative_execution_policy
+    assert isinstance(especulacao, CountingSpeculativeExecutionPolicy)
+    assert (especulacao.delay, especulacao.max_attempts) == (0.01, 2)
+    assert not isinstance(padrao.speculative_execution_policy, CountingSpeculativeExecutionPolicy)
+    # O cqlengine e as leituras por chave dependem do dict_factory nos dois perfis!
+    for perfil in (padrao, leitura):
+        assert perfil.row_factory is dict_factory
+        assert isinstance(perfil.retry_policy, IdempotencyAwareRetryPolicy)
+
+    monkeypatch.setattr(policies, "CASSANDRA_SPECULATIVE_MAX", 0)
+    desligada = policies.execution_profiles()[EXEC_PROFILE_LEITURA].speculative_execution_policy
+    assert not isinstance(desligada, CountingSpeculativeExecutionPolicy)
+
+
+def test_plano_especulativo_conta_as_execucoes():
+    metrics.reset()
+    plano = CountingSpeculativeExecutionPolicy(0.01, 2).new_plan("mybooks", None)
+    assert [plano.next_execution(None) for _ in range(3)] == [0.01, 0.01, -1]
+    assert metrics.value("cassandra.speculative", "eligible") == 1
+    assert metrics.value("cassandra.speculative", "executions") == 2
+
+
+class _Vazio(list):
+    def one(self):
+        return None
+
+
+class _Sessao:
+    # Sessão falsa que só registra os statements preparados/executados e o perfil usado!
+    def __init__(self):
+        self.execucoes = []
+
+    def prepare(self, cql):
+        return SimpleNamespace(query_string=cql, is_idempotent=False)
+
+    def execute(self, statement, params=None, execution_profile=EXEC_PROFILE_DEFAULT):
+        self.execucoes.append((statement, execution_profile))
+        return _Vazio()
+
+
+@pytest.fixture
+def sessao(monkeypatch):
+    sessao = _Sessao()
+    monkeypatch.setattr(cassandra.connection, "get_session", lambda: sessao)
+
+    def concorrente(session, statement, params, concurrency=1, execution_profile=EXEC_PROFILE_DEFAULT, **kwargs):
+        session.execucoes.append((statement, execution_profile))
+        return [(True, _Vazio()) for _ in params]
+
+    monkeypatch.setattr(cassandra, "execute_concurrent_with_args", concorrente)
+    return sessao
+
+
+def test_leituras_idempotentes_e_escritas_nao(sessao):
+    livros = cassandra.CassandraEntityRepository(Livro)
+    with pytest.raises(Livro.DoesNotExist):
+        livros.get(uuid4())
+    livros.get_many([uuid4(), uuid4()], columns=["id", "titulo"])
+    cassandra.scan_token_ranges(Livro, "id", None, splits=4)
+    vendas = cassandra.CassandraVendasRepository()
+    vendas.por_dias("dia", [None])
+    vendas.incr([{"dimensao": "dia", "dia": None, "chave": "", "receita_centavos": 1, "quantidade": 1}])
+
+    leituras = [statement for statement, perfil in sessao.execucoes if perfil == EXEC_PROFILE_LEITURA]
+    escritas = [statement for statement, perfil in sessao.execucoes if perfil != EXEC_PROFILE_LEITURA]
+    assert len(leituras) == 4 and all(s.query_string.startswith("SELECT") and s.is_idempotent for s in leituras)
+    # O incremento de contador vai pelo perfil sem especulação e não é idempotente (o driver nem repete)!
+    [incremento] = escritas
+    assert incremento.query_string.startswith("UPDATE") and not incremento.is_idempotent
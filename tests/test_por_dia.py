@@ -0,0 +1,70 @@
+from app import write_behind
+from app.projections import por_dia
+from tests.conftest import ok
+
+
+def _ids(client, url, **params):
+    response = client.get(url, params=params)
+    return [] if response.status_code == 404 else [item["id"] for item in ok(response)["items"]]
+
+
+def test_filtro_por_data_enxerga_escritas_na_hora(client, dados, monkeypatch):
+    # Mesmo com o worker async (tarefas ainda na fila), a série já foi gravada pela requisição!
+    monkeypatch.setattr(write_behind, "enqueue", lambda *args, **kwargs: None)
+    usuario = dados["usuario"]
+    pedido = ok(client.post("/pedidos/", json={
+        "usuario_id": usuario["id"], "status": "novo", "valor_total": 5.0, "data_pedido": "2025-09-10",
+    }))
+    assert _ids(client, "/pedidos/filtrar", data_pedido="2025-09-10") == [pedido["id"]]
+
+    ok(client.patch("/pedidos/", params={"pedido_id": pedido["id"]}, json={"data_pedido": "2025-09-11"}))
+    assert _ids(client, "/pedidos/filtrar", data_pedido="2025-09-10") == []
+    assert _ids(client, "/pedidos/filtrar", data_pedido="2025-09-11") == [pedido["id"]]
+
+    response = client.patch(
+        "/pedidos/", params={"pedido_id": pedido["id"]}, json={"status": "pago"}, headers={"Prefer": "return=minimal"},
+    )
+    assert response.status_code == 204
+    filtrado = ok(client.get("/pedidos/filtrar", params={"data_pedido": "2025-09-11"}))
+    assert filtrado["items"][0]["status"] == "pago"
+
+    ok(client.delete("/pedidos/", params={"pedido_id": pedido["id"]}))
+    assert _ids(client, "/pedidos/filtrar", data_pedido="2025-09-11") == []
+
+
+def test_filtro_de_pagamentos_por_data(client, dados, monkeypatch):
+    monkeypatch.setattr(write_behind, "enqueue", lambda *args, **kwargs: None)
+    pagamento = dados["pagamento"]
+    assert _ids(client, "/pagamentos/filtrar", data_pagamento="2025-07-02") == [pagamento["id"]]
+    ok(client.patch("/pagamentos/", params={"pagamento_id": pagamento["id"]}, json={"data_pagamento": "2025-07-03"}))
+    assert _ids(client, "/pagamentos/filtrar", data_inicio="2025-07-01", data_fim="2025-07-31") == [pagamento["id"]]
+    assert _ids(client, "/pagamentos/filtrar", data_pagamento="2025-07-02") == []
+    ok(client.delete("/pagamentos/", params={"pagamento_id": pagamento["id"]}))
+    assert _ids(client, "/pagamentos/filtrar", data_pagamento="2025-07-03") == []
+
+
+def test_backfill_preenche_series_vazias(client, dados, repos):
+    repos.pedidos_por_dia.truncate()
+    repos.pagamentos_por_dia.truncate()
+    assert _ids(client, "/pedidos/filtrar", data_pedido="2025-07-01") == []
+
+    assert por_dia.backfill(repos) == 2
+    assert _ids(client, "/pedidos/filtrar", data_pedido="2025-07-01") == [dados["pedido"]["id"]]
+    # Com a série já preenchida, o backfill não faz nada!
+    assert por_dia.backfill(repos) == 0
+
+
+def test_escritas_nao_procuram_a_copia_pelo_id(client, dados, monkeypatch):
+    from app.database.query_tracker import assert_query_budget
+    monkeypatch.setattr(write_behind, "enqueue", lambda *args, **kwargs: None)
+    with assert_query_budget(6) as requisicoes:
+        pedido = ok(client.post("/pedidos/", json={
+            "usuario_id": dados["usuario"]["id"], "status": "novo", "valor_total": 5.0, "data_pedido": "2025-09-10",
+        }))
+        ok(client.patch("/pedidos/", params={"pedido_id": pedido["id"]}, json={"status": "pago"}))
+        ok(client.patch("/pedidos/", params={"pedido_id": pedido["id"]}, json={"data_pedido": "2025-09-12"}))
+        ok(client.delete("/pedidos/", params={"pedido_id": pedido["id"]}))
+    # O dia antigo vem da rota: nenhuma leitura na série (o índice em id consultaria todos os nós)!
+    statements = [statement for requisicao in requisicoes for statement, _ in requisicao.statements]
+    assert [s for s in statements if s.startswith("SELECT") and "_por_dia" in s] == [], statements
+    assert _ids(client, "/pedidos/filtrar", data_pedido="2025-09-12") == []
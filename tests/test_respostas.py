@@ -0,0 +1,31 @@
+import os
+import uuid
+import orjson
+import pytest
+from pydantic import ValidationError
+from app.schemas.schemas import LivroRead
+from app.serialization import responses
+
+LIVRO = {
+    "id": uuid.uuid4(), "titulo": "T", "genero": "conto", "preco": 1.0, "data_publicacao": "1900-01-01",
+    "autor_id": uuid.uuid4(), "editora_id": uuid.uuid4(),
+}
+
+
+@pytest.mark.skipif("RESPONSE_VALIDATION" in os.environ, reason="modo escolhido no ambiente")
+def test_validacao_e_o_padrao():
+    assert responses.RESPONSE_VALIDATION == "validate"
+
+
+def test_validate_descarta_colunas_e_recusa_tipos_errados(monkeypatch):
+    monkeypatch.setattr(responses, "RESPONSE_VALIDATION", "validate")
+    body = orjson.loads(responses.render(LivroRead, {**LIVRO, "coluna_interna": 1}).body)
+    assert "coluna_interna" not in body
+    with pytest.raises(ValidationError):
+        responses.render(LivroRead, {**LIVRO, "preco": "caro"})
+
+
+def test_trust_e_opt_in(monkeypatch):
+    monkeypatch.setattr(responses, "RESPONSE_VALIDATION", "trust")
+    body = orjson.loads(responses.render(LivroRead, {**LIVRO, "coluna_interna": 1}).body)
+    assert body["coluna_interna"] == 1
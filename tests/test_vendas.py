@@ -0,0 +1,44 @@
+from datetime import date
+from uuid import UUID
+from app import write_behind
+from app.projections import vendas
+from tests.conftest import ok
+
+
+def _status(repos, dia):
+    return {row.chave: (row.receita_centavos, row.quantidade) for row in repos.vendas.por_dias("status", [dia])}
+
+
+def test_sincronizacoes_concorrentes_somam_uma_vez(client, repos, monkeypatch):
+    monkeypatch.setattr(write_behind, "enqueue", lambda *args, **kwargs: None)
+    usuario = ok(client.post("/usuarios/", json={"nome": "U", "email": "u@x.com", "cpf": "1"}))
+    pedido = ok(client.post("/pedidos/", json={
+        "usuario_id": usuario["id"], "status": "novo", "valor_total": 10.0, "data_pedido": "2025-07-01",
+    }))
+    pedido_id = UUID(pedido["id"])
+
+    # A segunda tarefa da mesma origem termina entre a leitura do registro e a LWT da primeira!
+    registrar = repos.vendas.registrar
+    concorrente = []
+
+    def registrar_depois_da_concorrente(*args, **kwargs):
+        if not concorrente:
+            concorrente.append(True)
+            vendas.sincronizar_pedido(repos, pedido_id)
+        return registrar(*args, **kwargs)
+
+    monkeypatch.setattr(repos.vendas, "registrar", registrar_depois_da_concorrente)
+    vendas.sincronizar_pedido(repos, pedido_id)
+    assert _status(repos, date(2025, 7, 1)) == {"novo": (1000, 1)}
+
+    # Mudou o status: sai de um contador e entra no outro, uma vez só!
+    ok(client.patch("/pedidos/", params={"pedido_id": str(pedido_id)}, json={"status": "pago"}))
+    concorrente.clear()
+    vendas.sincronizar_pedido(repos, pedido_id)
+    assert _status(repos, date(2025, 7, 1)) == {"novo": (0, 0), "pago": (1000, 1)}
+
+    ok(client.delete("/pedidos/", params={"pedido_id": str(pedido_id)}))
+    vendas.sincronizar_pedido(repos, pedido_id)
+    assert _status(repos, date(2025, 7, 1)) == {"novo": (0, 0), "pago": (0, 0)}
+    assert vendas.sincronizar_pedido(repos, pedido_id) is None
+    assert _status(repos, date(2025, 7, 1)) == {"novo": (0, 0), "pago": (0, 0)}
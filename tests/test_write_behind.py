@@ -0,0 +1,183 @@
+import json
+import time
+from datetime import timedelta
+from uuid import UUID, uuid1, uuid4
+import pytest
+from app import write_behind
+from app.write_behind.tarefas import TAREFAS
+from tests.conftest import ok
+
+
+@pytest.fixture(params=["inline", "async"])
+def modo(request, monkeypatch):
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_MODE", request.param)
+    return request.param
+
+
+@pytest.fixture
+def client_modo(modo, repos):
+    # O worker async sobe no startup do app (lê WRITE_BEHIND_MODE nessa hora)!
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _drenar():
+    assert write_behind.flush(timeout=10)
+
+
+def _livros_detalhados(client, usuario_id):
+    detalhados = ok(client.get(f"/consulta-usuario/pedidos-detalhados/{usuario_id}"))
+    return {livro["id"] for item in detalhados["items"] for livro in item["livros"]}
+
+
+def test_remover_livro_limpa_vinculos_e_projecoes(client_modo, repos):
+    client = client_modo
+    autor = ok(client.post("/autores/", json={
+        "nome": "A", "email": "a@x.com", "data_nascimento": "1900-01-01", "nacionalidade": "BR",
+    }))
+    editora = ok(client.post("/editoras/", json={"nome": "Ed", "endereco": "R", "telefone": "1", "email": "e@x.com"}))
+    livros = [
+        ok(client.post("/livros/", json={
+            "titulo": f"L{i}", "genero": "conto", "preco": 1.0, "data_publicacao": "1900-01-01",
+            "autor_id": autor["id"], "editora_id": editora["id"],
+        }))
+        for i in range(2)
+    ]
+    usuario = ok(client.post("/usuarios/", json={"nome": "U", "email": "u@x.com", "cpf": "1"}))
+    pedido = ok(client.post("/pedidos/checkout", json={
+        "usuario_id": usuario["id"], "livro_ids": [livro["id"] for livro in livros], "forma_pagamento": "pix",
+    }), 201)["pedido"]
+    _drenar()
+    assert _livros_detalhados(client, usuario["id"]) == {livro["id"] for livro in livros}
+
+    ok(client.delete("/livros/", params={"livro_id": livros[0]["id"]}))
+    _drenar()
+    assert [item["id"] for item in ok(client.get(f"/pedido-livro/livros/{pedido['id']}"))["items"]] == [livros[1]["id"]]
+    assert _livros_detalhados(client, usuario["id"]) == {livros[1]["id"]}
+    assert write_behind._backlog == 0
+
+
+def test_remover_pedido_limpa_vinculos(client_modo, repos):
+    client = client_modo
+    usuario = ok(client.post("/usuarios/", json={"nome": "U", "email": "u@x.com", "cpf": "1"}))
+    pedido = ok(client.post("/pedidos/", json={
+        "usuario_id": usuario["id"], "status": "novo", "valor_total": 1.0, "data_pedido": "2025-07-01",
+    }))
+    pagamento = ok(client.post("/pagamentos/", json={
+        "pedido_id": pedido["id"], "valor": 1.0, "data_pagamento": "2025-07-01", "forma_pagamento": "pix",
+    }))
+    ok(client.post("/pedido-pagamento/vincular", json={"pedido_id": pedido["id"], "pagamento_id": pagamento["id"]}), 201)
+    _drenar()
+
+    ok(client.delete("/pedidos/", params={"pedido_id": pedido["id"]}))
+    _drenar()
+    assert repos.pedido_pagamento.list_by_pedido(UUID(pedido["id"])) == []
+    assert ok(client.get(f"/consulta-usuario/pedidos-detalhados/{usuario['id']}"))["items"] == []
+
+
+@pytest.mark.parametrize("rota, parametro, chave, tabela", [
+    ("/livros/", "livro_id", "livros", "livro"), ("/pedidos/", "pedido_id", "pedido", "pedido"),
+])
+def test_remocao_le_a_linha_uma_vez_so(client, dados, monkeypatch, rota, parametro, chave, tabela):
+    from app.database.query_tracker import assert_query_budget
+    monkeypatch.setattr(write_behind, "enqueue", lambda *args, **kwargs: None)
+    alvo = dados[chave][0] if chave == "livros" else dados[chave]
+    with assert_query_budget(4) as requisicoes:
+        ok(client.delete(rota, params={parametro: alvo["id"]}))
+    # Na tabela da entidade, uma leitura por chave antes do DELETE: a checagem de existência ("read"), que no
+    # pedido é a mesma leitura que traz o dia da cópia por dia (identity map). A série nunca é consultada pelo
+    # id (índice em todos os nós), nem a editora/usuário (a tarefa do write-behind os acha)!
+    statements = [statement for statement, _ in requisicoes[0].statements]
+    assert len([s for s in statements if s.startswith("SELECT") and f"FROM {tabela} " in s]) == 1, statements
+    assert [s for s in statements if s.startswith("SELECT") and "_por_dia" in s] == [], statements
+
+
+def test_cascata_nao_depende_das_projecoes(client, dados, repos):
+    # Projeção vazia (nunca reconstruída): os vínculos ainda saem pelo índice das tabelas de vínculos!
+    repos.pedido_detalhado.partitions.clear()
+    repos.pedido_detalhado.livro_pedido.clear()
+    repos.pedido_detalhado.pagamento_pedido.clear()
+    pedido_id = UUID(dados["pedido"]["id"])
+
+    ok(client.delete("/livros/", params={"livro_id": dados["livros"][0]["id"]}))
+    ok(client.delete("/pagamentos/", params={"pagamento_id": dados["pagamento"]["id"]}))
+    _drenar()
+    assert [str(rel.livro_id) for rel in repos.pedido_livro.list_by_pedido(pedido_id)] == [dados["livros"][1]["id"]]
+    assert repos.pedido_pagamento.list_by_pedido(pedido_id) == []
+
+
+@pytest.fixture
+def worker(repos, monkeypatch):
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_MODE", "async")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _tarefa(particao, tipo, dono, prazo, **payload):
+    return {
+        "particao": particao, "id": uuid1(), "tipo": tipo, "payload": json.dumps(payload), "tags": [],
+        "dono": dono, "prazo": prazo,
+    }
+
+
+def test_falha_nao_segura_as_outras_e_volta_quando_o_prazo_vence(worker, repos, monkeypatch):
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_BACKOFF_MS", 300)
+    feitas, falhas = [], []
+
+    def falha(repos, nome):
+        if len(falhas) < 2:
+            falhas.append(time.perf_counter())
+            raise RuntimeError("fora do ar")
+        feitas.append((nome, time.perf_counter()))
+
+    monkeypatch.setitem(TAREFAS, "falha", falha)
+    monkeypatch.setitem(TAREFAS, "conta", lambda repos, nome: feitas.append((nome, time.perf_counter())))
+
+    write_behind.enqueue("falha", nome="falha")
+    write_behind.enqueue("conta", nome="conta")
+    _drenar()
+    # A outra tarefa não esperou o backoff; a que falhou duas vezes continua no outbox!
+    assert [nome for nome, _ in feitas] == ["conta"]
+    assert feitas[0][1] < falhas[0] + 0.3 <= falhas[1]
+    assert [t.tipo for t in repos.outbox.pending(write_behind.OUTBOX_PARTITIONS)] == ["falha"]
+
+    # A varredura periódica só a toma depois de vencido o prazo do dono!
+    assert write_behind._reclaim() == 0
+    vencido = write_behind._agora() + timedelta(seconds=write_behind.WRITE_BEHIND_LEASE_S + 1)
+    monkeypatch.setattr(write_behind, "_agora", lambda: vencido)
+    assert write_behind._reclaim() == 1
+    _drenar()
+    assert [nome for nome, _ in feitas] == ["conta", "falha"]
+    assert repos.outbox.pending(write_behind.OUTBOX_PARTITIONS) == []
+
+
+def test_startup_so_refaz_tarefas_vencidas(repos, monkeypatch):
+    feitas = []
+    monkeypatch.setitem(TAREFAS, "conta", lambda repos, nome: feitas.append(nome))
+    agora = write_behind._agora()
+    # Uma de um worker vivo (prazo em dia), uma de um worker que caiu (prazo vencido)!
+    repos.outbox.add(_tarefa(0, "conta", uuid4(), agora + timedelta(minutes=1), nome="viva"))
+    repos.outbox.add(_tarefa(1, "conta", uuid4(), agora - timedelta(minutes=1), nome="orfa"))
+
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_MODE", "async")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app):
+        _drenar()
+    assert feitas == ["orfa"]
+    assert [t.payload for t in repos.outbox.pending(write_behind.OUTBOX_PARTITIONS)] == [json.dumps({"nome": "viva"})]
+
+
+def test_so_um_worker_toma_a_tarefa_vencida(repos):
+    tarefa = _tarefa(0, "conta", uuid4(), write_behind._agora() - timedelta(seconds=1), nome="x")
+    repos.outbox.add(tarefa)
+    lida = {"particao": tarefa["particao"], "id": tarefa["id"], "prazo": tarefa["prazo"]}
+    prazo = write_behind._agora() + timedelta(minutes=1)
+    # Dois workers leram o mesmo prazo: o segundo compare-and-set não vale mais!
+    assert repos.outbox.claim([dict(lida)], uuid4(), prazo) != []
+    assert repos.outbox.claim([dict(lida)], uuid4(), prazo) == []